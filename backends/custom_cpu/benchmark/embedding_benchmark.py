@@ -0,0 +1,89 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the native custom_cpu embedding with the fallback path.
+
+Without a custom_cpu kernel the lookup runs on the host CPU kernel: the ids
+and the whole table are copied to CPUPlace, the op runs there and the output
+(and, for the backward pass, the table-sized gradient) is copied back. The
+fallback column times exactly that. The default table is 10M x 128 float32,
+about 5 GB, and the backward pass needs as much again for the gradient:
+
+    python embedding_benchmark.py --rows 10000000 --width 128 --steps 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+
+def make_step(table, ids, backward, fallback):
+    device = paddle.CustomPlace("custom_cpu", 0)
+    host = paddle.CPUPlace()
+
+    def step():
+        weight, index = table, ids
+        if fallback:
+            weight = table._copy_to(host, True)
+            weight.stop_gradient = table.stop_gradient
+            index = ids._copy_to(host, True)
+        out = F.embedding(index, weight, padding_idx=0)
+        if backward:
+            (grad,) = paddle.grad([out], [weight], [paddle.ones_like(out)])
+            return grad._copy_to(device, True) if fallback else grad
+        return out._copy_to(device, True) if fallback else out
+
+    return step
+
+
+def time_step(step, steps):
+    step().numpy()  # warm up
+    start = time.perf_counter()
+    for _ in range(steps):
+        out = step()
+    out.numpy()
+    return (time.perf_counter() - start) * 1000.0 / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--width", type=int, default=128)
+    parser.add_argument(
+        "--ids", type=int, default=4096 * 26, help="ids per lookup (batch x slots)"
+    )
+    parser.add_argument("--steps", type=int, default=5)
+    args = parser.parse_args()
+
+    paddle.set_device("custom_cpu")
+    table = paddle.to_tensor(
+        np.random.rand(args.rows, args.width).astype("float32"), stop_gradient=False
+    )
+    ids = paddle.to_tensor(np.random.randint(0, args.rows, [args.ids]).astype("int64"))
+
+    print("embedding [%d, %d], %d ids per lookup" % (args.rows, args.width, args.ids))
+    print("%-10s %14s %12s %8s" % ("pass", "fallback (ms)", "native (ms)", "speedup"))
+    for name, backward in (("forward", False), ("backward", True)):
+        fallback = time_step(make_step(table, ids, backward, True), args.steps)
+        native = time_step(make_step(table, ids, backward, False), args.steps)
+        print(
+            "%-10s %14.3f %12.3f %7.2fx" % (name, fallback, native, fallback / native)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// Compares the blocked GEMM engine used by the custom_cpu matmul kernels with
+// the naive triple loop it replaced, and checks that both agree.
+//
+//   cmake .. -DWITH_BENCHMARK=ON && make gemm_benchmark && ./gemm_benchmark
+
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <random>
+#include <vector>
+
+#include "kernels/funcs/gemm.h"
+
+namespace {
+
+template <typename T>
+void NaiveGEMM(bool trans_x,
+               bool trans_y,
+               size_t M,
+               size_t K,
+               size_t N,
+               const T* x,
+               const T* y,
+               T* out,
+               bool trans_out) {
+  memset(out, 0, M * N * sizeof(T));
+  for (size_t m = 0; m < M; ++m) {
+    for (size_t n = 0; n < N; ++n) {
+      auto* out_data = trans_out ? &out[n * M + m] : &out[m * N + n];
+      for (size_t k = 0; k < K; ++k) {
+        auto x_dat = trans_x ? x[k * M + m] : x[m * K + k];
+        auto y_dat = trans_y ? y[n * K + k] : y[k * N + n];
+        *out_data += x_dat * y_dat;
+      }
+    }
+  }
+}
+
+template <typename T>
+void EngineGEMM(bool trans_x,
+                bool trans_y,
+                int64_t M,
+                int64_t K,
+                int64_t N,
+                const T* x,
+                const T* y,
+                T* out,
+                bool trans_out) {
+  using custom_kernel::funcs::StridedMatrix;
+  StridedMatrix<const T> x_mat{x, trans_x ? 1 : K, trans_x ? M : 1};
+  StridedMatrix<const T> y_mat{y, trans_y ? 1 : N, trans_y ? K : 1};
+  StridedMatrix<T> out_mat{out, trans_out ? 1 : N, trans_out ? M : 1};
+  custom_kernel::funcs::Gemm<T>(M, N, K, 1.0f, x_mat, y_mat, false, out_mat);
+}
+
+template <typename F>
+double TimeMs(F&& fn, int repeat) {
+  fn();  // warm up
+  auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < repeat; ++i) {
+    fn();
+  }
+  auto end = std::chrono::steady_clock::now();
+  return std::chrono::duration<double, std::milli>(end - start).count() /
+         repeat;
+}
+
+struct Shape {
+  int64_t M;
+  int64_t K;
+  int64_t N;
+  bool trans_x;
+  bool trans_y;
+  bool trans_out;
+};
+
+template <typename T>
+void RunCase(const Shape& s, const char* dtype) {
+  std::mt19937 rng(2023);
+  std::uniform_real_distribution<double> dist(-1.0, 1.0);
+  std::vector<T> x(s.M * s.K), y(s.K * s.N);
+  std::vector<T> ref(s.M * s.N), out(s.M * s.N);
+  for (auto& v : x) v = static_cast<T>(dist(rng));
+  for (auto& v : y) v = static_cast<T>(dist(rng));
+
+  // The naive loop is only timed once on large shapes to keep runs short.
+  const double flops = 2.0 * s.M * s.N * s.K;
+  const int naive_repeat = flops > 1e9 ? 1 : 3;
+  const int engine_repeat = flops > 1e9 ? 10 : 50;
+
+  double naive_ms = TimeMs(
+      [&] {
+        NaiveGEMM(s.trans_x,
+                  s.trans_y,
+                  s.M,
+                  s.K,
+                  s.N,
+                  x.data(),
+                  y.data(),
+                  ref.data(),
+                  s.trans_out);
+      },
+      naive_repeat);
+  double engine_ms = TimeMs(
+      [&] {
+        EngineGEMM(s.trans_x,
+                   s.trans_y,
+                   s.M,
+                   s.K,
+                   s.N,
+                   x.data(),
+                   y.data(),
+                   out.data(),
+                   s.trans_out);
+      },
+      engine_repeat);
+
+  double max_err = 0;
+  for (size_t i = 0; i < ref.size(); ++i) {
+    max_err = std::max(
+        max_err,
+        std::fabs(static_cast<double>(ref[i]) - static_cast<double>(out[i])));
+  }
+  printf(
+      "%-7s %5ld %5ld %5ld  tx=%d ty=%d to=%d  naive %10.3f ms  engine "
+      "%8.3f ms  %8.1fx  %7.2f GFLOP/s  max_err %.2e\n",
+      dtype,
+      static_cast<long>(s.M),  // NOLINT
+      static_cast<long>(s.K),  // NOLINT
+      static_cast<long>(s.N),  // NOLINT
+      s.trans_x,
+      s.trans_y,
+      s.trans_out,
+      naive_ms,
+      engine_ms,
+      naive_ms / engine_ms,
+      flops / engine_ms / 1e6,
+      max_err);
+}
+
+}  // namespace
+
+int main() {
+  printf("threads: %d\n",
+         custom_kernel::funcs::ThreadPool::Instance().NumThreads());
+  const std::vector<Shape> shapes = {
+      {64, 64, 64, false, false, false},
+      {128, 784, 10, false, false, false},
+      {1, 1024, 1024, false, false, false},
+      {256, 256, 256, false, false, false},
+      {256, 256, 256, true, false, false},
+      {256, 256, 256, false, true, false},
+      {256, 256, 256, false, false, true},
+      {512, 768, 768, false, true, false},
+      {1024, 1024, 1024, false, false, false},
+  };
+  for (const auto& s : shapes) {
+    RunCase<float>(s, "float32");
+  }
+  for (const auto& s : shapes) {
+    RunCase<double>(s, "float64");
+  }
+  return 0;
+}
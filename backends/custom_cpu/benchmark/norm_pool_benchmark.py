@@ -0,0 +1,137 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the native custom_cpu pool2d, batch_norm and layer_norm kernels
+with the fallback path.
+
+Without a custom_cpu kernel an op runs on the host CPU kernel: the inputs are
+copied to CPUPlace, the op runs there and its outputs are copied back. The
+fallback column times exactly that, so it includes the transfer cost. Every
+case runs the forward pass and, with --backward, the backward pass as well:
+
+    python norm_pool_benchmark.py --steps 50 --backward
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+CASES = [
+    ("max_pool_nchw", "max_pool2d 3x3/2 pad 1, [32, 64, 112, 112]"),
+    ("max_pool_nhwc", "max_pool2d 3x3/2 pad 1, [32, 112, 112, 64] NHWC"),
+    ("avg_pool_nchw", "adaptive_avg_pool2d 1x1, [32, 2048, 7, 7]"),
+    ("batch_norm_nchw", "batch_norm train, [32, 64, 56, 56]"),
+    ("batch_norm_nhwc", "batch_norm train, [32, 56, 56, 64] NHWC"),
+    ("layer_norm", "layer_norm, [32 * 128, 768]"),
+]
+
+
+def build_case(name):
+    rand = lambda *shape: np.random.rand(*shape).astype("float32")
+    if name == "max_pool_nchw":
+        inputs = [rand(32, 64, 112, 112)]
+        fn = lambda x: F.max_pool2d(x, 3, 2, 1)
+    elif name == "max_pool_nhwc":
+        inputs = [rand(32, 112, 112, 64)]
+        fn = lambda x: F.max_pool2d(x, 3, 2, 1, data_format="NHWC")
+    elif name == "avg_pool_nchw":
+        inputs = [rand(32, 2048, 7, 7)]
+        fn = lambda x: F.adaptive_avg_pool2d(x, 1)
+    elif name in ("batch_norm_nchw", "batch_norm_nhwc"):
+        data_format = "NHWC" if name.endswith("nhwc") else "NCHW"
+        shape = [32, 56, 56, 64] if data_format == "NHWC" else [32, 64, 56, 56]
+        inputs = [rand(*shape), rand(64), rand(64)]
+        running_mean = np.zeros([64], "float32")
+        running_var = np.ones([64], "float32")
+
+        def fn(x, scale, bias):
+            return F.batch_norm(
+                x,
+                paddle.to_tensor(running_mean, place=x.place),
+                paddle.to_tensor(running_var, place=x.place),
+                weight=scale,
+                bias=bias,
+                training=True,
+                data_format=data_format,
+            )
+
+    elif name == "layer_norm":
+        inputs = [rand(32 * 128, 768), rand(768), rand(768)]
+        fn = lambda x, scale, bias: F.layer_norm(x, [768], scale, bias)
+    else:
+        raise ValueError("unknown case " + name)
+    return inputs, fn
+
+
+def make_step(inputs, fn, backward, fallback):
+    device = paddle.CustomPlace("custom_cpu", 0)
+    host = paddle.CPUPlace()
+    tensors = [
+        paddle.to_tensor(x, place=device, stop_gradient=not backward) for x in inputs
+    ]
+
+    def step():
+        args = tensors
+        if fallback:
+            args = [t._copy_to(host, True) for t in tensors]
+            for arg in args:
+                arg.stop_gradient = not backward
+        out = fn(*args)
+        if backward:
+            grads = paddle.grad([out], args, [paddle.ones_like(out)])
+            if fallback:
+                grads = [g._copy_to(device, True) for g in grads]
+            return grads[0]
+        return out._copy_to(device, True) if fallback else out
+
+    return step
+
+
+def time_step(step, steps):
+    step().numpy()  # warm up
+    start = time.perf_counter()
+    for _ in range(steps):
+        out = step()
+    out.numpy()
+    return (time.perf_counter() - start) * 1000.0 / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument(
+        "--backward", action="store_true", help="time forward and backward"
+    )
+    args = parser.parse_args()
+
+    paddle.set_device("custom_cpu")
+    print(
+        "%-16s %-50s %14s %12s %8s"
+        % ("case", "", "fallback (ms)", "native (ms)", "speedup")
+    )
+    for name, desc in CASES:
+        inputs, fn = build_case(name)
+        fallback = time_step(make_step(inputs, fn, args.backward, True), args.steps)
+        native = time_step(make_step(inputs, fn, args.backward, False), args.steps)
+        print(
+            "%-16s %-50s %14.3f %12.3f %7.2fx"
+            % (name, desc, fallback, native, fallback / native)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Times one optimizer step on custom_cpu over the parameters of BERT-base.
+
+The parameter set has the shapes of BERT-base (12 layers, hidden size 768,
+about 110M parameters in 199 tensors). Gradients are computed once and every
+step only runs the optimizer. Momentum and Adam run once with one kernel
+per parameter and once with their multi-tensor kernels. With --fp16 the parameters are float16
+and the optimizers keep float32 master weights:
+
+    python optimizer_benchmark.py --steps 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+
+CASES = [
+    ("sgd", "SGD", {}),
+    ("momentum", "Momentum", {"momentum": 0.9}),
+    ("momentum_mt", "Momentum", {"momentum": 0.9, "use_multi_tensor": True}),
+    ("adam", "Adam", {}),
+    ("adam_mt", "Adam", {"use_multi_tensor": True}),
+    ("adamw", "AdamW", {"weight_decay": 0.01}),
+]
+
+
+def bert_base_shapes(vocab_size=30522, hidden=768, layers=12, ffn=3072):
+    shapes = [[vocab_size, hidden], [512, hidden], [2, hidden], [hidden], [hidden]]
+    for _ in range(layers):
+        for _ in range(4):  # query, key, value and output projections
+            shapes += [[hidden, hidden], [hidden]]
+        shapes += [[hidden], [hidden]]
+        shapes += [[hidden, ffn], [ffn], [ffn, hidden], [hidden]]
+        shapes += [[hidden], [hidden]]
+    shapes += [[hidden, hidden], [hidden]]  # pooler
+    return shapes
+
+
+def build_params(dtype):
+    params = [paddle.create_parameter(shape, dtype) for shape in bert_base_shapes()]
+    # The gradients stay in place, since nothing calls clear_grad.
+    loss = paddle.add_n([paddle.sum(p).astype("float32") for p in params])
+    loss.backward()
+    return params
+
+
+def time_case(params, class_name, kwargs, multi_precision, steps):
+    optimizer_class = getattr(paddle.optimizer, class_name)
+    if multi_precision:
+        kwargs = dict(kwargs, multi_precision=True)
+    optimizer = optimizer_class(learning_rate=1e-4, parameters=params, **kwargs)
+    optimizer.step()  # warm up and create the accumulators
+    start = time.perf_counter()
+    for _ in range(steps):
+        optimizer.step()
+    params[-1].numpy()
+    return (time.perf_counter() - start) * 1000.0 / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument(
+        "--fp16", action="store_true", help="float16 parameters, float32 master"
+    )
+    args = parser.parse_args()
+
+    paddle.set_device("custom_cpu")
+    dtype = "float16" if args.fp16 else "float32"
+    params = build_params(dtype)
+    numel = sum(int(np.prod(p.shape)) for p in params)
+    print("%d %s parameters in %d tensors" % (numel, dtype, len(params)))
+    print("%-12s %12s %14s" % ("optimizer", "step (ms)", "GB/s (approx)"))
+    for name, class_name, kwargs in CASES:
+        ms = time_case(params, class_name, kwargs, args.fp16, args.steps)
+        # Adam reads and writes the parameter and two moments and reads the
+        # gradient; momentum has one state tensor and SGD none.
+        tensors = {"sgd": 3, "momentum": 5}.get(name.split("_")[0], 7)
+        bytes_per_step = numel * 4 * tensors
+        print("%-12s %12.3f %14.2f" % (name, ms, bytes_per_step / ms / 1e6))
+
+
+if __name__ == "__main__":
+    main()
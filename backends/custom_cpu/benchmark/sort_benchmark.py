@@ -0,0 +1,68 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Times argsort and top-k on custom_cpu against a full sort.
+
+The input is a batch of score rows, shaped like the candidate scores of beam
+search or retrieval. Every row is sorted with argsort, and top-k is timed
+for a few values of k. The top-k times show what a selection saves over
+sorting the whole row. With --axis 0 the rows run along the outer axis and
+are read with a stride:
+
+    python sort_benchmark.py --rows 256 --cols 50000 --steps 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+
+
+def time_op(fn, steps):
+    fn()[0].numpy()  # warm up
+    start = time.perf_counter()
+    for _ in range(steps):
+        out = fn()
+    out[0].numpy()
+    return (time.perf_counter() - start) * 1000.0 / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=256)
+    parser.add_argument("--cols", type=int, default=50000)
+    parser.add_argument("--axis", type=int, default=-1)
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args()
+
+    paddle.set_device("custom_cpu")
+    data = np.random.rand(args.rows, args.cols).astype(args.dtype)
+    if args.axis == 0:
+        data = np.ascontiguousarray(data.T)
+    x = paddle.to_tensor(data)
+    n = data.shape[args.axis]
+
+    print("%s %s, sorting along axis %d" % (args.dtype, list(data.shape), args.axis))
+    print("%-14s %10s" % ("op", "time (ms)"))
+    ms = time_op(lambda: (paddle.argsort(x, axis=args.axis),), args.steps)
+    print("%-14s %10.3f" % ("argsort", ms))
+    for k in (1, 10, 100, n // 10):
+        ms = time_op(lambda: paddle.topk(x, k, axis=args.axis), args.steps)
+        print("%-14s %10.3f" % ("topk k=%d" % k, ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reports how the custom_cpu kernels scale with the intra-op thread count.
+
+The pool size is fixed when the plugin is loaded, so every thread count runs
+in its own process with FLAGS_custom_cpu_num_threads set:
+
+    python thread_scaling_benchmark.py --threads 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+CASES = [
+    ("add", "x + y, [64, 512, 512] + [512]"),
+    ("multiply", "x * y, [64, 512, 512] * [64, 512, 512]"),
+    ("sum", "sum over axis 1, [256, 1024, 64]"),
+    ("mean", "mean over axis -1, [4096, 4096]"),
+    ("max", "max over axis 0, [4096, 4096]"),
+    ("softmax", "softmax over axis -1, [4096, 4096]"),
+    ("cast", "float32 -> float64, [16M]"),
+    ("transpose", "perm [0, 2, 1], [64, 512, 512]"),
+    ("concat", "axis 1, 4 x [64, 256, 512]"),
+    ("slice", "[:, 10:500, :], [64, 512, 512]"),
+    ("argsort", "axis -1, [4096, 1024]"),
+    ("uniform", "uniform, [16M]"),
+]
+
+
+def build_case(paddle, name):
+    rand = lambda *shape: paddle.to_tensor(np.random.rand(*shape).astype("float32"))
+    if name == "add":
+        x, y = rand(64, 512, 512), rand(512)
+        return lambda: paddle.add(x, y)
+    if name == "multiply":
+        x, y = rand(64, 512, 512), rand(64, 512, 512)
+        return lambda: paddle.multiply(x, y)
+    if name == "sum":
+        x = rand(256, 1024, 64)
+        return lambda: paddle.sum(x, axis=1)
+    if name == "mean":
+        x = rand(4096, 4096)
+        return lambda: paddle.mean(x, axis=-1)
+    if name == "max":
+        x = rand(4096, 4096)
+        return lambda: paddle.max(x, axis=0)
+    if name == "softmax":
+        x = rand(4096, 4096)
+        return lambda: paddle.nn.functional.softmax(x, axis=-1)
+    if name == "cast":
+        x = rand(1 << 24)
+        return lambda: paddle.cast(x, "float64")
+    if name == "transpose":
+        x = rand(64, 512, 512)
+        return lambda: paddle.transpose(x, [0, 2, 1])
+    if name == "concat":
+        xs = [rand(64, 256, 512) for _ in range(4)]
+        return lambda: paddle.concat(xs, axis=1)
+    if name == "slice":
+        x = rand(64, 512, 512)
+        return lambda: x[:, 10:500, :]
+    if name == "argsort":
+        x = rand(4096, 1024)
+        return lambda: paddle.argsort(x, axis=-1)
+    if name == "uniform":
+        return lambda: paddle.uniform([1 << 24], min=-1.0, max=1.0)
+    raise ValueError("unknown case " + name)
+
+
+def run_worker(repeat):
+    import paddle
+
+    paddle.set_device("custom_cpu")
+    results = {}
+    for name, _ in CASES:
+        fn = build_case(paddle, name)
+        fn()  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            out = fn()
+        out.numpy()
+        results[name] = (time.perf_counter() - start) * 1000.0 / repeat
+    print(json.dumps(results))
+
+
+def run_with_threads(num_threads, repeat):
+    env = dict(os.environ, FLAGS_custom_cpu_num_threads=str(num_threads))
+    output = subprocess.check_output(
+        [sys.executable, __file__, "--worker", "--repeat", str(repeat)], env=env
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, os.cpu_count() or 1],
+        help="thread counts to compare, the smallest one is the baseline",
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.repeat)
+        return
+
+    threads = sorted(set(args.threads))
+    timings = {n: run_with_threads(n, args.repeat) for n in threads}
+    base = threads[0]
+
+    header = "%-10s %-40s" % ("kernel", "case") + "".join(
+        "%14s" % ("%d thr (ms)" % n) for n in threads
+    )
+    print(header)
+    for name, desc in CASES:
+        row = "%-10s %-40s" % (name, desc)
+        for n in threads:
+            ms = timings[n][name]
+            row += "%8.2f %4.1fx" % (ms, timings[base][name] / ms)
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
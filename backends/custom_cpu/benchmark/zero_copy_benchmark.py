@@ -0,0 +1,177 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the custom_cpu copies with and without FLAGS_custom_cpu_zero_copy.
+
+The flag is read when the plugin is loaded, so each mode runs in its own
+process. Every case reports the time per step and the bytes the plugin copied
+and shared per step, read from CustomCPUZeroCopyGetStats:
+
+    python zero_copy_benchmark.py --steps 50
+"""
+
+import argparse
+import ctypes
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+CASES = [
+    ("mnist", "MNIST training step, batch 64 (tests/test_MNIST_model.py)"),
+    ("mnist_large", "MNIST training step, batch 4096"),
+    ("clone", "x.clone(), [64, 1024, 1024] float32"),
+    ("assign", "paddle.assign(x, y), [64, 1024, 1024] float32"),
+]
+
+
+class CustomCPUZeroCopyStats(ctypes.Structure):
+    _fields_ = [
+        ("bytes_copied", ctypes.c_uint64),
+        ("bytes_shared", ctypes.c_uint64),
+    ]
+
+
+def load_stats():
+    path = os.path.join(
+        os.environ.get("CUSTOM_DEVICE_ROOT", ""), "libpaddle-custom-cpu.so"
+    )
+    if not os.path.exists(path):
+        return lambda: (0, 0)
+    lib = ctypes.CDLL(path)
+    lib.CustomCPUZeroCopyGetStats.argtypes = [ctypes.POINTER(CustomCPUZeroCopyStats)]
+    lib.CustomCPUZeroCopyGetStats.restype = None
+
+    def get():
+        stats = CustomCPUZeroCopyStats()
+        lib.CustomCPUZeroCopyGetStats(ctypes.byref(stats))
+        return stats.bytes_copied, stats.bytes_shared
+
+    return get
+
+
+def build_mnist(paddle, batch_size):
+    # The model and training step of tests/test_MNIST_model.py, fed with
+    # random batches from host memory so that nothing has to be downloaded.
+    weight = paddle.create_parameter([784, 10], "float32")
+    sgd = paddle.optimizer.SGD(learning_rate=0.01, parameters=[weight])
+    images = np.random.uniform(-1, 1, [batch_size, 1, 28, 28]).astype("float32")
+    labels = np.random.randint(0, 10, [batch_size, 1]).astype("int64")
+
+    def step():
+        img = paddle.to_tensor(images)
+        label = paddle.to_tensor(labels)
+        x = paddle.reshape(img, shape=[-1, 784])
+        pred = paddle.nn.functional.softmax(paddle.matmul(x, weight))
+        loss = paddle.nn.functional.cross_entropy(pred, label)
+        loss.backward()
+        sgd.step()
+        sgd.clear_grad()
+        return loss
+
+    return step
+
+
+def build_case(paddle, name):
+    rand = lambda *shape: paddle.to_tensor(np.random.rand(*shape).astype("float32"))
+    if name == "mnist":
+        return build_mnist(paddle, 64)
+    if name == "mnist_large":
+        return build_mnist(paddle, 4096)
+    if name == "clone":
+        x = rand(64, 1024, 1024)
+        return lambda: x.clone()
+    if name == "assign":
+        x, y = rand(64, 1024, 1024), rand(64, 1024, 1024)
+        return lambda: paddle.assign(x, y)
+    raise ValueError("unknown case " + name)
+
+
+def run_worker(steps):
+    import paddle
+
+    paddle.set_device("custom_cpu")
+    get_stats = load_stats()
+    results = {}
+    for name, _ in CASES:
+        fn = build_case(paddle, name)
+        fn()  # warm up
+        copied, shared = get_stats()
+        start = time.perf_counter()
+        for _ in range(steps):
+            out = fn()
+        out.numpy()
+        elapsed = time.perf_counter() - start
+        end_copied, end_shared = get_stats()
+        results[name] = {
+            "ms": elapsed * 1000.0 / steps,
+            "copied": (end_copied - copied) / steps,
+            "shared": (end_shared - shared) / steps,
+        }
+    print(json.dumps(results))
+
+
+def run_with_zero_copy(enabled, steps):
+    env = dict(os.environ, FLAGS_custom_cpu_zero_copy="1" if enabled else "0")
+    output = subprocess.check_output(
+        [sys.executable, __file__, "--worker", "--steps", str(steps)], env=env
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.steps)
+        return
+
+    timings = {enabled: run_with_zero_copy(enabled, args.steps) for enabled in (0, 1)}
+
+    print(
+        "%-12s %-58s %10s %10s %8s %12s %12s"
+        % (
+            "case",
+            "",
+            "copy (ms)",
+            "zero (ms)",
+            "speedup",
+            "copied (MB)",
+            "shared (MB)",
+        )
+    )
+    for name, desc in CASES:
+        base, zero = timings[0][name], timings[1][name]
+        print(
+            "%-12s %-58s %10.3f %10.3f %7.2fx %12.2f %12.2f"
+            % (
+                name,
+                desc,
+                base["ms"],
+                zero["ms"],
+                base["ms"] / zero["ms"],
+                zero["copied"] / 2**20,
+                zero["shared"] / 2**20,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include <string>
+#include <vector>
+
+#include "kernels/funcs/linear_act.h"
+#include "paddle/extension.h"
+#include "paddle/phi/backends/custom/custom_context.h"
+
+// out = act(x * weight + bias), the fusion of matmul_v2, elementwise_add and
+// relu/gelu that the fused_linear_act passes produce for inference programs.
+// x is [..., K], weight is [K, N] and bias is [N].
+
+std::vector<std::vector<int64_t>> FusedLinearActInferShape(
+    const std::vector<int64_t>& x_shape,
+    const std::vector<int64_t>& weight_shape,
+    const std::vector<int64_t>& bias_shape) {
+  std::vector<int64_t> out_shape = x_shape;
+  out_shape[out_shape.size() - 1] = weight_shape[weight_shape.size() - 1];
+  return {out_shape};
+}
+
+std::vector<paddle::DataType> FusedLinearActInferDtype(
+    const paddle::DataType x_dtype,
+    const paddle::DataType weight_dtype,
+    const paddle::DataType bias_dtype) {
+  return {x_dtype};
+}
+
+std::vector<paddle::Tensor> FusedLinearAct(const paddle::Tensor& x,
+                                           const paddle::Tensor& weight,
+                                           const paddle::Tensor& bias,
+                                           const std::string& act_type) {
+  custom_kernel::funcs::LinearActivation act;
+  PD_CHECK(custom_kernel::funcs::ParseLinearActivation(act_type, &act),
+           "fused_linear_act: unsupported act_type ",
+           act_type,
+           ", expected identity, relu, gelu or gelu_tanh.");
+  const auto x_shape = x.shape();
+  const auto weight_shape = weight.shape();
+  PD_CHECK(!x_shape.empty() && weight_shape.size() == 2,
+           "fused_linear_act expects x of rank >= 1 and a 2-D weight.");
+  const int64_t K = x_shape.back();
+  const int64_t N = weight_shape[1];
+  PD_CHECK(weight_shape[0] == K,
+           "fused_linear_act: the last dim of x (",
+           K,
+           ") does not match the first dim of weight (",
+           weight_shape[0],
+           ").");
+  PD_CHECK(bias.numel() == N,
+           "fused_linear_act: bias has ",
+           bias.numel(),
+           " elements, expected ",
+           N,
+           ".");
+  PD_CHECK(weight.dtype() == x.dtype() && bias.dtype() == x.dtype(),
+           "fused_linear_act expects x, weight and bias of the same dtype.");
+
+  auto dev_ctx = static_cast<const phi::CustomContext*>(
+      paddle::experimental::DeviceContextPool::Instance().Get(x.place()));
+  auto x_tensor = static_cast<const phi::DenseTensor*>(x.impl().get());
+  auto weight_tensor =
+      static_cast<const phi::DenseTensor*>(weight.impl().get());
+  auto bias_tensor = static_cast<const phi::DenseTensor*>(bias.impl().get());
+
+  std::shared_ptr<phi::DenseTensor> out_tensor =
+      std::make_shared<phi::DenseTensor>();
+  out_tensor->Resize(phi::make_ddim(
+      FusedLinearActInferShape(x_shape, weight_shape, bias.shape()).at(0)));
+  dev_ctx->Alloc(out_tensor.get(), x_tensor->dtype());
+
+  int64_t M = 1;
+  for (size_t i = 0; i + 1 < x_shape.size(); ++i) {
+    M *= x_shape[i];
+  }
+  PD_DISPATCH_FLOATING_TYPES(x.dtype(), "FusedLinearAct", ([&] {
+                               custom_kernel::funcs::LinearAct<data_t>(
+                                   M,
+                                   N,
+                                   K,
+                                   x_tensor->data<data_t>(),
+                                   weight_tensor->data<data_t>(),
+                                   bias_tensor->data<data_t>(),
+                                   act,
+                                   out_tensor->data<data_t>());
+                             }));
+  return {paddle::Tensor(out_tensor)};
+}
+
+PD_BUILD_OP(fused_linear_act)
+    .Inputs({"X", "Weight", "Bias"})
+    .Outputs({"Out"})
+    .Attrs({"act_type: std::string"})
+    .SetKernelFn(PD_KERNEL(FusedLinearAct))
+    .SetInferDtypeFn(PD_INFER_DTYPE(FusedLinearActInferDtype))
+    .SetInferShapeFn(PD_INFER_SHAPE(FusedLinearActInferShape));
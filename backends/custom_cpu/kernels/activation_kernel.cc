@@ -0,0 +1,62 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/thread_pool.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+void ReluKernel(const phi::Context& dev_ctx,
+                const phi::DenseTensor& x,
+                phi::DenseTensor* out) {
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  const T* x_data = x.data<T>();
+  funcs::ParallelFor(
+      0, x.numel(), funcs::GrainSize(1), [&](int64_t begin, int64_t end) {
+        for (auto i = begin; i < end; ++i) {
+          out_data[i] =
+              x_data[i] > static_cast<T>(0) ? x_data[i] : static_cast<T>(0);
+        }
+      });
+}
+
+template <typename T>
+void ReluGradKernel(const phi::Context& dev_ctx,
+                    const phi::DenseTensor& out,
+                    const phi::DenseTensor& dout,
+                    phi::DenseTensor* dx) {
+  T* dx_data = dev_ctx.template Alloc<T>(dx);
+  const T* out_data = out.data<T>();
+  const T* dout_data = dout.data<T>();
+  funcs::ParallelFor(
+      0, out.numel(), funcs::GrainSize(1), [&](int64_t begin, int64_t end) {
+        for (auto i = begin; i < end; ++i) {
+          dx_data[i] = out_data[i] > static_cast<T>(0) ? dout_data[i]
+                                                       : static_cast<T>(0);
+        }
+      });
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(
+    relu, custom_cpu, ALL_LAYOUT, custom_kernel::ReluKernel, float, double) {}
+
+PD_BUILD_PHI_KERNEL(relu_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::ReluGradKernel,
+                    float,
+                    double) {}
@@ -0,0 +1,387 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/optimizer.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Tensors of an Adam step over several parameters. master_param and
+// master_param_out hold null for parameters without a float copy.
+struct AdamArgs {
+  std::vector<const phi::DenseTensor*> param;
+  std::vector<const phi::DenseTensor*> grad;
+  std::vector<const phi::DenseTensor*> learning_rate;
+  std::vector<const phi::DenseTensor*> moment1;
+  std::vector<const phi::DenseTensor*> moment2;
+  std::vector<const phi::DenseTensor*> beta1_pow;
+  std::vector<const phi::DenseTensor*> beta2_pow;
+  std::vector<const phi::DenseTensor*> master_param;
+  std::vector<phi::DenseTensor*> param_out;
+  std::vector<phi::DenseTensor*> moment1_out;
+  std::vector<phi::DenseTensor*> moment2_out;
+  std::vector<phi::DenseTensor*> beta1_pow_out;
+  std::vector<phi::DenseTensor*> beta2_pow_out;
+  std::vector<phi::DenseTensor*> master_param_out;
+};
+
+inline void CheckAdamArgs(const AdamArgs& args) {
+  const size_t n = args.param.size();
+  PD_CHECK(args.grad.size() == n && args.learning_rate.size() == n &&
+               args.moment1.size() == n && args.moment2.size() == n &&
+               args.beta1_pow.size() == n && args.beta2_pow.size() == n &&
+               args.param_out.size() == n && args.moment1_out.size() == n &&
+               args.moment2_out.size() == n,
+           "The number of Grad, LearningRate, Moment1, Moment2, Beta1Pow, "
+           "Beta2Pow and their outputs must equal the number of Param (%d).",
+           n);
+  for (size_t i = 0; i < n; ++i) {
+    PD_CHECK(args.grad[i]->numel() == args.param[i]->numel(),
+             "Param and Grad of parameter %d differ in size: %d vs %d.",
+             i,
+             args.param[i]->numel(),
+             args.grad[i]->numel());
+  }
+}
+
+// S is the type the moments are stored in: float for float16 parameters
+// whose moments the optimizer keeps in float, T otherwise.
+template <typename T, typename S>
+void AdamImpl(
+    const phi::Context& dev_ctx,
+    const AdamArgs& args,
+    const funcs::AdamConfig<typename funcs::OptimizerMPType<T>::type>& config,
+    bool use_global_beta_pow) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  CheckAdamArgs(args);
+  const size_t n = args.param.size();
+  std::vector<funcs::AdamTensor<T, S, MT>> tensors(n);
+  for (size_t i = 0; i < n; ++i) {
+    auto& t = tensors[i];
+    t.param = args.param[i]->data<T>();
+    t.grad = args.grad[i]->data<T>();
+    t.moment1 = args.moment1[i]->data<S>();
+    t.moment2 = args.moment2[i]->data<S>();
+    t.param_out = dev_ctx.template Alloc<T>(args.param_out[i]);
+    t.moment1_out = dev_ctx.template Alloc<S>(args.moment1_out[i]);
+    t.moment2_out = dev_ctx.template Alloc<S>(args.moment2_out[i]);
+    if (args.master_param[i]) {
+      t.master_param = args.master_param[i]->data<MT>();
+      t.master_param_out = dev_ctx.template Alloc<MT>(args.master_param_out[i]);
+    }
+    t.numel = args.param[i]->numel();
+    t.lr = funcs::GetScalarValue<MT>(*args.learning_rate[i]);
+    t.beta1_pow = funcs::GetScalarValue<MT>(*args.beta1_pow[i]);
+    t.beta2_pow = funcs::GetScalarValue<MT>(*args.beta2_pow[i]);
+  }
+  funcs::AdamUpdate(config, tensors);
+
+  if (use_global_beta_pow) {
+    return;
+  }
+  for (size_t i = 0; i < n; ++i) {
+    if (i < args.beta1_pow_out.size() && args.beta1_pow_out[i]) {
+      funcs::SetScalarValue(dev_ctx,
+                            *args.beta1_pow[i],
+                            tensors[i].beta1_pow * config.beta1,
+                            args.beta1_pow_out[i]);
+    }
+    if (i < args.beta2_pow_out.size() && args.beta2_pow_out[i]) {
+      funcs::SetScalarValue(dev_ctx,
+                            *args.beta2_pow[i],
+                            tensors[i].beta2_pow * config.beta2,
+                            args.beta2_pow_out[i]);
+    }
+  }
+}
+
+template <typename T>
+void AdamDispatch(
+    const phi::Context& dev_ctx,
+    const AdamArgs& args,
+    const funcs::AdamConfig<typename funcs::OptimizerMPType<T>::type>& config,
+    bool use_global_beta_pow) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  if (!args.param.empty() &&
+      args.moment1[0]->dtype() != args.param[0]->dtype()) {
+    AdamImpl<T, MT>(dev_ctx, args, config, use_global_beta_pow);
+  } else {
+    AdamImpl<T, T>(dev_ctx, args, config, use_global_beta_pow);
+  }
+}
+
+inline bool SkipUpdate(const paddle::optional<phi::DenseTensor>& skip_update) {
+  if (!skip_update) {
+    return false;
+  }
+  PD_CHECK(skip_update->numel() == 1,
+           "Input(SkipUpdate) size must be 1, but get %d",
+           skip_update->numel());
+  return *skip_update->data<bool>();
+}
+
+// Passes the state through unchanged for a skipped step.
+template <typename T>
+void AdamSkipUpdate(const phi::Context& dev_ctx,
+                    const AdamArgs& args,
+                    bool use_global_beta_pow) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  funcs::CopyIfNotShared<T>(dev_ctx, *args.param[0], args.param_out[0]);
+  if (args.moment1[0]->dtype() != args.param[0]->dtype()) {
+    funcs::CopyIfNotShared<MT>(dev_ctx, *args.moment1[0], args.moment1_out[0]);
+    funcs::CopyIfNotShared<MT>(dev_ctx, *args.moment2[0], args.moment2_out[0]);
+  } else {
+    funcs::CopyIfNotShared<T>(dev_ctx, *args.moment1[0], args.moment1_out[0]);
+    funcs::CopyIfNotShared<T>(dev_ctx, *args.moment2[0], args.moment2_out[0]);
+  }
+  if (args.master_param[0]) {
+    funcs::CopyIfNotShared<MT>(
+        dev_ctx, *args.master_param[0], args.master_param_out[0]);
+  }
+  if (!use_global_beta_pow) {
+    funcs::SetScalarValue(dev_ctx,
+                          *args.beta1_pow[0],
+                          funcs::GetScalarValue<MT>(*args.beta1_pow[0]),
+                          args.beta1_pow_out[0]);
+    funcs::SetScalarValue(dev_ctx,
+                          *args.beta2_pow[0],
+                          funcs::GetScalarValue<MT>(*args.beta2_pow[0]),
+                          args.beta2_pow_out[0]);
+  }
+}
+
+inline AdamArgs SingleAdamArgs(
+    const phi::DenseTensor& param,
+    const phi::DenseTensor& grad,
+    const phi::DenseTensor& learning_rate,
+    const phi::DenseTensor& moment1,
+    const phi::DenseTensor& moment2,
+    const phi::DenseTensor& beta1_pow,
+    const phi::DenseTensor& beta2_pow,
+    const paddle::optional<phi::DenseTensor>& master_param,
+    bool multi_precision,
+    phi::DenseTensor* param_out,
+    phi::DenseTensor* moment1_out,
+    phi::DenseTensor* moment2_out,
+    phi::DenseTensor* beta1_pow_out,
+    phi::DenseTensor* beta2_pow_out,
+    phi::DenseTensor* master_param_out) {
+  AdamArgs args;
+  args.param = {&param};
+  args.grad = {&grad};
+  args.learning_rate = {&learning_rate};
+  args.moment1 = {&moment1};
+  args.moment2 = {&moment2};
+  args.beta1_pow = {&beta1_pow};
+  args.beta2_pow = {&beta2_pow};
+  const bool use_master = multi_precision && master_param;
+  args.master_param = {use_master ? &master_param.get() : nullptr};
+  args.param_out = {param_out};
+  args.moment1_out = {moment1_out};
+  args.moment2_out = {moment2_out};
+  args.beta1_pow_out = {beta1_pow_out};
+  args.beta2_pow_out = {beta2_pow_out};
+  args.master_param_out = {use_master ? master_param_out : nullptr};
+  return args;
+}
+
+template <typename T>
+void AdamKernel(const phi::Context& dev_ctx,
+                const phi::DenseTensor& param,
+                const phi::DenseTensor& grad,
+                const phi::DenseTensor& learning_rate,
+                const phi::DenseTensor& moment1,
+                const phi::DenseTensor& moment2,
+                const phi::DenseTensor& beta1_pow,
+                const phi::DenseTensor& beta2_pow,
+                const paddle::optional<phi::DenseTensor>& master_param,
+                const paddle::optional<phi::DenseTensor>& skip_update,
+                const phi::Scalar& beta1,
+                const phi::Scalar& beta2,
+                const phi::Scalar& epsilon,
+                bool lazy_mode,
+                int64_t min_row_size_to_use_multithread,
+                bool multi_precision,
+                bool use_global_beta_pow,
+                phi::DenseTensor* param_out,
+                phi::DenseTensor* moment1_out,
+                phi::DenseTensor* moment2_out,
+                phi::DenseTensor* beta1_pow_out,
+                phi::DenseTensor* beta2_pow_out,
+                phi::DenseTensor* master_param_out) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  auto args = SingleAdamArgs(param,
+                             grad,
+                             learning_rate,
+                             moment1,
+                             moment2,
+                             beta1_pow,
+                             beta2_pow,
+                             master_param,
+                             multi_precision,
+                             param_out,
+                             moment1_out,
+                             moment2_out,
+                             beta1_pow_out,
+                             beta2_pow_out,
+                             master_param_out);
+  if (SkipUpdate(skip_update)) {
+    AdamSkipUpdate<T>(dev_ctx, args, use_global_beta_pow);
+    return;
+  }
+  funcs::AdamConfig<MT> config;
+  config.beta1 = beta1.to<MT>();
+  config.beta2 = beta2.to<MT>();
+  config.epsilon = epsilon.to<MT>();
+  AdamDispatch<T>(dev_ctx, args, config, use_global_beta_pow);
+}
+
+template <typename T>
+void AdamwKernel(const phi::Context& dev_ctx,
+                 const phi::DenseTensor& param,
+                 const phi::DenseTensor& grad,
+                 const phi::DenseTensor& learning_rate,
+                 const phi::DenseTensor& moment1,
+                 const phi::DenseTensor& moment2,
+                 const phi::DenseTensor& beta1_pow,
+                 const phi::DenseTensor& beta2_pow,
+                 const paddle::optional<phi::DenseTensor>& master_param,
+                 const paddle::optional<phi::DenseTensor>& skip_update,
+                 const phi::Scalar& beta1,
+                 const phi::Scalar& beta2,
+                 const phi::Scalar& epsilon,
+                 float lr_ratio,
+                 float coeff,
+                 bool with_decay,
+                 bool lazy_mode,
+                 int64_t min_row_size_to_use_multithread,
+                 bool multi_precision,
+                 bool use_global_beta_pow,
+                 phi::DenseTensor* param_out,
+                 phi::DenseTensor* moment1_out,
+                 phi::DenseTensor* moment2_out,
+                 phi::DenseTensor* beta1_pow_out,
+                 phi::DenseTensor* beta2_pow_out,
+                 phi::DenseTensor* master_param_out) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  auto args = SingleAdamArgs(param,
+                             grad,
+                             learning_rate,
+                             moment1,
+                             moment2,
+                             beta1_pow,
+                             beta2_pow,
+                             master_param,
+                             multi_precision,
+                             param_out,
+                             moment1_out,
+                             moment2_out,
+                             beta1_pow_out,
+                             beta2_pow_out,
+                             master_param_out);
+  if (SkipUpdate(skip_update)) {
+    AdamSkipUpdate<T>(dev_ctx, args, use_global_beta_pow);
+    return;
+  }
+  funcs::AdamConfig<MT> config;
+  config.beta1 = beta1.to<MT>();
+  config.beta2 = beta2.to<MT>();
+  config.epsilon = epsilon.to<MT>();
+  config.lr_ratio = static_cast<MT>(lr_ratio);
+  config.coeff = static_cast<MT>(coeff);
+  config.with_decay = with_decay;
+  AdamDispatch<T>(dev_ctx, args, config, use_global_beta_pow);
+}
+
+template <typename T>
+void MergedAdamKernel(
+    const phi::Context& dev_ctx,
+    const std::vector<const phi::DenseTensor*>& param,
+    const std::vector<const phi::DenseTensor*>& grad,
+    const std::vector<const phi::DenseTensor*>& learning_rate,
+    const std::vector<const phi::DenseTensor*>& moment1,
+    const std::vector<const phi::DenseTensor*>& moment2,
+    const std::vector<const phi::DenseTensor*>& beta1_pow,
+    const std::vector<const phi::DenseTensor*>& beta2_pow,
+    const paddle::optional<std::vector<const phi::DenseTensor*>>& master_param,
+    const phi::Scalar& beta1,
+    const phi::Scalar& beta2,
+    const phi::Scalar& epsilon,
+    bool multi_precision,
+    bool use_global_beta_pow,
+    std::vector<phi::DenseTensor*> param_out,
+    std::vector<phi::DenseTensor*> moment1_out,
+    std::vector<phi::DenseTensor*> moment2_out,
+    std::vector<phi::DenseTensor*> beta1_pow_out,
+    std::vector<phi::DenseTensor*> beta2_pow_out,
+    std::vector<phi::DenseTensor*> master_param_out) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  AdamArgs args;
+  args.param = param;
+  args.grad = grad;
+  args.learning_rate = learning_rate;
+  args.moment1 = moment1;
+  args.moment2 = moment2;
+  args.beta1_pow = beta1_pow;
+  args.beta2_pow = beta2_pow;
+  args.param_out = param_out;
+  args.moment1_out = moment1_out;
+  args.moment2_out = moment2_out;
+  args.beta1_pow_out = beta1_pow_out;
+  args.beta2_pow_out = beta2_pow_out;
+  if (multi_precision && master_param) {
+    PD_CHECK(master_param->size() == param.size() &&
+                 master_param_out.size() == param.size(),
+             "The number of MasterParam and MasterParamOut must equal the "
+             "number of Param (%d).",
+             param.size());
+    args.master_param = master_param.get();
+    args.master_param_out = master_param_out;
+  } else {
+    args.master_param.assign(param.size(), nullptr);
+    args.master_param_out.assign(param.size(), nullptr);
+  }
+
+  funcs::AdamConfig<MT> config;
+  config.beta1 = beta1.to<MT>();
+  config.beta2 = beta2.to<MT>();
+  config.epsilon = epsilon.to<MT>();
+  AdamDispatch<T>(dev_ctx, args, config, use_global_beta_pow);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(adam,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::AdamKernel,
+                    phi::dtype::float16,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(adamw,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::AdamwKernel,
+                    phi::dtype::float16,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(merged_adam,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MergedAdamKernel,
+                    phi::dtype::float16,
+                    float,
+                    double) {}
@@ -16,6 +16,7 @@
 
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
+#include "runtime/zero_copy.h"
 
 namespace custom_kernel {
 
@@ -44,7 +45,8 @@ void AssignKernel(const phi::Context& dev_ctx,
                   phi::DenseTensor* out) {
   auto out_data = dev_ctx.template Alloc<T>(out);
   auto x_data = x.data<T>();
-  std::memcpy(out_data, x_data, sizeof(T) * x.numel());
+  custom_runtime::SharedArena::Instance().Copy(
+      out_data, x_data, sizeof(T) * x.numel());
 }
 
 }  // namespace custom_kernel
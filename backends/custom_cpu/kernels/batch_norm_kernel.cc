@@ -0,0 +1,236 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include <cmath>
+
+#include "kernels/funcs/norm.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// x viewed as [outer, channels, inner]. A 2-D input is [N, C] in either
+// layout, which is the channel-last case.
+struct BatchNormDims {
+  int64_t outer = 1;
+  int64_t channels = 1;
+  int64_t inner = 1;
+};
+
+inline BatchNormDims GetBatchNormDims(const std::vector<int64_t>& x_dims,
+                                      const std::string& data_layout) {
+  PD_CHECK(x_dims.size() >= 2 && x_dims.size() <= 5,
+           "The input of batch_norm should be 2-D to 5-D, but received a "
+           "%d-D input.",
+           x_dims.size());
+  const bool channel_last = data_layout == "NHWC" || x_dims.size() == 2;
+  BatchNormDims dims;
+  if (channel_last) {
+    dims.channels = x_dims.back();
+    for (size_t i = 0; i + 1 < x_dims.size(); ++i) {
+      dims.outer *= x_dims[i];
+    }
+  } else {
+    dims.outer = x_dims[0];
+    dims.channels = x_dims[1];
+    for (size_t i = 2; i < x_dims.size(); ++i) {
+      dims.inner *= x_dims[i];
+    }
+  }
+  return dims;
+}
+
+template <typename T>
+void BatchNormKernel(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& x,
+                     const phi::DenseTensor& running_mean,
+                     const phi::DenseTensor& running_var,
+                     const phi::DenseTensor& scale,
+                     const phi::DenseTensor& bias,
+                     bool is_test,
+                     float momentum,
+                     float epsilon,
+                     const std::string& data_layout_str,
+                     bool use_global_stats,
+                     bool trainable_stats,
+                     phi::DenseTensor* y,
+                     phi::DenseTensor* mean_out,
+                     phi::DenseTensor* variance_out,
+                     phi::DenseTensor* saved_mean,
+                     phi::DenseTensor* saved_variance,
+                     phi::DenseTensor* reserve_space) {
+  const bool global_stats = (is_test && !trainable_stats) || use_global_stats;
+  auto dims = GetBatchNormDims(x.dims(), data_layout_str);
+  const int64_t c = dims.channels;
+
+  T* y_data = dev_ctx.template Alloc<T>(y);
+  T* mean_out_data = dev_ctx.template Alloc<T>(mean_out);
+  T* variance_out_data = dev_ctx.template Alloc<T>(variance_out);
+  T* saved_mean_data = dev_ctx.template Alloc<T>(saved_mean);
+  T* saved_variance_data = dev_ctx.template Alloc<T>(saved_variance);
+  const T* running_mean_data = running_mean.data<T>();
+  const T* running_var_data = running_var.data<T>();
+
+  std::vector<T> var(c);
+  if (global_stats) {
+    std::copy(running_mean_data, running_mean_data + c, saved_mean_data);
+    std::copy(running_var_data, running_var_data + c, var.begin());
+  }
+  funcs::BatchNormForward(x.data<T>(),
+                          dims.outer,
+                          c,
+                          dims.inner,
+                          scale.data<T>(),
+                          bias.data<T>(),
+                          static_cast<T>(epsilon),
+                          !global_stats,
+                          saved_mean_data,
+                          var.data(),
+                          y_data);
+
+  // mean_out and variance_out usually share memory with the running
+  // statistics, so every element is read before it is written.
+  const T m = static_cast<T>(momentum);
+  for (int64_t i = 0; i < c; ++i) {
+    if (global_stats) {
+      mean_out_data[i] = running_mean_data[i];
+      variance_out_data[i] = running_var_data[i];
+    } else {
+      mean_out_data[i] =
+          running_mean_data[i] * m + saved_mean_data[i] * (1 - m);
+      variance_out_data[i] = running_var_data[i] * m + var[i] * (1 - m);
+    }
+    saved_variance_data[i] =
+        static_cast<T>(1) / std::sqrt(var[i] + static_cast<T>(epsilon));
+  }
+}
+
+template <typename T>
+void BatchNormGradKernel(
+    const phi::Context& dev_ctx,
+    const phi::DenseTensor& x,
+    const phi::DenseTensor& scale,
+    const phi::DenseTensor& bias,
+    const paddle::optional<phi::DenseTensor>& mean,
+    const paddle::optional<phi::DenseTensor>& variance,
+    const phi::DenseTensor& saved_mean,
+    const phi::DenseTensor& saved_variance,
+    const paddle::optional<phi::DenseTensor>& reserve_space,
+    const phi::DenseTensor& d_y,
+    float momentum,
+    float epsilon,
+    const std::string& data_layout_str,
+    bool is_test,
+    bool use_global_stats,
+    bool trainable_statistics,
+    phi::DenseTensor* d_x,
+    phi::DenseTensor* d_scale,
+    phi::DenseTensor* d_bias) {
+  use_global_stats = is_test || use_global_stats;
+  auto dims = GetBatchNormDims(x.dims(), data_layout_str);
+  const int64_t c = dims.channels;
+
+  // The forward pass saved the batch mean and inverse standard deviation;
+  // with global statistics they come from the running statistics instead.
+  const T* mean_data = saved_mean.data<T>();
+  const T* inv_std_data = saved_variance.data<T>();
+  std::vector<T> inv_std;
+  if (use_global_stats) {
+    PD_CHECK(mean && variance,
+             "batch_norm_grad with global statistics needs Mean and "
+             "Variance.");
+    mean_data = mean->data<T>();
+    const T* var_data = variance->data<T>();
+    inv_std.resize(c);
+    for (int64_t i = 0; i < c; ++i) {
+      inv_std[i] =
+          static_cast<T>(1) / std::sqrt(var_data[i] + static_cast<T>(epsilon));
+    }
+    inv_std_data = inv_std.data();
+  }
+
+  T* d_x_data = d_x ? dev_ctx.template Alloc<T>(d_x) : nullptr;
+  T* d_scale_data = d_scale ? dev_ctx.template Alloc<T>(d_scale) : nullptr;
+  T* d_bias_data = d_bias ? dev_ctx.template Alloc<T>(d_bias) : nullptr;
+  funcs::BatchNormBackward(x.data<T>(),
+                           d_y.data<T>(),
+                           dims.outer,
+                           c,
+                           dims.inner,
+                           scale.data<T>(),
+                           mean_data,
+                           inv_std_data,
+                           use_global_stats,
+                           d_x_data,
+                           d_scale_data,
+                           d_bias_data);
+}
+
+template <typename T>
+void BatchNormInferKernel(const phi::Context& dev_ctx,
+                          const phi::DenseTensor& x,
+                          const phi::DenseTensor& mean,
+                          const phi::DenseTensor& variance,
+                          const phi::DenseTensor& scale,
+                          const phi::DenseTensor& bias,
+                          float momentum,
+                          float epsilon,
+                          const std::string& data_layout_str,
+                          phi::DenseTensor* y,
+                          phi::DenseTensor* mean_out,
+                          phi::DenseTensor* variance_out) {
+  auto dims = GetBatchNormDims(x.dims(), data_layout_str);
+  const int64_t c = dims.channels;
+
+  T* y_data = dev_ctx.template Alloc<T>(y);
+  T* mean_out_data = dev_ctx.template Alloc<T>(mean_out);
+  T* variance_out_data = dev_ctx.template Alloc<T>(variance_out);
+  std::vector<T> mean_data(mean.data<T>(), mean.data<T>() + c);
+  std::vector<T> var_data(variance.data<T>(), variance.data<T>() + c);
+  funcs::BatchNormForward(x.data<T>(),
+                          dims.outer,
+                          c,
+                          dims.inner,
+                          scale.data<T>(),
+                          bias.data<T>(),
+                          static_cast<T>(epsilon),
+                          false,
+                          mean_data.data(),
+                          var_data.data(),
+                          y_data);
+  std::copy(mean_data.begin(), mean_data.end(), mean_out_data);
+  std::copy(var_data.begin(), var_data.end(), variance_out_data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(batch_norm,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BatchNormKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(batch_norm_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BatchNormGradKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(batch_norm_infer,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::BatchNormInferKernel,
+                    float,
+                    double) {}
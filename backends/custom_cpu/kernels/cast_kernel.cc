@@ -12,11 +12,50 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/cast.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
+#include "runtime/zero_copy.h"
 
 namespace custom_kernel {
 
+bool ToCastType(phi::DataType dtype, funcs::CastType* type) {
+  switch (dtype) {
+    case phi::DataType::BOOL:
+      *type = funcs::CastType::kBool;
+      return true;
+    case phi::DataType::INT8:
+      *type = funcs::CastType::kInt8;
+      return true;
+    case phi::DataType::UINT8:
+      *type = funcs::CastType::kUInt8;
+      return true;
+    case phi::DataType::INT16:
+      *type = funcs::CastType::kInt16;
+      return true;
+    case phi::DataType::INT32:
+      *type = funcs::CastType::kInt32;
+      return true;
+    case phi::DataType::INT64:
+      *type = funcs::CastType::kInt64;
+      return true;
+    case phi::DataType::FLOAT16:
+      *type = funcs::CastType::kFloat16;
+      return true;
+    case phi::DataType::BFLOAT16:
+      *type = funcs::CastType::kBFloat16;
+      return true;
+    case phi::DataType::FLOAT32:
+      *type = funcs::CastType::kFloat32;
+      return true;
+    case phi::DataType::FLOAT64:
+      *type = funcs::CastType::kFloat64;
+      return true;
+    default:
+      return false;
+  }
+}
+
 template <typename T>
 void CastKernel(const phi::Context& dev_ctx,
                 const phi::DenseTensor& x,
@@ -24,83 +63,27 @@ void CastKernel(const phi::Context& dev_ctx,
                 phi::DenseTensor* out) {
   auto x_data = x.data<T>();
   out->Resize(x.dims());
-  auto numel = x.numel();
-  switch (out_dtype) {
-    case phi::DataType::BFLOAT16: {
-      auto out_data = dev_ctx.template Alloc<phi::dtype::bfloat16>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] =
-            static_cast<phi::dtype::bfloat16>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::FLOAT16: {
-      auto out_data = dev_ctx.template Alloc<phi::dtype::float16>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] =
-            static_cast<phi::dtype::float16>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::FLOAT32: {
-      auto out_data = dev_ctx.template Alloc<float>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<float>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::FLOAT64: {
-      auto out_data = dev_ctx.template Alloc<double>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<double>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::INT8: {
-      auto out_data = dev_ctx.template Alloc<int8_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int8_t>(static_cast<float>(x_data[i]));
-      }
-      break;
+  if (out_dtype == x.dtype()) {
+    // A copy, or nothing when cast in place; large tensors share pages with
+    // x in zero-copy mode.
+    if (!(x.initialized() && x.Holder() == out->Holder())) {
+      auto out_data = dev_ctx.template Alloc<T>(out);
+      custom_runtime::SharedArena::Instance().Copy(
+          out_data, x_data, x.numel() * sizeof(T));
     }
-    case phi::DataType::INT16: {
-      auto out_data = dev_ctx.template Alloc<int16_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int16_t>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::INT32: {
-      auto out_data = dev_ctx.template Alloc<int32_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int32_t>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::INT64: {
-      auto out_data = dev_ctx.template Alloc<int64_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<int64_t>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::UINT8: {
-      auto out_data = dev_ctx.template Alloc<uint8_t>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<uint8_t>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    case phi::DataType::BOOL: {
-      auto out_data = dev_ctx.template Alloc<bool>(out);
-      for (auto i = 0; i < numel; ++i) {
-        out_data[i] = static_cast<bool>(static_cast<float>(x_data[i]));
-      }
-      break;
-    }
-    default:
-      break;
+    return;
+  }
+  funcs::CastType in_type;
+  funcs::CastType out_type;
+  if (!ToCastType(x.dtype(), &in_type) || !ToCastType(out_dtype, &out_type)) {
+    PD_CHECK(false,
+             "Cast from %d to %d is not supported.",
+             static_cast<int>(x.dtype()),
+             static_cast<int>(out_dtype));
+    return;
   }
+  auto out_data = dev_ctx.Alloc(out, out_dtype);
+  funcs::Cast(in_type, x_data, out_type, out_data, x.numel());
 }
 
 }  // namespace custom_kernel
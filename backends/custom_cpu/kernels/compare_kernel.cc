@@ -12,39 +12,33 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
-#include <cmath>
-
+#include "kernels/funcs/compare.h"
+#include "kernels/funcs/elementwise_base.h"
 #include "paddle/phi/capi/all.h"
-#include "phi_funcs.h"  //NOLINT
 
 namespace custom_kernel {
 
+template <typename T, typename Functor>
+void CompareRawKernel(const phi::Context& dev_ctx,
+                      const phi::DenseTensor& x,
+                      const phi::DenseTensor& y,
+                      int axis,
+                      phi::DenseTensor* out) {
+  auto x_dims = x.dims();
+  auto y_dims = y.dims();
+  auto out_dims = phi::BroadcastDims(axis, x_dims, y_dims);
+  auto out_data = dev_ctx.template Alloc<bool>(out);
+  auto bc = funcs::MakeBinaryBroadcast(x_dims, y_dims, out_dims, axis);
+  funcs::Compare<T, Functor>(x.data<T>(), y.data<T>(), out_data, bc);
+}
+
 template <typename T>
 void NotEqualRawKernel(const phi::Context& dev_ctx,
                        const phi::DenseTensor& x,
                        const phi::DenseTensor& y,
                        int axis,
                        phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    if (std::is_floating_point<T>::value) {
-      out_data[i] = static_cast<bool>(
-          fabs(static_cast<double>(x_data[i] - y_data[i])) >= 1e-8);
-    } else {
-      out_data[i] = x_data[i] != y_data[i];
-    }
-  }
+  CompareRawKernel<T, funcs::NotEqualFunctor>(dev_ctx, x, y, axis, out);
 }
 
 template <typename T>
@@ -61,26 +55,7 @@ void EqualRawKernel(const phi::Context& dev_ctx,
                     const phi::DenseTensor& y,
                     int axis,
                     phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    if (std::is_floating_point<T>::value) {
-      out_data[i] = static_cast<bool>(
-          fabs(static_cast<double>(x_data[i] - y_data[i])) < 1e-8);
-    } else {
-      out_data[i] = x_data[i] == y_data[i];
-    }
-  }
+  CompareRawKernel<T, funcs::EqualFunctor>(dev_ctx, x, y, axis, out);
 }
 
 template <typename T>
@@ -97,20 +72,7 @@ void LessThanRawKernel(const phi::Context& dev_ctx,
                        const phi::DenseTensor& y,
                        int axis,
                        phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] < y_data[i];
-  }
+  CompareRawKernel<T, funcs::LessThanFunctor>(dev_ctx, x, y, axis, out);
 }
 
 template <typename T>
@@ -127,20 +89,7 @@ void LessEqualRawKernel(const phi::Context& dev_ctx,
                         const phi::DenseTensor& y,
                         int axis,
                         phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] <= y_data[i];
-  }
+  CompareRawKernel<T, funcs::LessEqualFunctor>(dev_ctx, x, y, axis, out);
 }
 
 template <typename T>
@@ -157,20 +106,7 @@ void GreaterThanRawKernel(const phi::Context& dev_ctx,
                           const phi::DenseTensor& y,
                           int axis,
                           phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] > y_data[i];
-  }
+  CompareRawKernel<T, funcs::GreaterThanFunctor>(dev_ctx, x, y, axis, out);
 }
 
 template <typename T>
@@ -187,20 +123,7 @@ void GreaterEqualRawKernel(const phi::Context& dev_ctx,
                            const phi::DenseTensor& y,
                            int axis,
                            phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<bool>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] >= y_data[i];
-  }
+  CompareRawKernel<T, funcs::GreaterEqualFunctor>(dev_ctx, x, y, axis, out);
 }
 
 template <typename T>
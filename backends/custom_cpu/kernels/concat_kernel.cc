@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/thread_pool.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -39,19 +40,43 @@ void ConcatKernel(const phi::Context& dev_ctx,
   out->Resize(out_dims);
   dev_ctx.template Alloc<T>(out);
 
-  auto M = std::accumulate(
-      out_dims.cbegin(), out_dims.cbegin() + axis, 1, std::multiplies<int>());
-  auto N = std::accumulate(
-      out_dims.cbegin() + axis + 1, out_dims.cend(), 1, std::multiplies<int>());
-  auto out_offset = 0;
-  for (auto i = 0; i < M; ++i) {
-    for (auto j = 0; j < x.size(); ++j) {
-      memcpy(out->data<T>() + out_offset,
-             x[j]->data<T>() + i * N * x[j]->dims()[axis],
-             (N * x[j]->dims()[axis]) * sizeof(T));
-      out_offset += N * x[j]->dims()[axis];
-    }
+  // The output is M rows, each made of one piece per input; pieces are
+  // copied independently.
+  int64_t M = std::accumulate(out_dims.cbegin(),
+                              out_dims.cbegin() + axis,
+                              static_cast<int64_t>(1),
+                              std::multiplies<int64_t>());
+  int64_t N = std::accumulate(out_dims.cbegin() + axis + 1,
+                              out_dims.cend(),
+                              static_cast<int64_t>(1),
+                              std::multiplies<int64_t>());
+  const int64_t num_inputs = x.size();
+  std::vector<int64_t> piece_offset(num_inputs + 1, 0);
+  for (auto j = 0; j < num_inputs; ++j) {
+    piece_offset[j + 1] = piece_offset[j] + N * x[j]->dims()[axis];
+  }
+  const int64_t row_size = piece_offset.back();
+  if (M * row_size == 0) {
+    return;
   }
+
+  auto out_data = out->data<T>();
+  funcs::ParallelFor(0,
+                     M * num_inputs,
+                     funcs::GrainSize(row_size / num_inputs),
+                     [&](int64_t begin, int64_t end) {
+                       for (auto p = begin; p < end; ++p) {
+                         auto i = p / num_inputs;
+                         auto j = p % num_inputs;
+                         auto size = piece_offset[j + 1] - piece_offset[j];
+                         if (size == 0) {
+                           continue;
+                         }
+                         memcpy(out_data + i * row_size + piece_offset[j],
+                                x[j]->data<T>() + i * size,
+                                size * sizeof(T));
+                       }
+                     });
 }
 
 }  // namespace custom_kernel
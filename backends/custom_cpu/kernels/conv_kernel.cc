@@ -0,0 +1,285 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/conv.h"
+#include "kernels/funcs/transpose.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// NCHW dims of an NCHW or NHWC tensor.
+inline std::vector<int64_t> ToChannelFirst(const std::vector<int64_t>& dims,
+                                           bool channel_last) {
+  if (!channel_last) {
+    return dims;
+  }
+  return {dims[0], dims[3], dims[1], dims[2]};
+}
+
+inline funcs::ConvShape MakeConvShape(const std::vector<int64_t>& in_dims,
+                                      const std::vector<int64_t>& filter_dims,
+                                      const std::vector<int64_t>& out_dims,
+                                      const std::vector<int>& strides,
+                                      const std::vector<int>& paddings,
+                                      const std::vector<int>& dilations,
+                                      int groups) {
+  funcs::ConvShape shape;
+  shape.batch = in_dims[0];
+  shape.in_channels = in_dims[1];
+  shape.in_h = in_dims[2];
+  shape.in_w = in_dims[3];
+  shape.out_channels = out_dims[1];
+  shape.out_h = out_dims[2];
+  shape.out_w = out_dims[3];
+  shape.kernel_h = filter_dims[2];
+  shape.kernel_w = filter_dims[3];
+  shape.stride_h = strides[0];
+  shape.stride_w = strides[1];
+  shape.pad_h = paddings[0];
+  shape.pad_w = paddings[2];
+  shape.dilation_h = dilations[0];
+  shape.dilation_w = dilations[1];
+  shape.groups = groups;
+  PD_CHECK(groups > 0 && shape.in_channels % groups == 0 &&
+               shape.out_channels % groups == 0,
+           "The number of input channels (%d) and output channels (%d) "
+           "should be divisible by groups (%d).",
+           shape.in_channels,
+           shape.out_channels,
+           groups);
+  PD_CHECK(filter_dims[1] * groups == shape.in_channels,
+           "The filter expects %d input channels per group, but the input "
+           "has %d channels in %d groups.",
+           filter_dims[1],
+           shape.in_channels,
+           groups);
+  return shape;
+}
+
+// Resolves the padding and dilation attributes against the input and filter
+// and returns the shape in NCHW.
+inline funcs::ConvShape GetConvShape(const phi::DenseTensor& input,
+                                     const phi::DenseTensor& filter,
+                                     const std::vector<int64_t>& out_dims,
+                                     const std::vector<int>& strides,
+                                     const std::vector<int>& paddings_in,
+                                     const std::string& padding_algorithm,
+                                     const std::vector<int>& dilations_in,
+                                     int groups,
+                                     bool channel_last) {
+  auto in_dims = ToChannelFirst(input.dims(), channel_last);
+  auto filter_dims = filter.dims();
+  std::vector<int> paddings = paddings_in;
+  std::vector<int> dilations = dilations_in;
+  phi::funcs::UpdatePaddingAndDilation(
+      &paddings,
+      &dilations,
+      padding_algorithm,
+      std::vector<int64_t>(in_dims.begin() + 2, in_dims.end()),
+      strides,
+      std::vector<int64_t>(filter_dims.begin() + 2, filter_dims.end()));
+  return MakeConvShape(in_dims,
+                       filter_dims,
+                       ToChannelFirst(out_dims, channel_last),
+                       strides,
+                       paddings,
+                       dilations,
+                       groups);
+}
+
+// Channel-last tensors are transposed to and from NCHW around the NCHW
+// engine.
+template <typename T>
+void ToNCHW(const T* in, const std::vector<int64_t>& nhwc_dims, T* out) {
+  funcs::Transpose(in, out, nhwc_dims, {0, 3, 1, 2});
+}
+
+template <typename T>
+void ToNHWC(const T* in, const std::vector<int64_t>& nchw_dims, T* out) {
+  funcs::Transpose(in, out, nchw_dims, {0, 2, 3, 1});
+}
+
+template <typename T>
+void Conv2dKernel(const phi::Context& dev_ctx,
+                  const phi::DenseTensor& input,
+                  const phi::DenseTensor& filter,
+                  const std::vector<int>& strides,
+                  const std::vector<int>& paddings,
+                  const std::string& padding_algorithm,
+                  const std::vector<int>& dilations,
+                  int groups,
+                  const std::string& data_format,
+                  phi::DenseTensor* out) {
+  const bool channel_last = data_format == "NHWC";
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  if (out->numel() == 0) {
+    return;
+  }
+  auto shape = GetConvShape(input,
+                            filter,
+                            out->dims(),
+                            strides,
+                            paddings,
+                            padding_algorithm,
+                            dilations,
+                            groups,
+                            channel_last);
+  if (!channel_last) {
+    funcs::ConvForward(shape, input.data<T>(), filter.data<T>(), out_data);
+    return;
+  }
+
+  std::vector<T> in_nchw(input.numel());
+  std::vector<T> out_nchw(out->numel());
+  ToNCHW(input.data<T>(), input.dims(), in_nchw.data());
+  funcs::ConvForward(shape, in_nchw.data(), filter.data<T>(), out_nchw.data());
+  ToNHWC(out_nchw.data(), ToChannelFirst(out->dims(), channel_last), out_data);
+}
+
+template <typename T>
+void Conv2dGradKernel(const phi::Context& dev_ctx,
+                      const phi::DenseTensor& input,
+                      const phi::DenseTensor& filter,
+                      const phi::DenseTensor& out_grad,
+                      const std::vector<int>& strides,
+                      const std::vector<int>& paddings,
+                      const std::string& padding_algorithm,
+                      const std::vector<int>& dilations,
+                      int groups,
+                      const std::string& data_format,
+                      phi::DenseTensor* input_grad,
+                      phi::DenseTensor* filter_grad) {
+  const bool channel_last = data_format == "NHWC";
+  auto shape = GetConvShape(input,
+                            filter,
+                            out_grad.dims(),
+                            strides,
+                            paddings,
+                            padding_algorithm,
+                            dilations,
+                            groups,
+                            channel_last);
+
+  const T* x = input.data<T>();
+  const T* dy = out_grad.data<T>();
+  std::vector<T> in_nchw, out_grad_nchw;
+  if (channel_last) {
+    out_grad_nchw.resize(out_grad.numel());
+    ToNCHW(dy, out_grad.dims(), out_grad_nchw.data());
+    dy = out_grad_nchw.data();
+  }
+
+  if (filter_grad) {
+    T* dw = dev_ctx.template Alloc<T>(filter_grad);
+    if (channel_last) {
+      in_nchw.resize(input.numel());
+      ToNCHW(x, input.dims(), in_nchw.data());
+      x = in_nchw.data();
+    }
+    funcs::ConvBackwardFilter(shape, x, dy, dw);
+  }
+
+  if (input_grad) {
+    T* dx = dev_ctx.template Alloc<T>(input_grad);
+    if (!channel_last) {
+      funcs::ConvBackwardData(shape, filter.data<T>(), dy, dx);
+    } else {
+      std::vector<T> in_grad_nchw(input.numel());
+      funcs::ConvBackwardData(shape, filter.data<T>(), dy, in_grad_nchw.data());
+      ToNHWC(
+          in_grad_nchw.data(), ToChannelFirst(input.dims(), channel_last), dx);
+    }
+  }
+}
+
+template <typename T>
+void DepthwiseConv2dKernel(const phi::Context& dev_ctx,
+                           const phi::DenseTensor& input,
+                           const phi::DenseTensor& filter,
+                           const std::vector<int>& strides,
+                           const std::vector<int>& paddings,
+                           const std::string& padding_algorithm,
+                           int groups,
+                           const std::vector<int>& dilations,
+                           const std::string& data_format,
+                           phi::DenseTensor* out) {
+  custom_kernel::Conv2dKernel<T>(dev_ctx,
+                                 input,
+                                 filter,
+                                 strides,
+                                 paddings,
+                                 padding_algorithm,
+                                 dilations,
+                                 groups,
+                                 data_format,
+                                 out);
+}
+
+template <typename T>
+void DepthwiseConv2dGradKernel(const phi::Context& dev_ctx,
+                               const phi::DenseTensor& input,
+                               const phi::DenseTensor& filter,
+                               const phi::DenseTensor& out_grad,
+                               const std::vector<int>& strides,
+                               const std::vector<int>& paddings,
+                               const std::string& padding_algorithm,
+                               int groups,
+                               const std::vector<int>& dilations,
+                               const std::string& data_format,
+                               phi::DenseTensor* input_grad,
+                               phi::DenseTensor* filter_grad) {
+  custom_kernel::Conv2dGradKernel<T>(dev_ctx,
+                                     input,
+                                     filter,
+                                     out_grad,
+                                     strides,
+                                     paddings,
+                                     padding_algorithm,
+                                     dilations,
+                                     groups,
+                                     data_format,
+                                     input_grad,
+                                     filter_grad);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(conv2d,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Conv2dKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(conv2d_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Conv2dGradKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(depthwise_conv2d,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DepthwiseConv2dKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(depthwise_conv2d_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DepthwiseConv2dGradKernel,
+                    float,
+                    double) {}
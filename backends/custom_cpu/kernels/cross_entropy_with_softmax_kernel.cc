@@ -13,6 +13,8 @@
 // limitations under the License.
 
 #include "kernels.h"  //NOLINT
+#include "kernels/funcs/softmax.h"
+#include "kernels/funcs/thread_pool.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -155,6 +157,85 @@ void CrossEntropyKernel(const phi::Context& dev_ctx,
   }
 }
 
+// Cross entropy straight from the logits, given the per-row max and
+// log(sum(exp(x - max))) left behind by funcs::Softmax:
+//   -log(softmax(x)_j) = log_sum - max(x_j - max, -64)
+// This avoids taking the log of the rounded probabilities and never writes a
+// log-softmax tensor.
+template <typename T, typename U>
+void SoftmaxCrossEntropy(const T* logits,
+                         const U* label,
+                         const T* row_max,
+                         const T* row_log_sum,
+                         bool soft_label,
+                         int64_t batch_size,
+                         int64_t axis_dim,
+                         int64_t num_remain,
+                         int ignore_index,
+                         T* out) {
+  const int64_t num_classes = axis_dim * num_remain;
+  const T clip = static_cast<T>(funcs::detail::kSoftmaxClip);
+  if (soft_label) {
+    funcs::ParallelFor(0,
+                       batch_size * num_remain,
+                       funcs::GrainSize(axis_dim * 2),
+                       [&](int64_t begin, int64_t end) {
+                         for (auto p = begin; p < end; ++p) {
+                           const int64_t offset =
+                               p / num_remain * num_classes + p % num_remain;
+                           const T* x = logits + offset;
+                           const U* y = label + offset;
+                           T loss = 0;
+                           for (int64_t j = 0; j < axis_dim; ++j) {
+                             const T log_prob =
+                                 std::max(x[j * num_remain] - row_max[p],
+                                          clip) -
+                                 row_log_sum[p];
+                             loss -= y[j * num_remain] * log_prob;
+                           }
+                           out[p] = loss;
+                         }
+                       });
+    return;
+  }
+
+  for (int64_t p = 0; p < batch_size * num_remain; ++p) {
+    const int lbl = static_cast<int>(label[p]);
+    if (lbl != ignore_index) {
+      PD_CHECK(lbl >= 0,
+               "label value should >= 0 when label "
+               "value(%f) not equal to ignore_index(%f)",
+               lbl,
+               ignore_index);
+      PD_CHECK(lbl < axis_dim,
+               "label value should less than the shape of axis dimension "
+               "when label value(%f) not equal to ignore_index(%f), But "
+               "received label value as %ld and shape of axis dimension "
+               "is %d",
+               lbl,
+               ignore_index,
+               lbl,
+               axis_dim);
+    }
+  }
+  funcs::ParallelFor(
+      0,
+      batch_size * num_remain,
+      funcs::GrainSize(8),
+      [&](int64_t begin, int64_t end) {
+        for (auto p = begin; p < end; ++p) {
+          const int lbl = static_cast<int>(label[p]);
+          if (lbl == ignore_index) {
+            out[p] = 0;
+            continue;
+          }
+          const int64_t index =
+              p / num_remain * num_classes + lbl * num_remain + p % num_remain;
+          out[p] = row_log_sum[p] - std::max(logits[index] - row_max[p], clip);
+        }
+      });
+}
+
 template <typename T>
 void CrossEntropyWithSoftmaxKernel(const phi::Context& dev_ctx,
                                    const phi::DenseTensor& logits,
@@ -175,9 +256,106 @@ void CrossEntropyWithSoftmaxKernel(const phi::Context& dev_ctx,
     return;
   }
 
-  custom_kernel::SoftmaxKernel<T>(dev_ctx, logits, axis, softmax);
-  CrossEntropyKernel<T>(
-      dev_ctx, *softmax, label, soft_label, ignore_index, axis, loss);
+  const int rank = logits.dims().size();
+  const int axis_v = phi::funcs::CanonicalAxis(axis, rank);
+  const int axis_dim = logits.dims()[axis_v];
+  PD_CHECK(axis_dim > 0,
+           "The axis dimention should be larger than 0, but received "
+           "axis dimention is %d.",
+           axis_dim);
+
+  auto softmax_data = dev_ctx.template Alloc<T>(softmax);
+  auto loss_data = dev_ctx.template Alloc<T>(loss);
+
+  const int n = phi::funcs::SizeToAxis(axis_v, logits.dims());
+  PD_CHECK(n > 0,
+           "The size of axis should be larger than 0, but received "
+           "SizeToAxis of softmax is %d.",
+           n);
+
+  const int d = phi::funcs::SizeFromAxis(axis_v, logits.dims());
+  const int remain = d / axis_dim;
+  // The softmax pass also hands back max(x) and log(sum(exp(x - max))) per
+  // row, which is all the loss needs besides the logits themselves.
+  std::vector<T> row_max(static_cast<size_t>(n) * remain);
+  std::vector<T> row_log_sum(static_cast<size_t>(n) * remain);
+  funcs::Softmax(logits.data<T>(),
+                 softmax_data,
+                 n,
+                 axis_dim,
+                 remain,
+                 row_max.data(),
+                 row_log_sum.data());
+
+  if (soft_label) {
+    SoftmaxCrossEntropy<T, T>(logits.data<T>(),
+                              label.data<T>(),
+                              row_max.data(),
+                              row_log_sum.data(),
+                              soft_label,
+                              n,
+                              axis_dim,
+                              remain,
+                              ignore_index,
+                              loss_data);
+  } else if (label.dtype() == phi::DataType::INT32) {
+    SoftmaxCrossEntropy<T, int32_t>(logits.data<T>(),
+                                    label.data<int32_t>(),
+                                    row_max.data(),
+                                    row_log_sum.data(),
+                                    soft_label,
+                                    n,
+                                    axis_dim,
+                                    remain,
+                                    ignore_index,
+                                    loss_data);
+  } else if (label.dtype() == phi::DataType::INT64) {
+    SoftmaxCrossEntropy<T, int64_t>(logits.data<T>(),
+                                    label.data<int64_t>(),
+                                    row_max.data(),
+                                    row_log_sum.data(),
+                                    soft_label,
+                                    n,
+                                    axis_dim,
+                                    remain,
+                                    ignore_index,
+                                    loss_data);
+  } else if (label.dtype() == phi::DataType::INT16) {
+    SoftmaxCrossEntropy<T, int16_t>(logits.data<T>(),
+                                    label.data<int16_t>(),
+                                    row_max.data(),
+                                    row_log_sum.data(),
+                                    soft_label,
+                                    n,
+                                    axis_dim,
+                                    remain,
+                                    ignore_index,
+                                    loss_data);
+  } else if (label.dtype() == phi::DataType::INT8) {
+    SoftmaxCrossEntropy<T, int8_t>(logits.data<T>(),
+                                   label.data<int8_t>(),
+                                   row_max.data(),
+                                   row_log_sum.data(),
+                                   soft_label,
+                                   n,
+                                   axis_dim,
+                                   remain,
+                                   ignore_index,
+                                   loss_data);
+  } else if (label.dtype() == phi::DataType::UINT8) {
+    SoftmaxCrossEntropy<T, uint8_t>(logits.data<T>(),
+                                    label.data<uint8_t>(),
+                                    row_max.data(),
+                                    row_log_sum.data(),
+                                    soft_label,
+                                    n,
+                                    axis_dim,
+                                    remain,
+                                    ignore_index,
+                                    loss_data);
+  } else {
+    PD_CHECK(false, "The dtype of label must be int.");
+  }
 }
 
 template <typename T, typename LabelT>
@@ -0,0 +1,125 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include <string>
+
+#include "kernels/funcs/random.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// out = x * scale, elementwise.
+template <typename T>
+void ScaleCopy(const T *x, int64_t size, T scale, T *out) {
+  funcs::ParallelFor(
+      0, size, funcs::GrainSize(1), [&](int64_t begin, int64_t end) {
+        for (int64_t i = begin; i < end; ++i) {
+          out[i] = x[i] * scale;
+        }
+      });
+}
+
+template <typename T>
+void DropoutRawKernel(const phi::Context &dev_ctx,
+                      const phi::DenseTensor &x,
+                      const paddle::optional<phi::DenseTensor> &seed_tensor,
+                      const phi::Scalar &p,
+                      bool is_test,
+                      const std::string &mode,
+                      int seed,
+                      bool fix_seed,
+                      phi::DenseTensor *out,
+                      phi::DenseTensor *mask) {
+  const T *x_data = x.data<T>();
+  T *out_data = dev_ctx.template Alloc<T>(out);
+  const int64_t size = x.numel();
+  const float dropout_prob = p.to<float>();
+  const bool upscale_in_train = (mode == "upscale_in_train");
+
+  if (is_test) {
+    ScaleCopy(x_data,
+              size,
+              static_cast<T>(upscale_in_train ? 1.0f : 1.0f - dropout_prob),
+              out_data);
+    return;
+  }
+
+  uint8_t *mask_data = dev_ctx.template Alloc<uint8_t>(mask);
+  int seed_data = fix_seed ? seed : 0;
+  if (seed_tensor) {
+    seed_data = *seed_tensor->data<int>();
+  }
+  // With p == 1 and upscale_in_train every output is zero anyway.
+  const T scale = static_cast<T>(upscale_in_train && dropout_prob < 1.0f
+                                     ? 1.0f / (1.0f - dropout_prob)
+                                     : 1.0f);
+  funcs::DropoutMaskFill(funcs::PhiloxKey(dev_ctx, seed_data),
+                         dropout_prob,
+                         size,
+                         mask_data,
+                         [&](int64_t i, bool keep) {
+                           out_data[i] =
+                               keep ? x_data[i] * scale : static_cast<T>(0);
+                         });
+}
+
+template <typename T>
+void DropoutGradRawKernel(const phi::Context &dev_ctx,
+                          const phi::DenseTensor &mask,
+                          const phi::DenseTensor &out_grad,
+                          const phi::Scalar &p,
+                          bool is_test,
+                          const std::string &mode,
+                          phi::DenseTensor *x_grad) {
+  const T *dout = out_grad.data<T>();
+  T *dx = dev_ctx.template Alloc<T>(x_grad);
+  const int64_t size = out_grad.numel();
+  const float dropout_prob = p.to<float>();
+  const bool upscale_in_train = (mode == "upscale_in_train");
+
+  if (is_test) {
+    ScaleCopy(dout,
+              size,
+              static_cast<T>(upscale_in_train ? 1.0f : 1.0f - dropout_prob),
+              dx);
+    return;
+  }
+  const uint8_t *mask_data = mask.data<uint8_t>();
+  const T scale = static_cast<T>(
+      upscale_in_train
+          ? (dropout_prob < 1.0f ? 1.0f / (1.0f - dropout_prob) : 0.0f)
+          : 1.0f);
+  funcs::ParallelFor(
+      0, size, funcs::GrainSize(1), [&](int64_t begin, int64_t end) {
+        for (int64_t i = begin; i < end; ++i) {
+          dx[i] = dout[i] * static_cast<T>(mask_data[i]) * scale;
+        }
+      });
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(dropout,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DropoutRawKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(dropout_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::DropoutGradRawKernel,
+                    float,
+                    double) {}
@@ -12,8 +12,8 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/elementwise_base.h"
 #include "paddle/phi/capi/all.h"
-#include "phi_funcs.h"  //NOLINT
 
 namespace custom_kernel {
 
@@ -23,20 +23,8 @@ void MultiplyRawKernel(const phi::Context& dev_ctx,
                        const phi::DenseTensor& y,
                        int axis,
                        phi::DenseTensor* out) {
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<T>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] * y_data[i];
-  }
+  funcs::ElementwiseCompute<T, T>(
+      dev_ctx, x, y, axis, [](T a, T b) { return a * b; }, out);
 }
 
 template <typename T>
@@ -54,21 +42,8 @@ void AddRawKernel(const phi::Context& dev_ctx,
                   const phi::DenseTensor& y,
                   int axis,
                   phi::DenseTensor* out) {
-  dev_ctx.template Alloc<T>(out);
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<T>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = x_data[i] + y_data[i];
-  }
+  funcs::ElementwiseCompute<T, T>(
+      dev_ctx, x, y, axis, [](T a, T b) { return a + b; }, out);
 }
 
 template <typename T>
@@ -80,27 +55,30 @@ void AddKernel(const phi::Context& dev_ctx,
   custom_kernel::AddRawKernel<T>(dev_ctx, x, y, axis, out);
 }
 
+template <typename T>
+void AddGradKernel(const phi::Context& dev_ctx,
+                   const phi::DenseTensor& x,
+                   const phi::DenseTensor& y,
+                   const phi::DenseTensor& dout,
+                   int axis,
+                   phi::DenseTensor* dx,
+                   phi::DenseTensor* dy) {
+  if (dx) {
+    funcs::ElementwiseGradReduce<T>(dev_ctx, dout, x.dims(), axis, dx);
+  }
+  if (dy) {
+    funcs::ElementwiseGradReduce<T>(dev_ctx, dout, y.dims(), axis, dy);
+  }
+}
+
 template <typename T>
 void MaxRawKernel(const phi::Context& dev_ctx,
                   const phi::DenseTensor& x,
                   const phi::DenseTensor& y,
                   int axis,
                   phi::DenseTensor* out) {
-  dev_ctx.template Alloc<T>(out);
-  auto x_dims = x.dims();
-  auto y_dims = y.dims();
-  auto dst_dims = phi::BroadcastDims(axis, x_dims, y_dims);
-  phi::DenseTensor tmp_x, tmp_y;
-  phi::BroadcastTo<T>(dev_ctx, x, dst_dims, axis, &tmp_x);
-  phi::BroadcastTo<T>(dev_ctx, y, dst_dims, axis, &tmp_y);
-
-  auto x_data = tmp_x.data<T>();
-  auto y_data = tmp_y.data<T>();
-  auto out_data = dev_ctx.template Alloc<T>(out);
-  auto numel = out->numel();
-  for (auto i = 0; i < numel; ++i) {
-    out_data[i] = std::max(x_data[i], y_data[i]);
-  }
+  funcs::ElementwiseCompute<T, T>(
+      dev_ctx, x, y, axis, [](T a, T b) { return std::max(a, b); }, out);
 }
 
 template <typename T>
@@ -150,6 +128,15 @@ PD_BUILD_PHI_KERNEL(add,
                     float,
                     double) {}
 
+PD_BUILD_PHI_KERNEL(add_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::AddGradKernel,
+                    int32_t,
+                    int64_t,
+                    float,
+                    double) {}
+
 PD_BUILD_PHI_KERNEL(maximum_raw,
                     custom_cpu,
                     ALL_LAYOUT,
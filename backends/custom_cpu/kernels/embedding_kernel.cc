@@ -0,0 +1,123 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/embedding.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename IndexT>
+void CheckEmbeddingIds(const phi::DenseTensor& ids,
+                       int64_t rows,
+                       int64_t padding_idx) {
+  const IndexT* ids_data = ids.data<IndexT>();
+  const int64_t invalid =
+      funcs::FindInvalidId(ids_data, ids.numel(), rows, padding_idx);
+  PD_CHECK(invalid < 0,
+           "Variable value (input) of OP(fluid.layers.embedding) expected >= "
+           "0 and < %ld, but got %ld. Please check input value.",
+           rows,
+           invalid < 0 ? 0 : static_cast<int64_t>(ids_data[invalid]));
+}
+
+template <typename T, typename IndexT>
+void EmbeddingImpl(const phi::Context& dev_ctx,
+                   const phi::DenseTensor& ids,
+                   const phi::DenseTensor& weight,
+                   int64_t padding_idx,
+                   phi::DenseTensor* out) {
+  auto weight_dims = weight.dims();
+  const int64_t rows = weight_dims[0];
+  const int64_t width = weight_dims[1];
+  CheckEmbeddingIds<IndexT>(ids, rows, padding_idx);
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  funcs::EmbeddingForward(weight.data<T>(),
+                          width,
+                          ids.data<IndexT>(),
+                          ids.numel(),
+                          padding_idx,
+                          out_data);
+}
+
+template <typename T>
+void EmbeddingKernel(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& inputx,
+                     const phi::DenseTensor& weight,
+                     int64_t padding_idx,
+                     phi::DenseTensor* out) {
+  if (inputx.dtype() == phi::DataType::INT32) {
+    EmbeddingImpl<T, int32_t>(dev_ctx, inputx, weight, padding_idx, out);
+  } else {
+    PD_CHECK(inputx.dtype() == phi::DataType::INT64,
+             "embedding ids must be int32 or int64.");
+    EmbeddingImpl<T, int64_t>(dev_ctx, inputx, weight, padding_idx, out);
+  }
+}
+
+template <typename T, typename IndexT>
+void EmbeddingGradImpl(const phi::Context& dev_ctx,
+                       const phi::DenseTensor& ids,
+                       const phi::DenseTensor& weight,
+                       const phi::DenseTensor& out_grad,
+                       int64_t padding_idx,
+                       phi::DenseTensor* weight_grad) {
+  auto weight_dims = weight.dims();
+  const int64_t rows = weight_dims[0];
+  const int64_t width = weight_dims[1];
+  CheckEmbeddingIds<IndexT>(ids, rows, padding_idx);
+  T* weight_grad_data = dev_ctx.template Alloc<T>(weight_grad);
+  funcs::EmbeddingBackward(ids.data<IndexT>(),
+                           ids.numel(),
+                           out_grad.data<T>(),
+                           rows,
+                           width,
+                           padding_idx,
+                           weight_grad_data);
+}
+
+template <typename T>
+void EmbeddingGradKernel(const phi::Context& dev_ctx,
+                         const phi::DenseTensor& input,
+                         const phi::DenseTensor& weight,
+                         const phi::DenseTensor& out_grad,
+                         int64_t padding_idx,
+                         phi::DenseTensor* weight_grad) {
+  if (input.dtype() == phi::DataType::INT32) {
+    EmbeddingGradImpl<T, int32_t>(
+        dev_ctx, input, weight, out_grad, padding_idx, weight_grad);
+  } else {
+    PD_CHECK(input.dtype() == phi::DataType::INT64,
+             "embedding ids must be int32 or int64.");
+    EmbeddingGradImpl<T, int64_t>(
+        dev_ctx, input, weight, out_grad, padding_idx, weight_grad);
+  }
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(embedding,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::EmbeddingKernel,
+                    float,
+                    double,
+                    phi::dtype::float16) {}
+
+PD_BUILD_PHI_KERNEL(embedding_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::EmbeddingGradKernel,
+                    float,
+                    double,
+                    phi::dtype::float16) {}
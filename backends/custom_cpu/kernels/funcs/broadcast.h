@@ -0,0 +1,206 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Describes how two operands map onto a broadcast output without
+// materialising them: every operand gets a stride per output dimension, with
+// stride 0 on the dimensions it is broadcast along. Output dimensions of size
+// 1 are dropped and neighbouring dimensions that are contiguous for both
+// operands are merged, so e.g. [N, C] + [C] becomes a row loop over a
+// contiguous inner loop and a same-shape op becomes a single flat loop.
+struct BinaryBroadcast {
+  int64_t numel = 1;
+  std::vector<int64_t> shape;
+  std::vector<int64_t> x_strides;
+  std::vector<int64_t> y_strides;
+
+  int64_t inner_size() const { return shape.empty() ? 1 : shape.back(); }
+  int64_t x_inner_stride() const {
+    return x_strides.empty() ? 0 : x_strides.back();
+  }
+  int64_t y_inner_stride() const {
+    return y_strides.empty() ? 0 : y_strides.back();
+  }
+};
+
+namespace detail {
+
+// Strides of an operand aligned to out_dims the same way Paddle's elementwise
+// ops do it: a lower-rank operand starts at `axis` (or is right-aligned when
+// axis is -1) and broadcast dimensions get stride 0.
+inline std::vector<int64_t> BroadcastStrides(
+    const std::vector<int64_t>& in_dims,
+    const std::vector<int64_t>& out_dims,
+    int axis) {
+  const int out_rank = static_cast<int>(out_dims.size());
+  const int in_rank = static_cast<int>(in_dims.size());
+  const int offset =
+      in_rank == out_rank ? 0 : (axis == -1 ? out_rank - in_rank : axis);
+  std::vector<int64_t> strides(out_rank, 0);
+  int64_t stride = 1;
+  for (int i = in_rank - 1; i >= 0; --i) {
+    const int out_i = i + offset;
+    if (in_dims[i] != 1 && out_i >= 0 && out_i < out_rank) {
+      strides[out_i] = stride;
+    }
+    stride *= in_dims[i];
+  }
+  return strides;
+}
+
+}  // namespace detail
+
+inline BinaryBroadcast MakeBinaryBroadcast(const std::vector<int64_t>& x_dims,
+                                           const std::vector<int64_t>& y_dims,
+                                           const std::vector<int64_t>& out_dims,
+                                           int axis) {
+  auto x_strides = detail::BroadcastStrides(x_dims, out_dims, axis);
+  auto y_strides = detail::BroadcastStrides(y_dims, out_dims, axis);
+
+  BinaryBroadcast bc;
+  for (size_t i = 0; i < out_dims.size(); ++i) {
+    bc.numel *= out_dims[i];
+    if (out_dims[i] == 1) {
+      continue;
+    }
+    if (!bc.shape.empty()) {
+      const int64_t size = out_dims[i];
+      // Merge with the previous dimension when both operands step through
+      // it exactly like one longer dimension.
+      if (bc.x_strides.back() == x_strides[i] * size &&
+          bc.y_strides.back() == y_strides[i] * size) {
+        bc.shape.back() *= size;
+        bc.x_strides.back() = x_strides[i];
+        bc.y_strides.back() = y_strides[i];
+        continue;
+      }
+    }
+    bc.shape.push_back(out_dims[i]);
+    bc.x_strides.push_back(x_strides[i]);
+    bc.y_strides.push_back(y_strides[i]);
+  }
+  return bc;
+}
+
+// Contiguous inner loop; the inner strides are always 0 or 1, so the four
+// cases below cover same-shape, scalar/bias and row-broadcast patterns with
+// loops the compiler can vectorise.
+template <typename InT, typename OutT, typename Functor>
+inline void BinaryInnerLoop(const InT* x,
+                            int64_t x_stride,
+                            const InT* y,
+                            int64_t y_stride,
+                            OutT* out,
+                            int64_t n,
+                            Functor func) {
+  if (x_stride == 1 && y_stride == 1) {
+    for (int64_t i = 0; i < n; ++i) out[i] = func(x[i], y[i]);
+  } else if (x_stride == 1) {
+    const InT b = *y;
+    for (int64_t i = 0; i < n; ++i) out[i] = func(x[i], b);
+  } else if (y_stride == 1) {
+    const InT a = *x;
+    for (int64_t i = 0; i < n; ++i) out[i] = func(a, y[i]);
+  } else {
+    const OutT value = func(*x, *y);
+    for (int64_t i = 0; i < n; ++i) out[i] = value;
+  }
+}
+
+// Splits the output described by `bc` into runs along the inner dimension
+// and calls fn(x_offset, y_offset, out_offset, n) for every run, in parallel.
+template <typename RowFn>
+void ForEachBroadcastRow(const BinaryBroadcast& bc, RowFn fn) {
+  if (bc.numel == 0) {
+    return;
+  }
+  const int rank = static_cast<int>(bc.shape.size());
+  const int64_t inner = bc.inner_size();
+  const int64_t x_inner = bc.x_inner_stride();
+  const int64_t y_inner = bc.y_inner_stride();
+
+  ParallelFor(0, bc.numel, GrainSize(1), [&](int64_t begin, int64_t end) {
+    // Recover the multi-index of `begin` once, then walk it incrementally.
+    std::vector<int64_t> index(std::max(rank, 1), 0);
+    int64_t x_offset = 0;
+    int64_t y_offset = 0;
+    int64_t rest = begin;
+    for (int d = rank - 1; d >= 0; --d) {
+      index[d] = rest % bc.shape[d];
+      rest /= bc.shape[d];
+      x_offset += index[d] * bc.x_strides[d];
+      y_offset += index[d] * bc.y_strides[d];
+    }
+
+    int64_t pos = begin;
+    while (pos < end) {
+      const int64_t inner_pos = rank > 0 ? index[rank - 1] : 0;
+      const int64_t n = std::min(inner - inner_pos, end - pos);
+      fn(x_offset, y_offset, pos, n);
+      pos += n;
+      if (pos >= end || rank == 0) {
+        break;
+      }
+      // Rewind to the start of this inner row and step to the next one.
+      x_offset -= inner_pos * x_inner;
+      y_offset -= inner_pos * y_inner;
+      index[rank - 1] = 0;
+      for (int d = rank - 2; d >= 0; --d) {
+        x_offset += bc.x_strides[d];
+        y_offset += bc.y_strides[d];
+        if (++index[d] < bc.shape[d]) {
+          break;
+        }
+        x_offset -= index[d] * bc.x_strides[d];
+        y_offset -= index[d] * bc.y_strides[d];
+        index[d] = 0;
+      }
+    }
+  });
+}
+
+// out[i] = func(x[...], y[...]) over a broadcast described by `bc`.
+template <typename InT, typename OutT, typename Functor>
+void BroadcastBinary(const InT* x,
+                     const InT* y,
+                     OutT* out,
+                     const BinaryBroadcast& bc,
+                     Functor func) {
+  const int64_t x_inner = bc.x_inner_stride();
+  const int64_t y_inner = bc.y_inner_stride();
+  ForEachBroadcastRow(
+      bc,
+      [&](int64_t x_offset, int64_t y_offset, int64_t out_offset, int64_t n) {
+        BinaryInnerLoop(x + x_offset,
+                        x_inner,
+                        y + y_offset,
+                        y_inner,
+                        out + out_offset,
+                        n,
+                        func);
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,404 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/cast.h"
+
+#include <cmath>
+#include <cstring>
+
+#include "kernels/funcs/thread_pool.h"
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <immintrin.h>
+#elif defined(__aarch64__)
+#include <arm_neon.h>
+#endif
+
+namespace custom_kernel {
+namespace funcs {
+
+namespace {
+
+struct Float16 {
+  uint16_t bits;
+};
+
+struct BFloat16 {
+  uint16_t bits;
+};
+
+constexpr int kCastTypeSizes[kNumCastTypes] = {1, 1, 1, 2, 4, 8, 2, 2, 4, 8};
+
+inline float BitsToFloat(uint32_t bits) {
+  float value;
+  memcpy(&value, &bits, sizeof(value));
+  return value;
+}
+
+inline uint32_t FloatToBits(float value) {
+  uint32_t bits;
+  memcpy(&bits, &value, sizeof(bits));
+  return bits;
+}
+
+// NaNs keep the top of their payload and become quiet, as the F16C and NEON
+// instructions do.
+inline float Float16ToFloat(uint16_t bits) {
+  const uint32_t sign = static_cast<uint32_t>(bits & 0x8000) << 16;
+  uint32_t exponent = (bits >> 10) & 0x1f;
+  uint32_t mantissa = bits & 0x3ff;
+  if (exponent == 0x1f) {
+    return BitsToFloat(sign | 0x7f800000 | (mantissa << 13) |
+                       (mantissa != 0 ? 0x400000 : 0));
+  }
+  if (exponent != 0) {
+    return BitsToFloat(sign | ((exponent + 112) << 23) | (mantissa << 13));
+  }
+  if (mantissa == 0) {
+    return BitsToFloat(sign);
+  }
+  // Subnormal: normalise the mantissa.
+  exponent = 113;
+  while ((mantissa & 0x400) == 0) {
+    mantissa <<= 1;
+    --exponent;
+  }
+  return BitsToFloat(sign | (exponent << 23) | ((mantissa & 0x3ff) << 13));
+}
+
+inline uint16_t FloatToFloat16(float value) {
+  const uint32_t x = FloatToBits(value);
+  const uint16_t sign = (x >> 16) & 0x8000;
+  const uint32_t abs = x & 0x7fffffff;
+  if (abs > 0x7f800000) {
+    return sign | 0x7e00 | ((abs >> 13) & 0x3ff);
+  }
+  if (abs >= 0x477ff000) {
+    return sign | 0x7c00;  // inf, or overflows to inf
+  }
+  if (abs < 0x38800000) {
+    // Subnormal or zero: shift the mantissa into place, rounding to even.
+    const int shift = 126 - static_cast<int>(abs >> 23);
+    if (shift > 24) {
+      return sign;
+    }
+    const uint32_t mantissa = (abs & 0x7fffff) | 0x800000;
+    uint32_t half = mantissa >> shift;
+    const uint32_t rest = mantissa & ((1u << shift) - 1);
+    const uint32_t halfway = 1u << (shift - 1);
+    if (rest > halfway || (rest == halfway && (half & 1))) {
+      ++half;
+    }
+    return sign | static_cast<uint16_t>(half);
+  }
+  const uint32_t rounded = abs + 0xfff + ((abs >> 13) & 1);
+  return sign | static_cast<uint16_t>((rounded - 0x38000000) >> 13);
+}
+
+inline float BFloat16ToFloat(uint16_t bits) {
+  return BitsToFloat(static_cast<uint32_t>(bits) << 16);
+}
+
+inline uint16_t FloatToBFloat16(float value) {
+  const uint32_t x = FloatToBits(value);
+  if ((x & 0x7fffffff) > 0x7f800000) {
+    return static_cast<uint16_t>((x >> 16) | 0x40);  // keep NaN quiet
+  }
+  return static_cast<uint16_t>((x + 0x7fff + ((x >> 16) & 1)) >> 16);
+}
+
+// Rounds to the float with an odd last bit unless the value is exact, which
+// makes the rounding to a narrower type that follows give the same result as
+// rounding the value directly.
+template <typename T>
+inline float ToFloatRoundToOdd(T value) {
+  return static_cast<float>(value);  // exact for the narrow integers
+}
+
+inline float ToFloatRoundToOdd(double value) {
+  const float rounded = static_cast<float>(value);
+  if (static_cast<double>(rounded) == value || std::isnan(value)) {
+    return rounded;
+  }
+  uint32_t bits = FloatToBits(rounded);
+  if (std::fabs(static_cast<double>(rounded)) > std::fabs(value)) {
+    --bits;  // towards zero
+  }
+  return BitsToFloat(bits | 1);
+}
+
+inline float ToFloatRoundToOdd(int64_t value) {
+  const uint64_t magnitude = value < 0 ? 0 - static_cast<uint64_t>(value)
+                                       : static_cast<uint64_t>(value);
+  if (magnitude < (1u << 24)) {
+    return static_cast<float>(value);
+  }
+  const int shift = 64 - __builtin_clzll(magnitude) - 24;
+  const uint64_t kept =
+      (magnitude >> shift) | ((magnitude & ((uint64_t{1} << shift) - 1)) != 0);
+  const float result = std::ldexp(static_cast<float>(kept), shift);
+  return value < 0 ? -result : result;
+}
+
+inline float ToFloatRoundToOdd(int32_t value) {
+  return ToFloatRoundToOdd(static_cast<int64_t>(value));
+}
+
+// Converts one value; numeric types convert directly, so no value goes
+// through float unless one side is float16 or bfloat16.
+template <typename OutT>
+struct Convert {
+  template <typename InT>
+  static OutT Apply(InT value) {
+    return static_cast<OutT>(value);
+  }
+  static OutT Apply(Float16 value) {
+    return static_cast<OutT>(Float16ToFloat(value.bits));
+  }
+  static OutT Apply(BFloat16 value) {
+    return static_cast<OutT>(BFloat16ToFloat(value.bits));
+  }
+};
+
+template <>
+struct Convert<Float16> {
+  template <typename InT>
+  static Float16 Apply(InT value) {
+    return Float16{FloatToFloat16(ToFloatRoundToOdd(value))};
+  }
+  static Float16 Apply(Float16 value) { return value; }
+  static Float16 Apply(BFloat16 value) {
+    return Float16{FloatToFloat16(BFloat16ToFloat(value.bits))};
+  }
+};
+
+template <>
+struct Convert<BFloat16> {
+  template <typename InT>
+  static BFloat16 Apply(InT value) {
+    return BFloat16{FloatToBFloat16(ToFloatRoundToOdd(value))};
+  }
+  static BFloat16 Apply(Float16 value) {
+    return BFloat16{FloatToBFloat16(Float16ToFloat(value.bits))};
+  }
+  static BFloat16 Apply(BFloat16 value) { return value; }
+};
+
+template <typename InT, typename OutT>
+void CastLoop(const void* in, void* out, int64_t begin, int64_t end) {
+  const auto* x = static_cast<const InT*>(in);
+  auto* y = static_cast<OutT*>(out);
+  for (int64_t i = begin; i < end; ++i) {
+    y[i] = Convert<OutT>::Apply(x[i]);
+  }
+}
+
+#if defined(__x86_64__) || defined(__i386__)
+
+__attribute__((target("avx,f16c"))) void Float16ToFloat32F16C(const void* in,
+                                                              void* out,
+                                                              int64_t begin,
+                                                              int64_t end) {
+  const auto* x = static_cast<const uint16_t*>(in);
+  auto* y = static_cast<float*>(out);
+  int64_t i = begin;
+  for (; i + 8 <= end; i += 8) {
+    const __m128i h = _mm_loadu_si128(reinterpret_cast<const __m128i*>(x + i));
+    _mm256_storeu_ps(y + i, _mm256_cvtph_ps(h));
+  }
+  for (; i < end; ++i) {
+    y[i] = Float16ToFloat(x[i]);
+  }
+}
+
+__attribute__((target("avx,f16c"))) void Float32ToFloat16F16C(const void* in,
+                                                              void* out,
+                                                              int64_t begin,
+                                                              int64_t end) {
+  const auto* x = static_cast<const float*>(in);
+  auto* y = static_cast<uint16_t*>(out);
+  int64_t i = begin;
+  for (; i + 8 <= end; i += 8) {
+    const __m128i h =
+        _mm256_cvtps_ph(_mm256_loadu_ps(x + i), _MM_FROUND_TO_NEAREST_INT);
+    _mm_storeu_si128(reinterpret_cast<__m128i*>(y + i), h);
+  }
+  for (; i < end; ++i) {
+    y[i] = FloatToFloat16(x[i]);
+  }
+}
+
+__attribute__((target("avx2"))) void BFloat16ToFloat32AVX2(const void* in,
+                                                           void* out,
+                                                           int64_t begin,
+                                                           int64_t end) {
+  const auto* x = static_cast<const uint16_t*>(in);
+  auto* y = static_cast<float*>(out);
+  int64_t i = begin;
+  for (; i + 8 <= end; i += 8) {
+    const __m128i h = _mm_loadu_si128(reinterpret_cast<const __m128i*>(x + i));
+    const __m256i bits = _mm256_slli_epi32(_mm256_cvtepu16_epi32(h), 16);
+    _mm256_storeu_ps(y + i, _mm256_castsi256_ps(bits));
+  }
+  for (; i < end; ++i) {
+    y[i] = BFloat16ToFloat(x[i]);
+  }
+}
+
+// The rounding of FloatToBFloat16 on eight values at a time. The AVX-512 BF16
+// instruction is not used: it flushes subnormals to zero.
+__attribute__((target("avx2"))) void Float32ToBFloat16AVX2(const void* in,
+                                                           void* out,
+                                                           int64_t begin,
+                                                           int64_t end) {
+  const auto* x = static_cast<const float*>(in);
+  auto* y = static_cast<uint16_t*>(out);
+  const __m256i bias = _mm256_set1_epi32(0x7fff);
+  const __m256i one = _mm256_set1_epi32(1);
+  const __m256i abs_mask = _mm256_set1_epi32(0x7fffffff);
+  const __m256i inf = _mm256_set1_epi32(0x7f800000);
+  const __m256i quiet = _mm256_set1_epi32(0x40);
+  int64_t i = begin;
+  for (; i + 8 <= end; i += 8) {
+    const __m256i v = _mm256_castps_si256(_mm256_loadu_ps(x + i));
+    const __m256i high = _mm256_srli_epi32(v, 16);
+    const __m256i rounded =
+        _mm256_srli_epi32(_mm256_add_epi32(_mm256_add_epi32(v, bias),
+                                           _mm256_and_si256(high, one)),
+                          16);
+    const __m256i is_nan =
+        _mm256_cmpgt_epi32(_mm256_and_si256(v, abs_mask), inf);
+    const __m256i bits =
+        _mm256_blendv_epi8(rounded, _mm256_or_si256(high, quiet), is_nan);
+    // Packing works within 128-bit lanes; gather the two low halves.
+    const __m256i packed =
+        _mm256_permute4x64_epi64(_mm256_packus_epi32(bits, bits), 0x08);
+    _mm_storeu_si128(reinterpret_cast<__m128i*>(y + i),
+                     _mm256_castsi256_si128(packed));
+  }
+  for (; i < end; ++i) {
+    y[i] = FloatToBFloat16(x[i]);
+  }
+}
+
+#elif defined(__aarch64__)
+
+void Float16ToFloat32NEON(const void* in,
+                          void* out,
+                          int64_t begin,
+                          int64_t end) {
+  const auto* x = static_cast<const uint16_t*>(in);
+  auto* y = static_cast<float*>(out);
+  int64_t i = begin;
+  for (; i + 4 <= end; i += 4) {
+    vst1q_f32(y + i, vcvt_f32_f16(vreinterpret_f16_u16(vld1_u16(x + i))));
+  }
+  for (; i < end; ++i) {
+    y[i] = Float16ToFloat(x[i]);
+  }
+}
+
+void Float32ToFloat16NEON(const void* in,
+                          void* out,
+                          int64_t begin,
+                          int64_t end) {
+  const auto* x = static_cast<const float*>(in);
+  auto* y = static_cast<uint16_t*>(out);
+  int64_t i = begin;
+  for (; i + 4 <= end; i += 4) {
+    vst1_u16(y + i, vreinterpret_u16_f16(vcvt_f16_f32(vld1q_f32(x + i))));
+  }
+  for (; i < end; ++i) {
+    y[i] = FloatToFloat16(x[i]);
+  }
+}
+
+#endif
+
+template <typename InT>
+void FillRow(CastFunction* row) {
+  row[static_cast<int>(CastType::kBool)] = CastLoop<InT, bool>;
+  row[static_cast<int>(CastType::kInt8)] = CastLoop<InT, int8_t>;
+  row[static_cast<int>(CastType::kUInt8)] = CastLoop<InT, uint8_t>;
+  row[static_cast<int>(CastType::kInt16)] = CastLoop<InT, int16_t>;
+  row[static_cast<int>(CastType::kInt32)] = CastLoop<InT, int32_t>;
+  row[static_cast<int>(CastType::kInt64)] = CastLoop<InT, int64_t>;
+  row[static_cast<int>(CastType::kFloat16)] = CastLoop<InT, Float16>;
+  row[static_cast<int>(CastType::kBFloat16)] = CastLoop<InT, BFloat16>;
+  row[static_cast<int>(CastType::kFloat32)] = CastLoop<InT, float>;
+  row[static_cast<int>(CastType::kFloat64)] = CastLoop<InT, double>;
+}
+
+struct CastTable {
+  CastTable() {
+    FillRow<bool>(functions[static_cast<int>(CastType::kBool)]);
+    FillRow<int8_t>(functions[static_cast<int>(CastType::kInt8)]);
+    FillRow<uint8_t>(functions[static_cast<int>(CastType::kUInt8)]);
+    FillRow<int16_t>(functions[static_cast<int>(CastType::kInt16)]);
+    FillRow<int32_t>(functions[static_cast<int>(CastType::kInt32)]);
+    FillRow<int64_t>(functions[static_cast<int>(CastType::kInt64)]);
+    FillRow<Float16>(functions[static_cast<int>(CastType::kFloat16)]);
+    FillRow<BFloat16>(functions[static_cast<int>(CastType::kBFloat16)]);
+    FillRow<float>(functions[static_cast<int>(CastType::kFloat32)]);
+    FillRow<double>(functions[static_cast<int>(CastType::kFloat64)]);
+
+#if defined(__x86_64__) || defined(__i386__)
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx") && __builtin_cpu_supports("f16c")) {
+      Set(CastType::kFloat16, CastType::kFloat32, Float16ToFloat32F16C);
+      Set(CastType::kFloat32, CastType::kFloat16, Float32ToFloat16F16C);
+    }
+    if (__builtin_cpu_supports("avx2")) {
+      Set(CastType::kBFloat16, CastType::kFloat32, BFloat16ToFloat32AVX2);
+      Set(CastType::kFloat32, CastType::kBFloat16, Float32ToBFloat16AVX2);
+    }
+#elif defined(__aarch64__)
+    Set(CastType::kFloat16, CastType::kFloat32, Float16ToFloat32NEON);
+    Set(CastType::kFloat32, CastType::kFloat16, Float32ToFloat16NEON);
+#endif
+  }
+
+  void Set(CastType in_type, CastType out_type, CastFunction function) {
+    functions[static_cast<int>(in_type)][static_cast<int>(out_type)] = function;
+  }
+
+  CastFunction functions[kNumCastTypes][kNumCastTypes];
+};
+
+}  // namespace
+
+CastFunction GetCastFunction(CastType in_type, CastType out_type) {
+  static const CastTable table;
+  return table.functions[static_cast<int>(in_type)][static_cast<int>(out_type)];
+}
+
+void Cast(CastType in_type,
+          const void* in,
+          CastType out_type,
+          void* out,
+          int64_t numel) {
+  const CastFunction cast = GetCastFunction(in_type, out_type);
+  if (in == out && kCastTypeSizes[static_cast<int>(in_type)] !=
+                       kCastTypeSizes[static_cast<int>(out_type)]) {
+    // In place, a chunk would overwrite input another chunk has yet to read.
+    cast(in, out, 0, numel);
+    return;
+  }
+  ParallelFor(0, numel, GrainSize(1), [&](int64_t begin, int64_t end) {
+    cast(in, out, begin, end);
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,64 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstdint>
+
+namespace custom_kernel {
+namespace funcs {
+
+// Element types the cast engine converts between. float16 and bfloat16 are
+// stored as their 16-bit patterns.
+enum class CastType {
+  kBool,
+  kInt8,
+  kUInt8,
+  kInt16,
+  kInt32,
+  kInt64,
+  kFloat16,
+  kBFloat16,
+  kFloat32,
+  kFloat64,
+};
+
+constexpr int kNumCastTypes = 10;
+
+// Converts in[begin, end) to out[begin, end).
+using CastFunction = void (*)(const void* in,
+                              void* out,
+                              int64_t begin,
+                              int64_t end);
+
+// Looks the conversion up in a table of one function per pair of types.
+//
+// Every value is rounded once, to nearest even: integers and doubles are not
+// narrowed to float on the way, and conversions to float16 and bfloat16 go
+// through float with round-to-odd so that they do not round twice. The
+// float32 <-> float16 pairs use F16C on x86 and NEON on ARM, the float32 <->
+// bfloat16 pairs AVX2 on x86, when the CPU has them; they give the same bits
+// as the scalar code.
+CastFunction GetCastFunction(CastType in_type, CastType out_type);
+
+// Casts numel elements on the intra-op thread pool. `in` and `out` may be the
+// same buffer.
+void Cast(CastType in_type,
+          const void* in,
+          CastType out_type,
+          void* out,
+          int64_t numel);
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,148 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cmath>
+#include <cstdint>
+
+#include "kernels/funcs/broadcast.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Paddle treats floating point values that differ by less than 1e-8 as
+// equal. The difference of two floats is below 1e-8 exactly when it is at
+// most the float nearest to 1e-8, which lies just below it, so the float
+// test needs no conversion to double.
+template <typename T>
+inline bool CloseTo(T a, T b) {
+  return a == b;
+}
+
+inline bool CloseTo(float a, float b) { return std::fabs(a - b) <= 1e-8f; }
+
+inline bool CloseTo(double a, double b) { return std::fabs(a - b) < 1e-8; }
+
+struct EqualFunctor {
+  template <typename T>
+  bool operator()(T a, T b) const {
+    return CloseTo(a, b);
+  }
+};
+
+struct NotEqualFunctor {
+  template <typename T>
+  bool operator()(T a, T b) const {
+    return !CloseTo(a, b);
+  }
+};
+
+struct LessThanFunctor {
+  template <typename T>
+  bool operator()(T a, T b) const {
+    return a < b;
+  }
+};
+
+struct LessEqualFunctor {
+  template <typename T>
+  bool operator()(T a, T b) const {
+    return a <= b;
+  }
+};
+
+struct GreaterThanFunctor {
+  template <typename T>
+  bool operator()(T a, T b) const {
+    return a > b;
+  }
+};
+
+struct GreaterEqualFunctor {
+  template <typename T>
+  bool operator()(T a, T b) const {
+    return a >= b;
+  }
+};
+
+template <typename T>
+using CompareRowFunction = void (*)(const T* x,
+                                    int64_t x_stride,
+                                    const T* y,
+                                    int64_t y_stride,
+                                    bool* out,
+                                    int64_t n);
+
+namespace detail {
+
+template <typename T, typename Functor>
+void CompareRow(const T* x,
+                int64_t x_stride,
+                const T* y,
+                int64_t y_stride,
+                bool* out,
+                int64_t n) {
+  BinaryInnerLoop(x, x_stride, y, y_stride, out, n, Functor());
+}
+
+#if defined(__x86_64__) || defined(__i386__)
+// The same loops compiled for AVX2, which compares 32 bytes of input at a
+// time and narrows the masks to bools in registers.
+template <typename T, typename Functor>
+__attribute__((target("avx2"))) void CompareRowAVX2(const T* x,
+                                                    int64_t x_stride,
+                                                    const T* y,
+                                                    int64_t y_stride,
+                                                    bool* out,
+                                                    int64_t n) {
+  BinaryInnerLoop(x, x_stride, y, y_stride, out, n, Functor());
+}
+
+inline bool HasAVX2() {
+  static const bool has_avx2 = __builtin_cpu_supports("avx2");
+  return has_avx2;
+}
+#endif
+
+template <typename T, typename Functor>
+CompareRowFunction<T> GetCompareRow() {
+#if defined(__x86_64__) || defined(__i386__)
+  if (HasAVX2()) {
+    return CompareRowAVX2<T, Functor>;
+  }
+#endif
+  return CompareRow<T, Functor>;
+}
+
+}  // namespace detail
+
+// out = Functor()(x, y) over a broadcast described by `bc`. Every run along
+// the inner dimension is one contiguous, vectorised loop; same-shape inputs
+// and a single-element operand, as in `x > 0`, make the whole output one
+// run that is split across threads.
+template <typename T, typename Functor>
+void Compare(const T* x, const T* y, bool* out, const BinaryBroadcast& bc) {
+  const auto row = detail::GetCompareRow<T, Functor>();
+  const int64_t x_inner = bc.x_inner_stride();
+  const int64_t y_inner = bc.y_inner_stride();
+  ForEachBroadcastRow(
+      bc,
+      [&](int64_t x_offset, int64_t y_offset, int64_t out_offset, int64_t n) {
+        row(x + x_offset, x_inner, y + y_offset, y_inner, out + out_offset, n);
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
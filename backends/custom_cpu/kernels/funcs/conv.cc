@@ -0,0 +1,147 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/conv.h"
+
+#include <array>
+#include <mutex>
+#include <unordered_map>
+
+#include "runtime/flags.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+namespace {
+
+using ConvKey = std::array<int64_t, 17>;
+
+ConvKey MakeConvKey(const ConvShape& s, int64_t elem_size) {
+  return {s.batch,
+          s.in_channels,
+          s.in_h,
+          s.in_w,
+          s.out_channels,
+          s.out_h,
+          s.out_w,
+          s.kernel_h,
+          s.kernel_w,
+          s.stride_h,
+          s.stride_w,
+          s.pad_h,
+          s.pad_w,
+          s.dilation_h,
+          s.dilation_w,
+          s.groups,
+          elem_size};
+}
+
+struct ConvKeyHash {
+  size_t operator()(const ConvKey& key) const {
+    size_t seed = 0;
+    for (int64_t v : key) {
+      seed ^= std::hash<int64_t>()(v) + 0x9e3779b9 + (seed << 6) + (seed >> 2);
+    }
+    return seed;
+  }
+};
+
+class ConvAlgorithmCache {
+ public:
+  static ConvAlgorithmCache& Instance() {
+    static ConvAlgorithmCache* cache = new ConvAlgorithmCache();
+    return *cache;
+  }
+
+  bool Find(const ConvKey& key, ConvAlgorithm* algo) {
+    std::lock_guard<std::mutex> lock(mutex_);
+    auto it = algorithms_.find(key);
+    if (it == algorithms_.end()) {
+      return false;
+    }
+    *algo = it->second;
+    return true;
+  }
+
+  void Insert(const ConvKey& key, ConvAlgorithm algo) {
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (algorithms_.size() >= kMaxEntries) {
+      algorithms_.clear();
+    }
+    algorithms_[key] = algo;
+  }
+
+ private:
+  // Models that see many input sizes start over instead of growing forever.
+  static constexpr size_t kMaxEntries = 4096;
+
+  std::mutex mutex_;
+  std::unordered_map<ConvKey, ConvAlgorithm, ConvKeyHash> algorithms_;
+};
+
+}  // namespace
+
+bool ConvAlgorithmSupported(const ConvShape& s, ConvAlgorithm algo) {
+  switch (algo) {
+    case ConvAlgorithm::kWinograd:
+      return s.kernel_h == 3 && s.kernel_w == 3 && s.stride_h == 1 &&
+             s.stride_w == 1 && s.dilation_h == 1 && s.dilation_w == 1;
+    case ConvAlgorithm::kDepthwise:
+      return s.in_channels_per_group() == 1;
+    default:
+      return true;
+  }
+}
+
+ConvAlgorithm ChooseConvAlgorithm(const ConvShape& s) {
+  const int64_t icg = s.in_channels_per_group();
+  const int64_t ocg = s.out_channels_per_group();
+  if (icg == 1 && s.groups > 1) {
+    return ConvAlgorithm::kDepthwise;
+  }
+  // Winograd pays for its transforms once both channel counts are large
+  // enough for the 16 GEMMs to dominate.
+  if (ConvAlgorithmSupported(s, ConvAlgorithm::kWinograd) && icg >= 32 &&
+      ocg >= 32) {
+    return ConvAlgorithm::kWinograd;
+  }
+  // With few channels the GEMMs are too small to make up for unfolding the
+  // input kernel_h * kernel_w times.
+  if (icg > 1 && icg <= 16 && ocg <= 16) {
+    return ConvAlgorithm::kDirect;
+  }
+  return ConvAlgorithm::kIm2ColGemm;
+}
+
+bool ConvAutotuneEnabled() {
+  static const bool enabled =
+      EnvToBool("FLAGS_custom_cpu_conv_autotune", false);
+  return enabled;
+}
+
+bool FindConvAlgorithm(const ConvShape& shape,
+                       int64_t elem_size,
+                       ConvAlgorithm* algo) {
+  return ConvAlgorithmCache::Instance().Find(MakeConvKey(shape, elem_size),
+                                             algo);
+}
+
+void CacheConvAlgorithm(const ConvShape& shape,
+                        int64_t elem_size,
+                        ConvAlgorithm algo) {
+  ConvAlgorithmCache::Instance().Insert(MakeConvKey(shape, elem_size), algo);
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,975 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <chrono>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "kernels/funcs/gemm.h"
+#include "kernels/funcs/thread_pool.h"
+
+// 2-D convolution over NCHW tensors with a [out_channels, in_channels /
+// groups, kernel_h, kernel_w] filter. The forward pass has four algorithms:
+//
+//   kIm2ColGemm  unfolds a chunk of images into columns and runs one blocked
+//                GEMM per group; 1x1 convolutions use the input as is.
+//   kDirect      keeps kConvBlock output channels of a few output columns in
+//                registers, reading a filter packed as [oc / kConvBlock][ic]
+//                [kh][kw][kConvBlock] and input rows padded on both sides; it
+//                wins when there are too few channels for good GEMMs.
+//   kWinograd    F(2x2, 3x3) for 3x3 stride 1 filters: 16 GEMMs over tiles of
+//                transformed input replace 2.25x as many multiply-adds.
+//   kDepthwise   one input channel per group, done plane by plane.
+//
+// The algorithm is chosen once per shape and cached, either from the shape
+// or, with FLAGS_custom_cpu_conv_autotune, by timing every algorithm that
+// supports the shape on its first call. The backward passes use im2col and
+// GEMM, or direct loops for depthwise convolutions.
+
+namespace custom_kernel {
+namespace funcs {
+
+struct ConvShape {
+  int64_t batch;
+  int64_t in_channels;
+  int64_t in_h;
+  int64_t in_w;
+  int64_t out_channels;
+  int64_t out_h;
+  int64_t out_w;
+  int64_t kernel_h;
+  int64_t kernel_w;
+  int64_t stride_h;
+  int64_t stride_w;
+  // Top and left padding; the bottom and right padding follow from out_h
+  // and out_w.
+  int64_t pad_h;
+  int64_t pad_w;
+  int64_t dilation_h;
+  int64_t dilation_w;
+  int64_t groups;
+
+  int64_t in_channels_per_group() const { return in_channels / groups; }
+  int64_t out_channels_per_group() const { return out_channels / groups; }
+  int64_t in_size() const { return in_h * in_w; }
+  int64_t out_size() const { return out_h * out_w; }
+  int64_t kernel_size() const { return kernel_h * kernel_w; }
+  // Rows of the im2col matrix of one group.
+  int64_t col_rows() const { return in_channels_per_group() * kernel_size(); }
+};
+
+enum class ConvAlgorithm { kIm2ColGemm, kDirect, kWinograd, kDepthwise };
+
+bool ConvAlgorithmSupported(const ConvShape& shape, ConvAlgorithm algo);
+
+// Picks an algorithm from the shape alone.
+ConvAlgorithm ChooseConvAlgorithm(const ConvShape& shape);
+
+bool ConvAutotuneEnabled();
+
+// The algorithm cached for shape and element size, if any.
+bool FindConvAlgorithm(const ConvShape& shape,
+                       int64_t elem_size,
+                       ConvAlgorithm* algo);
+void CacheConvAlgorithm(const ConvShape& shape,
+                        int64_t elem_size,
+                        ConvAlgorithm algo);
+
+// Output channels accumulated together by the direct algorithm.
+constexpr int64_t kConvBlock = 8;
+
+// Elements of im2col scratch used per chunk of images.
+constexpr int64_t kConvScratchSize = 1 << 21;
+// Elements of a scratch buffer kept by a thread between calls.
+constexpr int64_t kConvRetainedScratchSize = 4 * kConvScratchSize;
+
+namespace detail {
+
+// Scratch space of a thread for one slot, reused across calls. A buffer
+// grown beyond kConvRetainedScratchSize is released when the ConvBuffer goes
+// out of scope, so that one outsized conv does not pin its workspace in
+// every pool thread for the life of the process.
+template <typename T, int Slot>
+class ConvBuffer {
+ public:
+  explicit ConvBuffer(int64_t size) : buffer_(Storage()) {
+    if (static_cast<int64_t>(buffer_.size()) < size) {
+      buffer_.resize(size);
+    }
+  }
+
+  ConvBuffer(const ConvBuffer&) = delete;
+  ConvBuffer& operator=(const ConvBuffer&) = delete;
+
+  ~ConvBuffer() {
+    if (static_cast<int64_t>(buffer_.capacity()) > kConvRetainedScratchSize) {
+      std::vector<T>().swap(buffer_);
+    }
+  }
+
+  T* data() { return buffer_.data(); }
+
+ private:
+  static std::vector<T>& Storage() {
+    thread_local std::vector<T> buffer;
+    return buffer;
+  }
+
+  std::vector<T>& buffer_;
+};
+
+inline bool ConvUseAVX2() { return HostGemmIsa() != GemmIsa::kBase; }
+
+// Output positions o in [*lo, *hi) read input position o * stride + offset
+// inside [0, size).
+inline void ValidOutputRange(int64_t offset,
+                             int64_t stride,
+                             int64_t size,
+                             int64_t out_size,
+                             int64_t* lo,
+                             int64_t* hi) {
+  *lo = offset < 0 ? (-offset + stride - 1) / stride : 0;
+  *hi = offset < size ? (size - 1 - offset) / stride + 1 : 0;
+  *hi = std::min(*hi, out_size);
+  *lo = std::min(*lo, *hi);
+}
+
+inline bool IsPointwise(const ConvShape& s) {
+  return s.kernel_h == 1 && s.kernel_w == 1 && s.stride_h == 1 &&
+         s.stride_w == 1 && s.pad_h == 0 && s.pad_w == 0 && s.out_h == s.in_h &&
+         s.out_w == s.in_w;
+}
+
+inline int64_t ImagesPerChunk(int64_t scratch_per_image, int64_t batch) {
+  return std::max<int64_t>(
+      1,
+      std::min(batch,
+               kConvScratchSize / std::max<int64_t>(scratch_per_image, 1)));
+}
+
+// Unfolds one input channel into kernel_h * kernel_w rows of out_h * out_w.
+template <typename T>
+void Im2ColChannel(const ConvShape& s, const T* in, T* col) {
+  for (int64_t ki = 0; ki < s.kernel_h; ++ki) {
+    for (int64_t kj = 0; kj < s.kernel_w; ++kj) {
+      T* dst = col + (ki * s.kernel_w + kj) * s.out_size();
+      const int64_t offset = kj * s.dilation_w - s.pad_w;
+      int64_t lo, hi;
+      ValidOutputRange(offset, s.stride_w, s.in_w, s.out_w, &lo, &hi);
+      for (int64_t oh = 0; oh < s.out_h; ++oh) {
+        T* d = dst + oh * s.out_w;
+        const int64_t ih = oh * s.stride_h - s.pad_h + ki * s.dilation_h;
+        if (ih < 0 || ih >= s.in_h) {
+          std::fill(d, d + s.out_w, T(0));
+          continue;
+        }
+        const T* row = in + ih * s.in_w + offset;
+        std::fill(d, d + lo, T(0));
+        if (s.stride_w == 1) {
+          std::copy(row + lo, row + hi, d + lo);
+        } else {
+          for (int64_t o = lo; o < hi; ++o) d[o] = row[o * s.stride_w];
+        }
+        std::fill(d + hi, d + s.out_w, T(0));
+      }
+    }
+  }
+}
+
+// Adds kernel_h * kernel_w rows of out_h * out_w back onto one channel.
+template <typename T>
+void Col2ImChannel(const ConvShape& s, const T* col, T* in) {
+  std::fill(in, in + s.in_size(), T(0));
+  for (int64_t ki = 0; ki < s.kernel_h; ++ki) {
+    for (int64_t kj = 0; kj < s.kernel_w; ++kj) {
+      const T* src = col + (ki * s.kernel_w + kj) * s.out_size();
+      const int64_t offset = kj * s.dilation_w - s.pad_w;
+      int64_t lo, hi;
+      ValidOutputRange(offset, s.stride_w, s.in_w, s.out_w, &lo, &hi);
+      for (int64_t oh = 0; oh < s.out_h; ++oh) {
+        const int64_t ih = oh * s.stride_h - s.pad_h + ki * s.dilation_h;
+        if (ih < 0 || ih >= s.in_h) {
+          continue;
+        }
+        const T* c = src + oh * s.out_w;
+        T* row = in + ih * s.in_w + offset;
+        for (int64_t o = lo; o < hi; ++o) row[o * s.stride_w] += c[o];
+      }
+    }
+  }
+}
+
+// col = im2col of num_images images, laid out as [image][channel][kh * kw]
+// [out_h * out_w], which is [image][group][col_rows][out_h * out_w].
+template <typename T>
+void Im2Col(const ConvShape& s, const T* in, int64_t num_images, T* col) {
+  const int64_t rows = s.kernel_size() * s.out_size();
+  ParallelFor(0,
+              num_images * s.in_channels,
+              GrainSize(rows),
+              [&](int64_t begin, int64_t end) {
+                for (int64_t c = begin; c < end; ++c) {
+                  Im2ColChannel(s, in + c * s.in_size(), col + c * rows);
+                }
+              });
+}
+
+template <typename T>
+void Col2Im(const ConvShape& s, const T* col, int64_t num_images, T* in) {
+  const int64_t rows = s.kernel_size() * s.out_size();
+  ParallelFor(0,
+              num_images * s.in_channels,
+              GrainSize(rows),
+              [&](int64_t begin, int64_t end) {
+                for (int64_t c = begin; c < end; ++c) {
+                  Col2ImChannel(s, col + c * rows, in + c * s.in_size());
+                }
+              });
+}
+
+template <typename T>
+void ConvIm2ColGemm(const ConvShape& s, const T* in, const T* filter, T* out) {
+  const int64_t ocg = s.out_channels_per_group();
+  const int64_t col_rows = s.col_rows();
+  const int64_t in_image = s.in_channels * s.in_size();
+  const int64_t out_image = s.out_channels * s.out_size();
+  const bool pointwise = IsPointwise(s);
+  const int64_t col_image = s.groups * col_rows * s.out_size();
+  const int64_t chunk =
+      pointwise ? s.batch : ImagesPerChunk(col_image, s.batch);
+  ConvBuffer<T, 0> col_buffer(pointwise ? 0 : chunk * col_image);
+  T* col = pointwise ? nullptr : col_buffer.data();
+
+  for (int64_t n0 = 0; n0 < s.batch; n0 += chunk) {
+    const int64_t num_images = std::min(chunk, s.batch - n0);
+    const T* cols = in + n0 * in_image;
+    int64_t cols_stride = in_image;
+    if (!pointwise) {
+      Im2Col(s, cols, num_images, col);
+      cols = col;
+      cols_stride = col_image;
+    }
+    for (int64_t g = 0; g < s.groups; ++g) {
+      BatchedGemm<T>(
+          num_images,
+          ocg,
+          s.out_size(),
+          col_rows,
+          1.0f,
+          {filter + g * ocg * col_rows, col_rows, 1},
+          0,
+          {cols + g * col_rows * s.out_size(), s.out_size(), 1},
+          cols_stride,
+          false,
+          {out + n0 * out_image + g * ocg * s.out_size(), s.out_size(), 1},
+          out_image);
+    }
+  }
+}
+
+// Width of the input rows the direct algorithm reads, padded on both sides
+// so that no output column needs a bounds check.
+inline int64_t DirectPaddedWidth(const ConvShape& s) {
+  return (s.out_w - 1) * s.stride_w + (s.kernel_w - 1) * s.dilation_w + 1;
+}
+
+// acc[o][c] = sum over ic, ki, kj of w[ic][ki][kj][c] * in[ic][ih][iw] for
+// the W outputs o in [ow0, ow0 + W) of row oh, kept in registers as vectors
+// of VecBytes. `in` points at the first padded channel of the group.
+template <typename T, int VecBytes, int W>
+CUSTOM_CPU_ALWAYS_INLINE void DirectTile(const ConvShape& s,
+                                         const T* in,
+                                         int64_t padded_w,
+                                         const T* w,
+                                         int64_t oh,
+                                         int64_t ow0,
+                                         T* acc) {
+  constexpr int kLanes = VecBytes / sizeof(T);
+  constexpr int kVecs = kConvBlock / kLanes;
+  typedef T Vec __attribute__((vector_size(VecBytes)));
+
+  Vec a[W][kVecs];
+  for (int i = 0; i < W; ++i) {
+    for (int v = 0; v < kVecs; ++v) {
+      a[i][v] = Vec{};
+    }
+  }
+  const int64_t icg = s.in_channels_per_group();
+  for (int64_t ic = 0; ic < icg; ++ic) {
+    for (int64_t ki = 0; ki < s.kernel_h; ++ki) {
+      const int64_t ih = oh * s.stride_h - s.pad_h + ki * s.dilation_h;
+      if (ih < 0 || ih >= s.in_h) {
+        continue;
+      }
+      const T* row = in + (ic * s.in_h + ih) * padded_w + ow0 * s.stride_w;
+      const T* wk = w + (ic * s.kernel_h + ki) * s.kernel_w * kConvBlock;
+      for (int64_t kj = 0; kj < s.kernel_w; ++kj) {
+        const T* x = row + kj * s.dilation_w;
+        Vec b[kVecs];
+        for (int v = 0; v < kVecs; ++v) {
+          std::memcpy(&b[v], wk + kj * kConvBlock + v * kLanes, VecBytes);
+        }
+        for (int i = 0; i < W; ++i) {
+          const T xi = x[i * s.stride_w];
+          for (int v = 0; v < kVecs; ++v) {
+            a[i][v] += xi * b[v];
+          }
+        }
+      }
+    }
+  }
+  for (int i = 0; i < W; ++i) {
+    for (int v = 0; v < kVecs; ++v) {
+      std::memcpy(
+          acc + (ow0 + i) * kConvBlock + v * kLanes, &a[i][v], VecBytes);
+    }
+  }
+}
+
+// One output row of a block of output channels, as tiles of about eight
+// independent accumulator vectors.
+template <typename T, int VecBytes>
+CUSTOM_CPU_ALWAYS_INLINE void DirectRowImpl(const ConvShape& s,
+                                            const T* in,
+                                            int64_t padded_w,
+                                            const T* w,
+                                            int64_t oh,
+                                            T* acc) {
+  constexpr int kTile = 8 * VecBytes / (kConvBlock * sizeof(T));
+  int64_t ow = 0;
+  for (; ow + kTile <= s.out_w; ow += kTile) {
+    DirectTile<T, VecBytes, kTile>(s, in, padded_w, w, oh, ow, acc);
+  }
+  for (; ow < s.out_w; ++ow) {
+    DirectTile<T, VecBytes, 1>(s, in, padded_w, w, oh, ow, acc);
+  }
+}
+
+template <typename T>
+void DirectRow(const ConvShape& s,
+               const T* in,
+               int64_t padded_w,
+               const T* w,
+               int64_t oh,
+               T* acc) {
+  DirectRowImpl<T, 16>(s, in, padded_w, w, oh, acc);
+}
+
+#ifdef CUSTOM_CPU_GEMM_X86
+template <typename T>
+__attribute__((target("avx2,fma"))) void DirectRowAVX2(const ConvShape& s,
+                                                       const T* in,
+                                                       int64_t padded_w,
+                                                       const T* w,
+                                                       int64_t oh,
+                                                       T* acc) {
+  DirectRowImpl<T, 32>(s, in, padded_w, w, oh, acc);
+}
+#endif
+
+template <typename T>
+void ConvDirect(const ConvShape& s, const T* in, const T* filter, T* out) {
+  const int64_t icg = s.in_channels_per_group();
+  const int64_t ocg = s.out_channels_per_group();
+  const int64_t col_rows = s.col_rows();
+  const int64_t blocks = (ocg + kConvBlock - 1) / kConvBlock;
+
+  // [group][block][ic][kh][kw][kConvBlock], zero padded past ocg.
+  ConvBuffer<T, 1> packed_buffer(s.groups * blocks * col_rows * kConvBlock);
+  T* packed = packed_buffer.data();
+  ParallelFor(0,
+              s.groups * blocks,
+              GrainSize(col_rows * kConvBlock),
+              [&](int64_t begin, int64_t end) {
+                for (int64_t gb = begin; gb < end; ++gb) {
+                  const int64_t g = gb / blocks;
+                  const int64_t oc0 = gb % blocks * kConvBlock;
+                  T* dst = packed + gb * col_rows * kConvBlock;
+                  for (int64_t k = 0; k < col_rows; ++k) {
+                    for (int64_t c = 0; c < kConvBlock; ++c) {
+                      dst[k * kConvBlock + c] =
+                          oc0 + c < ocg
+                              ? filter[(g * ocg + oc0 + c) * col_rows + k]
+                              : T(0);
+                    }
+                  }
+                }
+              });
+
+  // The input with every row padded to padded_w columns.
+  const int64_t padded_w = DirectPaddedWidth(s);
+  ConvBuffer<T, 0> padded_buffer(s.batch * s.in_channels * s.in_h * padded_w);
+  T* padded = padded_buffer.data();
+  ParallelFor(0,
+              s.batch * s.in_channels * s.in_h,
+              GrainSize(padded_w),
+              [&](int64_t begin, int64_t end) {
+                for (int64_t r = begin; r < end; ++r) {
+                  const T* src = in + r * s.in_w;
+                  T* dst = padded + r * padded_w;
+                  const int64_t lo = std::min(s.pad_w, padded_w);
+                  const int64_t hi = std::min(s.pad_w + s.in_w, padded_w);
+                  std::fill(dst, dst + lo, T(0));
+                  std::copy(src, src + hi - lo, dst + lo);
+                  std::fill(dst + hi, dst + padded_w, T(0));
+                }
+              });
+
+  auto row_fn = DirectRow<T>;
+#ifdef CUSTOM_CPU_GEMM_X86
+  if (ConvUseAVX2()) {
+    row_fn = DirectRowAVX2<T>;
+  }
+#endif
+  const int64_t rows_per_image = s.groups * blocks * s.out_h;
+  ParallelFor(
+      0,
+      s.batch * rows_per_image,
+      GrainSize(col_rows * kConvBlock * s.out_w),
+      [&](int64_t begin, int64_t end) {
+        ConvBuffer<T, 2> acc_buffer(s.out_w * kConvBlock);
+        T* acc = acc_buffer.data();
+        for (int64_t task = begin; task < end; ++task) {
+          const int64_t n = task / rows_per_image;
+          const int64_t gb = task % rows_per_image / s.out_h;
+          const int64_t oh = task % s.out_h;
+          const int64_t g = gb / blocks;
+          const int64_t oc0 = g * ocg + gb % blocks * kConvBlock;
+          const int64_t num_oc = std::min(kConvBlock, (g + 1) * ocg - oc0);
+          row_fn(s,
+                 padded + (n * s.in_channels + g * icg) * s.in_h * padded_w,
+                 padded_w,
+                 packed + gb * col_rows * kConvBlock,
+                 oh,
+                 acc);
+          for (int64_t c = 0; c < num_oc; ++c) {
+            T* dst =
+                out + ((n * s.out_channels + oc0 + c) * s.out_h + oh) * s.out_w;
+            for (int64_t o = 0; o < s.out_w; ++o) {
+              dst[o] = acc[o * kConvBlock + c];
+            }
+          }
+        }
+      });
+}
+
+// One output plane of a depthwise convolution.
+template <typename T>
+CUSTOM_CPU_ALWAYS_INLINE void DepthwisePlaneImpl(const ConvShape& s,
+                                                 const T* in,
+                                                 const T* w,
+                                                 T* out) {
+  for (int64_t oh = 0; oh < s.out_h; ++oh) {
+    T* dst = out + oh * s.out_w;
+    std::fill(dst, dst + s.out_w, T(0));
+    for (int64_t ki = 0; ki < s.kernel_h; ++ki) {
+      const int64_t ih = oh * s.stride_h - s.pad_h + ki * s.dilation_h;
+      if (ih < 0 || ih >= s.in_h) {
+        continue;
+      }
+      const T* row = in + ih * s.in_w;
+      for (int64_t kj = 0; kj < s.kernel_w; ++kj) {
+        const T wv = w[ki * s.kernel_w + kj];
+        const int64_t offset = kj * s.dilation_w - s.pad_w;
+        int64_t lo, hi;
+        ValidOutputRange(offset, s.stride_w, s.in_w, s.out_w, &lo, &hi);
+        const T* src = row + offset;
+        if (s.stride_w == 1) {
+          for (int64_t o = lo; o < hi; ++o) dst[o] += wv * src[o];
+        } else {
+          for (int64_t o = lo; o < hi; ++o) {
+            dst[o] += wv * src[o * s.stride_w];
+          }
+        }
+      }
+    }
+  }
+}
+
+template <typename T>
+void DepthwisePlane(const ConvShape& s, const T* in, const T* w, T* out) {
+  DepthwisePlaneImpl(s, in, w, out);
+}
+
+#ifdef CUSTOM_CPU_GEMM_X86
+template <typename T>
+__attribute__((target("avx2,fma"))) void DepthwisePlaneAVX2(const ConvShape& s,
+                                                            const T* in,
+                                                            const T* w,
+                                                            T* out) {
+  DepthwisePlaneImpl(s, in, w, out);
+}
+#endif
+
+template <typename T>
+void ConvDepthwise(const ConvShape& s, const T* in, const T* filter, T* out) {
+  const int64_t multiplier = s.out_channels_per_group();
+  auto plane_fn = DepthwisePlane<T>;
+#ifdef CUSTOM_CPU_GEMM_X86
+  if (ConvUseAVX2()) {
+    plane_fn = DepthwisePlaneAVX2<T>;
+  }
+#endif
+  ParallelFor(0,
+              s.batch * s.out_channels,
+              GrainSize(s.kernel_size() * s.out_size()),
+              [&](int64_t begin, int64_t end) {
+                for (int64_t p = begin; p < end; ++p) {
+                  const int64_t n = p / s.out_channels;
+                  const int64_t oc = p % s.out_channels;
+                  const int64_t c = oc / multiplier;
+                  plane_fn(s,
+                           in + (n * s.in_channels + c) * s.in_size(),
+                           filter + oc * s.kernel_size(),
+                           out + p * s.out_size());
+                }
+              });
+}
+
+// Transform matrices of F(2x2, 3x3):
+//   U = G g G^T, V = B^T d B, Y = A^T (U . V) A.
+template <typename T>
+void WinogradFilterTransform(const T* g, T* u, int64_t stride) {
+  T t[4][3];
+  for (int j = 0; j < 3; ++j) {
+    const T g0 = g[j], g1 = g[3 + j], g2 = g[6 + j];
+    t[0][j] = g0;
+    t[1][j] = T(0.5) * (g0 + g1 + g2);
+    t[2][j] = T(0.5) * (g0 - g1 + g2);
+    t[3][j] = g2;
+  }
+  for (int i = 0; i < 4; ++i) {
+    const T a = t[i][0], b = t[i][1], c = t[i][2];
+    u[(i * 4 + 0) * stride] = a;
+    u[(i * 4 + 1) * stride] = T(0.5) * (a + b + c);
+    u[(i * 4 + 2) * stride] = T(0.5) * (a - b + c);
+    u[(i * 4 + 3) * stride] = c;
+  }
+}
+
+template <typename T>
+void WinogradInputTransform(const T d[4][4], T* v, int64_t stride) {
+  T t[4][4];
+  for (int j = 0; j < 4; ++j) {
+    t[0][j] = d[0][j] - d[2][j];
+    t[1][j] = d[1][j] + d[2][j];
+    t[2][j] = d[2][j] - d[1][j];
+    t[3][j] = d[1][j] - d[3][j];
+  }
+  for (int i = 0; i < 4; ++i) {
+    v[(i * 4 + 0) * stride] = t[i][0] - t[i][2];
+    v[(i * 4 + 1) * stride] = t[i][1] + t[i][2];
+    v[(i * 4 + 2) * stride] = t[i][2] - t[i][1];
+    v[(i * 4 + 3) * stride] = t[i][1] - t[i][3];
+  }
+}
+
+template <typename T>
+void WinogradOutputTransform(const T* m, int64_t stride, T y[2][2]) {
+  T t[2][4];
+  for (int j = 0; j < 4; ++j) {
+    const T m0 = m[j * stride], m1 = m[(4 + j) * stride];
+    const T m2 = m[(8 + j) * stride], m3 = m[(12 + j) * stride];
+    t[0][j] = m0 + m1 + m2;
+    t[1][j] = m1 - m2 - m3;
+  }
+  for (int i = 0; i < 2; ++i) {
+    y[i][0] = t[i][0] + t[i][1] + t[i][2];
+    y[i][1] = t[i][1] - t[i][2] - t[i][3];
+  }
+}
+
+constexpr int64_t kWinogradSkew = 16;
+
+template <typename T>
+void ConvWinograd(const ConvShape& s, const T* in, const T* filter, T* out) {
+  const int64_t icg = s.in_channels_per_group();
+  const int64_t ocg = s.out_channels_per_group();
+  const int64_t tiles_h = (s.out_h + 1) / 2;
+  const int64_t tiles_w = (s.out_w + 1) / 2;
+  const int64_t tiles_image = tiles_h * tiles_w;
+  const int64_t num_tiles = s.batch * tiles_image;
+
+  // [group][16][ocg][icg]
+  ConvBuffer<T, 1> u_buffer(s.groups * 16 * ocg * icg);
+  T* u = u_buffer.data();
+  ParallelFor(
+      0, s.out_channels * icg, GrainSize(64), [&](int64_t begin, int64_t end) {
+        for (int64_t p = begin; p < end; ++p) {
+          const int64_t oc = p / icg;
+          const int64_t ic = p % icg;
+          const int64_t g = oc / ocg;
+          WinogradFilterTransform(
+              filter + p * 9,
+              u + g * 16 * ocg * icg + (oc % ocg) * icg + ic,
+              ocg * icg);
+        }
+      });
+
+  // Tiles per block, so that the transformed tiles of a block stay in L2.
+  const int64_t block =
+      std::min(num_tiles, std::max<int64_t>(16, (1 << 14) / (icg + ocg)));
+  const int64_t num_blocks = (num_tiles + block - 1) / block;
+  ParallelFor(0, num_blocks, 1, [&](int64_t begin, int64_t end) {
+    // The 16 matrices are a cache line apart beyond their size, so that the
+    // transforms do not stream to 16 addresses in the same cache set.
+    const int64_t v_stride = icg * block + kWinogradSkew;
+    const int64_t m_stride = ocg * block + kWinogradSkew;
+    ConvBuffer<T, 2> v_buffer(16 * v_stride);
+    ConvBuffer<T, 3> m_buffer(16 * m_stride);
+    T* v = v_buffer.data();
+    T* m = m_buffer.data();
+    // Image and top-left output position of every tile of a block.
+    ConvBuffer<int64_t, 0> tiles_buffer(3 * block);
+    int64_t* tiles = tiles_buffer.data();
+    for (int64_t b = begin; b < end; ++b) {
+      const int64_t t0 = b * block;
+      const int64_t nt = std::min(block, num_tiles - t0);
+      for (int64_t t = 0; t < nt; ++t) {
+        tiles[3 * t] = (t0 + t) / tiles_image;
+        tiles[3 * t + 1] = (t0 + t) % tiles_image / tiles_w * 2;
+        tiles[3 * t + 2] = (t0 + t) % tiles_w * 2;
+      }
+      for (int64_t g = 0; g < s.groups; ++g) {
+        // v = [16][icg][nt], written tile by tile so that each of the 16
+        // rows is filled sequentially.
+        for (int64_t ic = 0; ic < icg; ++ic) {
+          for (int64_t t = 0; t < nt; ++t) {
+            const int64_t n = tiles[3 * t];
+            const int64_t ih0 = tiles[3 * t + 1] - s.pad_h;
+            const int64_t iw0 = tiles[3 * t + 2] - s.pad_w;
+            const T* x = in + (n * s.in_channels + g * icg + ic) * s.in_size();
+            T d[4][4];
+            if (ih0 >= 0 && iw0 >= 0 && ih0 + 4 <= s.in_h &&
+                iw0 + 4 <= s.in_w) {
+              for (int i = 0; i < 4; ++i) {
+                for (int j = 0; j < 4; ++j) {
+                  d[i][j] = x[(ih0 + i) * s.in_w + iw0 + j];
+                }
+              }
+            } else {
+              for (int i = 0; i < 4; ++i) {
+                for (int j = 0; j < 4; ++j) {
+                  const int64_t ih = ih0 + i, iw = iw0 + j;
+                  d[i][j] = ih >= 0 && ih < s.in_h && iw >= 0 && iw < s.in_w
+                                ? x[ih * s.in_w + iw]
+                                : T(0);
+                }
+              }
+            }
+            WinogradInputTransform(d, v + ic * nt + t, v_stride);
+          }
+        }
+        BatchedGemm<T>(16,
+                       ocg,
+                       nt,
+                       icg,
+                       1.0f,
+                       {u + g * 16 * ocg * icg, icg, 1},
+                       ocg * icg,
+                       {v, nt, 1},
+                       v_stride,
+                       false,
+                       {m, nt, 1},
+                       m_stride);
+        for (int64_t oc = 0; oc < ocg; ++oc) {
+          for (int64_t t = 0; t < nt; ++t) {
+            const int64_t n = tiles[3 * t];
+            const int64_t oh0 = tiles[3 * t + 1];
+            const int64_t ow0 = tiles[3 * t + 2];
+            T y[2][2];
+            WinogradOutputTransform(m + oc * nt + t, m_stride, y);
+            T* dst = out + (n * s.out_channels + g * ocg + oc) * s.out_size() +
+                     oh0 * s.out_w + ow0;
+            if (oh0 + 2 <= s.out_h && ow0 + 2 <= s.out_w) {
+              dst[0] = y[0][0];
+              dst[1] = y[0][1];
+              dst[s.out_w] = y[1][0];
+              dst[s.out_w + 1] = y[1][1];
+            } else {
+              const int64_t rows = std::min<int64_t>(2, s.out_h - oh0);
+              const int64_t cols = std::min<int64_t>(2, s.out_w - ow0);
+              for (int64_t i = 0; i < rows; ++i) {
+                for (int64_t j = 0; j < cols; ++j) {
+                  dst[i * s.out_w + j] = y[i][j];
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  });
+}
+
+template <typename T>
+void RunConvForward(ConvAlgorithm algo,
+                    const ConvShape& s,
+                    const T* in,
+                    const T* filter,
+                    T* out) {
+  switch (algo) {
+    case ConvAlgorithm::kDirect:
+      ConvDirect(s, in, filter, out);
+      break;
+    case ConvAlgorithm::kWinograd:
+      ConvWinograd(s, in, filter, out);
+      break;
+    case ConvAlgorithm::kDepthwise:
+      ConvDepthwise(s, in, filter, out);
+      break;
+    default:
+      ConvIm2ColGemm(s, in, filter, out);
+      break;
+  }
+}
+
+// Runs every algorithm that supports the shape once and returns the fastest.
+template <typename T>
+ConvAlgorithm TuneConvAlgorithm(const ConvShape& s,
+                                const T* in,
+                                const T* filter,
+                                T* out) {
+  ConvAlgorithm best = ChooseConvAlgorithm(s);
+  double best_time = -1;
+  for (auto algo : {ConvAlgorithm::kIm2ColGemm,
+                    ConvAlgorithm::kDirect,
+                    ConvAlgorithm::kWinograd,
+                    ConvAlgorithm::kDepthwise}) {
+    if (!ConvAlgorithmSupported(s, algo)) {
+      continue;
+    }
+    const auto start = std::chrono::steady_clock::now();
+    RunConvForward(algo, s, in, filter, out);
+    const double time =
+        std::chrono::duration<double>(std::chrono::steady_clock::now() - start)
+            .count();
+    if (best_time < 0 || time < best_time) {
+      best = algo;
+      best_time = time;
+    }
+  }
+  return best;
+}
+
+}  // namespace detail
+
+// out = conv2d(in, filter) with the algorithm cached for the shape.
+template <typename T>
+void ConvForward(const ConvShape& s, const T* in, const T* filter, T* out) {
+  if (s.batch == 0 || s.out_channels == 0 || s.out_size() == 0) {
+    return;
+  }
+  ConvAlgorithm algo;
+  if (!FindConvAlgorithm(s, sizeof(T), &algo)) {
+    algo = ConvAutotuneEnabled() ? detail::TuneConvAlgorithm(s, in, filter, out)
+                                 : ChooseConvAlgorithm(s);
+    CacheConvAlgorithm(s, sizeof(T), algo);
+  }
+  detail::RunConvForward(algo, s, in, filter, out);
+}
+
+// in_grad = the gradient of conv2d with respect to its input.
+template <typename T>
+void ConvBackwardData(const ConvShape& s,
+                      const T* filter,
+                      const T* out_grad,
+                      T* in_grad) {
+  const int64_t in_image = s.in_channels * s.in_size();
+  const int64_t out_image = s.out_channels * s.out_size();
+  if (s.out_channels == 0 || s.out_size() == 0) {
+    std::fill(in_grad, in_grad + s.batch * in_image, T(0));
+    return;
+  }
+
+  if (s.in_channels_per_group() == 1) {
+    const int64_t multiplier = s.out_channels_per_group();
+    ParallelFor(0,
+                s.batch * s.in_channels,
+                GrainSize(multiplier * s.kernel_size() * s.out_size()),
+                [&](int64_t begin, int64_t end) {
+                  for (int64_t p = begin; p < end; ++p) {
+                    T* dx = in_grad + p * s.in_size();
+                    std::fill(dx, dx + s.in_size(), T(0));
+                    for (int64_t m = 0; m < multiplier; ++m) {
+                      const int64_t q = p * multiplier + m;
+                      const T* dy = out_grad + q * s.out_size();
+                      const T* w =
+                          filter + q % s.out_channels * s.kernel_size();
+                      for (int64_t oh = 0; oh < s.out_h; ++oh) {
+                        for (int64_t ki = 0; ki < s.kernel_h; ++ki) {
+                          const int64_t ih =
+                              oh * s.stride_h - s.pad_h + ki * s.dilation_h;
+                          if (ih < 0 || ih >= s.in_h) {
+                            continue;
+                          }
+                          for (int64_t kj = 0; kj < s.kernel_w; ++kj) {
+                            const T wv = w[ki * s.kernel_w + kj];
+                            const int64_t offset = kj * s.dilation_w - s.pad_w;
+                            int64_t lo, hi;
+                            detail::ValidOutputRange(
+                                offset, s.stride_w, s.in_w, s.out_w, &lo, &hi);
+                            T* row = dx + ih * s.in_w + offset;
+                            const T* g = dy + oh * s.out_w;
+                            for (int64_t o = lo; o < hi; ++o) {
+                              row[o * s.stride_w] += wv * g[o];
+                            }
+                          }
+                        }
+                      }
+                    }
+                  }
+                });
+    return;
+  }
+
+  const int64_t icg = s.in_channels_per_group();
+  const int64_t ocg = s.out_channels_per_group();
+  const int64_t col_rows = s.col_rows();
+  if (detail::IsPointwise(s)) {
+    for (int64_t g = 0; g < s.groups; ++g) {
+      BatchedGemm<T>(s.batch,
+                     icg,
+                     s.in_size(),
+                     ocg,
+                     1.0f,
+                     {filter + g * ocg * icg, 1, icg},
+                     0,
+                     {out_grad + g * ocg * s.out_size(), s.out_size(), 1},
+                     out_image,
+                     false,
+                     {in_grad + g * icg * s.in_size(), s.in_size(), 1},
+                     in_image);
+    }
+    return;
+  }
+
+  const int64_t col_image = s.groups * col_rows * s.out_size();
+  const int64_t chunk = detail::ImagesPerChunk(col_image, s.batch);
+  detail::ConvBuffer<T, 0> col_buffer(chunk * col_image);
+  T* col = col_buffer.data();
+  for (int64_t n0 = 0; n0 < s.batch; n0 += chunk) {
+    const int64_t num_images = std::min(chunk, s.batch - n0);
+    for (int64_t g = 0; g < s.groups; ++g) {
+      BatchedGemm<T>(
+          num_images,
+          col_rows,
+          s.out_size(),
+          ocg,
+          1.0f,
+          {filter + g * ocg * col_rows, 1, col_rows},
+          0,
+          {out_grad + n0 * out_image + g * ocg * s.out_size(), s.out_size(), 1},
+          out_image,
+          false,
+          {col + g * col_rows * s.out_size(), s.out_size(), 1},
+          col_image);
+    }
+    detail::Col2Im(s, col, num_images, in_grad + n0 * in_image);
+  }
+}
+
+// filter_grad = the gradient of conv2d with respect to its filter.
+template <typename T>
+void ConvBackwardFilter(const ConvShape& s,
+                        const T* in,
+                        const T* out_grad,
+                        T* filter_grad) {
+  const int64_t col_rows = s.col_rows();
+  const int64_t in_image = s.in_channels * s.in_size();
+  const int64_t out_image = s.out_channels * s.out_size();
+  if (s.batch == 0 || s.out_size() == 0) {
+    std::fill(filter_grad, filter_grad + s.out_channels * col_rows, T(0));
+    return;
+  }
+
+  if (s.in_channels_per_group() == 1) {
+    const int64_t multiplier = s.out_channels_per_group();
+    ParallelFor(0,
+                s.out_channels * s.kernel_size(),
+                GrainSize(s.batch * s.out_size()),
+                [&](int64_t begin, int64_t end) {
+                  for (int64_t p = begin; p < end; ++p) {
+                    const int64_t oc = p / s.kernel_size();
+                    const int64_t ki = p % s.kernel_size() / s.kernel_w;
+                    const int64_t kj = p % s.kernel_w;
+                    const int64_t offset = kj * s.dilation_w - s.pad_w;
+                    int64_t lo, hi;
+                    detail::ValidOutputRange(
+                        offset, s.stride_w, s.in_w, s.out_w, &lo, &hi);
+                    T sum = 0;
+                    for (int64_t n = 0; n < s.batch; ++n) {
+                      const T* x = in + (n * s.in_channels + oc / multiplier) *
+                                            s.in_size();
+                      const T* dy =
+                          out_grad + (n * s.out_channels + oc) * s.out_size();
+                      for (int64_t oh = 0; oh < s.out_h; ++oh) {
+                        const int64_t ih =
+                            oh * s.stride_h - s.pad_h + ki * s.dilation_h;
+                        if (ih < 0 || ih >= s.in_h) {
+                          continue;
+                        }
+                        const T* row = x + ih * s.in_w + offset;
+                        const T* g = dy + oh * s.out_w;
+                        for (int64_t o = lo; o < hi; ++o) {
+                          sum += g[o] * row[o * s.stride_w];
+                        }
+                      }
+                    }
+                    filter_grad[p] = sum;
+                  }
+                });
+    return;
+  }
+
+  const int64_t ocg = s.out_channels_per_group();
+  const bool pointwise = detail::IsPointwise(s);
+  const int64_t col_image = s.groups * col_rows * s.out_size();
+  const int64_t chunk =
+      pointwise ? s.batch : detail::ImagesPerChunk(col_image, s.batch);
+  detail::ConvBuffer<T, 0> col_buffer(pointwise ? 0 : chunk * col_image);
+  T* col = pointwise ? nullptr : col_buffer.data();
+  for (int64_t n0 = 0; n0 < s.batch; n0 += chunk) {
+    const int64_t num_images = std::min(chunk, s.batch - n0);
+    const T* cols = in + n0 * in_image;
+    int64_t cols_stride = in_image;
+    if (!pointwise) {
+      detail::Im2Col(s, cols, num_images, col);
+      cols = col;
+      cols_stride = col_image;
+    }
+    for (int64_t g = 0; g < s.groups; ++g) {
+      BatchedGemm<T>(
+          num_images,
+          ocg,
+          col_rows,
+          s.out_size(),
+          1.0f,
+          {out_grad + n0 * out_image + g * ocg * s.out_size(), s.out_size(), 1},
+          out_image,
+          {cols + g * col_rows * s.out_size(), 1, s.out_size()},
+          cols_stride,
+          n0 > 0,
+          {filter_grad + g * ocg * col_rows, col_rows, 1},
+          0);
+    }
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,64 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include "kernels/funcs/broadcast.h"
+#include "kernels/funcs/reduce.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// out = func(x, y) with Paddle's elementwise broadcasting rules. Broadcast
+// operands are read through zero strides instead of being expanded first.
+template <typename InT, typename OutT, typename Functor>
+void ElementwiseCompute(const phi::Context& dev_ctx,
+                        const phi::DenseTensor& x,
+                        const phi::DenseTensor& y,
+                        int axis,
+                        Functor func,
+                        phi::DenseTensor* out) {
+  auto x_dims = x.dims();
+  auto y_dims = y.dims();
+  auto out_dims = phi::BroadcastDims(axis, x_dims, y_dims);
+  auto out_data = dev_ctx.template Alloc<OutT>(out);
+  auto bc = MakeBinaryBroadcast(x_dims, y_dims, out_dims, axis);
+  BroadcastBinary(x.data<InT>(), y.data<InT>(), out_data, bc, func);
+}
+
+// Gradient of an operand that was broadcast into dout: dout summed over the
+// dimensions the operand was broadcast along, in the operand's shape.
+template <typename T>
+void ElementwiseGradReduce(const phi::Context& dev_ctx,
+                           const phi::DenseTensor& dout,
+                           const std::vector<int64_t>& in_dims,
+                           int axis,
+                           phi::DenseTensor* din) {
+  auto out_dims = dout.dims();
+  auto din_data = dev_ctx.template Alloc<T>(din);
+  auto strides = detail::BroadcastStrides(in_dims, out_dims, axis);
+  std::vector<int64_t> reduce_dims;
+  for (size_t i = 0; i < out_dims.size(); ++i) {
+    if (strides[i] == 0 && out_dims[i] != 1) {
+      reduce_dims.push_back(i);
+    }
+  }
+  using AccT = typename ReduceAccType<T>::type;
+  Reduce(dout.data<T>(), out_dims, reduce_dims, SumReducer<AccT>(), din_data);
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
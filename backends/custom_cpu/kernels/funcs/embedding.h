@@ -0,0 +1,129 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <type_traits>
+#include <utility>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// padding_idx value meaning that no id is padding.
+constexpr int64_t kNoPadding = -1;
+
+// Whether id is the padding row. With kNoPadding no id is, not even -1.
+inline bool IsPaddingId(int64_t id, int64_t padding_idx) {
+  return padding_idx != kNoPadding && id == padding_idx;
+}
+
+// Index of the first id outside [0, rows) that is not padding_idx, or -1.
+template <typename IndexT>
+int64_t FindInvalidId(const IndexT* ids,
+                      int64_t num_ids,
+                      int64_t rows,
+                      int64_t padding_idx) {
+  for (int64_t i = 0; i < num_ids; ++i) {
+    const int64_t id = static_cast<int64_t>(ids[i]);
+    if ((id < 0 || id >= rows) && !IsPaddingId(id, padding_idx)) {
+      return i;
+    }
+  }
+  return -1;
+}
+
+// Gathers out[i, :] = table[ids[i], :] for the width-wide rows of the table,
+// with zero rows for padding_idx. Every id must be valid.
+template <typename T, typename IndexT>
+void EmbeddingForward(const T* table,
+                      int64_t width,
+                      const IndexT* ids,
+                      int64_t num_ids,
+                      int64_t padding_idx,
+                      T* out) {
+  ParallelFor(0, num_ids, GrainSize(width), [&](int64_t begin, int64_t end) {
+    for (int64_t i = begin; i < end; ++i) {
+      const int64_t id = static_cast<int64_t>(ids[i]);
+      T* dst = out + i * width;
+      if (IsPaddingId(id, padding_idx)) {
+        std::fill(dst, dst + width, static_cast<T>(0));
+      } else {
+        std::memcpy(dst, table + id * width, width * sizeof(T));
+      }
+    }
+  });
+}
+
+// Scatter-adds the rows of out_grad into the rows-by-width table gradient:
+// table_grad[ids[i], :] += out_grad[i, :], with zero gradient for padding_idx
+// and for rows no id refers to.
+//
+// The (id, position) pairs are sorted once, so the rows of one id are merged
+// in position order and the result does not depend on the thread count.
+// Every task owns a contiguous range of table rows, which it zeroes and
+// accumulates into, so each row of the gradient is written by one thread
+// and touched once.
+template <typename T, typename IndexT>
+void EmbeddingBackward(const IndexT* ids,
+                       int64_t num_ids,
+                       const T* out_grad,
+                       int64_t rows,
+                       int64_t width,
+                       int64_t padding_idx,
+                       T* table_grad) {
+  using AccT =
+      typename std::conditional<std::is_arithmetic<T>::value, T, float>::type;
+  std::vector<std::pair<int64_t, int64_t>> order;
+  order.reserve(num_ids);
+  for (int64_t i = 0; i < num_ids; ++i) {
+    const int64_t id = static_cast<int64_t>(ids[i]);
+    if (!IsPaddingId(id, padding_idx)) {
+      order.emplace_back(id, i);
+    }
+  }
+  std::sort(order.begin(), order.end());
+
+  ParallelFor(0, rows, GrainSize(width), [&](int64_t begin, int64_t end) {
+    std::fill(table_grad + begin * width,
+              table_grad + end * width,
+              static_cast<T>(0));
+    auto it = std::lower_bound(order.begin(),
+                               order.end(),
+                               std::make_pair(begin, static_cast<int64_t>(0)));
+    std::vector<AccT> acc(width);
+    while (it != order.end() && it->first < end) {
+      const int64_t id = it->first;
+      std::fill(acc.begin(), acc.end(), static_cast<AccT>(0));
+      for (; it != order.end() && it->first == id; ++it) {
+        const T* src = out_grad + it->second * width;
+        for (int64_t j = 0; j < width; ++j) {
+          acc[j] += static_cast<AccT>(src[j]);
+        }
+      }
+      T* dst = table_grad + id * width;
+      for (int64_t j = 0; j < width; ++j) {
+        dst[j] = static_cast<T>(acc[j]);
+      }
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,556 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <type_traits>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+// Blocked GEMM engine in the style of GotoBLAS/BLIS:
+//
+//   for jc in N step NC                  (B column block)
+//     for pc in K step KC                (shared K block, B packed once)
+//       for ic in M step MC  [parallel]  (A row block, packed per thread)
+//         for jr in NC step NR
+//           for ir in MC step MR         (MR x NR register tile)
+//
+// Operands are described by a base pointer plus a row and a column stride,
+// so transposed inputs and transposed outputs are handled by the packing and
+// write-back routines without any extra copies. Packed panels are stored in
+// the accumulation type (float for float16/bfloat16), which keeps the
+// micro-kernel free of conversions.
+//
+// The micro-kernel is written with GCC vector extensions and compiled for
+// several instruction sets (AVX-512, AVX2+FMA and the baseline, which is NEON
+// on aarch64); the variant is picked once at runtime from the host CPU.
+
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+#define CUSTOM_CPU_GEMM_X86 1
+#endif
+
+#if defined(__GNUC__)
+#define CUSTOM_CPU_ALWAYS_INLINE inline __attribute__((always_inline))
+#else
+#define CUSTOM_CPU_ALWAYS_INLINE inline
+#endif
+
+namespace custom_kernel {
+namespace funcs {
+
+template <typename T>
+struct GemmAccType {
+  using type = typename std::
+      conditional<std::is_same<T, double>::value, double, float>::type;
+};
+
+template <typename AccT>
+struct GemmBlocking {
+  // Register tile: MR rows of one 64-byte line of B.
+  static constexpr int64_t MR = 6;
+  static constexpr int64_t NR = 64 / sizeof(AccT);
+  // Cache blocks: A block (MC x KC) stays in L2, B panel (KC x NR) in L1.
+  static constexpr int64_t MC = 96;
+  static constexpr int64_t KC = 256;
+  static constexpr int64_t NC = 2048;
+};
+
+// Problems below this many multiply-adds skip packing altogether.
+constexpr int64_t kGemmSmallProblem = 32 * 32 * 32;
+
+// Columns of C finished per epilogue call; a multiple of every NR.
+constexpr int64_t kGemmEpilogueCols = 256;
+
+template <typename T>
+struct StridedMatrix {
+  T* data;
+  int64_t row_stride;
+  int64_t col_stride;
+
+  T& operator()(int64_t r, int64_t c) const {
+    return data[r * row_stride + c * col_stride];
+  }
+};
+
+namespace detail {
+
+enum class GemmIsa { kBase, kAVX2, kAVX512 };
+
+inline GemmIsa DetectGemmIsa() {
+#ifdef CUSTOM_CPU_GEMM_X86
+  __builtin_cpu_init();
+  if (__builtin_cpu_supports("avx512f")) {
+    return GemmIsa::kAVX512;
+  }
+  if (__builtin_cpu_supports("avx2") && __builtin_cpu_supports("fma")) {
+    return GemmIsa::kAVX2;
+  }
+#endif
+  return GemmIsa::kBase;
+}
+
+inline GemmIsa HostGemmIsa() {
+  static const GemmIsa isa = DetectGemmIsa();
+  return isa;
+}
+
+// Thread-local scratch used for packed panels; Slot distinguishes the A and
+// B buffers of one thread.
+template <typename AccT, int Slot>
+AccT* PackBuffer(int64_t size) {
+  thread_local std::vector<AccT> buffer;
+  if (static_cast<int64_t>(buffer.size()) < size) {
+    buffer.resize(size);
+  }
+  return buffer.data();
+}
+
+// Packs an mc x kc block of A into MR-row panels laid out as
+// [panel][k][MR], zero padding the last panel and folding in alpha.
+template <typename T, typename AccT>
+void PackA(StridedMatrix<const T> a,
+           int64_t mc,
+           int64_t kc,
+           AccT alpha,
+           AccT* packed) {
+  constexpr int64_t MR = GemmBlocking<AccT>::MR;
+  for (int64_t ir = 0; ir < mc; ir += MR) {
+    const int64_t mr = std::min(MR, mc - ir);
+    AccT* dst = packed + ir * kc;
+    if (a.row_stride == 1) {
+      for (int64_t k = 0; k < kc; ++k) {
+        const T* src = &a(ir, k);
+        int64_t i = 0;
+        for (; i < mr; ++i) dst[k * MR + i] = alpha * static_cast<AccT>(src[i]);
+        for (; i < MR; ++i) dst[k * MR + i] = AccT(0);
+      }
+    } else {
+      for (int64_t i = 0; i < mr; ++i) {
+        const T* src = &a(ir + i, 0);
+        for (int64_t k = 0; k < kc; ++k) {
+          dst[k * MR + i] = alpha * static_cast<AccT>(src[k * a.col_stride]);
+        }
+      }
+      for (int64_t i = mr; i < MR; ++i) {
+        for (int64_t k = 0; k < kc; ++k) dst[k * MR + i] = AccT(0);
+      }
+    }
+  }
+}
+
+// Packs the NR-column panels [panel_begin, panel_end) of a kc x nc block of
+// B, laid out as [panel][k][NR] with zero padding.
+template <typename T, typename AccT>
+void PackB(StridedMatrix<const T> b,
+           int64_t nc,
+           int64_t kc,
+           int64_t panel_begin,
+           int64_t panel_end,
+           AccT* packed) {
+  constexpr int64_t NR = GemmBlocking<AccT>::NR;
+  for (int64_t p = panel_begin; p < panel_end; ++p) {
+    const int64_t jr = p * NR;
+    const int64_t nr = std::min(NR, nc - jr);
+    AccT* dst = packed + jr * kc;
+    if (b.col_stride == 1) {
+      for (int64_t k = 0; k < kc; ++k) {
+        const T* src = &b(k, jr);
+        int64_t j = 0;
+        for (; j < nr; ++j) dst[k * NR + j] = static_cast<AccT>(src[j]);
+        for (; j < NR; ++j) dst[k * NR + j] = AccT(0);
+      }
+    } else {
+      for (int64_t j = 0; j < nr; ++j) {
+        const T* src = &b(0, jr + j);
+        for (int64_t k = 0; k < kc; ++k) {
+          dst[k * NR + j] = static_cast<AccT>(src[k * b.row_stride]);
+        }
+      }
+      for (int64_t j = nr; j < NR; ++j) {
+        for (int64_t k = 0; k < kc; ++k) dst[k * NR + j] = AccT(0);
+      }
+    }
+  }
+}
+
+// MR x NR register tile: acc = packed_a * packed_b over kc steps. VecBytes is
+// the SIMD width the tile is split into.
+template <typename AccT, int VecBytes>
+CUSTOM_CPU_ALWAYS_INLINE void MicroKernel(int64_t kc,
+                                          const AccT* pa,
+                                          const AccT* pb,
+                                          AccT* acc) {
+  constexpr int MR = GemmBlocking<AccT>::MR;
+  constexpr int NR = GemmBlocking<AccT>::NR;
+  constexpr int kLanes = VecBytes / sizeof(AccT);
+  constexpr int kVecs = NR / kLanes;
+  typedef AccT Vec __attribute__((vector_size(VecBytes)));
+
+  Vec c[MR][kVecs];
+  for (int i = 0; i < MR; ++i) {
+    for (int v = 0; v < kVecs; ++v) {
+      c[i][v] = Vec{};
+    }
+  }
+  for (int64_t k = 0; k < kc; ++k) {
+    Vec b[kVecs];
+    for (int v = 0; v < kVecs; ++v) {
+      std::memcpy(&b[v], pb + k * NR + v * kLanes, VecBytes);
+    }
+    for (int i = 0; i < MR; ++i) {
+      const AccT a = pa[k * MR + i];
+      for (int v = 0; v < kVecs; ++v) {
+        c[i][v] += a * b[v];
+      }
+    }
+  }
+  for (int i = 0; i < MR; ++i) {
+    for (int v = 0; v < kVecs; ++v) {
+      std::memcpy(acc + i * NR + v * kLanes, &c[i][v], VecBytes);
+    }
+  }
+}
+
+// Runs all register tiles of an mc x [jr_begin, jr_end) block and writes them
+// back through the strides of C.
+template <typename T, typename AccT, int VecBytes>
+CUSTOM_CPU_ALWAYS_INLINE void MacroKernelImpl(int64_t mc,
+                                              int64_t nc,
+                                              int64_t kc,
+                                              int64_t jr_begin,
+                                              int64_t jr_end,
+                                              const AccT* pa,
+                                              const AccT* pb,
+                                              bool accumulate,
+                                              StridedMatrix<T> c) {
+  constexpr int64_t MR = GemmBlocking<AccT>::MR;
+  constexpr int64_t NR = GemmBlocking<AccT>::NR;
+  alignas(64) AccT acc[MR * NR];
+  for (int64_t jr = jr_begin; jr < jr_end; jr += NR) {
+    const int64_t nr = std::min(NR, nc - jr);
+    for (int64_t ir = 0; ir < mc; ir += MR) {
+      const int64_t mr = std::min(MR, mc - ir);
+      MicroKernel<AccT, VecBytes>(kc, pa + ir * kc, pb + jr * kc, acc);
+      for (int64_t i = 0; i < mr; ++i) {
+        T* dst = &c(ir + i, jr);
+        const AccT* src = acc + i * NR;
+        if (accumulate) {
+          for (int64_t j = 0; j < nr; ++j) {
+            dst[j * c.col_stride] = static_cast<T>(
+                static_cast<AccT>(dst[j * c.col_stride]) + src[j]);
+          }
+        } else {
+          for (int64_t j = 0; j < nr; ++j) {
+            dst[j * c.col_stride] = static_cast<T>(src[j]);
+          }
+        }
+      }
+    }
+  }
+}
+
+#define CUSTOM_CPU_GEMM_MACRO_KERNEL_ARGS                               \
+  int64_t mc, int64_t nc, int64_t kc, int64_t jr_begin, int64_t jr_end, \
+      const AccT *pa, const AccT *pb, bool accumulate, StridedMatrix<T> c
+#define CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS \
+  mc, nc, kc, jr_begin, jr_end, pa, pb, accumulate, c
+
+template <typename T, typename AccT>
+void MacroKernelBase(CUSTOM_CPU_GEMM_MACRO_KERNEL_ARGS) {
+  MacroKernelImpl<T, AccT, 16>(CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS);
+}
+
+#ifdef CUSTOM_CPU_GEMM_X86
+template <typename T, typename AccT>
+__attribute__((target("avx2,fma"))) void MacroKernelAVX2(
+    CUSTOM_CPU_GEMM_MACRO_KERNEL_ARGS) {
+  MacroKernelImpl<T, AccT, 32>(CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS);
+}
+
+template <typename T, typename AccT>
+__attribute__((target("avx512f,fma"))) void MacroKernelAVX512(
+    CUSTOM_CPU_GEMM_MACRO_KERNEL_ARGS) {
+  MacroKernelImpl<T, AccT, 64>(CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS);
+}
+#endif
+
+template <typename T, typename AccT>
+void MacroKernel(CUSTOM_CPU_GEMM_MACRO_KERNEL_ARGS) {
+#ifdef CUSTOM_CPU_GEMM_X86
+  switch (HostGemmIsa()) {
+    case GemmIsa::kAVX512:
+      return MacroKernelAVX512<T, AccT>(CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS);
+    case GemmIsa::kAVX2:
+      return MacroKernelAVX2<T, AccT>(CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS);
+    default:
+      break;
+  }
+#endif
+  MacroKernelBase<T, AccT>(CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS);
+}
+
+#undef CUSTOM_CPU_GEMM_MACRO_KERNEL_ARGS
+#undef CUSTOM_CPU_GEMM_MACRO_KERNEL_PARAMS
+
+// Unpacked kernel for tiny problems, where packing costs more than it saves.
+template <typename T, typename AccT>
+void SmallGemm(int64_t M,
+               int64_t N,
+               int64_t K,
+               AccT alpha,
+               StridedMatrix<const T> a,
+               StridedMatrix<const T> b,
+               bool accumulate,
+               StridedMatrix<T> c) {
+  for (int64_t m = 0; m < M; ++m) {
+    for (int64_t n = 0; n < N; ++n) {
+      AccT sum = 0;
+      for (int64_t k = 0; k < K; ++k) {
+        sum += static_cast<AccT>(a(m, k)) * static_cast<AccT>(b(k, n));
+      }
+      sum *= alpha;
+      c(m, n) = accumulate ? static_cast<T>(static_cast<AccT>(c(m, n)) + sum)
+                           : static_cast<T>(sum);
+    }
+  }
+}
+
+// Matrix-vector shaped problems (M == 1) are bound by reading B, so they
+// stream it directly instead of packing.
+template <typename T, typename AccT>
+void GemvRow(int64_t N,
+             int64_t K,
+             AccT alpha,
+             StridedMatrix<const T> a,
+             StridedMatrix<const T> b,
+             bool accumulate,
+             StridedMatrix<T> c) {
+  auto store = [&](int64_t n, AccT sum) {
+    sum *= alpha;
+    c(0, n) = accumulate ? static_cast<T>(static_cast<AccT>(c(0, n)) + sum)
+                         : static_cast<T>(sum);
+  };
+  constexpr int64_t kChunk = 1024;
+  if (b.col_stride == 1) {
+    ParallelFor(0, N, kChunk, [&](int64_t begin, int64_t end) {
+      AccT acc[kChunk];
+      for (int64_t n0 = begin; n0 < end; n0 += kChunk) {
+        const int64_t len = std::min(kChunk, end - n0);
+        std::fill(acc, acc + len, AccT(0));
+        for (int64_t k = 0; k < K; ++k) {
+          const AccT ak = static_cast<AccT>(a(0, k));
+          const T* row = &b(k, n0);
+          for (int64_t j = 0; j < len; ++j) {
+            acc[j] += ak * static_cast<AccT>(row[j]);
+          }
+        }
+        for (int64_t j = 0; j < len; ++j) store(n0 + j, acc[j]);
+      }
+    });
+  } else {
+    ParallelFor(0, N, 16, [&](int64_t begin, int64_t end) {
+      for (int64_t n = begin; n < end; ++n) {
+        const T* col = &b(0, n);
+        AccT sum = 0;
+        for (int64_t k = 0; k < K; ++k) {
+          sum += static_cast<AccT>(a(0, k)) *
+                 static_cast<AccT>(col[k * b.row_stride]);
+        }
+        store(n, sum);
+      }
+    });
+  }
+}
+
+}  // namespace detail
+
+// Epilogue of a plain GEMM.
+struct NoGemmEpilogue {
+  void operator()(int64_t, int64_t, int64_t, int64_t) const {}
+};
+
+// C = alpha * A * B (+ C when accumulate is set), where A is M x K, B is
+// K x N and C is M x N, each addressed through its own row/column strides.
+//
+// epilogue(row_begin, row_end, col_begin, col_end) is called once for every
+// block of C as soon as its last K block has been accumulated, from the
+// thread that wrote it, so element-wise work fused onto the product touches
+// the block while it is still in cache. The blocks partition C.
+template <typename T, typename Epilogue = NoGemmEpilogue>
+void Gemm(int64_t M,
+          int64_t N,
+          int64_t K,
+          float alpha,
+          StridedMatrix<const T> a,
+          StridedMatrix<const T> b,
+          bool accumulate,
+          StridedMatrix<T> c,
+          Epilogue epilogue = Epilogue()) {
+  using AccT = typename GemmAccType<T>::type;
+  using Blocking = GemmBlocking<AccT>;
+  constexpr int64_t MR = Blocking::MR;
+  constexpr int64_t NR = Blocking::NR;
+  constexpr int64_t MC = Blocking::MC;
+  constexpr int64_t KC = Blocking::KC;
+  constexpr int64_t NC = Blocking::NC;
+
+  if (M <= 0 || N <= 0) {
+    return;
+  }
+  if (K <= 0) {
+    if (!accumulate) {
+      for (int64_t m = 0; m < M; ++m) {
+        for (int64_t n = 0; n < N; ++n) c(m, n) = static_cast<T>(0);
+      }
+    }
+    epilogue(0, M, 0, N);
+    return;
+  }
+  if (M * N * K <= kGemmSmallProblem) {
+    detail::SmallGemm<T, AccT>(
+        M, N, K, static_cast<AccT>(alpha), a, b, accumulate, c);
+    epilogue(0, M, 0, N);
+    return;
+  }
+  if (M == 1) {
+    detail::GemvRow<T, AccT>(
+        N, K, static_cast<AccT>(alpha), a, b, accumulate, c);
+    epilogue(0, M, 0, N);
+    return;
+  }
+  if (N == 1) {
+    // C^T = B^T * A^T turns the column vector into a row vector.
+    StridedMatrix<const T> a_t{a.data, a.col_stride, a.row_stride};
+    StridedMatrix<const T> b_t{b.data, b.col_stride, b.row_stride};
+    StridedMatrix<T> c_t{c.data, c.col_stride, c.row_stride};
+    detail::GemvRow<T, AccT>(
+        M, K, static_cast<AccT>(alpha), b_t, a_t, accumulate, c_t);
+    epilogue(0, M, 0, N);
+    return;
+  }
+
+  const int num_threads =
+      ThreadPool::InParallelRegion() ? 1 : ThreadPool::Instance().NumThreads();
+  // Shrink the A block when there are fewer row blocks than threads, so that
+  // mid-sized problems still spread over the pool.
+  int64_t mc_block = MC;
+  if ((M + mc_block - 1) / mc_block < num_threads) {
+    mc_block = std::max<int64_t>(
+        MR, ((M + num_threads - 1) / num_threads + MR - 1) / MR * MR);
+  }
+  const int64_t m_blocks = (M + mc_block - 1) / mc_block;
+
+  for (int64_t jc = 0; jc < N; jc += NC) {
+    const int64_t nc = std::min(NC, N - jc);
+    const int64_t n_panels = (nc + NR - 1) / NR;
+    // Split the column panels too when the rows alone cannot keep every
+    // thread busy (e.g. matrix-vector shaped problems).
+    const int64_t n_parts = std::max<int64_t>(
+        1, std::min<int64_t>(n_panels, num_threads / m_blocks));
+    const int64_t panels_per_part = (n_panels + n_parts - 1) / n_parts;
+
+    for (int64_t pc = 0; pc < K; pc += KC) {
+      const int64_t kc = std::min(KC, K - pc);
+      const bool acc_block = accumulate || pc > 0;
+      AccT* pb = detail::PackBuffer<AccT, 1>(n_panels * NR * kc);
+      StridedMatrix<const T> b_block{&b(pc, jc), b.row_stride, b.col_stride};
+      ParallelFor(0, n_panels, 1, [&](int64_t begin, int64_t end) {
+        detail::PackB<T, AccT>(b_block, nc, kc, begin, end, pb);
+      });
+
+      ParallelFor(0, m_blocks * n_parts, 1, [&](int64_t begin, int64_t end) {
+        AccT* pa = detail::PackBuffer<AccT, 0>(mc_block * kc);
+        int64_t packed_block = -1;
+        for (int64_t task = begin; task < end; ++task) {
+          const int64_t mb = task / n_parts;
+          const int64_t part = task % n_parts;
+          const int64_t ic = mb * mc_block;
+          const int64_t mc = std::min(mc_block, M - ic);
+          const int64_t jr_begin = part * panels_per_part * NR;
+          const int64_t jr_end = std::min(nc, jr_begin + panels_per_part * NR);
+          if (jr_begin >= jr_end) {
+            continue;
+          }
+          if (packed_block != mb) {
+            StridedMatrix<const T> a_block{
+                &a(ic, pc), a.row_stride, a.col_stride};
+            detail::PackA<T, AccT>(
+                a_block, mc, kc, static_cast<AccT>(alpha), pa);
+            packed_block = mb;
+          }
+          StridedMatrix<T> c_block{&c(ic, jc), c.row_stride, c.col_stride};
+          // The last K block finishes the columns in slices, and each slice
+          // goes through the epilogue while it is still in L2.
+          const bool last_k = pc + kc == K;
+          const int64_t slice = last_k ? kGemmEpilogueCols : jr_end - jr_begin;
+          for (int64_t jr = jr_begin; jr < jr_end; jr += slice) {
+            const int64_t jr_stop = std::min(jr_end, jr + slice);
+            detail::MacroKernel<T, AccT>(
+                mc, nc, kc, jr, jr_stop, pa, pb, acc_block, c_block);
+            if (last_k) {
+              epilogue(ic, ic + mc, jc + jr, jc + jr_stop);
+            }
+          }
+        }
+      });
+    }
+  }
+}
+
+// Runs batch_size independent GEMMs whose operands are batch_stride_* apart.
+// A zero stride broadcasts that operand over the batch; a zero C stride sums
+// all products into the same output.
+template <typename T>
+void BatchedGemm(int64_t batch_size,
+                 int64_t M,
+                 int64_t N,
+                 int64_t K,
+                 float alpha,
+                 StridedMatrix<const T> a,
+                 int64_t batch_stride_a,
+                 StridedMatrix<const T> b,
+                 int64_t batch_stride_b,
+                 bool accumulate,
+                 StridedMatrix<T> c,
+                 int64_t batch_stride_c) {
+  auto run = [&](int64_t bs, bool acc) {
+    StridedMatrix<const T> a_bs{
+        a.data + bs * batch_stride_a, a.row_stride, a.col_stride};
+    StridedMatrix<const T> b_bs{
+        b.data + bs * batch_stride_b, b.row_stride, b.col_stride};
+    StridedMatrix<T> c_bs{
+        c.data + bs * batch_stride_c, c.row_stride, c.col_stride};
+    Gemm<T>(M, N, K, alpha, a_bs, b_bs, acc, c_bs);
+  };
+
+  const int num_threads = ThreadPool::Instance().NumThreads();
+  // Independent outputs and many small problems: one GEMM per thread.
+  if (batch_stride_c != 0 && batch_size >= num_threads &&
+      M * N * K <= 256 * 256 * 256) {
+    ParallelFor(0, batch_size, 1, [&](int64_t begin, int64_t end) {
+      for (int64_t bs = begin; bs < end; ++bs) run(bs, accumulate);
+    });
+    return;
+  }
+  for (int64_t bs = 0; bs < batch_size; ++bs) {
+    run(bs, accumulate || (batch_stride_c == 0 && bs > 0));
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,133 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cmath>
+#include <cstdint>
+#include <string>
+
+#include "kernels/funcs/gemm.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+enum class LinearActivation { kIdentity, kRelu, kGelu, kGeluTanh };
+
+// Maps the act_type attribute of fused_linear_act to the activation; returns
+// false for unknown names.
+inline bool ParseLinearActivation(const std::string& name,
+                                  LinearActivation* act) {
+  if (name == "identity" || name.empty()) {
+    *act = LinearActivation::kIdentity;
+  } else if (name == "relu") {
+    *act = LinearActivation::kRelu;
+  } else if (name == "gelu") {
+    *act = LinearActivation::kGelu;
+  } else if (name == "gelu_tanh") {
+    *act = LinearActivation::kGeluTanh;
+  } else {
+    return false;
+  }
+  return true;
+}
+
+namespace detail {
+
+template <LinearActivation Act, typename T>
+void BiasActRows(
+    int64_t rows, int64_t cols, const T* bias, T* out, int64_t out_stride) {
+  for (int64_t i = 0; i < rows; ++i) {
+    T* row = out + i * out_stride;
+    for (int64_t j = 0; j < cols; ++j) {
+      T v = row[j] + bias[j];
+      if (Act == LinearActivation::kRelu) {
+        v = v > static_cast<T>(0) ? v : static_cast<T>(0);
+      } else if (Act == LinearActivation::kGelu) {
+        v = static_cast<T>(0.5) * v *
+            (static_cast<T>(1) +
+             std::erf(v * static_cast<T>(0.70710678118654752440)));
+      } else if (Act == LinearActivation::kGeluTanh) {
+        const T inner = static_cast<T>(0.79788456080286535588) *
+                        (v + static_cast<T>(0.044715) * v * v * v);
+        v = static_cast<T>(0.5) * v * (static_cast<T>(1) + std::tanh(inner));
+      }
+      row[j] = v;
+    }
+  }
+}
+
+template <typename T>
+void BiasAct(LinearActivation act,
+             int64_t rows,
+             int64_t cols,
+             const T* bias,
+             T* out,
+             int64_t out_stride) {
+  switch (act) {
+    case LinearActivation::kIdentity:
+      BiasActRows<LinearActivation::kIdentity>(
+          rows, cols, bias, out, out_stride);
+      break;
+    case LinearActivation::kRelu:
+      BiasActRows<LinearActivation::kRelu>(rows, cols, bias, out, out_stride);
+      break;
+    case LinearActivation::kGelu:
+      BiasActRows<LinearActivation::kGelu>(rows, cols, bias, out, out_stride);
+      break;
+    case LinearActivation::kGeluTanh:
+      BiasActRows<LinearActivation::kGeluTanh>(
+          rows, cols, bias, out, out_stride);
+      break;
+  }
+}
+
+}  // namespace detail
+
+// out = act(x * weight + bias) for a row-major M x K input, a K x N weight
+// and a bias of N elements. The bias and the activation run as the epilogue
+// of the GEMM, on each block of the output right after it is written,
+// instead of streaming the whole product through memory two more times.
+template <typename T>
+void LinearAct(int64_t M,
+               int64_t N,
+               int64_t K,
+               const T* x,
+               const T* weight,
+               const T* bias,
+               LinearActivation act,
+               T* out) {
+  Gemm<T>(M,
+          N,
+          K,
+          1.0f,
+          {x, K, 1},
+          {weight, N, 1},
+          false,
+          {out, N, 1},
+          [&](int64_t row_begin,
+              int64_t row_end,
+              int64_t col_begin,
+              int64_t col_end) {
+            detail::BiasAct(act,
+                            row_end - row_begin,
+                            col_end - col_begin,
+                            bias + col_begin,
+                            out + row_begin * N + col_begin,
+                            N);
+          });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,505 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Count, mean and sum of squared deviations from the mean (M2) of a set of
+// values, updated one value at a time with Welford's method and merged with
+// Chan's formula. Unlike E[x^2] - E[x]^2 this does not cancel catastrophically
+// when the mean is large compared to the spread.
+template <typename T>
+struct WelfordState {
+  int64_t count = 0;
+  T mean = 0;
+  T m2 = 0;
+
+  void Add(T x) {
+    ++count;
+    const T delta = x - mean;
+    mean += delta / static_cast<T>(count);
+    m2 += delta * (x - mean);
+  }
+
+  void Merge(int64_t other_count, T other_mean, T other_m2) {
+    if (other_count == 0) {
+      return;
+    }
+    const int64_t total = count + other_count;
+    const T delta = other_mean - mean;
+    const T weight = static_cast<T>(other_count) / static_cast<T>(total);
+    mean += delta * weight;
+    m2 += other_m2 + delta * delta * static_cast<T>(count) * weight;
+    count = total;
+  }
+
+  // Biased (population) variance.
+  T Variance() const {
+    return count > 0 ? m2 / static_cast<T>(count) : static_cast<T>(0);
+  }
+};
+
+namespace detail {
+
+// Independent Welford accumulators in the contiguous case. They all see the
+// same number of values, so 1 / count is computed once per step and the lane
+// loop vectorises.
+constexpr int kWelfordLanes = 16;
+// Channels handled per task, and rows folded per step, when the channels are
+// the innermost dimension.
+constexpr int64_t kNormColumns = 64;
+constexpr int64_t kNormRows = 256;
+
+// Folds x[0:n] into state.
+template <typename T>
+void WelfordRow(const T* x, int64_t n, WelfordState<T>* state) {
+  T mean[kWelfordLanes] = {};
+  T m2[kWelfordLanes] = {};
+  int64_t steps = 0;
+  int64_t i = 0;
+  for (; i + kWelfordLanes <= n; i += kWelfordLanes) {
+    ++steps;
+    const T inv = static_cast<T>(1) / static_cast<T>(steps);
+    for (int l = 0; l < kWelfordLanes; ++l) {
+      const T delta = x[i + l] - mean[l];
+      mean[l] += delta * inv;
+      m2[l] += delta * (x[i + l] - mean[l]);
+    }
+  }
+  WelfordState<T> row;
+  for (int l = 0; l < kWelfordLanes; ++l) {
+    row.Merge(steps, mean[l], m2[l]);
+  }
+  for (; i < n; ++i) {
+    row.Add(x[i]);
+  }
+  state->Merge(row.count, row.mean, row.m2);
+}
+
+// Folds rows [0, rows) of the [rows, cols] block at x, whose rows are ld
+// apart, into one state per column. cols <= kNormColumns.
+template <typename T>
+void WelfordColumns(const T* x,
+                    int64_t rows,
+                    int64_t cols,
+                    int64_t ld,
+                    WelfordState<T>* states) {
+  for (int64_t r0 = 0; r0 < rows; r0 += kNormRows) {
+    const int64_t r1 = std::min(r0 + kNormRows, rows);
+    T mean[kNormColumns] = {};
+    T m2[kNormColumns] = {};
+    for (int64_t r = r0; r < r1; ++r) {
+      const T* row = x + r * ld;
+      const T inv = static_cast<T>(1) / static_cast<T>(r - r0 + 1);
+      for (int64_t c = 0; c < cols; ++c) {
+        const T delta = row[c] - mean[c];
+        mean[c] += delta * inv;
+        m2[c] += delta * (row[c] - mean[c]);
+      }
+    }
+    for (int64_t c = 0; c < cols; ++c) {
+      states[c].Merge(r1 - r0, mean[c], m2[c]);
+    }
+  }
+}
+
+// Adds sum(dy) and sum(dy * (x - mean)) over a contiguous row, with dy
+// scaled by scale[i] when scale is not null.
+template <typename T>
+void GradSums(const T* x,
+              const T* dy,
+              const T* scale,
+              int64_t n,
+              T mean,
+              T* sum_dy,
+              T* sum_dy_xc) {
+  T acc[kWelfordLanes] = {};
+  T acc_xc[kWelfordLanes] = {};
+  int64_t i = 0;
+  for (; i + kWelfordLanes <= n; i += kWelfordLanes) {
+    for (int l = 0; l < kWelfordLanes; ++l) {
+      const T g = scale ? dy[i + l] * scale[i + l] : dy[i + l];
+      acc[l] += g;
+      acc_xc[l] += g * (x[i + l] - mean);
+    }
+  }
+  for (int l = 0; i < n; ++i, ++l) {
+    const T g = scale ? dy[i] * scale[i] : dy[i];
+    acc[l] += g;
+    acc_xc[l] += g * (x[i] - mean);
+  }
+  T s = 0;
+  T s_xc = 0;
+  for (int l = 0; l < kWelfordLanes; ++l) {
+    s += acc[l];
+    s_xc += acc_xc[l];
+  }
+  *sum_dy += s;
+  *sum_dy_xc += s_xc;
+}
+
+inline int64_t NumColumnBlocks(int64_t channels) {
+  return (channels + kNormColumns - 1) / kNormColumns;
+}
+
+}  // namespace detail
+
+// Batch normalisation of x viewed as [outer, channels, inner], i.e.
+// [N, C, H * W] for NCHW and [N * H * W, C, 1] for NHWC:
+//   y = (x - mean[c]) * inv_std[c] * scale[c] + bias[c].
+// With compute_stats, mean and var (biased) are the statistics of the batch
+// and are written; otherwise they are read. Each task computes the
+// statistics of its channels and normalises them right away, while the
+// channels are still in cache.
+template <typename T>
+void BatchNormForward(const T* x,
+                      int64_t outer,
+                      int64_t channels,
+                      int64_t inner,
+                      const T* scale,
+                      const T* bias,
+                      T epsilon,
+                      bool compute_stats,
+                      T* mean,
+                      T* var,
+                      T* y) {
+  const int64_t per_channel = outer * inner;
+  if (inner > 1) {
+    ParallelFor(0,
+                channels,
+                GrainSize(per_channel * (compute_stats ? 6 : 2)),
+                [&](int64_t begin, int64_t end) {
+                  for (int64_t c = begin; c < end; ++c) {
+                    if (compute_stats) {
+                      WelfordState<T> state;
+                      for (int64_t o = 0; o < outer; ++o) {
+                        detail::WelfordRow(
+                            x + (o * channels + c) * inner, inner, &state);
+                      }
+                      mean[c] = state.mean;
+                      var[c] = state.Variance();
+                    }
+                    const T a = scale[c] / std::sqrt(var[c] + epsilon);
+                    const T b = bias[c] - mean[c] * a;
+                    for (int64_t o = 0; o < outer; ++o) {
+                      const T* xp = x + (o * channels + c) * inner;
+                      T* yp = y + (o * channels + c) * inner;
+                      for (int64_t i = 0; i < inner; ++i) {
+                        yp[i] = xp[i] * a + b;
+                      }
+                    }
+                  }
+                });
+    return;
+  }
+
+  ParallelFor(
+      0,
+      detail::NumColumnBlocks(channels),
+      GrainSize(per_channel * detail::kNormColumns * (compute_stats ? 6 : 2)),
+      [&](int64_t begin, int64_t end) {
+        T a[detail::kNormColumns];
+        T b[detail::kNormColumns];
+        for (int64_t block = begin; block < end; ++block) {
+          const int64_t c0 = block * detail::kNormColumns;
+          const int64_t cols = std::min(detail::kNormColumns, channels - c0);
+          if (compute_stats) {
+            WelfordState<T> states[detail::kNormColumns];
+            detail::WelfordColumns(x + c0, outer, cols, channels, states);
+            for (int64_t c = 0; c < cols; ++c) {
+              mean[c0 + c] = states[c].mean;
+              var[c0 + c] = states[c].Variance();
+            }
+          }
+          for (int64_t c = 0; c < cols; ++c) {
+            a[c] = scale[c0 + c] / std::sqrt(var[c0 + c] + epsilon);
+            b[c] = bias[c0 + c] - mean[c0 + c] * a[c];
+          }
+          for (int64_t r = 0; r < outer; ++r) {
+            const T* xp = x + r * channels + c0;
+            T* yp = y + r * channels + c0;
+            for (int64_t c = 0; c < cols; ++c) {
+              yp[c] = xp[c] * a[c] + b[c];
+            }
+          }
+        }
+      });
+}
+
+// Gradients of BatchNormForward given the per-channel mean and inverse
+// standard deviation it used. With batch statistics the mean and variance
+// depend on x:
+//   dx = scale * inv_std * (dy - mean(dy) - x_hat * mean(dy * x_hat)),
+// with global statistics they are constants and dx = scale * inv_std * dy.
+// dx, dscale and dbias may be null.
+template <typename T>
+void BatchNormBackward(const T* x,
+                       const T* dy,
+                       int64_t outer,
+                       int64_t channels,
+                       int64_t inner,
+                       const T* scale,
+                       const T* mean,
+                       const T* inv_std,
+                       bool use_global_stats,
+                       T* dx,
+                       T* dscale,
+                       T* dbias) {
+  const int64_t per_channel = outer * inner;
+  const T inv_count = static_cast<T>(1) / static_cast<T>(per_channel);
+  if (inner > 1) {
+    ParallelFor(0,
+                channels,
+                GrainSize(per_channel * 6),
+                [&](int64_t begin, int64_t end) {
+                  for (int64_t c = begin; c < end; ++c) {
+                    T sum_dy = 0;
+                    T sum_dy_xc = 0;
+                    for (int64_t o = 0; o < outer; ++o) {
+                      const int64_t offset = (o * channels + c) * inner;
+                      detail::GradSums<T>(x + offset,
+                                          dy + offset,
+                                          nullptr,
+                                          inner,
+                                          mean[c],
+                                          &sum_dy,
+                                          &sum_dy_xc);
+                    }
+                    if (dscale) {
+                      dscale[c] = sum_dy_xc * inv_std[c];
+                    }
+                    if (dbias) {
+                      dbias[c] = sum_dy;
+                    }
+                    if (!dx) {
+                      continue;
+                    }
+                    // dx = a * dy + b * (x - mean) + d
+                    const T a = scale[c] * inv_std[c];
+                    const T b = use_global_stats
+                                    ? static_cast<T>(0)
+                                    : -a * inv_std[c] * inv_std[c] * sum_dy_xc *
+                                          inv_count;
+                    const T d = use_global_stats ? static_cast<T>(0)
+                                                 : -a * sum_dy * inv_count;
+                    for (int64_t o = 0; o < outer; ++o) {
+                      const int64_t offset = (o * channels + c) * inner;
+                      const T* xp = x + offset;
+                      const T* dyp = dy + offset;
+                      T* dxp = dx + offset;
+                      for (int64_t i = 0; i < inner; ++i) {
+                        dxp[i] = a * dyp[i] + b * (xp[i] - mean[c]) + d;
+                      }
+                    }
+                  }
+                });
+    return;
+  }
+
+  ParallelFor(0,
+              detail::NumColumnBlocks(channels),
+              GrainSize(per_channel * detail::kNormColumns * 6),
+              [&](int64_t begin, int64_t end) {
+                T sum_dy[detail::kNormColumns];
+                T sum_dy_xc[detail::kNormColumns];
+                T a[detail::kNormColumns];
+                T b[detail::kNormColumns];
+                T d[detail::kNormColumns];
+                for (int64_t block = begin; block < end; ++block) {
+                  const int64_t c0 = block * detail::kNormColumns;
+                  const int64_t cols =
+                      std::min(detail::kNormColumns, channels - c0);
+                  const T* m = mean + c0;
+                  std::fill(sum_dy, sum_dy + cols, static_cast<T>(0));
+                  std::fill(sum_dy_xc, sum_dy_xc + cols, static_cast<T>(0));
+                  for (int64_t r = 0; r < outer; ++r) {
+                    const T* xp = x + r * channels + c0;
+                    const T* dyp = dy + r * channels + c0;
+                    for (int64_t c = 0; c < cols; ++c) {
+                      sum_dy[c] += dyp[c];
+                      sum_dy_xc[c] += dyp[c] * (xp[c] - m[c]);
+                    }
+                  }
+                  for (int64_t c = 0; c < cols; ++c) {
+                    const T is = inv_std[c0 + c];
+                    if (dscale) {
+                      dscale[c0 + c] = sum_dy_xc[c] * is;
+                    }
+                    if (dbias) {
+                      dbias[c0 + c] = sum_dy[c];
+                    }
+                    a[c] = scale[c0 + c] * is;
+                    b[c] = use_global_stats
+                               ? static_cast<T>(0)
+                               : -a[c] * is * is * sum_dy_xc[c] * inv_count;
+                    d[c] = use_global_stats ? static_cast<T>(0)
+                                            : -a[c] * sum_dy[c] * inv_count;
+                  }
+                  if (!dx) {
+                    continue;
+                  }
+                  for (int64_t r = 0; r < outer; ++r) {
+                    const T* xp = x + r * channels + c0;
+                    const T* dyp = dy + r * channels + c0;
+                    T* dxp = dx + r * channels + c0;
+                    for (int64_t c = 0; c < cols; ++c) {
+                      dxp[c] = a[c] * dyp[c] + b[c] * (xp[c] - m[c]) + d[c];
+                    }
+                  }
+                }
+              });
+}
+
+// Layer normalisation of every row of the [rows, cols] matrix x:
+//   y = (x - mean) / sqrt(var + epsilon) * scale + bias,
+// writing the mean and biased variance of every row. scale and bias may be
+// null. The row statistics come from one Welford pass, and the row is
+// normalised right after it while it is still in cache.
+template <typename T>
+void LayerNormForward(const T* x,
+                      int64_t rows,
+                      int64_t cols,
+                      const T* scale,
+                      const T* bias,
+                      T epsilon,
+                      T* y,
+                      T* mean,
+                      T* var) {
+  ParallelFor(0, rows, GrainSize(cols * 6), [&](int64_t begin, int64_t end) {
+    for (int64_t r = begin; r < end; ++r) {
+      const T* xp = x + r * cols;
+      T* yp = y + r * cols;
+      WelfordState<T> state;
+      detail::WelfordRow(xp, cols, &state);
+      const T m = state.mean;
+      const T v = state.Variance();
+      const T inv_std = static_cast<T>(1) / std::sqrt(v + epsilon);
+      if (mean) {
+        mean[r] = m;
+      }
+      if (var) {
+        var[r] = v;
+      }
+      if (scale && bias) {
+        for (int64_t j = 0; j < cols; ++j) {
+          yp[j] = (xp[j] - m) * inv_std * scale[j] + bias[j];
+        }
+      } else if (scale) {
+        for (int64_t j = 0; j < cols; ++j) {
+          yp[j] = (xp[j] - m) * inv_std * scale[j];
+        }
+      } else if (bias) {
+        for (int64_t j = 0; j < cols; ++j) {
+          yp[j] = (xp[j] - m) * inv_std + bias[j];
+        }
+      } else {
+        for (int64_t j = 0; j < cols; ++j) {
+          yp[j] = (xp[j] - m) * inv_std;
+        }
+      }
+    }
+  });
+}
+
+// Gradients of LayerNormForward. With g = dy * scale and
+// x_hat = (x - mean) * inv_std:
+//   dx = inv_std * (g - mean(g) - x_hat * mean(g * x_hat)),
+//   dscale = sum over rows of dy * x_hat, dbias = sum over rows of dy.
+// The parameter gradients are reduced column block by column block over all
+// rows, so they do not depend on the thread count. Outputs may be null.
+template <typename T>
+void LayerNormBackward(const T* x,
+                       const T* dy,
+                       int64_t rows,
+                       int64_t cols,
+                       const T* scale,
+                       const T* mean,
+                       const T* var,
+                       T epsilon,
+                       T* dx,
+                       T* dscale,
+                       T* dbias) {
+  if (dx) {
+    const T inv_cols = static_cast<T>(1) / static_cast<T>(cols);
+    ParallelFor(0, rows, GrainSize(cols * 8), [&](int64_t begin, int64_t end) {
+      for (int64_t r = begin; r < end; ++r) {
+        const T* xp = x + r * cols;
+        const T* dyp = dy + r * cols;
+        T* dxp = dx + r * cols;
+        const T m = mean[r];
+        const T inv_std = static_cast<T>(1) / std::sqrt(var[r] + epsilon);
+        T sum_g = 0;
+        T sum_g_xc = 0;
+        detail::GradSums(xp, dyp, scale, cols, m, &sum_g, &sum_g_xc);
+        // dx = inv_std * g + b * (x - mean) + d
+        const T b = -inv_std * inv_std * inv_std * sum_g_xc * inv_cols;
+        const T d = -inv_std * sum_g * inv_cols;
+        if (scale) {
+          for (int64_t j = 0; j < cols; ++j) {
+            dxp[j] = inv_std * dyp[j] * scale[j] + b * (xp[j] - m) + d;
+          }
+        } else {
+          for (int64_t j = 0; j < cols; ++j) {
+            dxp[j] = inv_std * dyp[j] + b * (xp[j] - m) + d;
+          }
+        }
+      }
+    });
+  }
+
+  if (!dscale && !dbias) {
+    return;
+  }
+  ParallelFor(0,
+              detail::NumColumnBlocks(cols),
+              GrainSize(rows * detail::kNormColumns * 4),
+              [&](int64_t begin, int64_t end) {
+                T acc_scale[detail::kNormColumns];
+                T acc_bias[detail::kNormColumns];
+                for (int64_t block = begin; block < end; ++block) {
+                  const int64_t j0 = block * detail::kNormColumns;
+                  const int64_t n = std::min(detail::kNormColumns, cols - j0);
+                  std::fill(acc_scale, acc_scale + n, static_cast<T>(0));
+                  std::fill(acc_bias, acc_bias + n, static_cast<T>(0));
+                  for (int64_t r = 0; r < rows; ++r) {
+                    const T* xp = x + r * cols + j0;
+                    const T* dyp = dy + r * cols + j0;
+                    const T m = mean[r];
+                    const T inv_std =
+                        static_cast<T>(1) / std::sqrt(var[r] + epsilon);
+                    for (int64_t j = 0; j < n; ++j) {
+                      acc_scale[j] += dyp[j] * (xp[j] - m) * inv_std;
+                      acc_bias[j] += dyp[j];
+                    }
+                  }
+                  if (dscale) {
+                    std::copy(acc_scale, acc_scale + n, dscale + j0);
+                  }
+                  if (dbias) {
+                    std::copy(acc_bias, acc_bias + n, dbias + j0);
+                  }
+                }
+              });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,296 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <type_traits>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+#include "paddle/phi/capi/all.h"
+
+// Marks a loop whose iterations are independent. An optimizer update writes
+// each element once, either in place or into a separate buffer, but has too
+// many pointers for the compiler to prove that with runtime alias checks.
+#if defined(__clang__)
+#define CUSTOM_CPU_IVDEP _Pragma("clang loop vectorize(assume_safety)")
+#elif defined(__GNUC__)
+#define CUSTOM_CPU_IVDEP _Pragma("GCC ivdep")
+#else
+#define CUSTOM_CPU_IVDEP
+#endif
+
+namespace custom_kernel {
+namespace funcs {
+
+// Type optimizer updates are computed in: float16 parameters are updated in
+// float, everything else in its own type.
+template <typename T>
+struct OptimizerMPType {
+  using type =
+      typename std::conditional<std::is_arithmetic<T>::value, T, float>::type;
+};
+
+// Operands of one Adam step on one parameter. T is the parameter type, S the
+// type the moments are stored in and MT the type the update is computed in.
+// master_param and master_param_out are null unless the parameter keeps a
+// float copy; the outputs may alias the inputs.
+template <typename T, typename S, typename MT>
+struct AdamTensor {
+  const T* param = nullptr;
+  const T* grad = nullptr;
+  const S* moment1 = nullptr;
+  const S* moment2 = nullptr;
+  const MT* master_param = nullptr;
+  T* param_out = nullptr;
+  S* moment1_out = nullptr;
+  S* moment2_out = nullptr;
+  MT* master_param_out = nullptr;
+  int64_t numel = 0;
+  MT lr = 0;
+  MT beta1_pow = 0;
+  MT beta2_pow = 0;
+};
+
+// Hyperparameters shared by all parameters of an Adam step. With with_decay
+// the parameter is first scaled by 1 - lr * lr_ratio * coeff, which is AdamW.
+template <typename MT>
+struct AdamConfig {
+  MT beta1 = 0.9;
+  MT beta2 = 0.999;
+  MT epsilon = 1e-8;
+  MT lr_ratio = 1;
+  MT coeff = 0;
+  bool with_decay = false;
+};
+
+// Operands of one momentum step on one parameter, laid out like AdamTensor.
+// l2_coeff is the L2 regularization coefficient, 0 for none.
+template <typename T, typename S, typename MT>
+struct MomentumTensor {
+  const T* param = nullptr;
+  const T* grad = nullptr;
+  const S* velocity = nullptr;
+  const MT* master_param = nullptr;
+  T* param_out = nullptr;
+  S* velocity_out = nullptr;
+  MT* master_param_out = nullptr;
+  int64_t numel = 0;
+  MT lr = 0;
+  MT l2_coeff = 0;
+};
+
+template <typename MT>
+struct MomentumConfig {
+  MT mu = 0.9;
+  MT rescale_grad = 1;
+  bool use_nesterov = false;
+};
+
+namespace detail {
+
+// Elements per task of a multi-tensor update. Large enough to amortise the
+// per-task setup, small enough that a few large tensors still spread over
+// all threads.
+constexpr int64_t kMultiTensorChunk = 16384;
+
+template <bool kMaster, typename T, typename S, typename MT>
+void AdamRange(const AdamConfig<MT>& c,
+               const AdamTensor<T, S, MT>& t,
+               int64_t begin,
+               int64_t end) {
+  const MT one = static_cast<MT>(1);
+  const MT lr = t.lr * c.lr_ratio;
+  const MT decay = c.with_decay ? one - lr * c.coeff : one;
+  const MT bias2 = std::sqrt(one - t.beta2_pow);
+  const MT step = lr * bias2 / (one - t.beta1_pow);
+  const MT eps = c.epsilon * bias2;
+  const MT beta1 = c.beta1;
+  const MT beta2 = c.beta2;
+  // Copied out of t, which the stores below could otherwise alias.
+  const T* param = t.param;
+  const T* grad = t.grad;
+  const S* moment1 = t.moment1;
+  const S* moment2 = t.moment2;
+  const MT* master_param = t.master_param;
+  T* param_out = t.param_out;
+  S* moment1_out = t.moment1_out;
+  S* moment2_out = t.moment2_out;
+  MT* master_param_out = t.master_param_out;
+  CUSTOM_CPU_IVDEP
+  for (int64_t i = begin; i < end; ++i) {
+    const MT g = static_cast<MT>(grad[i]);
+    const MT m1 = beta1 * static_cast<MT>(moment1[i]) + (one - beta1) * g;
+    const MT m2 = beta2 * static_cast<MT>(moment2[i]) + (one - beta2) * g * g;
+    const MT p =
+        (kMaster ? master_param[i] : static_cast<MT>(param[i])) * decay -
+        step * m1 / (std::sqrt(m2) + eps);
+    moment1_out[i] = static_cast<S>(m1);
+    moment2_out[i] = static_cast<S>(m2);
+    param_out[i] = static_cast<T>(p);
+    if (kMaster) {
+      master_param_out[i] = p;
+    }
+  }
+}
+
+template <bool kMaster, typename T, typename S, typename MT>
+void MomentumRange(const MomentumConfig<MT>& c,
+                   const MomentumTensor<T, S, MT>& t,
+                   int64_t begin,
+                   int64_t end) {
+  const MT mu = c.mu;
+  const MT lr = t.lr;
+  const MT rescale = c.rescale_grad;
+  const MT l2 = t.l2_coeff;
+  const T* param = t.param;
+  const T* grad = t.grad;
+  const S* velocity = t.velocity;
+  const MT* master_param = t.master_param;
+  T* param_out = t.param_out;
+  S* velocity_out = t.velocity_out;
+  MT* master_param_out = t.master_param_out;
+  CUSTOM_CPU_IVDEP
+  for (int64_t i = begin; i < end; ++i) {
+    const MT p = kMaster ? master_param[i] : static_cast<MT>(param[i]);
+    const MT g = static_cast<MT>(grad[i]) * rescale + l2 * p;
+    const MT v = mu * static_cast<MT>(velocity[i]) + g;
+    const MT p_out = c.use_nesterov ? p - (g + mu * v) * lr : p - lr * v;
+    velocity_out[i] = static_cast<S>(v);
+    param_out[i] = static_cast<T>(p_out);
+    if (kMaster) {
+      master_param_out[i] = p_out;
+    }
+  }
+}
+
+}  // namespace detail
+
+// Calls fn(tensor, begin, end) on ranges that together cover [0, numels[i])
+// of every tensor i, in a single parallel loop. Tensors are cut into chunks
+// of kMultiTensorChunk elements, so hundreds of small parameters cost one
+// dispatch rather than one each, and large ones still split across threads.
+// cost is the work per element in units of GrainSize.
+template <typename F>
+void MultiTensorFor(const std::vector<int64_t>& numels, int64_t cost, F&& fn) {
+  const int64_t chunk = detail::kMultiTensorChunk;
+  std::vector<int64_t> first_chunk(numels.size() + 1, 0);
+  for (size_t i = 0; i < numels.size(); ++i) {
+    first_chunk[i + 1] = first_chunk[i] + (numels[i] + chunk - 1) / chunk;
+  }
+  ParallelFor(0,
+              first_chunk.back(),
+              GrainSize(chunk * cost),
+              [&](int64_t begin, int64_t end) {
+                size_t tensor =
+                    std::upper_bound(
+                        first_chunk.begin(), first_chunk.end(), begin) -
+                    first_chunk.begin() - 1;
+                for (int64_t c = begin; c < end; ++c) {
+                  while (c >= first_chunk[tensor + 1]) {
+                    ++tensor;
+                  }
+                  const int64_t start = (c - first_chunk[tensor]) * chunk;
+                  fn(tensor, start, std::min(start + chunk, numels[tensor]));
+                }
+              });
+}
+
+// Applies one Adam (or AdamW) step to every tensor in one parallel loop.
+template <typename T, typename S, typename MT>
+void AdamUpdate(const AdamConfig<MT>& config,
+                const std::vector<AdamTensor<T, S, MT>>& tensors) {
+  std::vector<int64_t> numels(tensors.size());
+  for (size_t i = 0; i < tensors.size(); ++i) {
+    numels[i] = tensors[i].numel;
+  }
+  MultiTensorFor(numels, 16, [&](size_t i, int64_t begin, int64_t end) {
+    if (tensors[i].master_param) {
+      detail::AdamRange<true>(config, tensors[i], begin, end);
+    } else {
+      detail::AdamRange<false>(config, tensors[i], begin, end);
+    }
+  });
+}
+
+// Applies one momentum step to every tensor in one parallel loop.
+template <typename T, typename S, typename MT>
+void MomentumUpdate(const MomentumConfig<MT>& config,
+                    const std::vector<MomentumTensor<T, S, MT>>& tensors) {
+  std::vector<int64_t> numels(tensors.size());
+  for (size_t i = 0; i < tensors.size(); ++i) {
+    numels[i] = tensors[i].numel;
+  }
+  MultiTensorFor(numels, 4, [&](size_t i, int64_t begin, int64_t end) {
+    if (tensors[i].master_param) {
+      detail::MomentumRange<true>(config, tensors[i], begin, end);
+    } else {
+      detail::MomentumRange<false>(config, tensors[i], begin, end);
+    }
+  });
+}
+
+// Reads the single element of a learning rate or beta power tensor, which
+// may be float16, float or double independently of the parameter.
+template <typename MT>
+MT GetScalarValue(const phi::DenseTensor& x) {
+  switch (x.dtype()) {
+    case phi::DataType::FLOAT64:
+      return static_cast<MT>(*x.data<double>());
+    case phi::DataType::FLOAT16:
+      return static_cast<MT>(
+          static_cast<float>(*x.data<phi::dtype::float16>()));
+    default:
+      return static_cast<MT>(*x.data<float>());
+  }
+}
+
+// Writes value into the single element of out, in the data type of like.
+template <typename MT>
+void SetScalarValue(const phi::Context& dev_ctx,
+                    const phi::DenseTensor& like,
+                    MT value,
+                    phi::DenseTensor* out) {
+  out->Resize({1});
+  switch (like.dtype()) {
+    case phi::DataType::FLOAT64:
+      *dev_ctx.template Alloc<double>(out) = static_cast<double>(value);
+      break;
+    case phi::DataType::FLOAT16:
+      *dev_ctx.template Alloc<phi::dtype::float16>(out) =
+          static_cast<phi::dtype::float16>(static_cast<float>(value));
+      break;
+    default:
+      *dev_ctx.template Alloc<float>(out) = static_cast<float>(value);
+      break;
+  }
+}
+
+// Copies x into out, unless out already shares x's memory.
+template <typename T>
+void CopyIfNotShared(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& x,
+                     phi::DenseTensor* out) {
+  const T* x_data = x.data<T>();
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  if (out_data != x_data) {
+    std::copy(x_data, x_data + x.numel(), out_data);
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,409 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <limits>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Geometry of a 2-D pooling. pad_h and pad_w are the top and left padding;
+// the bottom and right padding only show up in out_h and out_w.
+struct PoolShape {
+  int64_t batch = 1;
+  int64_t channels = 1;
+  int64_t in_h = 1;
+  int64_t in_w = 1;
+  int64_t out_h = 1;
+  int64_t out_w = 1;
+  int64_t kernel_h = 1;
+  int64_t kernel_w = 1;
+  int64_t stride_h = 1;
+  int64_t stride_w = 1;
+  int64_t pad_h = 0;
+  int64_t pad_w = 0;
+  // Windows split the input evenly into out_h x out_w cells.
+  bool adaptive = false;
+  // Average pooling divides by the number of input elements in the window
+  // instead of kernel_h * kernel_w.
+  bool exclusive = true;
+};
+
+template <typename T>
+struct MaxPool {
+  T Initial() const { return std::numeric_limits<T>::lowest(); }
+  T Combine(T acc, T x) const { return x > acc ? x : acc; }
+  T Finalize(T acc, int64_t pool_size) const { return acc; }
+};
+
+template <typename T>
+struct AvgPool {
+  T Initial() const { return static_cast<T>(0); }
+  T Combine(T acc, T x) const { return acc + x; }
+  T Finalize(T acc, int64_t pool_size) const {
+    return acc / static_cast<T>(pool_size);
+  }
+};
+
+namespace detail {
+
+// Channels handled per task by the channel-last backward pass.
+constexpr int64_t kPoolColumns = 64;
+
+// Input range [start, end) of output index o along one dimension.
+inline void PoolWindow(int64_t o,
+                       int64_t in,
+                       int64_t out,
+                       int64_t kernel,
+                       int64_t stride,
+                       int64_t pad,
+                       bool adaptive,
+                       int64_t* start,
+                       int64_t* end) {
+  if (adaptive) {
+    *start = o * in / out;
+    *end = ((o + 1) * in + out - 1) / out;
+    return;
+  }
+  const int64_t s = o * stride - pad;
+  *start = std::max<int64_t>(s, 0);
+  *end = std::min(s + kernel, in);
+}
+
+inline int64_t PoolSize(
+    const PoolShape& s, int64_t h0, int64_t h1, int64_t w0, int64_t w1) {
+  return s.exclusive || s.adaptive ? (h1 - h0) * (w1 - w0)
+                                   : s.kernel_h * s.kernel_w;
+}
+
+// Pools output row oh of the NCHW plane x into out_row. Windows that lie
+// inside the input row are combined one kernel column at a time across the
+// whole output row, which vectorises; windows that reach into the padding,
+// and adaptive windows, are pooled one by one.
+template <typename T, typename Pool>
+void PoolPlaneRow(
+    const PoolShape& s, const T* x, int64_t oh, const Pool& pool, T* out_row) {
+  int64_t h0, h1;
+  PoolWindow(oh,
+             s.in_h,
+             s.out_h,
+             s.kernel_h,
+             s.stride_h,
+             s.pad_h,
+             s.adaptive,
+             &h0,
+             &h1);
+  int64_t lo = 0;
+  int64_t hi = 0;
+  if (!s.adaptive) {
+    lo = std::min((s.pad_w + s.stride_w - 1) / s.stride_w, s.out_w);
+    const int64_t last = s.in_w + s.pad_w - s.kernel_w;
+    hi = last < 0 ? 0 : std::min(last / s.stride_w + 1, s.out_w);
+    hi = std::max(hi, lo);
+  }
+
+  auto pool_window = [&](int64_t ow) {
+    int64_t w0, w1;
+    PoolWindow(ow,
+               s.in_w,
+               s.out_w,
+               s.kernel_w,
+               s.stride_w,
+               s.pad_w,
+               s.adaptive,
+               &w0,
+               &w1);
+    T acc = pool.Initial();
+    for (int64_t h = h0; h < h1; ++h) {
+      const T* row = x + h * s.in_w;
+      for (int64_t w = w0; w < w1; ++w) {
+        acc = pool.Combine(acc, row[w]);
+      }
+    }
+    out_row[ow] = pool.Finalize(acc, PoolSize(s, h0, h1, w0, w1));
+  };
+  for (int64_t ow = 0; ow < lo; ++ow) {
+    pool_window(ow);
+  }
+  for (int64_t ow = hi; ow < s.out_w; ++ow) {
+    pool_window(ow);
+  }
+  if (lo == hi) {
+    return;
+  }
+
+  T* acc = out_row + lo;
+  const int64_t n = hi - lo;
+  const int64_t stride = s.stride_w;
+  std::fill(acc, acc + n, pool.Initial());
+  for (int64_t h = h0; h < h1; ++h) {
+    const T* row = x + h * s.in_w + lo * stride - s.pad_w;
+    for (int64_t k = 0; k < s.kernel_w; ++k) {
+      for (int64_t i = 0; i < n; ++i) {
+        acc[i] = pool.Combine(acc[i], row[i * stride + k]);
+      }
+    }
+  }
+  const int64_t pool_size = PoolSize(s, h0, h1, 0, s.kernel_w);
+  for (int64_t i = 0; i < n; ++i) {
+    acc[i] = pool.Finalize(acc[i], pool_size);
+  }
+}
+
+}  // namespace detail
+
+// Pools x into out. With channel_last the tensors are NHWC and every window
+// position is a contiguous run of channels, which is combined into the
+// output row in one vectorisable loop; otherwise they are NCHW and every
+// task pools whole H x W planes, reading contiguous input rows.
+template <typename T, typename Pool>
+void Pool2dForward(const PoolShape& s,
+                   const T* x,
+                   bool channel_last,
+                   const Pool& pool,
+                   T* out) {
+  const int64_t in_plane = s.in_h * s.in_w;
+  const int64_t out_plane = s.out_h * s.out_w;
+  const int64_t window = s.adaptive ? ((s.in_h + s.out_h - 1) / s.out_h + 1) *
+                                          ((s.in_w + s.out_w - 1) / s.out_w + 1)
+                                    : s.kernel_h * s.kernel_w;
+  if (!channel_last) {
+    ParallelFor(0,
+                s.batch * s.channels,
+                GrainSize(out_plane * window),
+                [&](int64_t begin, int64_t end) {
+                  for (int64_t p = begin; p < end; ++p) {
+                    const T* xp = x + p * in_plane;
+                    T* op = out + p * out_plane;
+                    for (int64_t oh = 0; oh < s.out_h; ++oh) {
+                      detail::PoolPlaneRow(s, xp, oh, pool, op + oh * s.out_w);
+                    }
+                  }
+                });
+    return;
+  }
+
+  const int64_t c = s.channels;
+  ParallelFor(0,
+              s.batch * s.out_h,
+              GrainSize(s.out_w * c * window),
+              [&](int64_t begin, int64_t end) {
+                for (int64_t task = begin; task < end; ++task) {
+                  const int64_t n = task / s.out_h;
+                  const int64_t oh = task % s.out_h;
+                  const T* xn = x + n * in_plane * c;
+                  int64_t h0, h1;
+                  detail::PoolWindow(oh,
+                                     s.in_h,
+                                     s.out_h,
+                                     s.kernel_h,
+                                     s.stride_h,
+                                     s.pad_h,
+                                     s.adaptive,
+                                     &h0,
+                                     &h1);
+                  for (int64_t ow = 0; ow < s.out_w; ++ow) {
+                    int64_t w0, w1;
+                    detail::PoolWindow(ow,
+                                       s.in_w,
+                                       s.out_w,
+                                       s.kernel_w,
+                                       s.stride_w,
+                                       s.pad_w,
+                                       s.adaptive,
+                                       &w0,
+                                       &w1);
+                    T* op = out + (task * s.out_w + ow) * c;
+                    std::fill(op, op + c, pool.Initial());
+                    for (int64_t h = h0; h < h1; ++h) {
+                      for (int64_t w = w0; w < w1; ++w) {
+                        const T* xp = xn + (h * s.in_w + w) * c;
+                        for (int64_t k = 0; k < c; ++k) {
+                          op[k] = pool.Combine(op[k], xp[k]);
+                        }
+                      }
+                    }
+                    const int64_t pool_size =
+                        detail::PoolSize(s, h0, h1, w0, w1);
+                    for (int64_t k = 0; k < c; ++k) {
+                      op[k] = pool.Finalize(op[k], pool_size);
+                    }
+                  }
+                }
+              });
+}
+
+// Gradient of max pooling: each output gradient goes to the first position
+// of its window, in row-major order, where x equals the pooled output.
+// Gradient of average pooling: each output gradient is spread evenly over
+// its window. Windows may overlap, so tasks own whole planes (NCHW) or
+// blocks of channels of one image (NHWC).
+template <typename T>
+void Pool2dBackward(const PoolShape& s,
+                    const T* x,
+                    const T* out,
+                    const T* out_grad,
+                    bool channel_last,
+                    bool max_pool,
+                    T* x_grad) {
+  const int64_t in_plane = s.in_h * s.in_w;
+  const int64_t out_plane = s.out_h * s.out_w;
+  const int64_t window = s.kernel_h * s.kernel_w;
+  if (!channel_last) {
+    ParallelFor(0,
+                s.batch * s.channels,
+                GrainSize(out_plane * window + in_plane),
+                [&](int64_t begin, int64_t end) {
+                  for (int64_t p = begin; p < end; ++p) {
+                    const T* xp = x + p * in_plane;
+                    const T* op = out + p * out_plane;
+                    const T* dop = out_grad + p * out_plane;
+                    T* dxp = x_grad + p * in_plane;
+                    std::fill(dxp, dxp + in_plane, static_cast<T>(0));
+                    for (int64_t oh = 0; oh < s.out_h; ++oh) {
+                      int64_t h0, h1;
+                      detail::PoolWindow(oh,
+                                         s.in_h,
+                                         s.out_h,
+                                         s.kernel_h,
+                                         s.stride_h,
+                                         s.pad_h,
+                                         s.adaptive,
+                                         &h0,
+                                         &h1);
+                      for (int64_t ow = 0; ow < s.out_w; ++ow) {
+                        int64_t w0, w1;
+                        detail::PoolWindow(ow,
+                                           s.in_w,
+                                           s.out_w,
+                                           s.kernel_w,
+                                           s.stride_w,
+                                           s.pad_w,
+                                           s.adaptive,
+                                           &w0,
+                                           &w1);
+                        const int64_t o = oh * s.out_w + ow;
+                        if (max_pool) {
+                          bool found = false;
+                          for (int64_t h = h0; h < h1 && !found; ++h) {
+                            for (int64_t w = w0; w < w1; ++w) {
+                              if (xp[h * s.in_w + w] == op[o]) {
+                                dxp[h * s.in_w + w] += dop[o];
+                                found = true;
+                                break;
+                              }
+                            }
+                          }
+                        } else {
+                          const T g = dop[o] / static_cast<T>(detail::PoolSize(
+                                                   s, h0, h1, w0, w1));
+                          for (int64_t h = h0; h < h1; ++h) {
+                            T* row = dxp + h * s.in_w;
+                            for (int64_t w = w0; w < w1; ++w) {
+                              row[w] += g;
+                            }
+                          }
+                        }
+                      }
+                    }
+                  }
+                });
+    return;
+  }
+
+  const int64_t c = s.channels;
+  const int64_t blocks = (c + detail::kPoolColumns - 1) / detail::kPoolColumns;
+  ParallelFor(0,
+              s.batch * blocks,
+              GrainSize((out_plane * window + in_plane) * detail::kPoolColumns),
+              [&](int64_t begin, int64_t end) {
+                bool found[detail::kPoolColumns];
+                T g[detail::kPoolColumns];
+                for (int64_t task = begin; task < end; ++task) {
+                  const int64_t n = task / blocks;
+                  const int64_t c0 = task % blocks * detail::kPoolColumns;
+                  const int64_t cols = std::min(detail::kPoolColumns, c - c0);
+                  const T* xn = x + n * in_plane * c + c0;
+                  const T* on = out + n * out_plane * c + c0;
+                  const T* don = out_grad + n * out_plane * c + c0;
+                  T* dxn = x_grad + n * in_plane * c + c0;
+                  for (int64_t i = 0; i < in_plane; ++i) {
+                    std::fill(
+                        dxn + i * c, dxn + i * c + cols, static_cast<T>(0));
+                  }
+                  for (int64_t oh = 0; oh < s.out_h; ++oh) {
+                    int64_t h0, h1;
+                    detail::PoolWindow(oh,
+                                       s.in_h,
+                                       s.out_h,
+                                       s.kernel_h,
+                                       s.stride_h,
+                                       s.pad_h,
+                                       s.adaptive,
+                                       &h0,
+                                       &h1);
+                    for (int64_t ow = 0; ow < s.out_w; ++ow) {
+                      int64_t w0, w1;
+                      detail::PoolWindow(ow,
+                                         s.in_w,
+                                         s.out_w,
+                                         s.kernel_w,
+                                         s.stride_w,
+                                         s.pad_w,
+                                         s.adaptive,
+                                         &w0,
+                                         &w1);
+                      const int64_t o = (oh * s.out_w + ow) * c;
+                      if (max_pool) {
+                        std::fill(found, found + cols, false);
+                        for (int64_t h = h0; h < h1; ++h) {
+                          for (int64_t w = w0; w < w1; ++w) {
+                            const int64_t i = (h * s.in_w + w) * c;
+                            for (int64_t k = 0; k < cols; ++k) {
+                              if (!found[k] && xn[i + k] == on[o + k]) {
+                                dxn[i + k] += don[o + k];
+                                found[k] = true;
+                              }
+                            }
+                          }
+                        }
+                      } else {
+                        const T inv =
+                            static_cast<T>(1) /
+                            static_cast<T>(detail::PoolSize(s, h0, h1, w0, w1));
+                        for (int64_t k = 0; k < cols; ++k) {
+                          g[k] = don[o + k] * inv;
+                        }
+                        for (int64_t h = h0; h < h1; ++h) {
+                          for (int64_t w = w0; w < w1; ++w) {
+                            T* dxp = dxn + (h * s.in_w + w) * c;
+                            for (int64_t k = 0; k < cols; ++k) {
+                              dxp[k] += g[k];
+                            }
+                          }
+                        }
+                      }
+                    }
+                  }
+                }
+              });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,211 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+
+#include "kernels/funcs/thread_pool.h"
+#include "paddle/phi/capi/all.h"
+
+// Counter-based random numbers (Philox4x32-10, Salmon et al., "Parallel
+// random numbers: as easy as 1, 2, 3", SC'11). Group g of a fill is the
+// block of four 32-bit words Philox(key, g), so every value depends only on
+// the key and its own index: any range of the output can be produced by any
+// thread, and the result is bit-identical for every thread count.
+
+#if defined(__GNUC__)
+#define CUSTOM_CPU_NOINLINE __attribute__((noinline))
+#else
+#define CUSTOM_CPU_NOINLINE
+#endif
+
+namespace custom_kernel {
+namespace funcs {
+
+// Groups computed together; the rounds are written as loops over the lanes
+// so that they vectorise.
+constexpr int kPhiloxLanes = 8;
+
+namespace detail {
+
+constexpr uint32_t kPhiloxM0 = 0xD2511F53;
+constexpr uint32_t kPhiloxM1 = 0xCD9E8D57;
+constexpr uint32_t kPhiloxW0 = 0x9E3779B9;
+constexpr uint32_t kPhiloxW1 = 0xBB67AE85;
+
+// One Philox round on every lane. It is kept out of line: inlined into the
+// round loop, GCC unrolls everything and no longer vectorises the lanes.
+CUSTOM_CPU_NOINLINE inline void PhiloxRound(uint32_t* __restrict c0,
+                                            uint32_t* __restrict c1,
+                                            uint32_t* __restrict c2,
+                                            uint32_t* __restrict c3,
+                                            uint32_t k0,
+                                            uint32_t k1) {
+  for (int l = 0; l < kPhiloxLanes; ++l) {
+    const uint64_t p0 = static_cast<uint64_t>(kPhiloxM0) * c0[l];
+    const uint64_t p1 = static_cast<uint64_t>(kPhiloxM1) * c2[l];
+    const uint32_t n0 = static_cast<uint32_t>(p1 >> 32) ^ c1[l] ^ k0;
+    const uint32_t n2 = static_cast<uint32_t>(p0 >> 32) ^ c3[l] ^ k1;
+    c1[l] = static_cast<uint32_t>(p1);
+    c3[l] = static_cast<uint32_t>(p0);
+    c0[l] = n0;
+    c2[l] = n2;
+  }
+}
+
+// words[w][l] = word w of Philox(key, counter + l).
+inline void PhiloxLanes(uint64_t key,
+                        uint64_t counter,
+                        uint32_t words[4][kPhiloxLanes]) {
+  uint32_t* c0 = words[0];
+  uint32_t* c1 = words[1];
+  uint32_t* c2 = words[2];
+  uint32_t* c3 = words[3];
+  for (int l = 0; l < kPhiloxLanes; ++l) {
+    const uint64_t c = counter + l;
+    c0[l] = static_cast<uint32_t>(c);
+    c1[l] = static_cast<uint32_t>(c >> 32);
+    c2[l] = 0;
+    c3[l] = 0;
+  }
+  uint32_t k0 = static_cast<uint32_t>(key);
+  uint32_t k1 = static_cast<uint32_t>(key >> 32);
+  for (int round = 0; round < 10; ++round) {
+    PhiloxRound(c0, c1, c2, c3, k0, k1);
+    k0 += kPhiloxW0;
+    k1 += kPhiloxW1;
+  }
+}
+
+}  // namespace detail
+
+// Key of a random op: its seed attribute when set, otherwise a fresh value
+// drawn from the generator of the device context, so that paddle.seed makes
+// the sequence of ops reproducible.
+inline uint64_t PhiloxKey(const phi::Context& dev_ctx, int seed) {
+  return seed != 0 ? static_cast<uint64_t>(seed) : dev_ctx.seed();
+}
+
+// Calls fn(group, words) for every group in [0, num_groups), where words
+// holds the four random words of the group. cost is the work per group.
+template <typename F>
+void PhiloxFor(uint64_t key, int64_t num_groups, int64_t cost, F&& fn) {
+  const int64_t num_blocks = (num_groups + kPhiloxLanes - 1) / kPhiloxLanes;
+  ParallelFor(0,
+              num_blocks,
+              GrainSize(cost * kPhiloxLanes),
+              [&](int64_t begin, int64_t end) {
+                uint32_t words[4][kPhiloxLanes];
+                for (int64_t block = begin; block < end; ++block) {
+                  const int64_t first = block * kPhiloxLanes;
+                  detail::PhiloxLanes(key, first, words);
+                  const int lanes = static_cast<int>(
+                      std::min<int64_t>(kPhiloxLanes, num_groups - first));
+                  for (int l = 0; l < lanes; ++l) {
+                    const uint32_t group_words[4] = {
+                        words[0][l], words[1][l], words[2][l], words[3][l]};
+                    fn(first + l, group_words);
+                  }
+                }
+              });
+}
+
+// Uniform in [0, 1) from the top 24 bits of a word.
+inline float WordToUniform(uint32_t w) {
+  return static_cast<float>(w >> 8) * (1.0f / 16777216.0f);
+}
+
+// Uniform in [0, 1) from 53 bits of two words.
+inline double WordsToUniform(uint32_t hi, uint32_t lo) {
+  const uint64_t bits = ((static_cast<uint64_t>(hi) << 32) | lo) >> 11;
+  return static_cast<double>(bits) * (1.0 / 9007199254740992.0);
+}
+
+// Uniform values in [min, max). A float takes one word and a double two, so
+// a group fills four floats or two doubles.
+template <typename T>
+void UniformFill(uint64_t key, T min, T max, int64_t size, T* out) {
+  constexpr int kPerGroup = sizeof(T) == sizeof(float) ? 4 : 2;
+  const T range = max - min;
+  PhiloxFor(key,
+            (size + kPerGroup - 1) / kPerGroup,
+            kPerGroup * 2,
+            [&](int64_t group, const uint32_t* words) {
+              const int64_t first = group * kPerGroup;
+              const int count =
+                  static_cast<int>(std::min<int64_t>(kPerGroup, size - first));
+              for (int j = 0; j < count; ++j) {
+                const T u = kPerGroup == 4
+                                ? static_cast<T>(WordToUniform(words[j]))
+                                : static_cast<T>(WordsToUniform(
+                                      words[2 * j], words[2 * j + 1]));
+                out[first + j] = min + u * range;
+              }
+            });
+}
+
+// Normal values with the given mean and standard deviation, two per pair of
+// uniforms through the Box-Muller transform.
+template <typename T>
+void GaussianFill(uint64_t key, T mean, T std, int64_t size, T* out) {
+  constexpr int kPerGroup = sizeof(T) == sizeof(float) ? 4 : 2;
+  constexpr T kTwoPi = static_cast<T>(6.28318530717958647692);
+  PhiloxFor(key,
+            (size + kPerGroup - 1) / kPerGroup,
+            kPerGroup * 16,
+            [&](int64_t group, const uint32_t* words) {
+              T u[4];
+              for (int j = 0; j < kPerGroup; ++j) {
+                u[j] = kPerGroup == 4 ? static_cast<T>(WordToUniform(words[j]))
+                                      : static_cast<T>(WordsToUniform(
+                                            words[2 * j], words[2 * j + 1]));
+              }
+              const int64_t first = group * kPerGroup;
+              const int count =
+                  static_cast<int>(std::min<int64_t>(kPerGroup, size - first));
+              for (int j = 0; j < count; j += 2) {
+                // 1 - u lies in (0, 1], so the logarithm is finite.
+                const T radius = std::sqrt(static_cast<T>(-2) *
+                                           std::log(static_cast<T>(1) - u[j]));
+                const T theta = kTwoPi * u[j + 1];
+                out[first + j] = mean + std * radius * std::cos(theta);
+                if (j + 1 < count) {
+                  out[first + j + 1] = mean + std * radius * std::sin(theta);
+                }
+              }
+            });
+}
+
+// Bernoulli keep mask: mask[i] = 0 with probability p, else 1; every value
+// takes one word. fn(i, keep) is called for each element after its mask is
+// set, for the caller to write the matching output.
+template <typename F>
+void DropoutMaskFill(
+    uint64_t key, float p, int64_t size, uint8_t* mask, F&& fn) {
+  PhiloxFor(key, (size + 3) / 4, 8, [&](int64_t group, const uint32_t* words) {
+    const int64_t first = group * 4;
+    const int count = static_cast<int>(std::min<int64_t>(4, size - first));
+    for (int j = 0; j < count; ++j) {
+      const bool keep = WordToUniform(words[j]) >= p;
+      mask[first + j] = keep ? 1 : 0;
+      fn(first + j, keep);
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,397 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <limits>
+#include <type_traits>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// Type used to accumulate a reduction over T: float16/bfloat16 and float
+// accumulate in float, everything else in its own type.
+template <typename T>
+struct ReduceAccType {
+  using type =
+      typename std::conditional<std::is_arithmetic<T>::value, T, float>::type;
+};
+
+// Reducers describe one reduction. Besides the associative Combine they
+// provide AccumulateRow, which folds a contiguous input row into a row of
+// accumulators (with a compensation row for Kahan summation), and Finalize,
+// which turns the accumulated value of `count` inputs into the result.
+
+template <typename AccT>
+struct SumReducer {
+  AccT Identity() const { return static_cast<AccT>(0); }
+
+  AccT Combine(AccT a, AccT b) const { return a + b; }
+
+  template <typename InT>
+  void AccumulateRow(AccT* acc, AccT* comp, const InT* x, int64_t n) const {
+    if (std::is_integral<AccT>::value) {
+      for (int64_t i = 0; i < n; ++i) {
+        acc[i] += static_cast<AccT>(x[i]);
+      }
+      return;
+    }
+    for (int64_t i = 0; i < n; ++i) {
+      const AccT y = static_cast<AccT>(x[i]) - comp[i];
+      const AccT t = acc[i] + y;
+      comp[i] = (t - acc[i]) - y;
+      acc[i] = t;
+    }
+  }
+
+  AccT Finalize(AccT acc, int64_t count) const { return acc; }
+};
+
+template <typename AccT>
+struct MeanReducer : public SumReducer<AccT> {
+  AccT Finalize(AccT acc, int64_t count) const {
+    return acc / static_cast<AccT>(count);
+  }
+};
+
+template <typename AccT>
+struct MinReducer {
+  AccT Identity() const { return std::numeric_limits<AccT>::max(); }
+
+  AccT Combine(AccT a, AccT b) const { return b < a ? b : a; }
+
+  template <typename InT>
+  void AccumulateRow(AccT* acc, AccT* comp, const InT* x, int64_t n) const {
+    for (int64_t i = 0; i < n; ++i) {
+      acc[i] = Combine(acc[i], static_cast<AccT>(x[i]));
+    }
+  }
+
+  AccT Finalize(AccT acc, int64_t count) const { return acc; }
+};
+
+template <typename AccT>
+struct MaxReducer {
+  AccT Identity() const { return std::numeric_limits<AccT>::lowest(); }
+
+  AccT Combine(AccT a, AccT b) const { return b > a ? b : a; }
+
+  template <typename InT>
+  void AccumulateRow(AccT* acc, AccT* comp, const InT* x, int64_t n) const {
+    for (int64_t i = 0; i < n; ++i) {
+      acc[i] = Combine(acc[i], static_cast<AccT>(x[i]));
+    }
+  }
+
+  AccT Finalize(AccT acc, int64_t count) const { return acc; }
+};
+
+namespace detail {
+
+// Rows longer than this are reduced in fixed-size blocks that can be spread
+// over threads. The blocking does not depend on the thread count, so results
+// are reproducible across FLAGS_custom_cpu_num_threads settings.
+constexpr int64_t kReduceBlock = 16384;
+// Number of inner elements reduced together by one task.
+constexpr int64_t kReduceColumns = 256;
+// Independent accumulators in the contiguous base case; wide enough for the
+// compiler to keep a full vector register per accumulator group.
+constexpr int kReduceLanes = 16;
+
+// Reduces a contiguous row with pairwise (cascade) combination, which keeps
+// the rounding error of sums at O(log n) instead of O(n).
+template <typename InT, typename AccT, typename Reducer>
+AccT ReduceContiguous(const InT* x, int64_t n, const Reducer& reducer) {
+  if (n <= 8 * kReduceLanes) {
+    AccT lanes[kReduceLanes];
+    for (int l = 0; l < kReduceLanes; ++l) {
+      lanes[l] = reducer.Identity();
+    }
+    int64_t i = 0;
+    for (; i + kReduceLanes <= n; i += kReduceLanes) {
+      for (int l = 0; l < kReduceLanes; ++l) {
+        lanes[l] = reducer.Combine(lanes[l], static_cast<AccT>(x[i + l]));
+      }
+    }
+    for (int l = 0; i < n; ++i, ++l) {
+      lanes[l] = reducer.Combine(lanes[l], static_cast<AccT>(x[i]));
+    }
+    for (int width = kReduceLanes / 2; width > 0; width /= 2) {
+      for (int l = 0; l < width; ++l) {
+        lanes[l] = reducer.Combine(lanes[l], lanes[l + width]);
+      }
+    }
+    return lanes[0];
+  }
+  // Split on a multiple of the lane count so that the base cases stay full.
+  const int64_t half = (n / 2 + kReduceLanes - 1) / kReduceLanes * kReduceLanes;
+  return reducer.Combine(
+      ReduceContiguous<InT, AccT>(x, half, reducer),
+      ReduceContiguous<InT, AccT>(x + half, n - half, reducer));
+}
+
+// out[o] = reduce(x[o, 0:reduce]) for a row-major [outer, reduce] input.
+template <typename InT, typename AccT, typename Reducer>
+void ReduceLastAxis(const InT* x,
+                    int64_t outer,
+                    int64_t reduce,
+                    const Reducer& reducer,
+                    AccT* out) {
+  const int64_t num_blocks = (reduce + kReduceBlock - 1) / kReduceBlock;
+  if (num_blocks == 1) {
+    ParallelFor(0, outer, GrainSize(reduce), [&](int64_t begin, int64_t end) {
+      for (auto o = begin; o < end; ++o) {
+        out[o] = ReduceContiguous<InT, AccT>(x + o * reduce, reduce, reducer);
+      }
+    });
+    return;
+  }
+  // Long rows: reduce fixed-size blocks in parallel, then the partials.
+  std::vector<AccT> partial(outer * num_blocks);
+  ParallelFor(0, outer * num_blocks, 1, [&](int64_t begin, int64_t end) {
+    for (auto t = begin; t < end; ++t) {
+      const int64_t o = t / num_blocks;
+      const int64_t start = t % num_blocks * kReduceBlock;
+      const int64_t n = std::min(kReduceBlock, reduce - start);
+      partial[t] =
+          ReduceContiguous<InT, AccT>(x + o * reduce + start, n, reducer);
+    }
+  });
+  ReduceLastAxis<AccT, AccT>(partial.data(), outer, num_blocks, reducer, out);
+}
+
+// Folds rows [row_begin, row_end) of a [reduce, inner] slab into
+// out[0:n] for the columns [col, col + n).
+template <typename InT, typename AccT, typename Reducer>
+void ReduceColumns(const InT* x,
+                   int64_t row_begin,
+                   int64_t row_end,
+                   int64_t inner,
+                   int64_t col,
+                   int64_t n,
+                   const Reducer& reducer,
+                   AccT* out) {
+  AccT acc[kReduceColumns];
+  AccT comp[kReduceColumns];
+  for (int64_t i = 0; i < n; ++i) {
+    acc[i] = reducer.Identity();
+    comp[i] = static_cast<AccT>(0);
+  }
+  for (auto r = row_begin; r < row_end; ++r) {
+    reducer.AccumulateRow(acc, comp, x + r * inner + col, n);
+  }
+  for (int64_t i = 0; i < n; ++i) {
+    out[i] = acc[i];
+  }
+}
+
+// out[o, i] = reduce(x[o, 0:reduce, i]) for a row-major [outer, reduce,
+// inner] input with inner > 1.
+template <typename InT, typename AccT, typename Reducer>
+void ReduceMiddleAxis(const InT* x,
+                      int64_t outer,
+                      int64_t reduce,
+                      int64_t inner,
+                      const Reducer& reducer,
+                      AccT* out) {
+  const int64_t col_chunks = (inner + kReduceColumns - 1) / kReduceColumns;
+  const int64_t num_tasks = outer * col_chunks;
+  const int64_t rows_per_block =
+      std::max<int64_t>(1, kReduceBlock / std::min(inner, kReduceColumns));
+  const int64_t num_blocks = (reduce + rows_per_block - 1) / rows_per_block;
+
+  if (num_blocks == 1) {
+    ParallelFor(0,
+                num_tasks,
+                GrainSize(reduce * kReduceColumns),
+                [&](int64_t begin, int64_t end) {
+                  for (auto t = begin; t < end; ++t) {
+                    const int64_t o = t / col_chunks;
+                    const int64_t col = t % col_chunks * kReduceColumns;
+                    const int64_t n = std::min(kReduceColumns, inner - col);
+                    ReduceColumns<InT, AccT>(x + o * reduce * inner,
+                                             0,
+                                             reduce,
+                                             inner,
+                                             col,
+                                             n,
+                                             reducer,
+                                             out + o * inner + col);
+                  }
+                });
+    return;
+  }
+  // Many rows: reduce fixed-size row blocks in parallel into
+  // [outer, num_blocks, inner] partials, then reduce those.
+  std::vector<AccT> partial(outer * num_blocks * inner);
+  ParallelFor(0, num_tasks * num_blocks, 1, [&](int64_t begin, int64_t end) {
+    for (auto t = begin; t < end; ++t) {
+      const int64_t block = t % num_blocks;
+      const int64_t o = t / num_blocks / col_chunks;
+      const int64_t col = t / num_blocks % col_chunks * kReduceColumns;
+      const int64_t n = std::min(kReduceColumns, inner - col);
+      const int64_t row_begin = block * rows_per_block;
+      const int64_t row_end = std::min(row_begin + rows_per_block, reduce);
+      ReduceColumns<InT, AccT>(
+          x + o * reduce * inner,
+          row_begin,
+          row_end,
+          inner,
+          col,
+          n,
+          reducer,
+          partial.data() + (o * num_blocks + block) * inner + col);
+    }
+  });
+  ReduceMiddleAxis<AccT, AccT>(
+      partial.data(), outer, num_blocks, inner, reducer, out);
+}
+
+template <typename InT, typename AccT, typename Reducer>
+void ReducePass(const InT* x,
+                int64_t outer,
+                int64_t reduce,
+                int64_t inner,
+                const Reducer& reducer,
+                AccT* out) {
+  if (inner == 1) {
+    ReduceLastAxis<InT, AccT>(x, outer, reduce, reducer, out);
+  } else {
+    ReduceMiddleAxis<InT, AccT>(x, outer, reduce, inner, reducer, out);
+  }
+}
+
+// Merges neighbouring dimensions that are both reduced or both kept and
+// drops size-1 dimensions.
+inline void CollapseReduceDims(const std::vector<int64_t>& dims,
+                               const std::vector<bool>& reduced,
+                               std::vector<int64_t>* out_dims,
+                               std::vector<bool>* out_reduced) {
+  out_dims->clear();
+  out_reduced->clear();
+  for (size_t i = 0; i < dims.size(); ++i) {
+    if (dims[i] == 1) {
+      continue;
+    }
+    if (!out_dims->empty() && out_reduced->back() == reduced[i]) {
+      out_dims->back() *= dims[i];
+    } else {
+      out_dims->push_back(dims[i]);
+      out_reduced->push_back(reduced[i]);
+    }
+  }
+}
+
+}  // namespace detail
+
+// Reduces x with shape `dims` over `reduce_dims` (non-negative, any order)
+// and writes the kept dimensions, in order, to out.
+//
+// The shape is collapsed into alternating kept/reduced groups. Each reduced
+// group is one (outer, reduce, inner) pass, innermost group first; passes
+// between groups go through an accumulator-typed scratch buffer, and only the
+// last pass converts to T.
+template <typename T, typename Reducer>
+void Reduce(const T* x,
+            const std::vector<int64_t>& dims,
+            const std::vector<int64_t>& reduce_dims,
+            const Reducer& reducer,
+            T* out) {
+  using AccT = typename ReduceAccType<T>::type;
+  std::vector<bool> is_reduced(dims.size(), false);
+  for (auto d : reduce_dims) {
+    is_reduced[d] = true;
+  }
+  std::vector<int64_t> shape;
+  std::vector<bool> reduced;
+  detail::CollapseReduceDims(dims, is_reduced, &shape, &reduced);
+
+  int64_t out_numel = 1;
+  int64_t count = 1;
+  for (size_t i = 0; i < shape.size(); ++i) {
+    (reduced[i] ? count : out_numel) *= shape[i];
+  }
+  for (size_t i = 0; i < dims.size(); ++i) {
+    if (dims[i] == 0 && !is_reduced[i]) {
+      return;
+    }
+  }
+
+  std::vector<AccT> acc(out_numel);
+  if (count == 0) {
+    std::fill(acc.begin(), acc.end(), reducer.Identity());
+  } else {
+    bool first = true;
+    std::vector<AccT> buffer;
+    while (true) {
+      int last = -1;
+      for (int i = static_cast<int>(shape.size()) - 1; i >= 0; --i) {
+        if (reduced[i]) {
+          last = i;
+          break;
+        }
+      }
+      if (last < 0) {
+        if (first) {
+          // Nothing to reduce.
+          for (int64_t i = 0; i < out_numel; ++i) {
+            acc[i] = static_cast<AccT>(x[i]);
+          }
+        }
+        break;
+      }
+      int64_t outer = 1;
+      int64_t inner = 1;
+      for (int i = 0; i < last; ++i) {
+        outer *= shape[i];
+      }
+      for (size_t i = last + 1; i < shape.size(); ++i) {
+        inner *= shape[i];
+      }
+      std::vector<AccT> next(outer * inner);
+      if (first) {
+        detail::ReducePass<T, AccT>(
+            x, outer, shape[last], inner, reducer, next.data());
+      } else {
+        detail::ReducePass<AccT, AccT>(
+            buffer.data(), outer, shape[last], inner, reducer, next.data());
+      }
+      buffer.swap(next);
+      first = false;
+
+      std::vector<int64_t> remaining_dims(shape);
+      std::vector<bool> remaining_reduced(reduced);
+      remaining_dims[last] = 1;
+      detail::CollapseReduceDims(
+          remaining_dims, remaining_reduced, &shape, &reduced);
+    }
+    if (!first) {
+      acc.swap(buffer);
+    }
+  }
+
+  ParallelFor(0, out_numel, GrainSize(1), [&](int64_t begin, int64_t end) {
+    for (auto i = begin; i < end; ++i) {
+      out[i] = static_cast<T>(reducer.Finalize(acc[i], count));
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
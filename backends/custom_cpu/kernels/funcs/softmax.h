@@ -0,0 +1,303 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <limits>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+namespace detail {
+
+// x - max is clipped to this before exp, as the reference implementation
+// does, so that log(softmax) stays finite.
+constexpr double kSoftmaxClip = -64.0;
+// Contiguous elements handled per online step on the last-axis path.
+constexpr int64_t kSoftmaxBlock = 256;
+// Inner columns handled per task, and axis rows per online step, on the
+// strided path.
+constexpr int64_t kSoftmaxColumns = 128;
+constexpr int64_t kSoftmaxRows = 16;
+// Independent accumulators for the contiguous reductions.
+constexpr int kSoftmaxLanes = 16;
+
+// exp(x) for float without branches or library calls, so that loops over it
+// vectorise. Cephes-style range reduction and polynomial, relative error
+// below 1e-7. x must lie in [-87, 88] or be NaN, which gives NaN as
+// std::exp does; callers clamp it in a separate loop, since GCC will not
+// if-convert a float comparison feeding the polynomial, with
+// std::max(x, clip), which lets NaN through.
+inline float Exp(float x) {
+  // Adding 1.5 * 2^23 rounds x / ln(2) to the nearest integer k and leaves
+  // k + 0x400000 in the mantissa. Unlike a conversion to int, which is
+  // undefined for NaN, this keeps NaN flowing into r and the result.
+  constexpr float kRound = 12582912.0f;
+  const float shifted = x * 1.44269504088896341f + kRound;
+  uint32_t k_bits;
+  memcpy(&k_bits, &shifted, sizeof(k_bits));
+  const float n = shifted - kRound;
+  const float r = (x - n * 0.693359375f) + n * 2.12194440e-4f;
+  float p = 1.9875691500e-4f;
+  p = p * r + 1.3981999507e-3f;
+  p = p * r + 8.3334519073e-3f;
+  p = p * r + 4.1665795894e-2f;
+  p = p * r + 1.6666665459e-1f;
+  p = p * r + 5.0000001201e-1f;
+  p = p * r * r + r + 1.0f;
+  // 2^k, in unsigned arithmetic so that the bits of a NaN wrap harmlessly.
+  const uint32_t bits = (k_bits - 0x4B400000u + 127u) << 23;
+  float scale;
+  memcpy(&scale, &bits, sizeof(scale));
+  return p * scale;
+}
+
+inline double Exp(double x) { return std::exp(x); }
+
+template <typename T>
+inline T ClippedExp(T x) {
+  return Exp(std::max(x, static_cast<T>(kSoftmaxClip)));
+}
+
+// Per-thread scratch space, grown on demand and reused across calls.
+template <typename T>
+T* SoftmaxScratch(size_t size) {
+  thread_local std::vector<T> buffer;
+  if (buffer.size() < size) {
+    buffer.resize(size);
+  }
+  return buffer.data();
+}
+
+template <typename T>
+T MaxOf(const T* x, int64_t n, T init) {
+  T lanes[kSoftmaxLanes];
+  for (int l = 0; l < kSoftmaxLanes; ++l) {
+    lanes[l] = init;
+  }
+  int64_t i = 0;
+  for (; i + kSoftmaxLanes <= n; i += kSoftmaxLanes) {
+    for (int l = 0; l < kSoftmaxLanes; ++l) {
+      lanes[l] = std::max(lanes[l], x[i + l]);
+    }
+  }
+  for (int l = 0; i < n; ++i, ++l) {
+    lanes[l] = std::max(lanes[l], x[i]);
+  }
+  T result = init;
+  for (int l = 0; l < kSoftmaxLanes; ++l) {
+    result = std::max(result, lanes[l]);
+  }
+  return result;
+}
+
+// y = exp(max(x - shift, -64)) and returns the sum of y.
+template <typename T>
+T ExpAndSum(const T* x, T* y, int64_t n, T shift) {
+  const T clip = static_cast<T>(kSoftmaxClip);
+  for (int64_t i = 0; i < n; ++i) {
+    y[i] = std::max(x[i] - shift, clip);
+  }
+  T lanes[kSoftmaxLanes] = {};
+  int64_t i = 0;
+  for (; i + kSoftmaxLanes <= n; i += kSoftmaxLanes) {
+    for (int l = 0; l < kSoftmaxLanes; ++l) {
+      y[i + l] = Exp(y[i + l]);
+      lanes[l] += y[i + l];
+    }
+  }
+  for (int l = 0; i < n; ++i, ++l) {
+    y[i] = Exp(y[i]);
+    lanes[l] += y[i];
+  }
+  T sum = 0;
+  for (int l = 0; l < kSoftmaxLanes; ++l) {
+    sum += lanes[l];
+  }
+  return sum;
+}
+
+// Softmax of one contiguous row. The first pass walks the row in blocks,
+// keeping a running max and a running sum that is rescaled whenever the max
+// grows, and writes exp(x - running max) to y; the block maxima go to the
+// scratch buffer. The second pass only rescales y, so every element is read
+// once from x and exponentiated once.
+template <typename T>
+void SoftmaxRow(const T* x, T* y, int64_t n, T* row_max, T* row_log_sum) {
+  const int64_t num_blocks = (n + kSoftmaxBlock - 1) / kSoftmaxBlock;
+  T* block_max = SoftmaxScratch<T>(num_blocks);
+  T max_val = std::numeric_limits<T>::lowest();
+  T sum = 0;
+  for (int64_t b = 0; b < num_blocks; ++b) {
+    const int64_t start = b * kSoftmaxBlock;
+    const int64_t len = std::min(kSoftmaxBlock, n - start);
+    const T new_max = MaxOf(x + start, len, max_val);
+    if (new_max > max_val) {
+      sum *= ClippedExp(max_val - new_max);
+      max_val = new_max;
+    }
+    sum += ExpAndSum(x + start, y + start, len, max_val);
+    block_max[b] = max_val;
+  }
+  const T inv_sum = static_cast<T>(1) / sum;
+  for (int64_t b = 0; b < num_blocks; ++b) {
+    const int64_t start = b * kSoftmaxBlock;
+    const int64_t len = std::min(kSoftmaxBlock, n - start);
+    const T scale = block_max[b] == max_val
+                        ? inv_sum
+                        : ClippedExp(block_max[b] - max_val) * inv_sum;
+    for (int64_t i = start; i < start + len; ++i) {
+      y[i] *= scale;
+    }
+  }
+  if (row_max != nullptr) {
+    *row_max = max_val;
+    *row_log_sum = std::log(sum);
+  }
+}
+
+// Softmax over the rows of a [axis_dim, inner] slab for the n columns
+// starting at col. Same online scheme as SoftmaxRow, with blocks of
+// kSoftmaxRows rows and all loops running along the contiguous columns.
+template <typename T>
+void SoftmaxColumns(const T* x,
+                    T* y,
+                    int64_t axis_dim,
+                    int64_t inner,
+                    int64_t col,
+                    int64_t n,
+                    T* row_max,
+                    T* row_log_sum) {
+  const int64_t num_blocks = (axis_dim + kSoftmaxRows - 1) / kSoftmaxRows;
+  const T clip = static_cast<T>(kSoftmaxClip);
+  T* max_val = SoftmaxScratch<T>((num_blocks + 3) * n);
+  T* sum = max_val + n;
+  T* block_max = sum + n;
+  T* new_max = block_max + num_blocks * n;
+  for (int64_t k = 0; k < n; ++k) {
+    max_val[k] = std::numeric_limits<T>::lowest();
+    sum[k] = 0;
+  }
+  for (int64_t b = 0; b < num_blocks; ++b) {
+    const int64_t j0 = b * kSoftmaxRows;
+    const int64_t j1 = std::min(j0 + kSoftmaxRows, axis_dim);
+    for (int64_t k = 0; k < n; ++k) {
+      new_max[k] = max_val[k];
+    }
+    for (auto j = j0; j < j1; ++j) {
+      const T* xr = x + j * inner + col;
+      for (int64_t k = 0; k < n; ++k) {
+        new_max[k] = std::max(new_max[k], xr[k]);
+      }
+    }
+    for (int64_t k = 0; k < n; ++k) {
+      sum[k] *= ClippedExp(max_val[k] - new_max[k]);
+      max_val[k] = new_max[k];
+    }
+    for (auto j = j0; j < j1; ++j) {
+      const T* xr = x + j * inner + col;
+      T* yr = y + j * inner + col;
+      for (int64_t k = 0; k < n; ++k) {
+        yr[k] = std::max(xr[k] - max_val[k], clip);
+      }
+      for (int64_t k = 0; k < n; ++k) {
+        yr[k] = Exp(yr[k]);
+        sum[k] += yr[k];
+      }
+    }
+    for (int64_t k = 0; k < n; ++k) {
+      block_max[b * n + k] = max_val[k];
+    }
+  }
+  for (int64_t b = 0; b < num_blocks; ++b) {
+    const int64_t j0 = b * kSoftmaxRows;
+    const int64_t j1 = std::min(j0 + kSoftmaxRows, axis_dim);
+    for (int64_t k = 0; k < n; ++k) {
+      new_max[k] = ClippedExp(block_max[b * n + k] - max_val[k]) / sum[k];
+    }
+    for (auto j = j0; j < j1; ++j) {
+      T* yr = y + j * inner + col;
+      for (int64_t k = 0; k < n; ++k) {
+        yr[k] *= new_max[k];
+      }
+    }
+  }
+  if (row_max != nullptr) {
+    for (int64_t k = 0; k < n; ++k) {
+      row_max[k] = max_val[k];
+      row_log_sum[k] = std::log(sum[k]);
+    }
+  }
+}
+
+}  // namespace detail
+
+// Softmax over the middle axis of a row-major [outer, axis_dim, inner]
+// tensor. If row_max and row_log_sum are given, they receive, for each of the
+// outer * inner softmax groups, the maximum and log(sum(exp(x - max))), so
+// that log_softmax(x) = max(x - row_max, -64) - row_log_sum can be formed
+// without taking the log of a rounded probability.
+template <typename T>
+void Softmax(const T* x,
+             T* y,
+             int64_t outer,
+             int64_t axis_dim,
+             int64_t inner,
+             T* row_max = nullptr,
+             T* row_log_sum = nullptr) {
+  if (inner == 1) {
+    ParallelFor(
+        0, outer, GrainSize(axis_dim * 8), [&](int64_t begin, int64_t end) {
+          for (auto o = begin; o < end; ++o) {
+            detail::SoftmaxRow(x + o * axis_dim,
+                               y + o * axis_dim,
+                               axis_dim,
+                               row_max ? row_max + o : nullptr,
+                               row_log_sum ? row_log_sum + o : nullptr);
+          }
+        });
+    return;
+  }
+  const int64_t col_chunks =
+      (inner + detail::kSoftmaxColumns - 1) / detail::kSoftmaxColumns;
+  ParallelFor(
+      0,
+      outer * col_chunks,
+      GrainSize(axis_dim * detail::kSoftmaxColumns * 8),
+      [&](int64_t begin, int64_t end) {
+        for (auto t = begin; t < end; ++t) {
+          const int64_t o = t / col_chunks;
+          const int64_t col = t % col_chunks * detail::kSoftmaxColumns;
+          const int64_t n = std::min(detail::kSoftmaxColumns, inner - col);
+          const int64_t group = o * inner + col;
+          detail::SoftmaxColumns(x + o * axis_dim * inner,
+                                 y + o * axis_dim * inner,
+                                 axis_dim,
+                                 inner,
+                                 col,
+                                 n,
+                                 row_max ? row_max + group : nullptr,
+                                 row_log_sum ? row_log_sum + group : nullptr);
+        }
+      });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,281 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <type_traits>
+#include <utility>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+// Sorting and top-k selection along one axis of a tensor viewed as
+// [outer, n, inner]. Every (outer, inner) pair is an independent row of n
+// elements, inner apart, and rows are spread over the thread pool.
+//
+// Values are first mapped to unsigned keys whose integer order is the sort
+// order: floats get their sign bit flipped (and the other bits too when
+// negative), NaN becomes the largest key and -0 the key of +0, and descending
+// order inverts the keys. Comparisons after that are plain integer compares,
+// and long rows are sorted with an LSD radix sort on the keys.
+
+namespace custom_kernel {
+namespace funcs {
+
+namespace detail {
+
+template <typename T, typename Enable = void>
+struct SortKey;
+
+template <typename T>
+struct SortKey<T, typename std::enable_if<std::is_integral<T>::value>::type> {
+  using type = typename std::make_unsigned<T>::type;
+  static type Of(T v) {
+    return std::is_signed<T>::value
+               ? static_cast<type>(v) ^ (type(1) << (sizeof(T) * 8 - 1))
+               : static_cast<type>(v);
+  }
+};
+
+template <typename T>
+struct SortKey<
+    T,
+    typename std::enable_if<std::is_floating_point<T>::value>::type> {
+  using type = typename std::
+      conditional<sizeof(T) == sizeof(uint32_t), uint32_t, uint64_t>::type;
+  static type Of(T v) {
+    constexpr type kSign = type(1) << (sizeof(T) * 8 - 1);
+    if (std::isnan(v)) {
+      return ~type(0);
+    }
+    if (v == static_cast<T>(0)) {
+      return kSign;
+    }
+    type bits;
+    std::memcpy(&bits, &v, sizeof(T));
+    return (bits & kSign) ? ~bits : bits | kSign;
+  }
+};
+
+// Rows shorter than this are sorted with std::sort on the keys.
+constexpr int64_t kRadixSortMinLength = 256;
+
+// Sorts the (key, index) pairs of one row by key, keeping equal keys in index
+// order. keys and ids hold the input; key_tmp and id_tmp are scratch of the
+// same length. The passes ping-pong between the two, so the sorted indices
+// end up in either buffer, and the one holding them is returned.
+template <typename K>
+const int64_t* RadixSortPairs(
+    int64_t n, K* keys, int64_t* ids, K* key_tmp, int64_t* id_tmp) {
+  constexpr int kPasses = sizeof(K);
+  // All digit histograms come from a single scan of the keys.
+  std::vector<int64_t> counts(kPasses * 256, 0);
+  for (int64_t i = 0; i < n; ++i) {
+    K key = keys[i];
+    for (int p = 0; p < kPasses; ++p) {
+      ++counts[p * 256 + ((key >> (8 * p)) & 0xff)];
+    }
+  }
+  for (int p = 0; p < kPasses; ++p) {
+    int64_t* count = counts.data() + p * 256;
+    // A digit shared by every key does not reorder anything.
+    if (count[(keys[0] >> (8 * p)) & 0xff] == n) {
+      continue;
+    }
+    int64_t offset = 0;
+    for (int d = 0; d < 256; ++d) {
+      const int64_t c = count[d];
+      count[d] = offset;
+      offset += c;
+    }
+    for (int64_t i = 0; i < n; ++i) {
+      const int64_t pos = count[(keys[i] >> (8 * p)) & 0xff]++;
+      key_tmp[pos] = keys[i];
+      id_tmp[pos] = ids[i];
+    }
+    std::swap(keys, key_tmp);
+    std::swap(ids, id_tmp);
+  }
+  return ids;
+}
+
+template <typename T>
+int64_t SortRowCost(int64_t n) {
+  return n < kRadixSortMinLength ? n * 8 : n * (2 * sizeof(T) + 4);
+}
+
+}  // namespace detail
+
+// Sorts every row of n elements (inner apart, rows laid out as
+// [outer, n, inner]) ascending or descending. NaN sorts after every number in
+// ascending order and before them in descending order, and equal values keep
+// their original order. out receives the values and indices the positions
+// they came from.
+template <typename T>
+void SortAlongAxis(const T* in,
+                   int64_t outer,
+                   int64_t n,
+                   int64_t inner,
+                   bool descending,
+                   T* out,
+                   int64_t* indices) {
+  using K = typename detail::SortKey<T>::type;
+  const int64_t rows = outer * inner;
+  ParallelFor(
+      0,
+      rows,
+      GrainSize(detail::SortRowCost<T>(n)),
+      [&](int64_t begin, int64_t end) {
+        std::vector<K> keys(2 * n);
+        std::vector<int64_t> ids(2 * n);
+        std::vector<std::pair<K, int64_t>> pairs;
+        for (int64_t row = begin; row < end; ++row) {
+          const int64_t base = row / inner * n * inner + row % inner;
+          const T* src = in + base;
+          const K flip = descending ? ~K(0) : K(0);
+          const int64_t* sorted_ids = ids.data();
+          if (n < detail::kRadixSortMinLength) {
+            pairs.resize(n);
+            for (int64_t j = 0; j < n; ++j) {
+              pairs[j] = {detail::SortKey<T>::Of(src[j * inner]) ^ flip, j};
+            }
+            std::sort(pairs.begin(), pairs.end());
+            for (int64_t j = 0; j < n; ++j) {
+              ids[j] = pairs[j].second;
+            }
+          } else {
+            for (int64_t j = 0; j < n; ++j) {
+              keys[j] = detail::SortKey<T>::Of(src[j * inner]) ^ flip;
+              ids[j] = j;
+            }
+            sorted_ids = detail::RadixSortPairs(
+                n, keys.data(), ids.data(), keys.data() + n, ids.data() + n);
+          }
+          T* dst = out + base;
+          int64_t* dst_ids = indices + base;
+          for (int64_t j = 0; j < n; ++j) {
+            dst[j * inner] = src[sorted_ids[j] * inner];
+            dst_ids[j * inner] = sorted_ids[j];
+          }
+        }
+      });
+}
+
+// Writes the k largest (or smallest) elements of every row of n elements,
+// laid out as [outer, n, inner], to out and their positions to indices, which
+// are [outer, k, inner]. The result is ordered, largest first when largest is
+// set; NaN counts as larger than every number and ties go to the lower
+// position.
+//
+// A k much smaller than n keeps a heap of the best k keys while scanning the
+// row, which rejects most elements with a single compare. Otherwise the keys
+// of the row are partitioned with nth_element and the first k sorted, so no
+// row pays for a full sort.
+template <typename T>
+void TopKAlongAxis(const T* in,
+                   int64_t outer,
+                   int64_t n,
+                   int64_t inner,
+                   int64_t k,
+                   bool largest,
+                   T* out,
+                   int64_t* indices) {
+  using K = typename detail::SortKey<T>::type;
+  using Entry = std::pair<K, int64_t>;
+  if (k <= 0) {
+    return;
+  }
+  const int64_t rows = outer * inner;
+  const bool use_heap = k * 16 <= n;
+  ParallelFor(0, rows, GrainSize(n * 2), [&](int64_t begin, int64_t end) {
+    std::vector<Entry> entries;
+    entries.reserve(use_heap ? k : n);
+    // The best entries have the smallest keys.
+    const K flip = largest ? ~K(0) : K(0);
+    for (int64_t row = begin; row < end; ++row) {
+      const int64_t o = row / inner;
+      const int64_t i = row % inner;
+      const T* src = in + o * n * inner + i;
+      entries.clear();
+      if (use_heap) {
+        for (int64_t j = 0; j < k; ++j) {
+          entries.emplace_back(detail::SortKey<T>::Of(src[j * inner]) ^ flip,
+                               j);
+        }
+        std::make_heap(entries.begin(), entries.end());
+        for (int64_t j = k; j < n; ++j) {
+          const K key = detail::SortKey<T>::Of(src[j * inner]) ^ flip;
+          // Later positions lose ties, so only a strictly smaller key enters.
+          if (key < entries.front().first) {
+            std::pop_heap(entries.begin(), entries.end());
+            entries.back() = Entry(key, j);
+            std::push_heap(entries.begin(), entries.end());
+          }
+        }
+      } else {
+        for (int64_t j = 0; j < n; ++j) {
+          entries.emplace_back(detail::SortKey<T>::Of(src[j * inner]) ^ flip,
+                               j);
+        }
+        if (k < n) {
+          std::nth_element(
+              entries.begin(), entries.begin() + k - 1, entries.end());
+        }
+        entries.resize(k);
+      }
+      std::sort(entries.begin(), entries.end());
+      T* dst = out + o * k * inner + i;
+      int64_t* dst_ids = indices + o * k * inner + i;
+      for (int64_t j = 0; j < k; ++j) {
+        dst[j * inner] = src[entries[j].second * inner];
+        dst_ids[j * inner] = entries[j].second;
+      }
+    }
+  });
+}
+
+// Gradient of TopKAlongAxis: x_grad is zero except at the selected positions,
+// which receive the matching elements of out_grad.
+template <typename T>
+void TopKGradAlongAxis(const T* out_grad,
+                       const int64_t* indices,
+                       int64_t outer,
+                       int64_t n,
+                       int64_t inner,
+                       int64_t k,
+                       T* x_grad) {
+  const int64_t rows = outer * inner;
+  ParallelFor(0, rows, GrainSize(n), [&](int64_t begin, int64_t end) {
+    for (int64_t row = begin; row < end; ++row) {
+      const int64_t o = row / inner;
+      const int64_t i = row % inner;
+      T* dst = x_grad + o * n * inner + i;
+      const T* src = out_grad + o * k * inner + i;
+      const int64_t* ids = indices + o * k * inner + i;
+      for (int64_t j = 0; j < n; ++j) {
+        dst[j * inner] = static_cast<T>(0);
+      }
+      for (int64_t j = 0; j < k; ++j) {
+        dst[ids[j * inner] * inner] = src[j * inner];
+      }
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
@@ -0,0 +1,168 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/thread_pool.h"
+
+#include <atomic>
+#include <cstdlib>
+
+#include "runtime/profiler.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+namespace {
+
+thread_local bool in_parallel_region = false;
+
+int DefaultNumThreads() {
+  const char* env = std::getenv("FLAGS_custom_cpu_num_threads");
+  if (env != nullptr) {
+    int num_threads = static_cast<int>(std::strtol(env, nullptr, 10));
+    if (num_threads > 0) {
+      return num_threads;
+    }
+  }
+  return std::max(1, static_cast<int>(std::thread::hardware_concurrency()));
+}
+
+}  // namespace
+
+struct ThreadPool::Job {
+  const std::function<void(int64_t)>* fn;
+  int64_t num_tasks;
+  std::atomic<int64_t> next_task{0};
+  std::mutex error_mutex;
+  std::exception_ptr error;
+};
+
+ThreadPool& ThreadPool::Instance() {
+  // Intentionally leaked, so that worker threads are never joined while the
+  // plugin library is being unloaded.
+  static ThreadPool* pool = new ThreadPool(DefaultNumThreads());
+  return *pool;
+}
+
+bool ThreadPool::InParallelRegion() { return in_parallel_region; }
+
+void ThreadPool::SetNumThreads(int num_threads) {
+  const int max_threads = static_cast<int>(workers_.size()) + 1;
+  num_threads_ = std::min(std::max(num_threads, 1), max_threads);
+}
+
+ThreadPool::ThreadPool(int num_threads) : num_threads_(num_threads) {
+  for (int i = 1; i < num_threads; ++i) {
+    workers_.emplace_back([this] { WorkerLoop(); });
+  }
+}
+
+ThreadPool::~ThreadPool() {
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    stop_ = true;
+  }
+  work_cv_.notify_all();
+  for (auto& worker : workers_) {
+    worker.join();
+  }
+}
+
+void ThreadPool::RunTasks(Job* job) {
+  while (true) {
+    int64_t task_id = job->next_task.fetch_add(1);
+    if (task_id >= job->num_tasks) {
+      break;
+    }
+    try {
+      (*job->fn)(task_id);
+    } catch (...) {
+      std::lock_guard<std::mutex> lock(job->error_mutex);
+      if (!job->error) {
+        job->error = std::current_exception();
+      }
+    }
+  }
+}
+
+void ThreadPool::WorkerLoop() {
+  in_parallel_region = true;
+  uint64_t seen_generation = 0;
+  while (true) {
+    Job* job = nullptr;
+    {
+      std::unique_lock<std::mutex> lock(mutex_);
+      work_cv_.wait(lock, [&] {
+        return stop_ || (job_ != nullptr && generation_ != seen_generation);
+      });
+      if (stop_) {
+        return;
+      }
+      seen_generation = generation_;
+      job = job_;
+      ++busy_workers_;
+    }
+    RunTasks(job);
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      if (--busy_workers_ == 0) {
+        done_cv_.notify_all();
+      }
+    }
+  }
+}
+
+void ThreadPool::Run(int64_t num_tasks,
+                     const std::function<void(int64_t)>& fn) {
+  if (num_tasks <= 0) {
+    return;
+  }
+  std::unique_lock<std::mutex> run_lock(run_mutex_, std::try_to_lock);
+  if (num_tasks == 1 || workers_.empty() || NumThreads() == 1 ||
+      in_parallel_region || !run_lock.owns_lock()) {
+    for (int64_t i = 0; i < num_tasks; ++i) {
+      fn(i);
+    }
+    return;
+  }
+
+  // Traced as one kernel spanning the parallel region.
+  custom_runtime::RuntimeTraceScope trace("ParallelFor");
+  Job job;
+  job.fn = &fn;
+  job.num_tasks = num_tasks;
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    job_ = &job;
+    ++generation_;
+  }
+  work_cv_.notify_all();
+
+  in_parallel_region = true;
+  RunTasks(&job);
+  in_parallel_region = false;
+
+  {
+    std::unique_lock<std::mutex> lock(mutex_);
+    job_ = nullptr;
+    done_cv_.wait(lock, [this] { return busy_workers_ == 0; });
+  }
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "ParallelFor", 0, num_tasks);
+  if (job.error) {
+    std::rethrow_exception(job.error);
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
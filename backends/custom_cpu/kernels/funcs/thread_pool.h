@@ -0,0 +1,118 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <atomic>
+#include <condition_variable>
+#include <cstdint>
+#include <exception>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace custom_kernel {
+namespace funcs {
+
+// A fixed-size pool of worker threads shared by all custom_cpu kernels.
+// The calling thread always takes part in the work, so a pool of N threads
+// owns N - 1 workers. Calls made from inside a parallel region, or while
+// another thread is using the pool, run serially on the caller.
+//
+// The pool size is read once from FLAGS_custom_cpu_num_threads and defaults
+// to the number of hardware threads.
+class ThreadPool {
+ public:
+  static ThreadPool& Instance();
+
+  // Number of threads, including the caller, that parallel loops split
+  // their work across.
+  int NumThreads() const { return num_threads_.load(); }
+
+  // Limits parallel loops to num_threads threads, clamped to [1, pool size].
+  void SetNumThreads(int num_threads);
+
+  // Runs fn(task_id) for every task_id in [0, num_tasks) and blocks until
+  // all tasks have finished. The first exception thrown by a task is
+  // rethrown on the caller.
+  void Run(int64_t num_tasks, const std::function<void(int64_t)>& fn);
+
+  static bool InParallelRegion();
+
+ private:
+  struct Job;
+
+  explicit ThreadPool(int num_threads);
+  ~ThreadPool();
+
+  ThreadPool(const ThreadPool&) = delete;
+  ThreadPool& operator=(const ThreadPool&) = delete;
+
+  void WorkerLoop();
+  static void RunTasks(Job* job);
+
+  std::vector<std::thread> workers_;
+  std::atomic<int> num_threads_;
+  std::mutex run_mutex_;
+  std::mutex mutex_;
+  std::condition_variable work_cv_;
+  std::condition_variable done_cv_;
+  Job* job_ = nullptr;
+  uint64_t generation_ = 0;
+  int busy_workers_ = 0;
+  bool stop_ = false;
+};
+
+// Minimum amount of work, in units of roughly one simple arithmetic operation
+// per element, that is worth handing to another thread.
+constexpr int64_t kMinParallelCost = 32768;
+
+// Grain size for a parallel loop whose iterations cost about
+// cost_per_element units each: loops smaller than kMinParallelCost in total
+// stay on the calling thread.
+inline int64_t GrainSize(int64_t cost_per_element) {
+  return std::max<int64_t>(
+      1, kMinParallelCost / std::max<int64_t>(cost_per_element, 1));
+}
+
+// Splits [begin, end) into at most NumThreads() contiguous chunks of at least
+// grain_size elements and calls fn(chunk_begin, chunk_end) on each of them.
+template <typename F>
+void ParallelFor(int64_t begin, int64_t end, int64_t grain_size, F&& fn) {
+  if (begin >= end) {
+    return;
+  }
+  auto& pool = ThreadPool::Instance();
+  const int64_t n = end - begin;
+  grain_size = std::max<int64_t>(grain_size, 1);
+  const int64_t max_tasks = (n + grain_size - 1) / grain_size;
+  const int64_t num_tasks = std::min<int64_t>(pool.NumThreads(), max_tasks);
+  if (num_tasks <= 1 || ThreadPool::InParallelRegion()) {
+    fn(begin, end);
+    return;
+  }
+  const int64_t chunk = (n + num_tasks - 1) / num_tasks;
+  pool.Run(num_tasks, [&](int64_t task_id) {
+    int64_t task_begin = begin + task_id * chunk;
+    int64_t task_end = std::min(task_begin + chunk, end);
+    if (task_begin < task_end) {
+      fn(task_begin, task_end);
+    }
+  });
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
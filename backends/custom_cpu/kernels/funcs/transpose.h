@@ -0,0 +1,278 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "kernels/funcs/thread_pool.h"
+
+namespace custom_kernel {
+namespace funcs {
+
+// A permutation reduced to its essential form: size-1 axes are dropped and
+// input axes that stay adjacent and in order in the output are merged, e.g.
+// [N, C, H, W] -> [N, H, W, C] becomes [N, C, H*W] -> [N, H*W, C].
+struct TransposePlan {
+  std::vector<int64_t> dims;  // input dims after coalescing
+  std::vector<int> perm;      // out axis i reads input axis perm[i]
+
+  bool is_identity() const {
+    for (size_t i = 0; i < perm.size(); ++i) {
+      if (perm[i] != static_cast<int>(i)) {
+        return false;
+      }
+    }
+    return true;
+  }
+};
+
+inline TransposePlan MakeTransposePlan(const std::vector<int64_t>& in_dims,
+                                       const std::vector<int>& perm) {
+  const int rank = static_cast<int>(in_dims.size());
+  // Drop size-1 axes and renumber the remaining ones.
+  std::vector<int> new_axis(rank, -1);
+  std::vector<int64_t> dims;
+  for (int i = 0; i < rank; ++i) {
+    if (in_dims[i] != 1) {
+      new_axis[i] = static_cast<int>(dims.size());
+      dims.push_back(in_dims[i]);
+    }
+  }
+  std::vector<int> squeezed;
+  for (int i = 0; i < rank; ++i) {
+    if (new_axis[perm[i]] >= 0) {
+      squeezed.push_back(new_axis[perm[i]]);
+    }
+  }
+
+  // Merge runs of consecutive input axes. merged_into[a] is the merged axis
+  // that input axis a belongs to, or -1 if a is folded into its predecessor.
+  std::vector<bool> starts_run(dims.size(), true);
+  for (size_t i = 1; i < squeezed.size(); ++i) {
+    if (squeezed[i] == squeezed[i - 1] + 1) {
+      starts_run[squeezed[i]] = false;
+    }
+  }
+  TransposePlan plan;
+  std::vector<int> merged_into(dims.size(), -1);
+  for (size_t a = 0; a < dims.size(); ++a) {
+    if (starts_run[a]) {
+      merged_into[a] = static_cast<int>(plan.dims.size());
+      plan.dims.push_back(dims[a]);
+    } else {
+      plan.dims.back() *= dims[a];
+    }
+  }
+  for (auto a : squeezed) {
+    if (merged_into[a] >= 0) {
+      plan.perm.push_back(merged_into[a]);
+    }
+  }
+  return plan;
+}
+
+namespace detail {
+
+// Edge of the square tiles used when the innermost axis moves.
+constexpr int64_t kTransposeTile = 64;
+
+inline std::vector<int64_t> ContiguousStrides(
+    const std::vector<int64_t>& dims) {
+  std::vector<int64_t> strides(dims.size(), 1);
+  for (int i = static_cast<int>(dims.size()) - 1; i > 0; --i) {
+    strides[i - 1] = strides[i] * dims[i];
+  }
+  return strides;
+}
+
+// Innermost input axis stays innermost: copy contiguous rows.
+template <typename T>
+void TransposeRows(const T* in, T* out, const TransposePlan& plan) {
+  const int rank = static_cast<int>(plan.dims.size());
+  const int64_t row_size = plan.dims.back();
+  const auto in_strides = ContiguousStrides(plan.dims);
+  std::vector<int64_t> out_dims(rank - 1);
+  std::vector<int64_t> src_strides(rank - 1);
+  int64_t num_rows = 1;
+  for (int i = 0; i < rank - 1; ++i) {
+    out_dims[i] = plan.dims[plan.perm[i]];
+    src_strides[i] = in_strides[plan.perm[i]];
+    num_rows *= out_dims[i];
+  }
+
+  ParallelFor(
+      0, num_rows, GrainSize(row_size), [&](int64_t begin, int64_t end) {
+        std::vector<int64_t> index(rank - 1, 0);
+        int64_t src = 0;
+        int64_t rest = begin;
+        for (int j = rank - 2; j >= 0; --j) {
+          index[j] = rest % out_dims[j];
+          rest /= out_dims[j];
+          src += index[j] * src_strides[j];
+        }
+        for (auto r = begin; r < end; ++r) {
+          memcpy(out + r * row_size, in + src, row_size * sizeof(T));
+          for (int j = rank - 2; j >= 0; --j) {
+            src += src_strides[j];
+            if (++index[j] < out_dims[j]) {
+              break;
+            }
+            src -= index[j] * src_strides[j];
+            index[j] = 0;
+          }
+        }
+      });
+}
+
+// The innermost axis moves: copy square tiles spanned by the innermost input
+// axis and the innermost output axis, so that both the reads and the writes
+// of a tile stay within a few cache lines per row.
+template <typename T>
+void TransposeTiles(const T* in, T* out, const TransposePlan& plan) {
+  const int rank = static_cast<int>(plan.dims.size());
+  const auto in_strides = ContiguousStrides(plan.dims);
+  std::vector<int64_t> out_dims(rank);
+  for (int i = 0; i < rank; ++i) {
+    out_dims[i] = plan.dims[plan.perm[i]];
+  }
+  const auto out_strides = ContiguousStrides(out_dims);
+
+  // Axis a is innermost in the output, axis b (the last input axis) is
+  // innermost in the input.
+  const int a = plan.perm[rank - 1];
+  const int b = rank - 1;
+  int b_out_pos = 0;
+  while (plan.perm[b_out_pos] != b) {
+    ++b_out_pos;
+  }
+  const int64_t size_a = plan.dims[a];
+  const int64_t size_b = plan.dims[b];
+  const int64_t in_stride_a = in_strides[a];
+  const int64_t out_stride_b = out_strides[b_out_pos];
+
+  // Remaining axes in output order, with their input and output strides.
+  std::vector<int64_t> outer_dims, outer_in_strides, outer_out_strides;
+  int64_t num_outer = 1;
+  for (int i = 0; i < rank; ++i) {
+    const int axis = plan.perm[i];
+    if (axis != a && axis != b) {
+      outer_dims.push_back(plan.dims[axis]);
+      outer_in_strides.push_back(in_strides[axis]);
+      outer_out_strides.push_back(out_strides[i]);
+      num_outer *= plan.dims[axis];
+    }
+  }
+  const int num_outer_dims = static_cast<int>(outer_dims.size());
+
+  const int64_t tiles_a = (size_a + kTransposeTile - 1) / kTransposeTile;
+  const int64_t tiles_b = (size_b + kTransposeTile - 1) / kTransposeTile;
+  const int64_t tiles_per_outer = tiles_a * tiles_b;
+  ParallelFor(0,
+              num_outer * tiles_per_outer,
+              GrainSize(kTransposeTile * kTransposeTile * 2),
+              [&](int64_t begin, int64_t end) {
+                for (auto task = begin; task < end; ++task) {
+                  int64_t rest = task / tiles_per_outer;
+                  const int64_t tile = task % tiles_per_outer;
+                  int64_t src = 0;
+                  int64_t dst = 0;
+                  for (int j = num_outer_dims - 1; j >= 0; --j) {
+                    const int64_t idx = rest % outer_dims[j];
+                    rest /= outer_dims[j];
+                    src += idx * outer_in_strides[j];
+                    dst += idx * outer_out_strides[j];
+                  }
+                  const int64_t a0 = tile / tiles_b * kTransposeTile;
+                  const int64_t b0 = tile % tiles_b * kTransposeTile;
+                  const int64_t a1 = std::min(a0 + kTransposeTile, size_a);
+                  const int64_t b1 = std::min(b0 + kTransposeTile, size_b);
+                  for (int64_t j = b0; j < b1; ++j) {
+                    const T* src_row = in + src + j;
+                    T* dst_row = out + dst + j * out_stride_b;
+                    for (int64_t i = a0; i < a1; ++i) {
+                      dst_row[i] = src_row[i * in_stride_a];
+                    }
+                  }
+                }
+              });
+}
+
+template <typename T>
+void TransposeImpl(const T* in,
+                   T* out,
+                   const std::vector<int64_t>& dims,
+                   const std::vector<int>& perm) {
+  const auto plan = MakeTransposePlan(dims, perm);
+  if (plan.is_identity()) {
+    int64_t numel = 1;
+    for (auto d : plan.dims) {
+      numel *= d;
+    }
+    ParallelFor(0, numel, GrainSize(1), [&](int64_t begin, int64_t end) {
+      memcpy(out + begin, in + begin, (end - begin) * sizeof(T));
+    });
+  } else if (plan.perm.back() == static_cast<int>(plan.dims.size()) - 1) {
+    TransposeRows(in, out, plan);
+  } else {
+    TransposeTiles(in, out, plan);
+  }
+}
+
+}  // namespace detail
+
+// out = in permuted by perm, where out axis i is input axis perm[i] and both
+// tensors are contiguous. Only the element size matters, so all types are
+// routed through unsigned integers of the same width.
+template <typename T>
+void Transpose(const T* in,
+               T* out,
+               const std::vector<int64_t>& dims,
+               const std::vector<int>& perm) {
+  switch (sizeof(T)) {
+    case 1:
+      detail::TransposeImpl(reinterpret_cast<const uint8_t*>(in),
+                            reinterpret_cast<uint8_t*>(out),
+                            dims,
+                            perm);
+      break;
+    case 2:
+      detail::TransposeImpl(reinterpret_cast<const uint16_t*>(in),
+                            reinterpret_cast<uint16_t*>(out),
+                            dims,
+                            perm);
+      break;
+    case 4:
+      detail::TransposeImpl(reinterpret_cast<const uint32_t*>(in),
+                            reinterpret_cast<uint32_t*>(out),
+                            dims,
+                            perm);
+      break;
+    case 8:
+      detail::TransposeImpl(reinterpret_cast<const uint64_t*>(in),
+                            reinterpret_cast<uint64_t*>(out),
+                            dims,
+                            perm);
+      break;
+    default:
+      detail::TransposeImpl(in, out, dims, perm);
+      break;
+  }
+}
+
+}  // namespace funcs
+}  // namespace custom_kernel
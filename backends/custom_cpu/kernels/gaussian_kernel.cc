@@ -0,0 +1,45 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/random.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+void GaussianKernel(const phi::Context &dev_ctx,
+                    const phi::IntArray &shape,
+                    float mean,
+                    float std,
+                    int seed,
+                    phi::DataType dtype,
+                    phi::DenseTensor *out) {
+  auto shape_data = shape.GetData();
+  out->Resize(std::vector<int64_t>(shape_data.begin(), shape_data.end()));
+  T *data = dev_ctx.template Alloc<T>(out);
+  funcs::GaussianFill<T>(funcs::PhiloxKey(dev_ctx, seed),
+                         static_cast<T>(mean),
+                         static_cast<T>(std),
+                         out->numel(),
+                         data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(gaussian,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::GaussianKernel,
+                    float,
+                    double) {}
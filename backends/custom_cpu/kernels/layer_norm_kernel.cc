@@ -0,0 +1,99 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/norm.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+template <typename T>
+void LayerNormKernel(const phi::Context& dev_ctx,
+                     const phi::DenseTensor& x,
+                     const paddle::optional<phi::DenseTensor>& scale_opt,
+                     const paddle::optional<phi::DenseTensor>& bias_opt,
+                     float epsilon,
+                     int begin_norm_axis,
+                     phi::DenseTensor* out,
+                     phi::DenseTensor* mean,
+                     phi::DenseTensor* variance) {
+  auto x_dims = x.dims();
+  const int64_t rows = phi::funcs::SizeToAxis(begin_norm_axis, x_dims);
+  const int64_t cols = phi::funcs::SizeFromAxis(begin_norm_axis, x_dims);
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  T* mean_data = mean ? dev_ctx.template Alloc<T>(mean) : nullptr;
+  T* variance_data = variance ? dev_ctx.template Alloc<T>(variance) : nullptr;
+  if (x.numel() == 0) {
+    return;
+  }
+  funcs::LayerNormForward(x.data<T>(),
+                          rows,
+                          cols,
+                          scale_opt ? scale_opt->data<T>() : nullptr,
+                          bias_opt ? bias_opt->data<T>() : nullptr,
+                          static_cast<T>(epsilon),
+                          out_data,
+                          mean_data,
+                          variance_data);
+}
+
+template <typename T>
+void LayerNormGradKernel(const phi::Context& dev_ctx,
+                         const phi::DenseTensor& x,
+                         const paddle::optional<phi::DenseTensor>& scale_opt,
+                         const paddle::optional<phi::DenseTensor>& bias_opt,
+                         const phi::DenseTensor& mean,
+                         const phi::DenseTensor& variance,
+                         const phi::DenseTensor& out_grad,
+                         float epsilon,
+                         int begin_norm_axis,
+                         phi::DenseTensor* x_grad,
+                         phi::DenseTensor* scale_grad,
+                         phi::DenseTensor* bias_grad) {
+  auto x_dims = x.dims();
+  const int64_t rows = phi::funcs::SizeToAxis(begin_norm_axis, x_dims);
+  const int64_t cols = phi::funcs::SizeFromAxis(begin_norm_axis, x_dims);
+  T* x_grad_data = x_grad ? dev_ctx.template Alloc<T>(x_grad) : nullptr;
+  T* scale_grad_data =
+      scale_grad ? dev_ctx.template Alloc<T>(scale_grad) : nullptr;
+  T* bias_grad_data =
+      bias_grad ? dev_ctx.template Alloc<T>(bias_grad) : nullptr;
+  funcs::LayerNormBackward(x.data<T>(),
+                           out_grad.data<T>(),
+                           rows,
+                           cols,
+                           scale_opt ? scale_opt->data<T>() : nullptr,
+                           mean.data<T>(),
+                           variance.data<T>(),
+                           static_cast<T>(epsilon),
+                           x_grad_data,
+                           scale_grad_data,
+                           bias_grad_data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(layer_norm,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::LayerNormKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(layer_norm_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::LayerNormGradKernel,
+                    float,
+                    double) {}
@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/gemm.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
@@ -27,17 +28,16 @@ void GEMM(bool trans_x,
           const T* y,
           T* out,
           bool trans_out = false) {
-  memset(out, 0, M * N * sizeof(T));
-  for (size_t m = 0; m < M; ++m) {
-    for (size_t n = 0; n < N; ++n) {
-      auto* out_data = trans_out ? &out[n * M + m] : &out[m * N + n];
-      for (size_t k = 0; k < K; ++k) {
-        auto x_dat = trans_x ? x[k * M + m] : x[m * K + k];
-        auto y_dat = trans_y ? y[n * K + k] : y[k * N + n];
-        *out_data += x_dat * y_dat;
-      }
-    }
-  }
+  funcs::StridedMatrix<const T> x_mat{x,
+                                      trans_x ? 1 : static_cast<int64_t>(K),
+                                      trans_x ? static_cast<int64_t>(M) : 1};
+  funcs::StridedMatrix<const T> y_mat{y,
+                                      trans_y ? 1 : static_cast<int64_t>(N),
+                                      trans_y ? static_cast<int64_t>(K) : 1};
+  funcs::StridedMatrix<T> out_mat{out,
+                                  trans_out ? 1 : static_cast<int64_t>(N),
+                                  trans_out ? static_cast<int64_t>(M) : 1};
+  funcs::Gemm<T>(M, N, K, 1.0f, x_mat, y_mat, false, out_mat);
 }
 
 template <typename T>
@@ -55,42 +55,32 @@ void BatchedGEMM(bool trans_x,
                  bool bs_flag = false,
                  bool reduce_bs = false,
                  float alpha = 1.0) {
-  memset(out, 0, sizeof(T) * (reduce_bs ? M * N : batch_size * M * N));
-  if (x_is_larger) {
-    for (size_t bs = 0; bs < batch_size; ++bs) {
-      for (size_t m = 0; m < M; ++m) {
-        for (size_t n = 0; n < N; ++n) {
-          auto out_bs = reduce_bs ? 0 : bs * M * N;
-          auto* out_data =
-              trans_out ? &out[out_bs + n * M + m] : &out[out_bs + m * N + n];
-          for (size_t k = 0; k < K; ++k) {
-            auto x_dat =
-                trans_x ? x[bs * M * K + k * M + m] : x[bs * M * K + m * K + k];
-            auto y_bs = bs_flag ? bs * N * K : 0;
-            auto y_dat = trans_y ? y[y_bs + n * K + k] : y[y_bs + k * N + n];
-            *out_data += static_cast<T>(alpha) * (x_dat * y_dat);
-          }
-        }
-      }
-    }
-  } else {
-    for (size_t bs = 0; bs < batch_size; ++bs) {
-      for (size_t m = 0; m < M; ++m) {
-        for (size_t n = 0; n < N; ++n) {
-          auto out_bs = reduce_bs ? 0 : bs * M * N;
-          auto* out_data =
-              trans_out ? &out[out_bs + n * M + m] : &out[out_bs + m * N + n];
-          for (size_t k = 0; k < K; ++k) {
-            auto y_dat =
-                trans_y ? y[bs * K * N + n * K + k] : y[bs * K * N + k * N + n];
-            auto x_bs = bs_flag ? bs * M * K : 0;
-            auto x_dat = trans_x ? x[x_bs + k * M + m] : x[x_bs + m * K + k];
-            *out_data += static_cast<T>(alpha) * (x_dat * y_dat);
-          }
-        }
-      }
-    }
-  }
+  funcs::StridedMatrix<const T> x_mat{x,
+                                      trans_x ? 1 : static_cast<int64_t>(K),
+                                      trans_x ? static_cast<int64_t>(M) : 1};
+  funcs::StridedMatrix<const T> y_mat{y,
+                                      trans_y ? 1 : static_cast<int64_t>(N),
+                                      trans_y ? static_cast<int64_t>(K) : 1};
+  funcs::StridedMatrix<T> out_mat{out,
+                                  trans_out ? 1 : static_cast<int64_t>(N),
+                                  trans_out ? static_cast<int64_t>(M) : 1};
+  // The larger operand always advances with the batch, the other one only
+  // when bs_flag is set; with reduce_bs every batch sums into one output.
+  int64_t x_stride = (x_is_larger || bs_flag) ? M * K : 0;
+  int64_t y_stride = (!x_is_larger || bs_flag) ? K * N : 0;
+  int64_t out_stride = reduce_bs ? 0 : M * N;
+  funcs::BatchedGemm<T>(batch_size,
+                        M,
+                        N,
+                        K,
+                        alpha,
+                        x_mat,
+                        x_stride,
+                        y_mat,
+                        y_stride,
+                        false,
+                        out_mat,
+                        out_stride);
 }
 
 template <typename T>
@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/reduce.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -22,14 +23,12 @@ void MeanAllKernel(const phi::Context& dev_ctx,
                    const phi::DenseTensor& x,
                    phi::DenseTensor* out) {
   auto out_data = dev_ctx.template Alloc<T>(out);
-  auto x_data = x.data<T>();
-  auto numel = x.numel();
-
-  *out_data = 0;
-  for (auto i = 0; i < numel; ++i) {
-    *out_data += x_data[i];
-  }
-  *out_data /= static_cast<T>(numel);
+  using AccT = typename funcs::ReduceAccType<T>::type;
+  funcs::Reduce(x.data<T>(),
+                std::vector<int64_t>{x.numel()},
+                std::vector<int64_t>{0},
+                funcs::MeanReducer<AccT>(),
+                out_data);
 }
 
 template <typename T>
@@ -56,7 +55,9 @@ PD_BUILD_PHI_KERNEL(mean_all,
                     ALL_LAYOUT,
                     custom_kernel::MeanAllKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(mean_all_grad,
                     custom_cpu,
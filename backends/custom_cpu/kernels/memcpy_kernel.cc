@@ -14,6 +14,7 @@
 
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
+#include "runtime/zero_copy.h"
 
 namespace custom_kernel {
 
@@ -24,7 +25,8 @@ void MemcpyD2HKernel(const phi::Context& dev_ctx,
                      phi::DenseTensor* out) {
   auto out_data = dev_ctx.HostAlloc<T>(out);
   auto x_data = x.data<T>();
-  memcpy(out_data, x_data, x.memory_size());
+  custom_runtime::SharedArena::Instance().Copy(
+      out_data, x_data, x.memory_size());
 }
 
 template <typename T>
@@ -34,7 +36,8 @@ void MemcpyH2DKernel(const phi::Context& dev_ctx,
                      phi::DenseTensor* out) {
   auto out_data = dev_ctx.Alloc<T>(out);
   auto x_data = x.data<T>();
-  memcpy(out_data, x_data, x.memory_size());
+  custom_runtime::SharedArena::Instance().Copy(
+      out_data, x_data, x.memory_size());
 }
 
 }  // namespace custom_kernel
@@ -0,0 +1,205 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/optimizer.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Tensors of a momentum step over several parameters. master_param and
+// master_param_out hold null for parameters without a float copy.
+struct MomentumArgs {
+  std::vector<const phi::DenseTensor*> param;
+  std::vector<const phi::DenseTensor*> grad;
+  std::vector<const phi::DenseTensor*> velocity;
+  std::vector<const phi::DenseTensor*> learning_rate;
+  std::vector<const phi::DenseTensor*> master_param;
+  std::vector<std::string> regularization_method;
+  std::vector<float> regularization_coeff;
+  std::vector<phi::DenseTensor*> param_out;
+  std::vector<phi::DenseTensor*> velocity_out;
+  std::vector<phi::DenseTensor*> master_param_out;
+};
+
+// S is the type the velocity is stored in: float for float16 parameters
+// whose velocity the optimizer keeps in float, T otherwise.
+template <typename T, typename S>
+void MomentumImpl(
+    const phi::Context& dev_ctx,
+    const MomentumArgs& args,
+    const funcs::MomentumConfig<typename funcs::OptimizerMPType<T>::type>&
+        config) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  const size_t n = args.param.size();
+  PD_CHECK(args.grad.size() == n && args.velocity.size() == n &&
+               args.param_out.size() == n && args.velocity_out.size() == n,
+           "The number of Grad, Velocity and their outputs must equal the "
+           "number of Param (%d).",
+           n);
+  PD_CHECK(args.learning_rate.size() == 1 || args.learning_rate.size() == n,
+           "The number of LearningRate must be 1 or equal the number of "
+           "Param (%d), but got %d.",
+           n,
+           args.learning_rate.size());
+  PD_CHECK(args.regularization_method.empty() ||
+               (args.regularization_method.size() == n &&
+                args.regularization_coeff.size() == n),
+           "The number of regularization_method and regularization_coeff "
+           "must be 0 or equal the number of Param (%d).",
+           n);
+
+  std::vector<funcs::MomentumTensor<T, S, MT>> tensors(n);
+  for (size_t i = 0; i < n; ++i) {
+    PD_CHECK(args.grad[i]->numel() == args.param[i]->numel(),
+             "Param and Grad of parameter %d differ in size: %d vs %d.",
+             i,
+             args.param[i]->numel(),
+             args.grad[i]->numel());
+    auto& t = tensors[i];
+    t.param = args.param[i]->data<T>();
+    t.grad = args.grad[i]->data<T>();
+    t.velocity = args.velocity[i]->data<S>();
+    t.param_out = dev_ctx.template Alloc<T>(args.param_out[i]);
+    t.velocity_out = dev_ctx.template Alloc<S>(args.velocity_out[i]);
+    if (args.master_param[i]) {
+      t.master_param = args.master_param[i]->data<MT>();
+      t.master_param_out = dev_ctx.template Alloc<MT>(args.master_param_out[i]);
+    }
+    t.numel = args.param[i]->numel();
+    t.lr = funcs::GetScalarValue<MT>(
+        *args.learning_rate[args.learning_rate.size() == 1 ? 0 : i]);
+    if (!args.regularization_method.empty() &&
+        args.regularization_method[i] == "l2_decay") {
+      t.l2_coeff = static_cast<MT>(args.regularization_coeff[i]);
+    }
+  }
+  funcs::MomentumUpdate(config, tensors);
+}
+
+template <typename T>
+void MomentumDispatch(
+    const phi::Context& dev_ctx,
+    const MomentumArgs& args,
+    const funcs::MomentumConfig<typename funcs::OptimizerMPType<T>::type>&
+        config) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  if (!args.param.empty() &&
+      args.velocity[0]->dtype() != args.param[0]->dtype()) {
+    MomentumImpl<T, MT>(dev_ctx, args, config);
+  } else {
+    MomentumImpl<T, T>(dev_ctx, args, config);
+  }
+}
+
+template <typename T>
+void MomentumKernel(const phi::Context& dev_ctx,
+                    const phi::DenseTensor& param,
+                    const phi::DenseTensor& grad,
+                    const phi::DenseTensor& velocity,
+                    const phi::DenseTensor& learning_rate,
+                    const paddle::optional<phi::DenseTensor>& master_param,
+                    float mu,
+                    bool use_nesterov,
+                    const std::string& regularization_method,
+                    float regularization_coeff,
+                    bool multi_precision,
+                    float rescale_grad,
+                    phi::DenseTensor* param_out,
+                    phi::DenseTensor* velocity_out,
+                    phi::DenseTensor* master_param_out) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  MomentumArgs args;
+  args.param = {&param};
+  args.grad = {&grad};
+  args.velocity = {&velocity};
+  args.learning_rate = {&learning_rate};
+  const bool use_master = multi_precision && master_param;
+  args.master_param = {use_master ? &master_param.get() : nullptr};
+  args.regularization_method = {regularization_method};
+  args.regularization_coeff = {regularization_coeff};
+  args.param_out = {param_out};
+  args.velocity_out = {velocity_out};
+  args.master_param_out = {use_master ? master_param_out : nullptr};
+
+  funcs::MomentumConfig<MT> config;
+  config.mu = static_cast<MT>(mu);
+  config.rescale_grad = static_cast<MT>(rescale_grad);
+  config.use_nesterov = use_nesterov;
+  MomentumDispatch<T>(dev_ctx, args, config);
+}
+
+template <typename T>
+void MergedMomentumKernel(
+    const phi::Context& dev_ctx,
+    const std::vector<const phi::DenseTensor*>& param,
+    const std::vector<const phi::DenseTensor*>& grad,
+    const std::vector<const phi::DenseTensor*>& velocity,
+    const std::vector<const phi::DenseTensor*>& learning_rate,
+    const paddle::optional<std::vector<const phi::DenseTensor*>>& master_param,
+    float mu,
+    bool use_nesterov,
+    const std::vector<std::string>& regularization_method,
+    const std::vector<float>& regularization_coeff,
+    bool multi_precision,
+    float rescale_grad,
+    std::vector<phi::DenseTensor*> param_out,
+    std::vector<phi::DenseTensor*> velocity_out,
+    std::vector<phi::DenseTensor*> master_param_out) {
+  using MT = typename funcs::OptimizerMPType<T>::type;
+  MomentumArgs args;
+  args.param = param;
+  args.grad = grad;
+  args.velocity = velocity;
+  args.learning_rate = learning_rate;
+  args.regularization_method = regularization_method;
+  args.regularization_coeff = regularization_coeff;
+  args.param_out = param_out;
+  args.velocity_out = velocity_out;
+  if (multi_precision && master_param) {
+    PD_CHECK(master_param->size() == param.size() &&
+                 master_param_out.size() == param.size(),
+             "The number of MasterParam and MasterParamOut must equal the "
+             "number of Param (%d).",
+             param.size());
+    args.master_param = master_param.get();
+    args.master_param_out = master_param_out;
+  } else {
+    args.master_param.assign(param.size(), nullptr);
+    args.master_param_out.assign(param.size(), nullptr);
+  }
+
+  funcs::MomentumConfig<MT> config;
+  config.mu = static_cast<MT>(mu);
+  config.rescale_grad = static_cast<MT>(rescale_grad);
+  config.use_nesterov = use_nesterov;
+  MomentumDispatch<T>(dev_ctx, args, config);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(momentum,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MomentumKernel,
+                    phi::dtype::float16,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(merged_momentum,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MergedMomentumKernel,
+                    phi::dtype::float16,
+                    float,
+                    double) {}
@@ -191,6 +191,50 @@ inline void CheckAndUpdateSliceAttrs(const std::vector<int64_t>& in_dims,
   }
 }
 
+// Expands paddings to [before, after] pairs for every spatial dimension and
+// applies padding_algorithm: "VALID" drops all padding, "SAME" pads so that
+// the output size is ceil(input size / stride) and resets the dilations.
+template <typename T = int>
+inline void UpdatePaddingAndDilation(std::vector<T>* paddings,
+                                     std::vector<T>* dilation,
+                                     const std::string& padding_algorithm,
+                                     const std::vector<int64_t>& data_dims,
+                                     const std::vector<T>& strides,
+                                     const std::vector<int64_t>& ksize) {
+  const size_t rank = data_dims.size();
+  if (paddings->size() == rank) {
+    for (size_t i = 0; i < rank; ++i) {
+      T copy_pad = *(paddings->begin() + 2 * i);
+      paddings->insert(paddings->begin() + 2 * i + 1, copy_pad);
+    }
+  } else {
+    PD_CHECK(rank * 2 == paddings->size(),
+             "Attribute padding's size should be the same or twice as the "
+             "input's dimension. But received: padding's size is %d, "
+             "input's dimension is %d.",
+             paddings->size(),
+             rank);
+  }
+
+  if (padding_algorithm == "SAME") {
+    for (size_t i = 0; i < rank; ++i) {
+      T out_size = (data_dims[i] + strides[i] - 1) / strides[i];
+      T pad_sum = std::max(
+          static_cast<T>((out_size - 1) * strides[i] + ksize[i] - data_dims[i]),
+          static_cast<T>(0));
+      T pad_0 = pad_sum / 2;
+      T pad_1 = pad_sum - pad_0;
+      *(paddings->begin() + i * 2) = pad_0;
+      *(paddings->begin() + i * 2 + 1) = pad_1;
+      *(dilation->begin() + i) = 1;
+    }
+  } else if (padding_algorithm == "VALID") {
+    for (auto& pad : *paddings) {
+      pad = 0;
+    }
+  }
+}
+
 template <typename T = int64_t>
 inline std::vector<int64_t> GetSliceDims(
     const std::vector<int64_t>& in_dims,
@@ -258,80 +302,6 @@ inline std::vector<int64_t> GetDecreasedDims(
 
 }  // namespace funcs
 
-template <typename T>
-static inline void BroadcastTo(const phi::Context& dev_ctx,
-                               const phi::DenseTensor& in,
-                               std::vector<int64_t> out_dims,
-                               int axis,
-                               phi::DenseTensor* out) {
-  auto in_dims = in.dims();
-
-  if (in_dims.size() == out_dims.size()) {
-    bool broadcast = false;
-    for (auto i = 0; i < in_dims.size(); ++i) {
-      if (in_dims[i] != out_dims[i]) {
-        broadcast = true;
-        break;
-      }
-    }
-    if (!broadcast) {
-      out->ShareDataWith(in);
-      return;
-    }
-  }
-
-  out->Resize(out_dims);
-  auto out_data = dev_ctx.template Alloc<T>(out);
-  auto in_data = in.data<T>();
-
-  axis = axis == -1 ? std::abs(static_cast<int>(in_dims.size()) -
-                               static_cast<int>(out_dims.size()))
-                    : axis;
-  auto retain = static_cast<int>(out_dims.size()) - axis -
-                static_cast<int>(in_dims.size());
-  std::vector<size_t> tmp_dims;
-  for (auto i = 0; i < axis; ++i) {
-    tmp_dims.push_back(1);
-  }
-  tmp_dims.insert(tmp_dims.end(), in_dims.cbegin(), in_dims.cend());
-  for (auto i = 0; i < retain; ++i) {
-    tmp_dims.push_back(1);
-  }
-
-  auto numel = out->numel();
-  std::vector<size_t> index(out_dims.size(), 0);
-  std::vector<size_t> in_step(tmp_dims.size(), 1);
-  std::vector<size_t> out_step(out_dims.size(), 1);
-  for (auto i = tmp_dims.size() - 1; i > 0; --i) {
-    in_step[i - 1] = in_step[i] * tmp_dims[i];
-  }
-  for (auto i = out_dims.size() - 1; i > 0; --i) {
-    out_step[i - 1] = out_step[i] * out_dims[i];
-  }
-
-  for (auto i = 0; i < numel; ++i) {
-    auto src_index = index;
-    for (auto j = 0; j < tmp_dims.size(); ++j) {
-      if (tmp_dims[j] == 1) {
-        src_index[j] = 0;
-      }
-    }
-
-    out_data[phi::vec_product(index, out_step)] =
-        in_data[phi::vec_product(src_index, in_step)];
-
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= out_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
-}
-
 static inline std::vector<int64_t> BroadcastDims(
     int axis,
     const std::vector<int64_t>& x_dims,
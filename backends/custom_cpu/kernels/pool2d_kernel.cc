@@ -0,0 +1,170 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/pooling.h"
+#include "kernels/phi_funcs.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Resolves the pooling attributes against the NCHW or NHWC input and output
+// dims.
+inline funcs::PoolShape GetPoolShape(const std::vector<int64_t>& in_dims,
+                                     const std::vector<int64_t>& out_dims,
+                                     const phi::IntArray& kernel_size,
+                                     const std::vector<int>& strides,
+                                     const std::vector<int>& paddings_in,
+                                     bool exclusive,
+                                     bool channel_last,
+                                     bool global_pooling,
+                                     bool adaptive,
+                                     const std::string& padding_algorithm) {
+  PD_CHECK(in_dims.size() == 4,
+           "pool2d expects a 4-D input, but received a %d-D input.",
+           in_dims.size());
+  const int h_axis = channel_last ? 1 : 2;
+  std::vector<int64_t> data_dims = {in_dims[h_axis], in_dims[h_axis + 1]};
+  auto ksize = kernel_size.GetData();
+  if (ksize.size() == 1) {
+    ksize.push_back(ksize[0]);
+  }
+  std::vector<int> paddings = paddings_in;
+  if (global_pooling || adaptive) {
+    paddings.assign(4, 0);
+  } else {
+    std::vector<int> dilations = {1, 1};
+    phi::funcs::UpdatePaddingAndDilation(
+        &paddings, &dilations, padding_algorithm, data_dims, strides, ksize);
+  }
+  if (global_pooling) {
+    ksize = data_dims;
+  }
+
+  funcs::PoolShape shape;
+  shape.batch = in_dims[0];
+  shape.channels = channel_last ? in_dims[3] : in_dims[1];
+  shape.in_h = data_dims[0];
+  shape.in_w = data_dims[1];
+  shape.out_h = out_dims[h_axis];
+  shape.out_w = out_dims[h_axis + 1];
+  shape.kernel_h = ksize[0];
+  shape.kernel_w = ksize[1];
+  shape.stride_h = strides[0];
+  shape.stride_w = strides[1];
+  shape.pad_h = paddings[0];
+  shape.pad_w = paddings[2];
+  shape.adaptive = adaptive && !global_pooling;
+  shape.exclusive = exclusive;
+  return shape;
+}
+
+template <typename T>
+void Pool2dKernel(const phi::Context& dev_ctx,
+                  const phi::DenseTensor& in_x,
+                  const phi::IntArray& kernel_size,
+                  const std::vector<int>& strides,
+                  const std::vector<int>& paddings,
+                  bool ceil_mode,
+                  bool exclusive,
+                  const std::string& data_format,
+                  const std::string& pooling_type,
+                  bool global_pooling,
+                  bool adaptive,
+                  const std::string& padding_algorithm,
+                  phi::DenseTensor* out) {
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  if (out->numel() == 0) {
+    return;
+  }
+  const bool channel_last = data_format == "NHWC";
+  auto shape = GetPoolShape(in_x.dims(),
+                            out->dims(),
+                            kernel_size,
+                            strides,
+                            paddings,
+                            exclusive,
+                            channel_last,
+                            global_pooling,
+                            adaptive,
+                            padding_algorithm);
+  if (pooling_type == "max") {
+    funcs::Pool2dForward(
+        shape, in_x.data<T>(), channel_last, funcs::MaxPool<T>(), out_data);
+  } else {
+    PD_CHECK(pooling_type == "avg",
+             "Unsupported pooling type: %s, it should be max or avg.",
+             pooling_type.c_str());
+    funcs::Pool2dForward(
+        shape, in_x.data<T>(), channel_last, funcs::AvgPool<T>(), out_data);
+  }
+}
+
+template <typename T>
+void Pool2dGradKernel(const phi::Context& dev_ctx,
+                      const phi::DenseTensor& in_x,
+                      const phi::DenseTensor& out,
+                      const phi::DenseTensor& out_grad,
+                      const phi::IntArray& kernel_size,
+                      const std::vector<int>& strides,
+                      const std::vector<int>& paddings,
+                      bool ceil_mode,
+                      bool exclusive,
+                      const std::string& data_format,
+                      const std::string& pooling_type,
+                      bool global_pooling,
+                      bool adaptive,
+                      const std::string& padding_algorithm,
+                      phi::DenseTensor* in_x_grad) {
+  T* in_x_grad_data = dev_ctx.template Alloc<T>(in_x_grad);
+  if (in_x_grad->numel() == 0) {
+    return;
+  }
+  const bool channel_last = data_format == "NHWC";
+  auto shape = GetPoolShape(in_x.dims(),
+                            out.dims(),
+                            kernel_size,
+                            strides,
+                            paddings,
+                            exclusive,
+                            channel_last,
+                            global_pooling,
+                            adaptive,
+                            padding_algorithm);
+  PD_CHECK(pooling_type == "max" || pooling_type == "avg",
+           "Unsupported pooling type: %s, it should be max or avg.",
+           pooling_type.c_str());
+  funcs::Pool2dBackward(shape,
+                        in_x.data<T>(),
+                        out.data<T>(),
+                        out_grad.data<T>(),
+                        channel_last,
+                        pooling_type == "max",
+                        in_x_grad_data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(pool2d,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Pool2dKernel,
+                    float,
+                    double) {}
+
+PD_BUILD_PHI_KERNEL(pool2d_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::Pool2dGradKernel,
+                    float,
+                    double) {}
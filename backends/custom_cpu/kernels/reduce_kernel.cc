@@ -14,6 +14,7 @@
 
 #include <cmath>
 
+#include "kernels/funcs/reduce.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
@@ -40,42 +41,11 @@ void MeanRawKernel(const phi::Context& dev_ctx,
       d = d + x_dims.size();
     }
   }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
 
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-  memset(out_data, 0, sizeof(T) * out->numel());
-  size_t reduce_numel = 1;
-  for (auto d : reduce_dims) {
-    reduce_numel *= x_dims[d];
-  }
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] +=
-        x_data[phi::vec_product(step, index)] / reduce_numel;
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  using AccT = typename funcs::ReduceAccType<T>::type;
+  funcs::Reduce(
+      x.data<T>(), x_dims, reduce_dims, funcs::MeanReducer<AccT>(), out_data);
 }
 
 template <typename T>
@@ -117,39 +87,11 @@ void SumRawKernel(const phi::Context& dev_ctx,
       d = d + x_dims.size();
     }
   }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
 
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-
-  memset(out_data, 0, sizeof(T) * out->numel());
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] +=
-        x_data[phi::vec_product(step, index)];
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  using AccT = typename funcs::ReduceAccType<T>::type;
+  funcs::Reduce(
+      x.data<T>(), x_dims, reduce_dims, funcs::SumReducer<AccT>(), out_data);
 }
 
 template <typename T>
@@ -191,39 +133,11 @@ void MinRawKernel(const phi::Context& dev_ctx,
       d = d + x_dims.size();
     }
   }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
 
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-  std::fill(out_data, out_data + out->numel(), std::numeric_limits<T>::max());
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] =
-        std::min(out_data[phi::vec_product(dst_step, index)],
-                 x_data[phi::vec_product(step, index)]);
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  using AccT = typename funcs::ReduceAccType<T>::type;
+  funcs::Reduce(
+      x.data<T>(), x_dims, reduce_dims, funcs::MinReducer<AccT>(), out_data);
 }
 
 template <typename T>
@@ -260,40 +174,11 @@ void MaxRawKernel(const phi::Context& dev_ctx,
       d = d + x_dims.size();
     }
   }
-  auto x_data = x.data<T>();
   auto out_data = dev_ctx.template Alloc<T>(out);
 
-  auto numel = x.numel();
-  auto out_dims(x_dims);
-  for (auto d : reduce_dims) {
-    out_dims[d] = 1;
-  }
-  std::vector<size_t> index(x_dims.size(), 0);
-  std::vector<size_t> step(x_dims.size(), 1);
-  std::vector<size_t> dst_step = step;
-  for (auto i = x_dims.size() - 1; i > 0; --i) {
-    step[i - 1] = step[i] * x_dims[i];
-    dst_step[i - 1] = dst_step[i] * out_dims[i];
-  }
-  for (auto d : reduce_dims) {
-    dst_step[d] = 0;
-  }
-  std::fill(
-      out_data, out_data + out->numel(), std::numeric_limits<T>::lowest());
-  for (auto i = 0; i < numel; ++i) {
-    out_data[phi::vec_product(dst_step, index)] =
-        std::max(out_data[phi::vec_product(dst_step, index)],
-                 x_data[phi::vec_product(step, index)]);
-    index.back()++;
-    for (auto j = index.size() - 1; j > 0; --j) {
-      if (index[j] >= x_dims[j]) {
-        index[j] = 0;
-        index[j - 1]++;
-      } else {
-        break;
-      }
-    }
-  }
+  using AccT = typename funcs::ReduceAccType<T>::type;
+  funcs::Reduce(
+      x.data<T>(), x_dims, reduce_dims, funcs::MaxReducer<AccT>(), out_data);
 }
 
 template <typename T>
@@ -316,20 +201,36 @@ PD_BUILD_PHI_KERNEL(mean_raw,
                     ALL_LAYOUT,
                     custom_kernel::MeanRawKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
-PD_BUILD_PHI_KERNEL(
-    mean, custom_cpu, ALL_LAYOUT, custom_kernel::MeanKernel, float, double) {}
+PD_BUILD_PHI_KERNEL(mean,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::MeanKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(sum_raw,
                     custom_cpu,
                     ALL_LAYOUT,
                     custom_kernel::SumRawKernel,
                     float,
-                    double) {}
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
-PD_BUILD_PHI_KERNEL(
-    sum, custom_cpu, ALL_LAYOUT, custom_kernel::SumKernel, float, double) {}
+PD_BUILD_PHI_KERNEL(sum,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::SumKernel,
+                    float,
+                    double,
+                    phi::dtype::float16,
+                    phi::dtype::bfloat16) {}
 
 PD_BUILD_PHI_KERNEL(min_raw,
                     custom_cpu,
@@ -16,6 +16,7 @@
 
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
+#include "runtime/zero_copy.h"
 
 namespace custom_kernel {
 
@@ -142,7 +143,8 @@ void ReshapeInferKernel(const phi::Context& dev_ctx,
     auto x_data = x.data<T>();
     auto out_data = out->data<T>();
 
-    memcpy(out_data, x_data, x.numel() * sizeof(T));
+    custom_runtime::SharedArena::Instance().Copy(
+        out_data, x_data, x.numel() * sizeof(T));
     out->Resize(dims);
     out->ResetLoD(x.lod());
   }
@@ -12,6 +12,7 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/thread_pool.h"
 #include "paddle/phi/capi/all.h"
 #include "phi_funcs.h"  //NOLINT
 
@@ -60,13 +61,7 @@ void SliceRawKernel(const phi::Context& ctx,
   out_dims = phi::funcs::GetDecreasedDims<int64_t>(slice_dims, decrease_axis);
 
   // 2.2 Get output
-  auto offsets = std::vector<size_t>(rank);
-  auto extents = std::vector<size_t>(rank);
-
-  for (size_t i = 0; i < rank; ++i) {
-    offsets[i] = 0;
-    extents[i] = slice_dims[i];
-  }
+  auto offsets = std::vector<int64_t>(rank, 0);
   for (size_t i = 0; i < axes.size(); ++i) {
     offsets[axes[i]] = starts[i];
   }
@@ -74,27 +69,41 @@ void SliceRawKernel(const phi::Context& ctx,
   out->Resize(slice_dims);
   auto out_data = ctx.template Alloc<T>(out);
 
-  std::vector<size_t> in_step(rank, 1);
+  std::vector<int64_t> in_step(rank, 1);
   for (auto i = rank - 1; i > 0; --i) {
     in_step[i - 1] = in_step[i] * in_dims[i];
   }
+  int64_t in_base = 0;
+  for (auto i = 0; i < rank; ++i) {
+    in_base += offsets[i] * in_step[i];
+  }
 
+  // Copy the slice row by row, splitting the rows across threads.
   auto numel = phi::product(slice_dims);
-  auto index = std::vector<size_t>(offsets.cbegin(), offsets.cend());
-  for (auto i = 0; i < numel; i += slice_dims.back()) {
-    memcpy(out_data + i,
-           in_data + phi::vec_product(index, in_step),
-           sizeof(T) * slice_dims.back());
-    index[index.size() - 2]++;
-    for (auto j = index.size() - 2; j > 0; --j) {
-      if (index[j] >= offsets[j] + extents[j]) {
-        index[j] = offsets[j];
-        index[j - 1] += 1;
-      } else {
-        break;
-      }
-    }
-  }
+  const int64_t row_size = slice_dims.back();
+  const int64_t num_rows = row_size == 0 ? 0 : numel / row_size;
+  funcs::ParallelFor(
+      0, num_rows, funcs::GrainSize(row_size), [&](int64_t begin, int64_t end) {
+        std::vector<int64_t> index(rank, 0);
+        int64_t src = in_base;
+        int64_t rest = begin;
+        for (auto j = rank - 2; j >= 0; --j) {
+          index[j] = rest % slice_dims[j];
+          rest /= slice_dims[j];
+          src += index[j] * in_step[j];
+        }
+        for (auto r = begin; r < end; ++r) {
+          memcpy(out_data + r * row_size, in_data + src, sizeof(T) * row_size);
+          for (auto j = rank - 2; j >= 0; --j) {
+            src += in_step[j];
+            if (++index[j] < slice_dims[j]) {
+              break;
+            }
+            src -= index[j] * in_step[j];
+            index[j] = 0;
+          }
+        }
+      });
   out->Resize(out_dims);
 }
 
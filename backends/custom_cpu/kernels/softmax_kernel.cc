@@ -12,46 +12,13 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include "kernels/funcs/softmax.h"
+#include "kernels/funcs/thread_pool.h"
 #include "kernels/phi_funcs.h"
 #include "paddle/phi/capi/all.h"
 
 namespace custom_kernel {
 
-template <typename T>
-T ValueClip(const T& x) {
-  const T kThreshold = static_cast<T>(-64.);
-  return x < kThreshold ? kThreshold : x;
-}
-
-template <typename T>
-void Softmax(int axis_dim, const T* in, T* out, size_t M, size_t N) {
-  auto remain = N / axis_dim;
-
-  for (size_t i = 0; i < M; ++i) {
-    for (size_t k = 0; k < remain; ++k) {
-      T max_val = in[i * N + k];
-      for (size_t j = 0; j < axis_dim; ++j) {
-        max_val = std::max(max_val, in[i * N + j * remain + k]);
-      }
-
-      auto exps = new T[axis_dim];
-      for (size_t j = 0; j < axis_dim; ++j) {
-        exps[j] = std::exp(ValueClip(in[i * N + j * remain + k] - max_val));
-      }
-
-      T sum = 0;
-      for (size_t j = 0; j < axis_dim; ++j) {
-        sum += exps[j];
-      }
-
-      for (size_t j = 0; j < axis_dim; ++j) {
-        out[i * N + j * remain + k] = exps[j] / sum;
-      }
-      delete[] exps;
-    }
-  }
-}
-
 template <typename T>
 void SoftmaxKernel(const phi::Context& dev_ctx,
                    const phi::DenseTensor& x,
@@ -73,33 +40,33 @@ void SoftmaxKernel(const phi::Context& dev_ctx,
 
   const int n = phi::funcs::SizeToAxis(calc_axis, x.dims());
   const int d = phi::funcs::SizeFromAxis(calc_axis, x.dims());
-  Softmax(axis_dim, x.data<T>(), out->data<T>(), n, d);
+  funcs::Softmax(x.data<T>(), out_data, n, axis_dim, d / axis_dim);
 }
 
 template <typename T>
 void SoftmaxGrad(
     const T* out, const T* out_grad, int axis_dim, int M, int N, T* x_grad) {
-  int num_remain = N / axis_dim;
-  T* dot = new T[M * num_remain];
-  for (auto i = 0; i < M; ++i) {
-    for (auto k = 0; k < num_remain; ++k) {
-      dot[i * num_remain + k] = 0;
-      for (auto j = 0; j < axis_dim; ++j) {
-        dot[i * num_remain + k] += out[i * N + j * num_remain + k] *
-                                   out_grad[i * N + j * num_remain + k];
-      }
-    }
-  }
-  for (auto i = 0; i < M; ++i) {
-    for (auto j = 0; j < axis_dim; ++j) {
-      for (auto k = 0; k < num_remain; ++k) {
-        x_grad[i * N + j * num_remain + k] =
-            (out_grad[i * N + j * num_remain + k] - dot[i * num_remain + k]) *
-            out[i * N + j * num_remain + k];
-      }
-    }
-  }
-  delete[] dot;
+  const int64_t num_remain = N / axis_dim;
+  funcs::ParallelFor(
+      0,
+      static_cast<int64_t>(M) * num_remain,
+      funcs::GrainSize(axis_dim * 4),
+      [&](int64_t begin, int64_t end) {
+        for (auto p = begin; p < end; ++p) {
+          const int64_t offset = p / num_remain * N + p % num_remain;
+          const T* y = out + offset;
+          const T* dy = out_grad + offset;
+          T* dx = x_grad + offset;
+
+          T dot = 0;
+          for (int64_t j = 0; j < axis_dim; ++j) {
+            dot += y[j * num_remain] * dy[j * num_remain];
+          }
+          for (int64_t j = 0; j < axis_dim; ++j) {
+            dx[j * num_remain] = (dy[j * num_remain] - dot) * y[j * num_remain];
+          }
+        }
+      });
 }
 
 template <typename T>
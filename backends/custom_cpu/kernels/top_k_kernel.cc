@@ -0,0 +1,125 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/sort.h"
+#include "paddle/phi/capi/all.h"
+
+namespace custom_kernel {
+
+// Splits dims around axis into [outer, dims[axis], inner].
+inline void TopKShape(const std::vector<int64_t>& dims,
+                      int axis,
+                      int64_t* outer,
+                      int64_t* inner) {
+  *outer = 1;
+  *inner = 1;
+  for (int i = 0; i < axis; ++i) {
+    *outer *= dims[i];
+  }
+  for (int i = axis + 1; i < static_cast<int>(dims.size()); ++i) {
+    *inner *= dims[i];
+  }
+}
+
+template <typename T>
+void TopkKernel(const phi::Context& dev_ctx,
+                const phi::DenseTensor& x,
+                const phi::Scalar& k_scalar,
+                int axis,
+                bool largest,
+                bool sorted,
+                phi::DenseTensor* out,
+                phi::DenseTensor* indices) {
+  auto in_dims = x.dims();
+  const int rank = in_dims.size();
+  const int64_t k = k_scalar.to<int64_t>();
+  if (rank == 0) {
+    PD_CHECK(k == 1, "top_k of a 0-D tensor expects k == 1, but got %ld.", k);
+    T* out_data = dev_ctx.template Alloc<T>(out);
+    int64_t* ids_data = dev_ctx.template Alloc<int64_t>(indices);
+    out_data[0] = x.data<T>()[0];
+    ids_data[0] = 0;
+    return;
+  }
+  axis = (axis < 0) ? (axis + rank) : axis;
+  PD_CHECK(k >= 0 && k <= in_dims[axis],
+           "top_k expects 0 <= k <= %ld (the size of axis %d), but got %ld.",
+           in_dims[axis],
+           axis,
+           k);
+
+  // k may come from a tensor, so the output shape is only known here.
+  auto out_dims = in_dims;
+  out_dims[axis] = k;
+  out->Resize(out_dims);
+  indices->Resize(out_dims);
+  T* out_data = dev_ctx.template Alloc<T>(out);
+  int64_t* ids_data = dev_ctx.template Alloc<int64_t>(indices);
+
+  // The result is always sorted, which costs O(k log k) on top of the
+  // selection and satisfies sorted == false as well.
+  int64_t outer, inner;
+  TopKShape(in_dims, axis, &outer, &inner);
+  funcs::TopKAlongAxis(
+      x.data<T>(), outer, in_dims[axis], inner, k, largest, out_data, ids_data);
+}
+
+template <typename T>
+void TopkGradKernel(const phi::Context& dev_ctx,
+                    const phi::DenseTensor& x,
+                    const phi::DenseTensor& indices,
+                    const phi::DenseTensor& out_grad,
+                    const phi::Scalar& k_scalar,
+                    int axis,
+                    bool largest,
+                    bool sorted,
+                    phi::DenseTensor* x_grad) {
+  auto in_dims = x.dims();
+  const int rank = in_dims.size();
+  T* x_grad_data = dev_ctx.template Alloc<T>(x_grad);
+  if (rank == 0) {
+    x_grad_data[0] = out_grad.data<T>()[0];
+    return;
+  }
+  axis = (axis < 0) ? (axis + rank) : axis;
+  int64_t outer, inner;
+  TopKShape(in_dims, axis, &outer, &inner);
+  funcs::TopKGradAlongAxis(out_grad.data<T>(),
+                           indices.data<int64_t>(),
+                           outer,
+                           in_dims[axis],
+                           inner,
+                           indices.dims()[axis],
+                           x_grad_data);
+}
+
+}  // namespace custom_kernel
+
+PD_BUILD_PHI_KERNEL(topk,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::TopkKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t) {}
+
+PD_BUILD_PHI_KERNEL(topk_grad,
+                    custom_cpu,
+                    ALL_LAYOUT,
+                    custom_kernel::TopkGradKernel,
+                    float,
+                    double,
+                    int,
+                    int64_t) {}
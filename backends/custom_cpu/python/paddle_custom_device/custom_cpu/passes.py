@@ -0,0 +1,97 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Inference passes that rewrite programs to the custom ops of custom_cpu.
+
+Importing this module registers the custom ops of the plugin with Python and
+the passes with Paddle, after which an inference config can use them by
+name, in static mode like every pass defined with RegisterPass:
+
+    import paddle
+    import paddle_custom_device.custom_cpu.passes
+
+    paddle.enable_static()
+    config = paddle.inference.Config("model.pdmodel", "model.pdiparams")
+    config.enable_custom_device("custom_cpu")
+    config.pass_builder().append_pass("generate_fused_linear_act")
+"""
+
+import os
+
+import paddle
+from paddle.incubate.passes.ir import PassDesc, RegisterPass
+
+__all__ = ["generate_fused_linear_act"]
+
+PLUGIN_LIBRARY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "libpaddle-custom-cpu.so",
+)
+
+# The replacements create fused_linear_act, which Python only knows once the
+# op meta info of the plugin is loaded.
+if os.path.exists(PLUGIN_LIBRARY):
+    paddle.utils.cpp_extension.extension_utils.load_op_meta_info_and_register_op(
+        PLUGIN_LIBRARY
+    )
+
+
+# Ranks of x for which elementwise_add gets the bias axis spelled out, as
+# the programs saved from paddle.nn.Linear do, instead of -1.
+MAX_X_RANK = 6
+
+
+@RegisterPass
+def generate_fused_linear_act():
+    """matmul_v2 -> elementwise_add -> relu/gelu to fused_linear_act.
+
+    Only untransposed products of a 2-D weight with a 1-D bias added along
+    the last axis are rewritten, which is what paddle.nn.Linear saves; a bias
+    broadcast along another axis of the same size is left alone. The pattern
+    cannot compare the axis with the rank of x, so there is one pair per
+    rank besides the one for axis -1. fused_linear_act has no gradient, so
+    the pass is for inference programs only.
+    """
+
+    def create_pass_pair(act_type, x_rank):
+        def pattern(x, weight, bias):
+            weight.Attr("shape").Size().EQ(2)
+            bias.Attr("shape").Size().EQ(1)
+            matmul = PassDesc.OP.matmul_v2(X=x, Y=weight)
+            matmul.Attr("trans_x").EQ(False)
+            matmul.Attr("trans_y").EQ(False)
+            add = PassDesc.OP.elementwise_add(X=matmul, Y=bias)
+            if x_rank is None:
+                add.Attr("axis").EQ(-1)
+            else:
+                x.Attr("shape").Size().EQ(x_rank)
+                add.Attr("axis").EQ(x_rank - 1)
+            if act_type == "relu":
+                return PassDesc.OP.relu(X=add)
+            gelu = PassDesc.OP.gelu(X=add)
+            gelu.Attr("approximate").EQ(act_type == "gelu_tanh")
+            return gelu
+
+        def replace(x, weight, bias):
+            fused = PassDesc.OP.fused_linear_act(X=x, Weight=weight, Bias=bias)
+            fused.SetAttr("act_type", act_type)
+            return fused
+
+        return pattern, replace
+
+    return [
+        create_pass_pair(act_type, x_rank)
+        for act_type in ["relu", "gelu", "gelu_tanh"]
+        for x_rank in [None] + list(range(1, MAX_X_RANK + 1))
+    ]
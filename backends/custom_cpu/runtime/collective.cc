@@ -0,0 +1,626 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/collective.h"
+
+#include <fcntl.h>
+#include <sched.h>
+#include <sys/mman.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cerrno>
+#include <cstring>
+#include <iostream>
+#include <memory>
+#include <random>
+#include <vector>
+
+#include "runtime/flags.h"
+
+namespace custom_runtime {
+
+namespace {
+
+constexpr size_t kCacheLine = 64;
+constexpr size_t kUniqueIdSize = 32;
+
+size_t AlignUp(size_t size, size_t alignment) {
+  return (size + alignment - 1) / alignment * alignment;
+}
+
+// Spins briefly, then yields, so that waiting ranks do not starve the ones
+// they wait for when there are more ranks than cores.
+template <typename Predicate>
+void WaitUntil(Predicate ready) {
+  for (int i = 0; !ready(); ++i) {
+    if (i >= 64) {
+      sched_yield();
+    }
+  }
+}
+
+size_t DataTypeSize(C_DataType data_type) {
+  switch (data_type) {
+    case BOOL:
+    case UINT8:
+    case INT8:
+      return 1;
+    case UINT16:
+    case INT16:
+    case FLOAT16:
+    case BFLOAT16:
+      return 2;
+    case UINT32:
+    case INT32:
+    case FLOAT32:
+      return 4;
+    case UINT64:
+    case INT64:
+    case FLOAT64:
+    case COMPLEX64:
+      return 8;
+    case COMPLEX128:
+      return 16;
+    default:
+      return 0;
+  }
+}
+
+// Half precision values are combined in float and rounded back after every
+// step, like the device kernels do.
+struct Float16 {
+  uint16_t bits;
+
+  operator float() const {
+    const uint32_t sign = static_cast<uint32_t>(bits & 0x8000) << 16;
+    uint32_t exponent = (bits >> 10) & 0x1f;
+    uint32_t mantissa = bits & 0x3ff;
+    uint32_t result;
+    if (exponent == 0x1f) {
+      result = sign | 0x7f800000 | (mantissa << 13);
+    } else if (exponent != 0) {
+      result = sign | ((exponent + 112) << 23) | (mantissa << 13);
+    } else if (mantissa == 0) {
+      result = sign;
+    } else {
+      // Subnormal: normalise the mantissa.
+      exponent = 113;
+      while ((mantissa & 0x400) == 0) {
+        mantissa <<= 1;
+        --exponent;
+      }
+      result = sign | (exponent << 23) | ((mantissa & 0x3ff) << 13);
+    }
+    float value;
+    memcpy(&value, &result, sizeof(value));
+    return value;
+  }
+
+  Float16 &operator=(float value) {
+    uint32_t x;
+    memcpy(&x, &value, sizeof(x));
+    const uint16_t sign = (x >> 16) & 0x8000;
+    const uint32_t abs = x & 0x7fffffff;
+    if (abs >= 0x7f800000) {
+      bits = sign | 0x7c00 | (abs > 0x7f800000 ? 0x200 : 0);
+    } else if (abs >= 0x477ff000) {
+      bits = sign | 0x7c00;  // overflows to inf
+    } else if (abs < 0x38800000) {
+      // Subnormal or zero: shift the mantissa into place, rounding to even.
+      const int shift = 126 - static_cast<int>(abs >> 23);
+      if (shift > 24) {
+        bits = sign;
+      } else {
+        const uint32_t mantissa = (abs & 0x7fffff) | 0x800000;
+        uint32_t half = mantissa >> shift;
+        const uint32_t rest = mantissa & ((1u << shift) - 1);
+        const uint32_t halfway = 1u << (shift - 1);
+        if (rest > halfway || (rest == halfway && (half & 1))) {
+          ++half;
+        }
+        bits = sign | static_cast<uint16_t>(half);
+      }
+    } else {
+      uint32_t rounded = abs + 0xfff + ((abs >> 13) & 1);
+      bits = sign | static_cast<uint16_t>((rounded - 0x38000000) >> 13);
+    }
+    return *this;
+  }
+};
+
+struct BFloat16 {
+  uint16_t bits;
+
+  operator float() const {
+    const uint32_t x = static_cast<uint32_t>(bits) << 16;
+    float value;
+    memcpy(&value, &x, sizeof(value));
+    return value;
+  }
+
+  BFloat16 &operator=(float value) {
+    uint32_t x;
+    memcpy(&x, &value, sizeof(x));
+    if ((x & 0x7fffffff) > 0x7f800000) {
+      bits = static_cast<uint16_t>((x >> 16) | 0x40);  // keep NaN quiet
+    } else {
+      bits = static_cast<uint16_t>((x + 0x7fff + ((x >> 16) & 1)) >> 16);
+    }
+    return *this;
+  }
+};
+
+template <typename T>
+struct Compute {
+  using type = T;
+};
+template <>
+struct Compute<Float16> {
+  using type = float;
+};
+template <>
+struct Compute<BFloat16> {
+  using type = float;
+};
+
+// acc[i] = op(acc[i], x[i])
+template <typename T>
+void Combine(T *acc, const T *x, size_t n, C_CCLReduceOp op) {
+  using C = typename Compute<T>::type;
+  switch (op) {
+    case SUM:
+    case AVG:
+      for (size_t i = 0; i < n; ++i) {
+        acc[i] = static_cast<C>(acc[i]) + static_cast<C>(x[i]);
+      }
+      break;
+    case PRODUCT:
+      for (size_t i = 0; i < n; ++i) {
+        acc[i] = static_cast<C>(acc[i]) * static_cast<C>(x[i]);
+      }
+      break;
+    case MAX:
+      for (size_t i = 0; i < n; ++i) {
+        acc[i] = std::max(static_cast<C>(acc[i]), static_cast<C>(x[i]));
+      }
+      break;
+    case MIN:
+      for (size_t i = 0; i < n; ++i) {
+        acc[i] = std::min(static_cast<C>(acc[i]), static_cast<C>(x[i]));
+      }
+      break;
+  }
+}
+
+template <typename T>
+void Scale(T *acc, size_t n, size_t divisor) {
+  using C = typename Compute<T>::type;
+  for (size_t i = 0; i < n; ++i) {
+    acc[i] = static_cast<C>(acc[i]) / static_cast<C>(divisor);
+  }
+}
+
+// Calls visitor(T()) with the element type of data_type, or returns
+// C_FAILED for types that cannot be reduced.
+template <typename Visitor>
+C_Status VisitReduceType(C_DataType data_type, Visitor visitor) {
+  switch (data_type) {
+    case UINT8:
+      return visitor(uint8_t());
+    case INT8:
+      return visitor(int8_t());
+    case INT16:
+      return visitor(int16_t());
+    case INT32:
+      return visitor(int32_t());
+    case INT64:
+      return visitor(int64_t());
+    case FLOAT16:
+      return visitor(Float16());
+    case BFLOAT16:
+      return visitor(BFloat16());
+    case FLOAT32:
+      return visitor(float());
+    case FLOAT64:
+      return visitor(double());
+    default:
+      std::cerr << "custom_cpu ccl: unsupported data type " << data_type
+                << " for a reduction\n";
+      return C_FAILED;
+  }
+}
+
+}  // namespace
+
+struct ShmCommunicator::Header {
+  alignas(kCacheLine) std::atomic<uint64_t> attached;
+  alignas(kCacheLine) std::atomic<uint64_t> barrier_count;
+  alignas(kCacheLine) std::atomic<uint64_t> barrier_generation;
+};
+
+// Ring from one rank to another: `written` only moves on the sender,
+// `read` only on the receiver.
+struct ShmCommunicator::Channel {
+  alignas(kCacheLine) std::atomic<uint64_t> written;
+  alignas(kCacheLine) std::atomic<uint64_t> read;
+};
+
+struct ShmCommunicator::P2POp {
+  ShmCommunicator *comm;
+  bool is_send;
+  size_t peer;
+  char *data;
+  size_t bytes;
+  size_t done;
+};
+
+// Point-to-point operations queued by the calling thread since GroupStart.
+struct ShmCommunicator::Group {
+  int depth = 0;
+  std::vector<P2POp> ops;
+};
+
+ShmCommunicator::Group &ShmCommunicator::LocalGroup() {
+  thread_local Group group;
+  return group;
+}
+
+size_t ShmCommunicator::UniqueIdSize() { return kUniqueIdSize; }
+
+void ShmCommunicator::GenerateUniqueId(char *unique_id, size_t size) {
+  static const char kChars[] = "abcdefghijklmnopqrstuvwxyz0123456789";
+  std::random_device device;
+  std::mt19937_64 engine((static_cast<uint64_t>(device()) << 32) ^ device() ^
+                         static_cast<uint64_t>(getpid()));
+  std::uniform_int_distribution<int> pick(0, sizeof(kChars) - 2);
+  const std::string prefix = "/pdccl_";
+  memset(unique_id, 0, size);
+  for (size_t i = 0; i + 1 < size; ++i) {
+    unique_id[i] = i < prefix.size() ? prefix[i] : kChars[pick(engine)];
+  }
+}
+
+ShmCommunicator *ShmCommunicator::Create(const char *unique_id,
+                                         size_t nranks,
+                                         size_t rank) {
+  if (nranks == 0 || rank >= nranks) {
+    return nullptr;
+  }
+  std::unique_ptr<ShmCommunicator> comm(new ShmCommunicator());
+  comm->name_ = std::string(unique_id, strnlen(unique_id, kUniqueIdSize));
+  comm->rank_ = rank;
+  comm->nranks_ = nranks;
+  comm->slot_bytes_ = AlignUp(
+      EnvToUInt("FLAGS_custom_cpu_ccl_buffer_size", 1ul << 20), kCacheLine);
+  comm->channel_bytes_ =
+      AlignUp(EnvToUInt("FLAGS_custom_cpu_ccl_p2p_buffer_size", 256ul << 10),
+              kCacheLine);
+
+  const size_t header_bytes = AlignUp(sizeof(Header), kCacheLine);
+  const size_t channel_headers = nranks * nranks * sizeof(Channel);
+  const size_t slots_bytes = 2 * nranks * comm->slot_bytes_;
+  const size_t rings_bytes = nranks * nranks * comm->channel_bytes_;
+  comm->mapped_bytes_ =
+      header_bytes + channel_headers + slots_bytes + rings_bytes;
+
+  // Every rank creates or opens the segment and sizes it the same way; a
+  // new segment is zero-filled, which is the initial state of all counters.
+  const int fd = shm_open(comm->name_.c_str(), O_CREAT | O_RDWR, 0600);
+  if (fd < 0) {
+    std::cerr << "custom_cpu ccl: shm_open(" << comm->name_
+              << ") failed: " << strerror(errno) << "\n";
+    return nullptr;
+  }
+  if (ftruncate(fd, comm->mapped_bytes_) != 0) {
+    std::cerr << "custom_cpu ccl: ftruncate failed: " << strerror(errno)
+              << "\n";
+    close(fd);
+    return nullptr;
+  }
+  void *base = mmap(
+      nullptr, comm->mapped_bytes_, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+  close(fd);
+  if (base == MAP_FAILED) {
+    std::cerr << "custom_cpu ccl: mmap failed: " << strerror(errno) << "\n";
+    return nullptr;
+  }
+  comm->base_ = static_cast<char *>(base);
+  comm->header_ = reinterpret_cast<Header *>(comm->base_);
+  comm->channels_ = comm->base_ + header_bytes;
+  comm->slots_ = comm->channels_ + channel_headers;
+
+  auto header = comm->header_;
+  header->attached.fetch_add(1);
+  WaitUntil([&] { return header->attached.load() >= nranks; });
+  // Everyone has the segment open, so the name is no longer needed and the
+  // memory goes away with the last rank even if a process crashes.
+  if (rank == 0) {
+    shm_unlink(comm->name_.c_str());
+  }
+  comm->Barrier();
+  return comm.release();
+}
+
+ShmCommunicator::~ShmCommunicator() {
+  if (base_ != nullptr) {
+    munmap(base_, mapped_bytes_);
+  }
+}
+
+void ShmCommunicator::Barrier() {
+  const uint64_t generation = header_->barrier_generation.load();
+  if (header_->barrier_count.fetch_add(1) + 1 == nranks_) {
+    header_->barrier_count.store(0);
+    header_->barrier_generation.fetch_add(1);
+  } else {
+    WaitUntil([&] { return header_->barrier_generation.load() != generation; });
+  }
+}
+
+char *ShmCommunicator::Slot(size_t rank) const {
+  return slots_ + ((step_ % 2) * nranks_ + rank) * slot_bytes_;
+}
+
+ShmCommunicator::Channel *ShmCommunicator::GetChannel(size_t src,
+                                                      size_t dst) const {
+  return reinterpret_cast<Channel *>(channels_) + src * nranks_ + dst;
+}
+
+char *ShmCommunicator::ChannelData(size_t src, size_t dst) const {
+  return slots_ + 2 * nranks_ * slot_bytes_ +
+         (src * nranks_ + dst) * channel_bytes_;
+}
+
+C_Status ShmCommunicator::AllReduce(const void *send_buf,
+                                    void *recv_buf,
+                                    size_t count,
+                                    C_DataType data_type,
+                                    C_CCLReduceOp op) {
+  return Reduce(send_buf, recv_buf, count, data_type, op, nranks_);
+}
+
+// root == nranks_ means every rank receives the result.
+C_Status ShmCommunicator::Reduce(const void *send_buf,
+                                 void *recv_buf,
+                                 size_t count,
+                                 C_DataType data_type,
+                                 C_CCLReduceOp op,
+                                 size_t root) {
+  return VisitReduceType(data_type, [&](auto zero) {
+    using T = decltype(zero);
+    const T *send = static_cast<const T *>(send_buf);
+    T *recv = static_cast<T *>(recv_buf);
+    const size_t chunk = slot_bytes_ / sizeof(T);
+    for (size_t offset = 0; offset < count; offset += chunk) {
+      const size_t n = std::min(chunk, count - offset);
+      memcpy(Slot(rank_), send + offset, n * sizeof(T));
+      Barrier();
+
+      // Reduce this rank's share of the chunk in place in its own slot.
+      const size_t share = (n + nranks_ - 1) / nranks_;
+      const size_t begin = std::min(rank_ * share, n);
+      const size_t len = std::min(begin + share, n) - begin;
+      T *acc = reinterpret_cast<T *>(Slot(rank_)) + begin;
+      for (size_t r = 0; r < nranks_; ++r) {
+        if (r != rank_) {
+          Combine(acc, reinterpret_cast<const T *>(Slot(r)) + begin, len, op);
+        }
+      }
+      if (op == AVG) {
+        Scale(acc, len, nranks_);
+      }
+      Barrier();
+
+      if (root == nranks_ || root == rank_) {
+        for (size_t r = 0; r < nranks_; ++r) {
+          const size_t r_begin = std::min(r * share, n);
+          const size_t r_len = std::min(r_begin + share, n) - r_begin;
+          memcpy(recv + offset + r_begin,
+                 reinterpret_cast<const T *>(Slot(r)) + r_begin,
+                 r_len * sizeof(T));
+        }
+      }
+      NextStep();
+    }
+    return C_SUCCESS;
+  });
+}
+
+C_Status ShmCommunicator::Broadcast(void *buf,
+                                    size_t count,
+                                    C_DataType data_type,
+                                    size_t root) {
+  const size_t bytes = count * DataTypeSize(data_type);
+  char *data = static_cast<char *>(buf);
+  for (size_t offset = 0; offset < bytes; offset += slot_bytes_) {
+    const size_t n = std::min(slot_bytes_, bytes - offset);
+    if (rank_ == root) {
+      memcpy(Slot(root), data + offset, n);
+    }
+    Barrier();
+    if (rank_ != root) {
+      memcpy(data + offset, Slot(root), n);
+    }
+    NextStep();
+  }
+  return C_SUCCESS;
+}
+
+C_Status ShmCommunicator::AllGather(const void *send_buf,
+                                    void *recv_buf,
+                                    size_t count,
+                                    C_DataType data_type) {
+  const size_t bytes = count * DataTypeSize(data_type);
+  const char *send = static_cast<const char *>(send_buf);
+  char *recv = static_cast<char *>(recv_buf);
+  for (size_t offset = 0; offset < bytes; offset += slot_bytes_) {
+    const size_t n = std::min(slot_bytes_, bytes - offset);
+    memcpy(Slot(rank_), send + offset, n);
+    Barrier();
+    for (size_t r = 0; r < nranks_; ++r) {
+      memcpy(recv + r * bytes + offset, Slot(r), n);
+    }
+    NextStep();
+  }
+  return C_SUCCESS;
+}
+
+C_Status ShmCommunicator::ReduceScatter(const void *send_buf,
+                                        void *recv_buf,
+                                        size_t count,
+                                        C_DataType data_type,
+                                        C_CCLReduceOp op) {
+  return VisitReduceType(data_type, [&](auto zero) {
+    using T = decltype(zero);
+    const T *send = static_cast<const T *>(send_buf);
+    T *recv = static_cast<T *>(recv_buf);
+    // Each slot holds the same range of all nranks blocks.
+    const size_t chunk = std::max<size_t>(1, slot_bytes_ / sizeof(T) / nranks_);
+    for (size_t offset = 0; offset < count; offset += chunk) {
+      const size_t n = std::min(chunk, count - offset);
+      T *slot = reinterpret_cast<T *>(Slot(rank_));
+      for (size_t r = 0; r < nranks_; ++r) {
+        memcpy(slot + r * n, send + r * count + offset, n * sizeof(T));
+      }
+      Barrier();
+
+      T *acc = recv + offset;
+      memcpy(acc, slot + rank_ * n, n * sizeof(T));
+      for (size_t r = 0; r < nranks_; ++r) {
+        if (r != rank_) {
+          Combine(acc, reinterpret_cast<const T *>(Slot(r)) + rank_ * n, n, op);
+        }
+      }
+      if (op == AVG) {
+        Scale(acc, n, nranks_);
+      }
+      NextStep();
+    }
+    return C_SUCCESS;
+  });
+}
+
+size_t ShmCommunicator::TrySend(size_t peer, const char *data, size_t bytes) {
+  auto channel = GetChannel(rank_, peer);
+  char *ring = ChannelData(rank_, peer);
+  const uint64_t written = channel->written.load(std::memory_order_relaxed);
+  const uint64_t read = channel->read.load(std::memory_order_acquire);
+  const size_t n = std::min<size_t>(bytes, channel_bytes_ - (written - read));
+  const size_t pos = written % channel_bytes_;
+  const size_t first = std::min(n, channel_bytes_ - pos);
+  memcpy(ring + pos, data, first);
+  memcpy(ring, data + first, n - first);
+  channel->written.store(written + n, std::memory_order_release);
+  return n;
+}
+
+size_t ShmCommunicator::TryRecv(size_t peer, char *data, size_t bytes) {
+  auto channel = GetChannel(peer, rank_);
+  const char *ring = ChannelData(peer, rank_);
+  const uint64_t read = channel->read.load(std::memory_order_relaxed);
+  const uint64_t written = channel->written.load(std::memory_order_acquire);
+  const size_t n = std::min<size_t>(bytes, written - read);
+  const size_t pos = read % channel_bytes_;
+  const size_t first = std::min(n, channel_bytes_ - pos);
+  memcpy(data, ring + pos, first);
+  memcpy(data + first, ring, n - first);
+  channel->read.store(read + n, std::memory_order_release);
+  return n;
+}
+
+C_Status ShmCommunicator::Progress(P2POp *ops, size_t num_ops) {
+  for (auto op = ops; op != ops + num_ops; ++op) {
+    if (op->peer >= op->comm->nranks_) {
+      return C_FAILED;
+    }
+  }
+  size_t pending = 0;
+  for (auto op = ops; op != ops + num_ops; ++op) {
+    pending += op->done != op->bytes;
+  }
+  for (int idle = 0; pending > 0;) {
+    bool moved = false;
+    for (auto op = ops; op != ops + num_ops; ++op) {
+      if (op->done == op->bytes) {
+        continue;
+      }
+      const size_t n =
+          op->is_send
+              ? op->comm->TrySend(
+                    op->peer, op->data + op->done, op->bytes - op->done)
+              : op->comm->TryRecv(
+                    op->peer, op->data + op->done, op->bytes - op->done);
+      op->done += n;
+      moved |= n > 0;
+      pending -= op->done == op->bytes;
+    }
+    if (moved) {
+      idle = 0;
+    } else if (++idle >= 64) {
+      sched_yield();
+    }
+  }
+  return C_SUCCESS;
+}
+
+C_Status ShmCommunicator::Send(const void *buf,
+                               size_t count,
+                               C_DataType data_type,
+                               size_t peer) {
+  P2POp op{this,
+           true,
+           peer,
+           const_cast<char *>(static_cast<const char *>(buf)),
+           count * DataTypeSize(data_type),
+           0};
+  auto &group = LocalGroup();
+  if (group.depth > 0) {
+    group.ops.push_back(op);
+    return C_SUCCESS;
+  }
+  return Progress(&op, 1);
+}
+
+C_Status ShmCommunicator::Recv(void *buf,
+                               size_t count,
+                               C_DataType data_type,
+                               size_t peer) {
+  P2POp op{this,
+           false,
+           peer,
+           static_cast<char *>(buf),
+           count * DataTypeSize(data_type),
+           0};
+  auto &group = LocalGroup();
+  if (group.depth > 0) {
+    group.ops.push_back(op);
+    return C_SUCCESS;
+  }
+  return Progress(&op, 1);
+}
+
+void ShmCommunicator::GroupStart() { ++LocalGroup().depth; }
+
+C_Status ShmCommunicator::GroupEnd() {
+  auto &group = LocalGroup();
+  if (group.depth == 0 || --group.depth > 0) {
+    return C_SUCCESS;
+  }
+  std::vector<P2POp> ops;
+  ops.swap(group.ops);
+  return Progress(ops.data(), ops.size());
+}
+
+}  // namespace custom_runtime
@@ -0,0 +1,133 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <string>
+
+#include "paddle/phi/backends/device_ext.h"
+
+namespace custom_runtime {
+
+// Collectives between the processes of one job on the same machine, through
+// a POSIX shared-memory segment named after the unique id.
+//
+// Every rank owns two staging slots of FLAGS_custom_cpu_ccl_buffer_size bytes
+// (1 MB by default). Buffers are processed in chunks that fit a slot, and the
+// two slots are used alternately, so a rank can stage chunk k + 1 while the
+// others still read chunk k and each chunk needs a single barrier per phase:
+//
+//  - AllReduce stages a chunk, then every rank reduces its 1/nranks share of
+//    the chunk across all slots (reduce-scatter) and finally copies all the
+//    reduced shares out (all-gather);
+//  - Reduce is AllReduce where only the root copies the result out;
+//  - ReduceScatter, AllGather and Broadcast stage and read a chunk once.
+//
+// Each share is reduced by exactly one rank, so all ranks receive
+// bit-identical results. Send/Recv go through a single-producer,
+// single-consumer ring per ordered pair of ranks; between GroupStart and
+// GroupEnd they are queued and progressed together, so pairwise exchanges
+// such as all-to-all cannot deadlock on full rings.
+//
+// All ranks must use the same buffer sizes.
+class ShmCommunicator {
+ public:
+  static size_t UniqueIdSize();
+  static void GenerateUniqueId(char *unique_id, size_t size);
+
+  // Attaches to the segment of `unique_id`, creating it if this is the first
+  // rank, and waits until all ranks are attached. Returns nullptr on failure.
+  static ShmCommunicator *Create(const char *unique_id,
+                                 size_t nranks,
+                                 size_t rank);
+  ~ShmCommunicator();
+
+  size_t rank() const { return rank_; }
+  size_t nranks() const { return nranks_; }
+
+  C_Status AllReduce(const void *send_buf,
+                     void *recv_buf,
+                     size_t count,
+                     C_DataType data_type,
+                     C_CCLReduceOp op);
+  C_Status Reduce(const void *send_buf,
+                  void *recv_buf,
+                  size_t count,
+                  C_DataType data_type,
+                  C_CCLReduceOp op,
+                  size_t root);
+  C_Status Broadcast(void *buf,
+                     size_t count,
+                     C_DataType data_type,
+                     size_t root);
+  // recv_buf receives nranks * count elements, ordered by rank.
+  C_Status AllGather(const void *send_buf,
+                     void *recv_buf,
+                     size_t count,
+                     C_DataType data_type);
+  // send_buf holds nranks * count elements; rank r receives the reduction of
+  // the r-th block of count elements.
+  C_Status ReduceScatter(const void *send_buf,
+                         void *recv_buf,
+                         size_t count,
+                         C_DataType data_type,
+                         C_CCLReduceOp op);
+  C_Status Send(const void *buf,
+                size_t count,
+                C_DataType data_type,
+                size_t peer);
+  C_Status Recv(void *buf, size_t count, C_DataType data_type, size_t peer);
+
+  // Groups are per calling thread and may nest.
+  static void GroupStart();
+  static C_Status GroupEnd();
+
+ private:
+  struct Header;
+  struct Channel;
+  struct P2POp;
+  struct Group;
+
+  ShmCommunicator() = default;
+
+  void Barrier();
+  // Staging slot of `rank` for the current step.
+  char *Slot(size_t rank) const;
+  void NextStep() { ++step_; }
+
+  Channel *GetChannel(size_t src, size_t dst) const;
+  char *ChannelData(size_t src, size_t dst) const;
+  // Move as many bytes as the ring allows and return how many were moved.
+  size_t TrySend(size_t peer, const char *data, size_t bytes);
+  size_t TryRecv(size_t peer, char *data, size_t bytes);
+  static C_Status Progress(P2POp *ops, size_t num_ops);
+  static Group &LocalGroup();
+
+  std::string name_;
+  size_t rank_ = 0;
+  size_t nranks_ = 0;
+  size_t slot_bytes_ = 0;
+  size_t channel_bytes_ = 0;
+  char *base_ = nullptr;
+  size_t mapped_bytes_ = 0;
+  Header *header_ = nullptr;
+  char *slots_ = nullptr;
+  char *channels_ = nullptr;
+  uint64_t step_ = 0;
+};
+
+}  // namespace custom_runtime
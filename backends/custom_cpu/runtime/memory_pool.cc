@@ -0,0 +1,319 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/memory_pool.h"
+
+#include <sys/mman.h>
+
+#include <algorithm>
+#include <cstdlib>
+
+#include "runtime/flags.h"
+#include "runtime/zero_copy.h"
+
+namespace custom_runtime {
+
+constexpr size_t MemoryPool::kAlignment;
+constexpr int MemoryPool::kNumClasses;
+constexpr size_t MemoryPool::kHugePageSize;
+constexpr size_t MemoryPool::kMaxThreadCachedSize;
+constexpr size_t MemoryPool::kThreadCacheBytesPerClass;
+
+// Blocks of the small classes freed on one thread, kept for reuse by the
+// same thread. The mutex is only contended while Trim drains the cache.
+struct MemoryPool::ThreadCache {
+  explicit ThreadCache(MemoryPool *pool) : pool(pool) {
+    pool->RegisterCache(this);
+  }
+
+  ~ThreadCache() {
+    // Once unregistered, Trim can no longer reach this cache.
+    pool->UnregisterCache(this);
+    for (int c = 0; c < kNumClasses; ++c) {
+      pool->ReleaseToShared(c, blocks[c].data(), blocks[c].size());
+    }
+  }
+
+  static size_t Capacity(int size_class) {
+    return std::max<size_t>(1,
+                            kThreadCacheBytesPerClass / ClassSize(size_class));
+  }
+
+  MemoryPool *pool;
+  std::mutex mutex;
+  std::vector<void *> blocks[kNumClasses];
+};
+
+MemoryPool &MemoryPool::Instance() {
+  // Never destroyed: thread caches may flush into it during thread exit after
+  // static destructors have started running.
+  static MemoryPool *pool = new MemoryPool();
+  return *pool;
+}
+
+MemoryPool::MemoryPool()
+    : enabled_(EnvToBool("FLAGS_custom_cpu_use_memory_pool", true)),
+      use_huge_pages_(EnvToBool("FLAGS_custom_cpu_use_huge_pages", true)) {}
+
+int MemoryPool::SizeClass(size_t size) {
+  int size_class = 0;
+  while (size_class < kNumClasses && ClassSize(size_class) < size) {
+    ++size_class;
+  }
+  return size_class;
+}
+
+void *MemoryPool::SystemAllocate(size_t size) {
+  void *ptr = nullptr;
+  if (size >= kHugePageSize && SharedArena::Instance().enabled()) {
+    ptr = SharedArena::Instance().Map(size);
+    if (ptr == nullptr) {
+      return nullptr;
+    }
+  } else if (size >= kHugePageSize) {
+    ptr = mmap(nullptr,
+               size,
+               PROT_READ | PROT_WRITE,
+               MAP_PRIVATE | MAP_ANONYMOUS,
+               -1,
+               0);
+    if (ptr == MAP_FAILED) {
+      return nullptr;
+    }
+#ifdef MADV_HUGEPAGE
+    if (use_huge_pages_) {
+      madvise(ptr, size, MADV_HUGEPAGE);
+    }
+#endif
+  } else if (posix_memalign(&ptr, kAlignment, size) != 0) {
+    return nullptr;
+  }
+  auto reserved = bytes_reserved_.fetch_add(size) + size;
+  auto peak = peak_bytes_reserved_.load();
+  while (reserved > peak &&
+         !peak_bytes_reserved_.compare_exchange_weak(peak, reserved)) {
+  }
+  return ptr;
+}
+
+void MemoryPool::SystemFree(void *ptr, size_t size) {
+  if (size >= kHugePageSize && SharedArena::Instance().enabled()) {
+    SharedArena::Instance().Unmap(ptr, size);
+  } else if (size >= kHugePageSize) {
+    munmap(ptr, size);
+  } else {
+    free(ptr);
+  }
+  bytes_reserved_.fetch_sub(size);
+}
+
+MemoryPool::ThreadCache *MemoryPool::LocalCache() {
+  thread_local ThreadCache cache(this);
+  return &cache;
+}
+
+void MemoryPool::RegisterCache(ThreadCache *cache) {
+  std::lock_guard<std::mutex> guard(mutex_);
+  caches_.insert(cache);
+}
+
+void MemoryPool::UnregisterCache(ThreadCache *cache) {
+  std::lock_guard<std::mutex> guard(mutex_);
+  caches_.erase(cache);
+}
+
+void MemoryPool::ReleaseToShared(int size_class,
+                                 void *const *blocks,
+                                 size_t count) {
+  if (count == 0) {
+    return;
+  }
+  std::lock_guard<std::mutex> guard(mutex_);
+  free_lists_[size_class].insert(
+      free_lists_[size_class].end(), blocks, blocks + count);
+}
+
+void *MemoryPool::AllocateFromClass(int size_class) {
+  const size_t class_size = ClassSize(size_class);
+  if (class_size <= kMaxThreadCachedSize) {
+    auto cache = LocalCache();
+    std::lock_guard<std::mutex> guard(cache->mutex);
+    auto &blocks = cache->blocks[size_class];
+    if (!blocks.empty()) {
+      void *ptr = blocks.back();
+      blocks.pop_back();
+      return ptr;
+    }
+  }
+  {
+    std::lock_guard<std::mutex> guard(mutex_);
+    auto &blocks = free_lists_[size_class];
+    if (!blocks.empty()) {
+      void *ptr = blocks.back();
+      blocks.pop_back();
+      return ptr;
+    }
+  }
+  return nullptr;
+}
+
+void *MemoryPool::Allocate(size_t size) {
+  if (!enabled_) {
+    return malloc(size);
+  }
+  num_allocs_.fetch_add(1, std::memory_order_relaxed);
+  const int size_class = SizeClass(size);
+  if (size_class == kNumClasses) {
+    // Too large to be worth caching; map it directly.
+    void *ptr = SystemAllocate(size);
+    if (ptr == nullptr) {
+      Trim();
+      ptr = SystemAllocate(size);
+    }
+    if (ptr != nullptr) {
+      bytes_requested_.fetch_add(size);
+      bytes_in_use_.fetch_add(size);
+    }
+    return ptr;
+  }
+
+  const size_t class_size = ClassSize(size_class);
+  void *ptr = AllocateFromClass(size_class);
+  if (ptr != nullptr) {
+    num_cache_hits_.fetch_add(1, std::memory_order_relaxed);
+    bytes_cached_.fetch_sub(class_size);
+  } else {
+    ptr = SystemAllocate(class_size);
+    if (ptr == nullptr) {
+      // Give the cached blocks of other classes back and retry once.
+      Trim();
+      ptr = SystemAllocate(class_size);
+      if (ptr == nullptr) {
+        return nullptr;
+      }
+    }
+  }
+  bytes_requested_.fetch_add(size);
+  bytes_in_use_.fetch_add(class_size);
+  return ptr;
+}
+
+void MemoryPool::Deallocate(void *ptr, size_t size) {
+  if (!enabled_) {
+    free(ptr);
+    return;
+  }
+  if (ptr == nullptr) {
+    return;
+  }
+  num_frees_.fetch_add(1, std::memory_order_relaxed);
+  bytes_requested_.fetch_sub(size);
+  const int size_class = SizeClass(size);
+  if (size_class == kNumClasses) {
+    bytes_in_use_.fetch_sub(size);
+    SystemFree(ptr, size);
+    return;
+  }
+
+  const size_t class_size = ClassSize(size_class);
+  if (class_size >= kHugePageSize && SharedArena::Instance().enabled()) {
+    // Drop the pages shared with other blocks before the block is reused.
+    SharedArena::Instance().Reset(ptr, class_size);
+  }
+  bytes_in_use_.fetch_sub(class_size);
+  bytes_cached_.fetch_add(class_size);
+  if (class_size <= kMaxThreadCachedSize) {
+    auto cache = LocalCache();
+    std::vector<void *> overflow;
+    {
+      std::lock_guard<std::mutex> guard(cache->mutex);
+      auto &blocks = cache->blocks[size_class];
+      blocks.push_back(ptr);
+      const size_t capacity = ThreadCache::Capacity(size_class);
+      if (blocks.size() > capacity) {
+        // Hand the older half over so other threads can reuse it.
+        const auto keep = blocks.end() - capacity / 2;
+        overflow.assign(blocks.begin(), keep);
+        blocks.erase(blocks.begin(), keep);
+      }
+    }
+    // Taken outside the cache lock: Trim locks the pool before the caches.
+    ReleaseToShared(size_class, overflow.data(), overflow.size());
+    return;
+  }
+  ReleaseToShared(size_class, &ptr, 1);
+}
+
+size_t MemoryPool::Trim() {
+  if (!enabled_) {
+    return 0;
+  }
+  std::vector<void *> released[kNumClasses];
+  {
+    std::lock_guard<std::mutex> guard(mutex_);
+    for (auto cache : caches_) {
+      std::lock_guard<std::mutex> cache_guard(cache->mutex);
+      for (int c = 0; c < kNumClasses; ++c) {
+        auto &blocks = cache->blocks[c];
+        released[c].insert(released[c].end(), blocks.begin(), blocks.end());
+        blocks.clear();
+      }
+    }
+    for (int c = 0; c < kNumClasses; ++c) {
+      released[c].insert(
+          released[c].end(), free_lists_[c].begin(), free_lists_[c].end());
+      free_lists_[c].clear();
+    }
+  }
+  size_t total = 0;
+  for (int c = 0; c < kNumClasses; ++c) {
+    for (auto ptr : released[c]) {
+      SystemFree(ptr, ClassSize(c));
+    }
+    total += released[c].size() * ClassSize(c);
+  }
+  bytes_cached_.fetch_sub(total);
+  return total;
+}
+
+CustomCPUMemoryStats MemoryPool::GetStats() const {
+  CustomCPUMemoryStats stats;
+  stats.num_allocs = num_allocs_.load();
+  stats.num_cache_hits = num_cache_hits_.load();
+  stats.num_frees = num_frees_.load();
+  stats.bytes_requested = bytes_requested_.load();
+  stats.bytes_in_use = bytes_in_use_.load();
+  stats.bytes_cached = bytes_cached_.load();
+  stats.bytes_reserved = bytes_reserved_.load();
+  stats.peak_bytes_reserved = peak_bytes_reserved_.load();
+  stats.hit_rate =
+      stats.num_allocs == 0
+          ? 0.0
+          : static_cast<double>(stats.num_cache_hits) / stats.num_allocs;
+  stats.fragmentation = stats.bytes_reserved == 0
+                            ? 0.0
+                            : 1.0 - static_cast<double>(stats.bytes_requested) /
+                                        stats.bytes_reserved;
+  return stats;
+}
+
+}  // namespace custom_runtime
+
+void CustomCPUMemoryPoolGetStats(CustomCPUMemoryStats *stats) {
+  *stats = custom_runtime::MemoryPool::Instance().GetStats();
+}
+
+uint64_t CustomCPUMemoryPoolTrim() {
+  return custom_runtime::MemoryPool::Instance().Trim();
+}
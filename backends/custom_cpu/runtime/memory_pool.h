@@ -0,0 +1,124 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <mutex>
+#include <unordered_set>
+#include <vector>
+
+extern "C" {
+
+// Snapshot of the memory pool counters, exported for tools and tests that
+// load the plugin with ctypes.
+typedef struct {
+  uint64_t num_allocs;       // Allocate calls served
+  uint64_t num_cache_hits;   // ... of which were served from the cache
+  uint64_t num_frees;        // Deallocate calls
+  uint64_t bytes_requested;  // bytes asked for by live allocations
+  uint64_t bytes_in_use;     // size-class bytes held by live allocations
+  uint64_t bytes_cached;     // bytes kept in the free lists
+  uint64_t bytes_reserved;   // bytes obtained from the system
+  uint64_t peak_bytes_reserved;
+  double hit_rate;       // num_cache_hits / num_allocs
+  double fragmentation;  // 1 - bytes_requested / bytes_reserved
+} CustomCPUMemoryStats;
+
+void CustomCPUMemoryPoolGetStats(CustomCPUMemoryStats *stats);
+
+// Returns every cached block to the system and the number of bytes released.
+uint64_t CustomCPUMemoryPoolTrim();
+
+}  // extern "C"
+
+namespace custom_runtime {
+
+// A caching allocator for the memory the plugin hands to Paddle. Requests are
+// rounded up to power-of-two size classes starting at 64 bytes, and freed
+// blocks are kept on per-class free lists instead of being returned to libc,
+// so the same-sized activations of a training step reuse memory that is
+// already mapped. Every block is 64-byte aligned; blocks of 2 MB and more are
+// mapped directly and advised to use transparent huge pages.
+//
+// Each thread keeps a small cache of blocks up to 1 MB in front of the shared
+// free lists, so steady-state Allocate/Deallocate pairs take no shared lock.
+// Requests above the largest class are passed straight to the system.
+//
+// Set FLAGS_custom_cpu_use_memory_pool=0 to bypass the pool, and
+// FLAGS_custom_cpu_use_huge_pages=0 to disable the huge page advice. With
+// FLAGS_custom_cpu_zero_copy=1 the blocks of 2 MB and more come from the
+// SharedArena instead, so that copies between them can share pages.
+class MemoryPool {
+ public:
+  static MemoryPool &Instance();
+
+  void *Allocate(size_t size);
+  // `size` must be the size passed to the matching Allocate call.
+  void Deallocate(void *ptr, size_t size);
+
+  // Releases all cached blocks, including those held in thread caches, and
+  // returns the number of bytes given back to the system.
+  size_t Trim();
+
+  CustomCPUMemoryStats GetStats() const;
+
+  // Bytes that can be handed out again without asking the system.
+  size_t CachedBytes() const { return bytes_cached_.load(); }
+  size_t ReservedBytes() const { return bytes_reserved_.load(); }
+
+  static constexpr size_t kAlignment = 64;
+  static constexpr int kNumClasses = 23;  // 64 B ... 256 MB
+  static constexpr size_t kHugePageSize = 2 << 20;
+  static constexpr size_t kMaxThreadCachedSize = 1 << 20;
+  static constexpr size_t kThreadCacheBytesPerClass = 4 << 20;
+
+  static int SizeClass(size_t size);
+  static size_t ClassSize(int size_class) { return kAlignment << size_class; }
+
+  struct ThreadCache;
+
+ private:
+  MemoryPool();
+
+  void *SystemAllocate(size_t size);
+  void SystemFree(void *ptr, size_t size);
+  void *AllocateFromClass(int size_class);
+  // Moves blocks of one class into the shared free list.
+  void ReleaseToShared(int size_class, void *const *blocks, size_t count);
+
+  ThreadCache *LocalCache();
+  void RegisterCache(ThreadCache *cache);
+  void UnregisterCache(ThreadCache *cache);
+
+  const bool enabled_;
+  const bool use_huge_pages_;
+
+  std::mutex mutex_;  // guards free_lists_ and caches_
+  std::vector<void *> free_lists_[kNumClasses];
+  std::unordered_set<ThreadCache *> caches_;
+
+  std::atomic<uint64_t> num_allocs_{0};
+  std::atomic<uint64_t> num_cache_hits_{0};
+  std::atomic<uint64_t> num_frees_{0};
+  std::atomic<uint64_t> bytes_requested_{0};
+  std::atomic<uint64_t> bytes_in_use_{0};
+  std::atomic<uint64_t> bytes_cached_{0};
+  std::atomic<uint64_t> bytes_reserved_{0};
+  std::atomic<uint64_t> peak_bytes_reserved_{0};
+};
+
+}  // namespace custom_runtime
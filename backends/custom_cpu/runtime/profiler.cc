@@ -0,0 +1,305 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/profiler.h"
+
+#include <sys/syscall.h>
+#include <time.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdio>
+
+#include "paddle/phi/api/profiler/trace_event.h"
+#include "runtime/flags.h"
+
+namespace custom_runtime {
+
+constexpr size_t Tracer::kMaxRecordsPerThread;
+
+namespace {
+
+uint64_t SamplingPeriod() {
+  const double rate = EnvToDouble("FLAGS_custom_cpu_trace_sampling_rate", 1.0);
+  if (!(rate > 0.0) || rate >= 1.0) {
+    return 1;
+  }
+  return static_cast<uint64_t>(std::llround(1.0 / rate));
+}
+
+uint64_t CurrentThreadId() {
+  thread_local uint64_t tid = syscall(SYS_gettid);
+  return tid;
+}
+
+}  // namespace
+
+// Records of one thread. Only the owning thread appends and only Consume,
+// under the tracer mutex, reads, so the chunks need no lock.
+struct Tracer::Buffer {
+  static constexpr size_t kChunkSize = 4096;
+
+  struct Chunk {
+    TraceRecord records[kChunkSize];
+    std::atomic<Chunk *> next{nullptr};
+  };
+
+  Buffer() : head(new Chunk()), tail(head) {}
+
+  ~Buffer() {
+    while (head != nullptr) {
+      Chunk *next = head->next.load();
+      delete head;
+      head = next;
+    }
+  }
+
+  bool Append(const TraceRecord &record) {
+    const uint64_t size = num_written.load(std::memory_order_relaxed);
+    if (size - num_read.load(std::memory_order_acquire) >=
+        kMaxRecordsPerThread) {
+      return false;
+    }
+    if (write_index == kChunkSize) {
+      Chunk *chunk = new Chunk();
+      tail->next.store(chunk, std::memory_order_release);
+      tail = chunk;
+      write_index = 0;
+    }
+    tail->records[write_index++] = record;
+    num_written.store(size + 1, std::memory_order_release);
+    return true;
+  }
+
+  void Drain(std::vector<TraceRecord> *records) {
+    const uint64_t size = num_written.load(std::memory_order_acquire);
+    uint64_t read = num_read.load(std::memory_order_relaxed);
+    for (; read < size; ++read) {
+      if (read_index == kChunkSize) {
+        // The writer moved to the next chunk before publishing this record.
+        Chunk *next = head->next.load(std::memory_order_acquire);
+        delete head;
+        head = next;
+        read_index = 0;
+      }
+      records->push_back(head->records[read_index++]);
+    }
+    num_read.store(read, std::memory_order_release);
+  }
+
+  // Consumer side.
+  Chunk *head;
+  size_t read_index = 0;
+  std::atomic<uint64_t> num_read{0};
+  // Producer side.
+  Chunk *tail;
+  size_t write_index = 0;
+  std::atomic<uint64_t> num_written{0};
+  // Set by the owning thread when it exits.
+  std::atomic<bool> orphaned{false};
+};
+
+constexpr size_t Tracer::Buffer::kChunkSize;
+
+Tracer &Tracer::Instance() {
+  // Never destroyed: threads may still record while the library unloads.
+  static Tracer *tracer = new Tracer();
+  return *tracer;
+}
+
+Tracer::Tracer() : sampling_period_(SamplingPeriod()) {}
+
+Tracer::Buffer *Tracer::LocalBuffer() {
+  struct Holder {
+    explicit Holder(Tracer *tracer) : buffer(new Buffer()) {
+      std::lock_guard<std::mutex> guard(tracer->mutex_);
+      tracer->buffers_.push_back(buffer);
+    }
+    // The tracer frees the buffer once its records are consumed.
+    ~Holder() { buffer->orphaned.store(true, std::memory_order_release); }
+    Buffer *buffer;
+  };
+  thread_local Holder holder(this);
+  return holder.buffer;
+}
+
+void Tracer::Start() {
+  Consume();
+  num_dropped_.store(0);
+  tracing_.store(true);
+}
+
+void Tracer::Stop() { tracing_.store(false); }
+
+uint32_t Tracer::Sample() {
+  if (!IsTracing()) {
+    return 0;
+  }
+  thread_local uint64_t num_calls = 0;
+  if (num_calls++ % sampling_period_ != 0) {
+    return 0;
+  }
+  uint32_t id = next_correlation_id_.fetch_add(1, std::memory_order_relaxed);
+  if (id == 0) {
+    id = next_correlation_id_.fetch_add(1, std::memory_order_relaxed);
+  }
+  return id;
+}
+
+void Tracer::Add(const TraceRecord &record) {
+  if (!LocalBuffer()->Append(record)) {
+    num_dropped_.fetch_add(1, std::memory_order_relaxed);
+  }
+}
+
+std::vector<TraceRecord> Tracer::Consume() {
+  std::vector<TraceRecord> records;
+  std::lock_guard<std::mutex> guard(mutex_);
+  auto live = buffers_.begin();
+  for (auto buffer : buffers_) {
+    // Checked before draining: an orphaned buffer gets no more records.
+    const bool orphaned = buffer->orphaned.load(std::memory_order_acquire);
+    buffer->Drain(&records);
+    if (orphaned) {
+      delete buffer;
+    } else {
+      *live++ = buffer;
+    }
+  }
+  buffers_.erase(live, buffers_.end());
+  return records;
+}
+
+uint64_t TraceNowNs() {
+  // The clock of Paddle's host tracer.
+  struct timespec ts;
+  clock_gettime(CLOCK_REALTIME, &ts);
+  return static_cast<uint64_t>(ts.tv_sec) * 1000000000 + ts.tv_nsec;
+}
+
+RuntimeTraceScope::RuntimeTraceScope(const char *name, uint64_t device_id)
+    : name_(name),
+      device_id_(device_id),
+      correlation_id_(Tracer::Instance().Sample()) {
+  if (correlation_id_ != 0) {
+    start_ns_ = TraceNowNs();
+  }
+}
+
+RuntimeTraceScope::~RuntimeTraceScope() {
+  if (correlation_id_ == 0) {
+    return;
+  }
+  TraceRecord record;
+  record.name = name_;
+  record.type = TraceType::kRuntime;
+  record.correlation_id = correlation_id_;
+  record.start_ns = start_ns_;
+  record.end_ns = TraceNowNs();
+  record.thread_id = CurrentThreadId();
+  record.device_id = device_id_;
+  record.stream_id = 0;
+  record.size = 0;
+  Tracer::Instance().Add(record);
+}
+
+void RuntimeTraceScope::AddDeviceActivity(TraceType type,
+                                          const char *name,
+                                          uint64_t stream_id,
+                                          uint64_t size) {
+  if (correlation_id_ != 0) {
+    AddDeviceTrace(type,
+                   name,
+                   correlation_id_,
+                   start_ns_,
+                   TraceNowNs(),
+                   device_id_,
+                   stream_id,
+                   size);
+  }
+}
+
+void AddDeviceTrace(TraceType type,
+                    const char *name,
+                    uint32_t correlation_id,
+                    uint64_t start_ns,
+                    uint64_t end_ns,
+                    uint64_t device_id,
+                    uint64_t stream_id,
+                    uint64_t size) {
+  if (correlation_id == 0) {
+    return;
+  }
+  TraceRecord record;
+  record.name = name;
+  record.type = type;
+  record.correlation_id = correlation_id;
+  record.start_ns = start_ns;
+  record.end_ns = end_ns;
+  record.thread_id = CurrentThreadId();
+  record.device_id = device_id;
+  record.stream_id = stream_id;
+  record.size = size;
+  Tracer::Instance().Add(record);
+}
+
+void CollectTraceData(C_Profiler prof, uint64_t start_ns) {
+  const uint64_t process_id = getpid();
+  for (const auto &record : Tracer::Instance().Consume()) {
+    if (record.start_ns < start_ns) {
+      continue;
+    }
+    if (record.type == TraceType::kRuntime) {
+      phi::RuntimeTraceEvent event;
+      event.name = record.name;
+      event.type = phi::TracerEventType::CudaRuntime;
+      event.start_ns = record.start_ns;
+      event.end_ns = record.end_ns;
+      event.process_id = process_id;
+      event.thread_id = record.thread_id;
+      event.correlation_id = record.correlation_id;
+      event.callback_id = 0;
+      profiler_add_runtime_trace_event(prof, &event);
+      continue;
+    }
+    phi::DeviceTraceEvent event;
+    event.name = record.name;
+    event.start_ns = record.start_ns;
+    event.end_ns = record.end_ns;
+    event.device_id = record.device_id;
+    event.context_id = 0;
+    event.stream_id = record.stream_id;
+    event.correlation_id = record.correlation_id;
+    if (record.type == TraceType::kKernel) {
+      event.type = phi::TracerEventType::Kernel;
+      event.kernel_info = phi::KernelEventInfo();
+      event.kernel_info.grid_x = record.size;
+      event.kernel_info.grid_y = 1;
+      event.kernel_info.grid_z = 1;
+      event.kernel_info.block_x = 1;
+      event.kernel_info.block_y = 1;
+      event.kernel_info.block_z = 1;
+    } else {
+      event.type = phi::TracerEventType::Memcpy;
+      event.memcpy_info = phi::MemcpyEventInfo();
+      event.memcpy_info.num_bytes = record.size;
+      snprintf(
+          event.memcpy_info.copy_kind, phi::kMemKindMaxLen, "%s", record.name);
+    }
+    profiler_add_device_trace_event(prof, &event);
+  }
+}
+
+}  // namespace custom_runtime
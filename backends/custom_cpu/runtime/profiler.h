@@ -0,0 +1,132 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <mutex>
+#include <vector>
+
+#include "paddle/phi/backends/device_ext.h"
+
+namespace custom_runtime {
+
+enum class TraceType : uint8_t {
+  kRuntime,  // a runtime API call on the calling thread
+  kKernel,   // computation on the device
+  kMemcpy,   // a copy on the device
+};
+
+// One traced span. Device records share the correlation id of the runtime
+// call that issued them, which is how Paddle attaches them to operators.
+struct TraceRecord {
+  const char *name;  // must be a string literal
+  TraceType type;
+  uint32_t correlation_id;
+  uint64_t start_ns;
+  uint64_t end_ns;
+  uint64_t thread_id;
+  uint64_t device_id;
+  uint64_t stream_id;
+  uint64_t size;  // bytes of a copy, tasks of a kernel
+};
+
+// Collects trace records while paddle.profiler is tracing the device.
+//
+// Every thread appends to its own buffer, a chain of fixed-size chunks with
+// a single producer and a single consumer, so recording takes no lock. When
+// tracing is off, instrumented calls cost one relaxed load.
+//
+// FLAGS_custom_cpu_trace_sampling_rate, in (0, 1], keeps about that fraction
+// of the runtime calls of each thread together with their device activity,
+// so that tracing can stay enabled in long runs at a lower overhead.
+class Tracer {
+ public:
+  static Tracer &Instance();
+
+  bool IsTracing() const { return tracing_.load(std::memory_order_relaxed); }
+  // Start drops the records left over from a previous session.
+  void Start();
+  void Stop();
+
+  // Returns the correlation id for a new runtime call, or 0 if the call is
+  // not traced.
+  uint32_t Sample();
+  void Add(const TraceRecord &record);
+  // Removes and returns the records of all threads.
+  std::vector<TraceRecord> Consume();
+  uint64_t NumDropped() const { return num_dropped_.load(); }
+
+  static constexpr size_t kMaxRecordsPerThread = 1 << 18;
+
+ private:
+  struct Buffer;
+
+  Tracer();
+  Buffer *LocalBuffer();
+
+  const uint64_t sampling_period_;
+  std::atomic<bool> tracing_{false};
+  std::atomic<uint32_t> next_correlation_id_{1};
+  std::atomic<uint64_t> num_dropped_{0};
+
+  std::mutex mutex_;  // guards buffers_
+  std::vector<Buffer *> buffers_;
+};
+
+uint64_t TraceNowNs();
+
+// Traces a runtime API call from construction to destruction.
+class RuntimeTraceScope {
+ public:
+  explicit RuntimeTraceScope(const char *name, uint64_t device_id = 0);
+  ~RuntimeTraceScope();
+
+  RuntimeTraceScope(const RuntimeTraceScope &) = delete;
+  RuntimeTraceScope &operator=(const RuntimeTraceScope &) = delete;
+
+  // 0 if the call is not traced.
+  uint32_t correlation_id() const { return correlation_id_; }
+  uint64_t device_id() const { return device_id_; }
+
+  // Records device activity that ran synchronously from the start of the
+  // call until now.
+  void AddDeviceActivity(TraceType type,
+                         const char *name,
+                         uint64_t stream_id,
+                         uint64_t size);
+
+ private:
+  const char *name_;
+  uint64_t device_id_;
+  uint32_t correlation_id_;
+  uint64_t start_ns_ = 0;
+};
+
+// Records device activity issued by the runtime call `correlation_id`.
+void AddDeviceTrace(TraceType type,
+                    const char *name,
+                    uint32_t correlation_id,
+                    uint64_t start_ns,
+                    uint64_t end_ns,
+                    uint64_t device_id,
+                    uint64_t stream_id,
+                    uint64_t size);
+
+// Hands the records that started after start_ns to Paddle's tracer.
+void CollectTraceData(C_Profiler prof, uint64_t start_ns);
+
+}  // namespace custom_runtime
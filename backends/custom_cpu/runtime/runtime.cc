@@ -14,22 +14,87 @@
 
 #include <errno.h>
 #include <fcntl.h>
-#include <semaphore.h>
 #include <sys/types.h>
 #include <sys/wait.h>
 #include <unistd.h>
 
+#include <algorithm>
 #include <cstdint>
 #include <cstdio>
 #include <cstring>
 #include <iostream>
 
 #include "paddle/phi/backends/device_ext.h"
-
-#define MEMORY_FRACTION 0.5f
+#include "runtime/collective.h"
+#include "runtime/memory_pool.h"
+#include "runtime/profiler.h"
+#include "runtime/stream.h"
+#include "runtime/zero_copy.h"
 
 static int global_current_device = 0;
 
+namespace {
+
+custom_runtime::Stream *ToStream(C_Stream stream) {
+  return reinterpret_cast<custom_runtime::Stream *>(stream);
+}
+
+custom_runtime::Event *ToEvent(C_Event event) {
+  return reinterpret_cast<custom_runtime::Event *>(event);
+}
+
+// Work issued without a stream runs synchronously.
+void RunOnStream(C_Stream stream, custom_runtime::Task task) {
+  if (stream == nullptr) {
+    task();
+  } else {
+    ToStream(stream)->Enqueue(std::move(task));
+  }
+}
+
+uint64_t StreamId(C_Stream stream) {
+  return stream == nullptr ? 0 : ToStream(stream)->id();
+}
+
+// Copies on `stream`, or synchronously without one, and traces the call and
+// the copy.
+void Copy(const char *api,
+          const char *kind,
+          const C_Device device,
+          C_Stream stream,
+          void *dst,
+          const void *src,
+          size_t size) {
+  custom_runtime::RuntimeTraceScope trace(api, device->id);
+  const uint32_t correlation_id = trace.correlation_id();
+  const uint64_t device_id = trace.device_id();
+  RunOnStream(stream, [=] {
+    auto &arena = custom_runtime::SharedArena::Instance();
+    if (correlation_id == 0) {
+      arena.Copy(dst, src, size);
+      return;
+    }
+    const uint64_t start_ns = custom_runtime::TraceNowNs();
+    arena.Copy(dst, src, size);
+    custom_runtime::AddDeviceTrace(custom_runtime::TraceType::kMemcpy,
+                                   kind,
+                                   correlation_id,
+                                   start_ns,
+                                   custom_runtime::TraceNowNs(),
+                                   device_id,
+                                   StreamId(stream),
+                                   size);
+  });
+}
+
+void WaitForStream(C_Stream stream) {
+  if (stream != nullptr) {
+    ToStream(stream)->Synchronize();
+  }
+}
+
+}  // namespace
+
 C_Status Init() {
   std::cout << "custom_cpu plugin compiled with ";
 #ifdef __clang__
@@ -70,20 +135,54 @@ C_Status GetDevicesList(size_t *devices) {
   return C_SUCCESS;
 }
 
-C_Status MemCpy(const C_Device device,
-                void *dst,
-                const void *src,
-                size_t size) {
-  memcpy(dst, src, size);
+C_Status MemCpyH2D(const C_Device device,
+                   void *dst,
+                   const void *src,
+                   size_t size) {
+  Copy("MemCpyH2D", "MEMCPY_HtoD", device, nullptr, dst, src, size);
   return C_SUCCESS;
 }
 
-C_Status AsyncMemCpy(const C_Device device,
-                     C_Stream stream,
-                     void *dst,
-                     const void *src,
-                     size_t size) {
-  memcpy(dst, src, size);
+C_Status MemCpyD2D(const C_Device device,
+                   void *dst,
+                   const void *src,
+                   size_t size) {
+  Copy("MemCpyD2D", "MEMCPY_DtoD", device, nullptr, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status MemCpyD2H(const C_Device device,
+                   void *dst,
+                   const void *src,
+                   size_t size) {
+  Copy("MemCpyD2H", "MEMCPY_DtoH", device, nullptr, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status AsyncMemCpyH2D(const C_Device device,
+                        C_Stream stream,
+                        void *dst,
+                        const void *src,
+                        size_t size) {
+  Copy("AsyncMemCpyH2D", "MEMCPY_HtoD", device, stream, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status AsyncMemCpyD2D(const C_Device device,
+                        C_Stream stream,
+                        void *dst,
+                        const void *src,
+                        size_t size) {
+  Copy("AsyncMemCpyD2D", "MEMCPY_DtoD", device, stream, dst, src, size);
+  return C_SUCCESS;
+}
+
+C_Status AsyncMemCpyD2H(const C_Device device,
+                        C_Stream stream,
+                        void *dst,
+                        const void *src,
+                        size_t size) {
+  Copy("AsyncMemCpyD2H", "MEMCPY_DtoH", device, stream, dst, src, size);
   return C_SUCCESS;
 }
 
@@ -92,7 +191,7 @@ C_Status MemCpyP2P(const C_Device dst_device,
                    void *dst,
                    const void *src,
                    size_t size) {
-  memcpy(dst, src, size);
+  Copy("MemCpyP2P", "MEMCPY_PtoP", dst_device, nullptr, dst, src, size);
   return C_SUCCESS;
 }
 
@@ -102,12 +201,13 @@ C_Status AsyncMemCpyP2P(const C_Device dst_device,
                         void *dst,
                         const void *src,
                         size_t size) {
-  memcpy(dst, src, size);
+  Copy("AsyncMemCpyP2P", "MEMCPY_PtoP", dst_device, stream, dst, src, size);
   return C_SUCCESS;
 }
 
 C_Status Allocate(const C_Device device, void **ptr, size_t size) {
-  auto data = malloc(size);
+  custom_runtime::RuntimeTraceScope trace("Allocate", device->id);
+  auto data = custom_runtime::MemoryPool::Instance().Allocate(size);
   if (data) {
     *ptr = data;
     return C_SUCCESS;
@@ -118,42 +218,87 @@ C_Status Allocate(const C_Device device, void **ptr, size_t size) {
 }
 
 C_Status Deallocate(const C_Device device, void *ptr, size_t size) {
-  free(ptr);
+  custom_runtime::RuntimeTraceScope trace("Deallocate", device->id);
+  custom_runtime::MemoryPool::Instance().Deallocate(ptr, size);
   return C_SUCCESS;
 }
 
 C_Status CreateStream(const C_Device device, C_Stream *stream) {
-  stream = nullptr;
+  *stream = reinterpret_cast<C_Stream>(new custom_runtime::Stream());
   return C_SUCCESS;
 }
 
 C_Status DestroyStream(const C_Device device, C_Stream stream) {
+  delete ToStream(stream);
+  return C_SUCCESS;
+}
+
+C_Status QueryStream(const C_Device device, C_Stream stream) {
+  return stream == nullptr || ToStream(stream)->Query() ? C_SUCCESS : C_ERROR;
+}
+
+C_Status AddCallback(const C_Device device,
+                     C_Stream stream,
+                     C_Callback callback,
+                     void *user_data) {
+  // The device handle only lives for the duration of this call.
+  auto device_copy = *device;
+  RunOnStream(stream, [=]() mutable {
+    C_Status status = C_SUCCESS;
+    callback(&device_copy, stream, user_data, &status);
+  });
   return C_SUCCESS;
 }
 
 C_Status CreateEvent(const C_Device device, C_Event *event) {
+  *event = reinterpret_cast<C_Event>(new custom_runtime::Event());
   return C_SUCCESS;
 }
 
 C_Status RecordEvent(const C_Device device, C_Stream stream, C_Event event) {
+  custom_runtime::RuntimeTraceScope trace("RecordEvent", device->id);
+  RunOnStream(stream, ToEvent(event)->Record());
   return C_SUCCESS;
 }
 
 C_Status DestroyEvent(const C_Device device, C_Event event) {
+  delete ToEvent(event);
   return C_SUCCESS;
 }
 
-C_Status SyncDevice(const C_Device device) { return C_SUCCESS; }
+C_Status QueryEvent(const C_Device device, C_Event event) {
+  return ToEvent(event)->Query() ? C_SUCCESS : C_ERROR;
+}
+
+C_Status SyncDevice(const C_Device device) {
+  custom_runtime::RuntimeTraceScope trace("SyncDevice", device->id);
+  custom_runtime::Stream::SynchronizeAll();
+  return C_SUCCESS;
+}
 
 C_Status SyncStream(const C_Device device, C_Stream stream) {
+  custom_runtime::RuntimeTraceScope trace("SyncStream", device->id);
+  if (stream != nullptr) {
+    ToStream(stream)->Synchronize();
+  }
   return C_SUCCESS;
 }
 
-C_Status SyncEvent(const C_Device device, C_Event event) { return C_SUCCESS; }
+C_Status SyncEvent(const C_Device device, C_Event event) {
+  custom_runtime::RuntimeTraceScope trace("SyncEvent", device->id);
+  ToEvent(event)->Synchronize();
+  return C_SUCCESS;
+}
 
 C_Status StreamWaitEvent(const C_Device device,
                          C_Stream stream,
                          C_Event event) {
+  custom_runtime::RuntimeTraceScope trace("StreamWaitEvent", device->id);
+  if (stream == nullptr) {
+    ToEvent(event)->Synchronize();
+  } else {
+    ToStream(stream)->WaitEvent(*ToEvent(event));
+  }
   return C_SUCCESS;
 }
 
@@ -162,53 +307,52 @@ C_Status VisibleDevices(size_t *devices) { return C_SUCCESS; }
 C_Status DeviceMemStats(const C_Device device,
                         size_t *total_memory,
                         size_t *free_memory) {
-  float memusage;
-  FILE *fp;
-  char buffer[1024];
-  size_t byte_read;
-  char *pos;
-
-  fp = fopen("/proc/meminfo", "r");
-  byte_read = fread(buffer, 1, sizeof(buffer), fp);
+  // Device memory is host memory: the total is the physical memory, and what
+  // is free is what the system can still hand out plus the blocks the pool
+  // keeps cached for reuse.
+  size_t mem_total = 0;
+  size_t mem_available = 0;
+  FILE *fp = fopen("/proc/meminfo", "r");
+  if (fp == nullptr) {
+    return C_FAILED;
+  }
+  char line[256];
+  while (fgets(line, sizeof(line), fp)) {
+    sscanf(line, "MemTotal: %zu kB", &mem_total);
+    sscanf(line, "MemAvailable: %zu kB", &mem_available);
+  }
   fclose(fp);
-  buffer[byte_read] = '\0';
-  pos = strstr(buffer, "MemTotal:");
-  sscanf(pos, "MemTotal: %lu kB", total_memory);
-  pos = strstr(pos, "MemFree:");
-  sscanf(pos, "MemFree: %lu kB", free_memory);
-  *total_memory = *total_memory * 1024;
-  *free_memory = *free_memory * 1024;
-  *free_memory = *free_memory * MEMORY_FRACTION;
 
+  auto &pool = custom_runtime::MemoryPool::Instance();
+  *total_memory = mem_total * 1024;
+  *free_memory =
+      std::min(mem_available * 1024 + pool.CachedBytes(), *total_memory);
   return C_SUCCESS;
 }
 
 C_Status DeviceMinChunkSize(const C_Device device, size_t *size) {
-  *size = 512;
+  auto &arena = custom_runtime::SharedArena::Instance();
+  // Page-aligned tensors let copies between them share whole pages.
+  *size = arena.enabled() ? arena.page_size() : 512;
   return C_SUCCESS;
 }
 
-struct C_CCLComm_st {
-  size_t rank;
-  size_t nranks;
-  sem_t *sig;
-  sem_t *sig_2;
-  std::string sig_name;
-  std::string sig_2_name;
-};
+namespace {
+
+custom_runtime::ShmCommunicator *ToCommunicator(C_CCLComm comm) {
+  return reinterpret_cast<custom_runtime::ShmCommunicator *>(comm);
+}
+
+}  // namespace
 
-// for unittest
 C_Status XcclGetUniqueIdSize(size_t *sz) {
-  *sz = sizeof(size_t);
+  *sz = custom_runtime::ShmCommunicator::UniqueIdSize();
   return C_SUCCESS;
 }
 
 C_Status XcclGetUniqueId(C_CCLRootId *unique_id) {
-  auto ptr = reinterpret_cast<int8_t *>(unique_id->data);
-  for (auto i = 0; i < unique_id->sz - 1; ++i) {
-    ptr[i] = static_cast<int8_t>(std::rand() % ('z' - 'a') + 'a');
-  }
-  ptr[unique_id->sz - 1] = '\0';
+  custom_runtime::ShmCommunicator::GenerateUniqueId(
+      static_cast<char *>(unique_id->data), unique_id->sz);
   return C_SUCCESS;
 }
 
@@ -216,25 +360,17 @@ C_Status XcclCommInitRank(size_t ranks,
                           C_CCLRootId *unique_id,
                           size_t rank,
                           C_CCLComm *comm) {
-  auto sig = sem_open(static_cast<char *>(unique_id->data), O_CREAT, 0644, 0);
-  auto sig_2 =
-      sem_open(static_cast<char *>(unique_id->data) + 1, O_CREAT, 0644, 0);
-  *comm =
-      new C_CCLComm_st({rank,
-                        ranks,
-                        sig,
-                        sig_2,
-                        std::string(static_cast<char *>(unique_id->data)),
-                        std::string(static_cast<char *>(unique_id->data) + 1)});
+  auto communicator = custom_runtime::ShmCommunicator::Create(
+      static_cast<char *>(unique_id->data), ranks, rank);
+  if (communicator == nullptr) {
+    return C_FAILED;
+  }
+  *comm = reinterpret_cast<C_CCLComm>(communicator);
   return C_SUCCESS;
 }
 
 C_Status XcclDestroyComm(C_CCLComm comm) {
-  if (comm) {
-    sem_unlink(comm->sig_name.c_str());
-    sem_unlink(comm->sig_2_name.c_str());
-    delete comm;
-  }
+  delete ToCommunicator(comm);
   return C_SUCCESS;
 }
 
@@ -245,20 +381,16 @@ C_Status XcclAllReduce(void *send_buf,
                        C_CCLReduceOp op,
                        C_CCLComm comm,
                        C_Stream stream) {
-  sem_post(comm->sig);
-
-  if (comm->rank == 0) {
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_wait(comm->sig);
-    }
-
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_post(comm->sig_2);
-    }
-  }
-
-  sem_wait(comm->sig_2);
-  return C_SUCCESS;
+  // Collectives run on the calling thread, after the work queued before
+  // them on the stream.
+  WaitForStream(stream);
+  custom_runtime::RuntimeTraceScope trace("XcclAllReduce",
+                                          global_current_device);
+  auto status =
+      ToCommunicator(comm)->AllReduce(send_buf, recv_buf, count, data_type, op);
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "AllReduce", StreamId(stream), count);
+  return status;
 }
 
 C_Status XcclBroadcast(void *buf,
@@ -267,22 +399,110 @@ C_Status XcclBroadcast(void *buf,
                        size_t root,
                        C_CCLComm comm,
                        C_Stream stream) {
-  sem_post(comm->sig);
-
-  if (comm->rank == 0) {
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_wait(comm->sig);
-    }
+  WaitForStream(stream);
+  if (root >= ToCommunicator(comm)->nranks()) {
+    return C_FAILED;
+  }
+  custom_runtime::RuntimeTraceScope trace("XcclBroadcast",
+                                          global_current_device);
+  auto status = ToCommunicator(comm)->Broadcast(buf, count, data_type, root);
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "Broadcast", StreamId(stream), count);
+  return status;
+}
 
-    for (auto i = 0; i < comm->nranks; ++i) {
-      sem_post(comm->sig_2);
-    }
+C_Status XcclReduce(void *send_buf,
+                    void *recv_buf,
+                    size_t count,
+                    C_DataType data_type,
+                    C_CCLReduceOp op,
+                    size_t root,
+                    C_CCLComm comm,
+                    C_Stream stream) {
+  WaitForStream(stream);
+  if (root >= ToCommunicator(comm)->nranks()) {
+    return C_FAILED;
   }
+  custom_runtime::RuntimeTraceScope trace("XcclReduce", global_current_device);
+  auto status = ToCommunicator(comm)->Reduce(
+      send_buf, recv_buf, count, data_type, op, root);
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "Reduce", StreamId(stream), count);
+  return status;
+}
+
+C_Status XcclAllGather(void *send_buf,
+                       void *recv_buf,
+                       size_t count,
+                       C_DataType data_type,
+                       C_CCLComm comm,
+                       C_Stream stream) {
+  WaitForStream(stream);
+  custom_runtime::RuntimeTraceScope trace("XcclAllGather",
+                                          global_current_device);
+  auto status =
+      ToCommunicator(comm)->AllGather(send_buf, recv_buf, count, data_type);
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "AllGather", StreamId(stream), count);
+  return status;
+}
 
-  sem_wait(comm->sig_2);
+C_Status XcclReduceScatter(void *send_buf,
+                           void *recv_buf,
+                           size_t count,
+                           C_DataType data_type,
+                           C_CCLReduceOp op,
+                           C_CCLComm comm,
+                           C_Stream stream) {
+  WaitForStream(stream);
+  custom_runtime::RuntimeTraceScope trace("XcclReduceScatter",
+                                          global_current_device);
+  auto status = ToCommunicator(comm)->ReduceScatter(
+      send_buf, recv_buf, count, data_type, op);
+  trace.AddDeviceActivity(custom_runtime::TraceType::kKernel,
+                          "ReduceScatter",
+                          StreamId(stream),
+                          count);
+  return status;
+}
+
+C_Status XcclGroupStart() {
+  custom_runtime::ShmCommunicator::GroupStart();
   return C_SUCCESS;
 }
 
+C_Status XcclGroupEnd() { return custom_runtime::ShmCommunicator::GroupEnd(); }
+
+C_Status XcclSend(void *send_buf,
+                  size_t count,
+                  C_DataType data_type,
+                  size_t dest_rank,
+                  C_CCLComm comm,
+                  C_Stream stream) {
+  WaitForStream(stream);
+  custom_runtime::RuntimeTraceScope trace("XcclSend", global_current_device);
+  auto status =
+      ToCommunicator(comm)->Send(send_buf, count, data_type, dest_rank);
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "Send", StreamId(stream), count);
+  return status;
+}
+
+C_Status XcclRecv(void *recv_buf,
+                  size_t count,
+                  C_DataType data_type,
+                  size_t src_rank,
+                  C_CCLComm comm,
+                  C_Stream stream) {
+  WaitForStream(stream);
+  custom_runtime::RuntimeTraceScope trace("XcclRecv", global_current_device);
+  auto status =
+      ToCommunicator(comm)->Recv(recv_buf, count, data_type, src_rank);
+  trace.AddDeviceActivity(
+      custom_runtime::TraceType::kKernel, "Recv", StreamId(stream), count);
+  return status;
+}
+
 C_Status ProfilerInitialize(C_Profiler prof, void **user_data) {
   return C_SUCCESS;
 }
@@ -293,13 +513,20 @@ C_Status ProfilerFinalize(C_Profiler prof, void *user_data) {
 
 C_Status ProfilerPrepare(C_Profiler prof, void *user_data) { return C_SUCCESS; }
 
-C_Status ProfilerStart(C_Profiler prof, void *user_data) { return C_SUCCESS; }
+C_Status ProfilerStart(C_Profiler prof, void *user_data) {
+  custom_runtime::Tracer::Instance().Start();
+  return C_SUCCESS;
+}
 
-C_Status ProfilerStop(C_Profiler prof, void *user_data) { return C_SUCCESS; }
+C_Status ProfilerStop(C_Profiler prof, void *user_data) {
+  custom_runtime::Tracer::Instance().Stop();
+  return C_SUCCESS;
+}
 
 C_Status ProfilerCollectData(C_Profiler prof,
                              uint64_t start_ns,
                              void *user_data) {
+  custom_runtime::CollectTraceData(prof, start_ns);
   return C_SUCCESS;
 }
 
@@ -322,23 +549,26 @@ void InitPlugin(CustomRuntimeParams *params) {
 
   params->interface->create_stream = CreateStream;
   params->interface->destroy_stream = DestroyStream;
+  params->interface->query_stream = QueryStream;
+  params->interface->stream_add_callback = AddCallback;
 
   params->interface->create_event = CreateEvent;
   params->interface->destroy_event = DestroyEvent;
   params->interface->record_event = RecordEvent;
+  params->interface->query_event = QueryEvent;
 
   params->interface->synchronize_device = SyncDevice;
   params->interface->synchronize_stream = SyncStream;
   params->interface->synchronize_event = SyncEvent;
   params->interface->stream_wait_event = StreamWaitEvent;
 
-  params->interface->memory_copy_h2d = MemCpy;
-  params->interface->memory_copy_d2d = MemCpy;
-  params->interface->memory_copy_d2h = MemCpy;
+  params->interface->memory_copy_h2d = MemCpyH2D;
+  params->interface->memory_copy_d2d = MemCpyD2D;
+  params->interface->memory_copy_d2h = MemCpyD2H;
   params->interface->memory_copy_p2p = MemCpyP2P;
-  params->interface->async_memory_copy_h2d = AsyncMemCpy;
-  params->interface->async_memory_copy_d2d = AsyncMemCpy;
-  params->interface->async_memory_copy_d2h = AsyncMemCpy;
+  params->interface->async_memory_copy_h2d = AsyncMemCpyH2D;
+  params->interface->async_memory_copy_d2d = AsyncMemCpyD2D;
+  params->interface->async_memory_copy_d2h = AsyncMemCpyD2H;
   params->interface->async_memory_copy_p2p = AsyncMemCpyP2P;
   params->interface->device_memory_allocate = Allocate;
   params->interface->host_memory_allocate = Allocate;
@@ -358,6 +588,13 @@ void InitPlugin(CustomRuntimeParams *params) {
   params->interface->xccl_destroy_comm = XcclDestroyComm;
   params->interface->xccl_all_reduce = XcclAllReduce;
   params->interface->xccl_broadcast = XcclBroadcast;
+  params->interface->xccl_reduce = XcclReduce;
+  params->interface->xccl_all_gather = XcclAllGather;
+  params->interface->xccl_reduce_scatter = XcclReduceScatter;
+  params->interface->xccl_group_start = XcclGroupStart;
+  params->interface->xccl_group_end = XcclGroupEnd;
+  params->interface->xccl_send = XcclSend;
+  params->interface->xccl_recv = XcclRecv;
 
   params->interface->profiler_collect_trace_data = ProfilerCollectData;
   params->interface->profiler_initialize = ProfilerInitialize;
@@ -0,0 +1,168 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/stream.h"
+
+#include <algorithm>
+#include <atomic>
+#include <unordered_set>
+
+#include "runtime/flags.h"
+
+namespace custom_runtime {
+
+struct Event::State {
+  std::mutex mutex;
+  std::condition_variable cv;
+  uint64_t num_recorded = 0;
+  uint64_t num_reached = 0;
+
+  void WaitFor(uint64_t point) {
+    std::unique_lock<std::mutex> lock(mutex);
+    cv.wait(lock, [&] { return num_reached >= point; });
+  }
+};
+
+Event::Event() : state_(std::make_shared<State>()) {}
+
+Task Event::Record() {
+  uint64_t point;
+  {
+    std::lock_guard<std::mutex> guard(state_->mutex);
+    point = ++state_->num_recorded;
+  }
+  auto state = state_;
+  return [state, point] {
+    {
+      std::lock_guard<std::mutex> guard(state->mutex);
+      state->num_reached = std::max(state->num_reached, point);
+    }
+    state->cv.notify_all();
+  };
+}
+
+Task Event::Wait() const {
+  uint64_t point;
+  {
+    std::lock_guard<std::mutex> guard(state_->mutex);
+    point = state_->num_recorded;
+  }
+  auto state = state_;
+  return [state, point] { state->WaitFor(point); };
+}
+
+bool Event::Query() const {
+  std::lock_guard<std::mutex> guard(state_->mutex);
+  return state_->num_reached >= state_->num_recorded;
+}
+
+void Event::Synchronize() const { Wait()(); }
+
+namespace {
+
+std::mutex &StreamsMutex() {
+  static std::mutex *mutex = new std::mutex();
+  return *mutex;
+}
+
+std::unordered_set<Stream *> &Streams() {
+  static auto *streams = new std::unordered_set<Stream *>();
+  return *streams;
+}
+
+uint64_t NextStreamId() {
+  static std::atomic<uint64_t> next_id{1};
+  return next_id.fetch_add(1);
+}
+
+}  // namespace
+
+Stream::Stream()
+    : id_(NextStreamId()),
+      async_(EnvToBool("FLAGS_custom_cpu_async_stream", false)) {
+  if (async_) {
+    worker_ = std::thread(&Stream::Run, this);
+  }
+  std::lock_guard<std::mutex> guard(StreamsMutex());
+  Streams().insert(this);
+}
+
+Stream::~Stream() {
+  {
+    std::lock_guard<std::mutex> guard(StreamsMutex());
+    Streams().erase(this);
+  }
+  if (async_) {
+    // The worker drains the queue before it exits.
+    {
+      std::lock_guard<std::mutex> guard(mutex_);
+      stop_ = true;
+    }
+    work_cv_.notify_one();
+    worker_.join();
+  }
+}
+
+void Stream::Enqueue(Task task) {
+  if (!async_) {
+    task();
+    return;
+  }
+  {
+    std::lock_guard<std::mutex> guard(mutex_);
+    queue_.push_back(std::move(task));
+    ++num_enqueued_;
+  }
+  work_cv_.notify_one();
+}
+
+void Stream::Run() {
+  std::unique_lock<std::mutex> lock(mutex_);
+  while (true) {
+    work_cv_.wait(lock, [this] { return stop_ || !queue_.empty(); });
+    if (queue_.empty()) {
+      return;
+    }
+    Task task = std::move(queue_.front());
+    queue_.pop_front();
+    lock.unlock();
+    task();
+    lock.lock();
+    ++num_done_;
+    done_cv_.notify_all();
+  }
+}
+
+void Stream::Synchronize() {
+  if (!async_) {
+    return;
+  }
+  std::unique_lock<std::mutex> lock(mutex_);
+  const uint64_t target = num_enqueued_;
+  done_cv_.wait(lock, [&] { return num_done_ >= target; });
+}
+
+bool Stream::Query() {
+  std::lock_guard<std::mutex> guard(mutex_);
+  return num_done_ == num_enqueued_;
+}
+
+void Stream::SynchronizeAll() {
+  std::lock_guard<std::mutex> guard(StreamsMutex());
+  for (auto stream : Streams()) {
+    stream->Synchronize();
+  }
+}
+
+}  // namespace custom_runtime
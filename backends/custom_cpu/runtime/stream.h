@@ -0,0 +1,96 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <condition_variable>
+#include <cstdint>
+#include <deque>
+#include <functional>
+#include <memory>
+#include <mutex>
+#include <thread>
+
+namespace custom_runtime {
+
+using Task = std::function<void()>;
+
+// A point in the work of a stream. Record() marks a new point and returns the
+// task that reaches it once the stream runs it; waiting on an event waits for
+// the last point recorded before the wait, like cudaEvent_t. An event that
+// was never recorded is complete.
+class Event {
+ public:
+  Event();
+
+  Task Record();
+  // Returns a task that blocks until the current last point is reached, so
+  // that another stream can wait for it.
+  Task Wait() const;
+  bool Query() const;
+  void Synchronize() const;
+
+ private:
+  struct State;
+  // Shared with the queued tasks, so an event may be destroyed while a
+  // stream still has to reach or wait for it.
+  std::shared_ptr<State> state_;
+};
+
+// An in-order queue of work run by a dedicated worker thread, modelling a
+// device stream: Enqueue returns immediately and the tasks of one stream run
+// one after another in FIFO order, concurrently with the host and with the
+// other streams.
+//
+// Kernels of this plugin run on the calling thread rather than on a stream,
+// so asynchronous streams are only safe when the framework synchronises
+// before the host reads the result of an asynchronous copy. They are enabled
+// with FLAGS_custom_cpu_async_stream=1; otherwise every task runs inline when
+// it is enqueued, which is the behaviour of a stream that is always idle.
+class Stream {
+ public:
+  Stream();
+  ~Stream();
+
+  // Starts from 1; 0 stands for work issued without a stream.
+  uint64_t id() const { return id_; }
+
+  void Enqueue(Task task);
+  // Waits until all tasks enqueued so far have run.
+  void Synchronize();
+  // True if all tasks enqueued so far have run.
+  bool Query();
+
+  void RecordEvent(Event *event) { Enqueue(event->Record()); }
+  void WaitEvent(const Event &event) { Enqueue(event.Wait()); }
+
+  // Synchronizes every live stream.
+  static void SynchronizeAll();
+
+ private:
+  void Run();
+
+  const uint64_t id_;
+  const bool async_;
+  std::mutex mutex_;
+  std::condition_variable work_cv_;
+  std::condition_variable done_cv_;
+  std::deque<Task> queue_;
+  uint64_t num_enqueued_ = 0;
+  uint64_t num_done_ = 0;
+  bool stop_ = false;
+  std::thread worker_;
+};
+
+}  // namespace custom_runtime
@@ -0,0 +1,304 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/zero_copy.h"
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <vector>
+
+#include "runtime/flags.h"
+
+namespace custom_runtime {
+
+constexpr size_t SharedArena::kMinSharedSize;
+
+namespace {
+
+// Every view is at least one mapping, and the default vm.max_map_count is
+// 65530; above this many views copies stop sharing pages.
+constexpr size_t kMaxViews = 1 << 14;
+
+}  // namespace
+
+SharedArena &SharedArena::Instance() {
+  // Never destroyed, like the memory pool whose blocks it maps.
+  static SharedArena *arena = new SharedArena();
+  return *arena;
+}
+
+SharedArena::SharedArena()
+    : enabled_(EnvToBool("FLAGS_custom_cpu_zero_copy", false)),
+      page_size_(sysconf(_SC_PAGESIZE)) {
+  if (enabled_) {
+    fd_ = memfd_create("custom_cpu", MFD_CLOEXEC);
+    if (fd_ < 0) {
+      perror("[custom_cpu] memfd_create, zero copy disabled");
+      enabled_ = false;
+    }
+  }
+}
+
+void SharedArena::SplitView(uintptr_t addr) {
+  auto it = views_.upper_bound(addr);
+  if (it == views_.begin()) {
+    return;
+  }
+  --it;
+  const uintptr_t end = it->first + it->second.size;
+  if (it->first < addr && addr < end) {
+    View tail = it->second;
+    tail.size = end - addr;
+    tail.offset += addr - it->first;
+    it->second.size = addr - it->first;
+    views_.emplace(addr, tail);
+  }
+}
+
+void SharedArena::SplitRef(uint64_t offset) {
+  auto it = refs_.upper_bound(offset);
+  if (it == refs_.begin()) {
+    return;
+  }
+  --it;
+  const uint64_t end = it->first + it->second.size;
+  if (it->first < offset && offset < end) {
+    Ref tail{end - offset, it->second.count};
+    it->second.size = offset - it->first;
+    refs_.emplace(offset, tail);
+  }
+}
+
+bool SharedArena::CoverViews(uintptr_t addr, size_t size) {
+  SplitView(addr);
+  SplitView(addr + size);
+  uintptr_t pos = addr;
+  for (auto it = views_.find(addr); it != views_.end() && pos < addr + size;
+       ++it) {
+    if (it->first != pos) {
+      return false;
+    }
+    pos += it->second.size;
+  }
+  return pos == addr + size;
+}
+
+void SharedArena::AddRefs(uint64_t offset, uint64_t size) {
+  const uint64_t end = offset + size;
+  SplitRef(offset);
+  SplitRef(end);
+  uint64_t pos = offset;
+  auto it = refs_.lower_bound(offset);
+  while (pos < end) {
+    if (it != refs_.end() && it->first == pos) {
+      ++it->second.count;
+      pos += it->second.size;
+      ++it;
+    } else {
+      const uint64_t next =
+          it == refs_.end() ? end : std::min<uint64_t>(it->first, end);
+      refs_.emplace_hint(it, pos, Ref{next - pos, 1});
+      pos = next;
+    }
+  }
+}
+
+void SharedArena::ReleaseRefs(uint64_t offset, uint64_t size) {
+  const uint64_t end = offset + size;
+  SplitRef(offset);
+  SplitRef(end);
+  auto it = refs_.lower_bound(offset);
+  while (it != refs_.end() && it->first < end) {
+    if (--it->second.count == 0) {
+      fallocate(fd_,
+                FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE,
+                it->first,
+                it->second.size);
+      it = refs_.erase(it);
+    } else {
+      ++it;
+    }
+  }
+}
+
+uint64_t SharedArena::AllocateOffset(size_t size) {
+  // File pages are never reused, so a page that is still mapped somewhere
+  // cannot be handed out twice. The file is sparse: freed pages are holes.
+  const uint64_t offset = next_offset_;
+  if (offset + size > file_size_) {
+    const uint64_t file_size =
+        std::max<uint64_t>(offset + size, 2 * file_size_);
+    if (ftruncate(fd_, file_size) != 0) {
+      return UINT64_MAX;
+    }
+    file_size_ = file_size;
+  }
+  next_offset_ += size;
+  return offset;
+}
+
+void SharedArena::MapFixed(uintptr_t addr,
+                           size_t size,
+                           uint64_t offset,
+                           bool shared) {
+  void *ptr = mmap(reinterpret_cast<void *>(addr),
+                   size,
+                   PROT_READ | PROT_WRITE,
+                   (shared ? MAP_SHARED : MAP_PRIVATE) | MAP_FIXED,
+                   fd_,
+                   offset);
+  if (ptr == MAP_FAILED) {
+    // The old pages may already be gone, so the buffer cannot be recovered.
+    perror("[custom_cpu] remapping zero-copy memory");
+    abort();
+  }
+}
+
+void *SharedArena::Map(size_t size) {
+  size = (size + page_size_ - 1) / page_size_ * page_size_;
+  std::lock_guard<std::mutex> guard(mutex_);
+  const uint64_t offset = AllocateOffset(size);
+  if (offset == UINT64_MAX) {
+    return nullptr;
+  }
+  void *ptr =
+      mmap(nullptr, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd_, offset);
+  if (ptr == MAP_FAILED) {
+    return nullptr;
+  }
+  views_.emplace(reinterpret_cast<uintptr_t>(ptr), View{size, offset, true});
+  AddRefs(offset, size);
+  return ptr;
+}
+
+void SharedArena::Unmap(void *ptr, size_t size) {
+  size = (size + page_size_ - 1) / page_size_ * page_size_;
+  const auto addr = reinterpret_cast<uintptr_t>(ptr);
+  {
+    std::lock_guard<std::mutex> guard(mutex_);
+    CoverViews(addr, size);
+    auto it = views_.lower_bound(addr);
+    while (it != views_.end() && it->first < addr + size) {
+      ReleaseRefs(it->second.offset, it->second.size);
+      it = views_.erase(it);
+    }
+  }
+  munmap(ptr, size);
+}
+
+void SharedArena::Reset(void *ptr, size_t size) {
+  size = (size + page_size_ - 1) / page_size_ * page_size_;
+  const auto addr = reinterpret_cast<uintptr_t>(ptr);
+  std::lock_guard<std::mutex> guard(mutex_);
+  auto it = views_.find(addr);
+  if (it != views_.end() && it->second.size == size && it->second.shared) {
+    return;
+  }
+  const uint64_t offset = AllocateOffset(size);
+  if (offset == UINT64_MAX) {
+    return;
+  }
+  CoverViews(addr, size);
+  it = views_.lower_bound(addr);
+  while (it != views_.end() && it->first < addr + size) {
+    ReleaseRefs(it->second.offset, it->second.size);
+    it = views_.erase(it);
+  }
+  MapFixed(addr, size, offset, true);
+  views_.emplace(addr, View{size, offset, true});
+  AddRefs(offset, size);
+}
+
+size_t SharedArena::Copy(void *dst, const void *src, size_t size) {
+  const auto d = reinterpret_cast<uintptr_t>(dst);
+  const auto s = reinterpret_cast<uintptr_t>(src);
+  // Only pages at the same offset in a page can be shared.
+  if (!enabled_ || size < kMinSharedSize || (d - s) % page_size_ != 0 ||
+      (d < s + size && s < d + size)) {
+    memcpy(dst, src, size);
+    bytes_copied_.fetch_add(size, std::memory_order_relaxed);
+    return 0;
+  }
+
+  const uintptr_t begin = (s + page_size_ - 1) / page_size_ * page_size_;
+  const uintptr_t end = (s + size) / page_size_ * page_size_;
+  const size_t length = end - begin;
+  const uintptr_t dst_begin = d + (begin - s);
+  bool shared = false;
+  {
+    std::lock_guard<std::mutex> guard(mutex_);
+    std::vector<std::pair<uintptr_t, View>> sources;
+    bool shareable = views_.size() < kMaxViews && CoverViews(begin, length) &&
+                     CoverViews(dst_begin, length);
+    for (auto it = views_.find(begin);
+         shareable && it != views_.end() && it->first < end;
+         ++it) {
+      shareable = it->second.shared;
+      sources.emplace_back(*it);
+    }
+    if (shareable) {
+      // The source turns private first, so that its own writes from now on
+      // stay out of the file pages the destination maps.
+      for (auto &source : sources) {
+        MapFixed(source.first, source.second.size, source.second.offset, false);
+        views_[source.first].shared = false;
+      }
+      auto it = views_.find(dst_begin);
+      while (it != views_.end() && it->first < dst_begin + length) {
+        ReleaseRefs(it->second.offset, it->second.size);
+        it = views_.erase(it);
+      }
+      for (auto &source : sources) {
+        const uintptr_t addr = dst_begin + (source.first - begin);
+        MapFixed(addr, source.second.size, source.second.offset, false);
+        views_.emplace(addr,
+                       View{source.second.size, source.second.offset, false});
+        AddRefs(source.second.offset, source.second.size);
+      }
+      shared = true;
+    }
+  }
+  if (!shared) {
+    memcpy(dst, src, size);
+    bytes_copied_.fetch_add(size, std::memory_order_relaxed);
+    return 0;
+  }
+  // The partial pages at either end.
+  memcpy(dst, src, begin - s);
+  memcpy(reinterpret_cast<void *>(dst_begin + length),
+         reinterpret_cast<const void *>(end),
+         s + size - end);
+  bytes_copied_.fetch_add(size - length, std::memory_order_relaxed);
+  bytes_shared_.fetch_add(length, std::memory_order_relaxed);
+  return length;
+}
+
+CustomCPUZeroCopyStats SharedArena::GetStats() const {
+  CustomCPUZeroCopyStats stats;
+  stats.bytes_copied = bytes_copied_.load();
+  stats.bytes_shared = bytes_shared_.load();
+  return stats;
+}
+
+}  // namespace custom_runtime
+
+void CustomCPUZeroCopyGetStats(CustomCPUZeroCopyStats *stats) {
+  *stats = custom_runtime::SharedArena::Instance().GetStats();
+}
@@ -0,0 +1,114 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <map>
+#include <mutex>
+
+extern "C" {
+
+typedef struct {
+  uint64_t bytes_copied;  // bytes moved by memcpy
+  uint64_t bytes_shared;  // bytes shared copy-on-write instead
+} CustomCPUZeroCopyStats;
+
+void CustomCPUZeroCopyGetStats(CustomCPUZeroCopyStats *stats);
+
+}  // extern "C"
+
+namespace custom_runtime {
+
+// Memory whose pages can be shared copy-on-write between buffers, so that a
+// copy does not have to touch them.
+//
+// With FLAGS_custom_cpu_zero_copy=1 the memory pool maps its large blocks
+// from one memfd instead of anonymous memory. Copy then maps the whole pages
+// of the destination onto the file pages of the source, privately on both
+// sides: the kernel duplicates a page only when one of the buffers writes to
+// it, and the bytes of partial pages at either end are copied.
+//
+// Pages are only shared from a source whose pages still hold what is in the
+// file, that is one that was not itself the source or the destination of a
+// shared copy; any other copy, and every copy that involves memory not
+// mapped here, falls back to memcpy.
+class SharedArena {
+ public:
+  static SharedArena &Instance();
+
+  bool enabled() const { return enabled_; }
+  size_t page_size() const { return page_size_; }
+
+  // `size` is rounded up to whole pages. Returns nullptr on failure.
+  void *Map(size_t size);
+  void Unmap(void *ptr, size_t size);
+  // Gives the pages of [ptr, ptr + size) fresh file pages again if any of
+  // them are shared, so a cached block holds no pages of other buffers.
+  void Reset(void *ptr, size_t size);
+
+  // Copies `size` bytes from src to dst, sharing whole pages when it can.
+  // Returns the number of bytes that were shared.
+  size_t Copy(void *dst, const void *src, size_t size);
+
+  CustomCPUZeroCopyStats GetStats() const;
+
+  // Copies smaller than this are always done with memcpy.
+  static constexpr size_t kMinSharedSize = 1 << 20;
+
+ private:
+  // A run of pages mapped from consecutive file pages.
+  struct View {
+    size_t size;
+    uint64_t offset;
+    bool shared;  // MAP_SHARED, so the file holds the contents
+  };
+  // Number of mappings of a run of file pages.
+  struct Ref {
+    uint64_t size;
+    uint32_t count;
+  };
+
+  SharedArena();
+
+  // Make `addr` or `offset` the start of an entry, splitting the one that
+  // contains it.
+  void SplitView(uintptr_t addr);
+  void SplitRef(uint64_t offset);
+  // True if [addr, addr + size) is covered by views, which are then split
+  // at both ends.
+  bool CoverViews(uintptr_t addr, size_t size);
+  void AddRefs(uint64_t offset, uint64_t size);
+  // Drops a reference and frees the file pages nobody maps any more.
+  void ReleaseRefs(uint64_t offset, uint64_t size);
+  uint64_t AllocateOffset(size_t size);
+  void MapFixed(uintptr_t addr, size_t size, uint64_t offset, bool shared);
+
+  bool enabled_;
+  const size_t page_size_;
+  int fd_ = -1;
+
+  std::mutex mutex_;  // guards everything below
+  uint64_t file_size_ = 0;
+  uint64_t next_offset_ = 0;
+  std::map<uintptr_t, View> views_;
+  std::map<uint64_t, Ref> refs_;
+
+  std::atomic<uint64_t> bytes_copied_{0};
+  std::atomic<uint64_t> bytes_shared_{0};
+};
+
+}  // namespace custom_runtime
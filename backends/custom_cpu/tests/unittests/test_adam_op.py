@@ -0,0 +1,158 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def adam_step(inputs, attributes, coeff=0.0, lr_ratio=1.0):
+    param = inputs["Param"]
+    grad = inputs["Grad"]
+    moment1 = inputs["Moment1"]
+    moment2 = inputs["Moment2"]
+    lr = inputs["LearningRate"] * lr_ratio
+    beta1_pow = inputs["Beta1Pow"]
+    beta2_pow = inputs["Beta2Pow"]
+    beta1 = attributes["beta1"]
+    beta2 = attributes["beta2"]
+    epsilon = attributes["epsilon"]
+
+    param = param * (1.0 - lr * coeff)
+    moment1_out = beta1 * moment1 + (1 - beta1) * grad
+    moment2_out = beta2 * moment2 + (1 - beta2) * np.square(grad)
+    lr_t = lr * np.sqrt(1 - beta2_pow) / (1 - beta1_pow)
+    param_out = param - lr_t * (
+        moment1_out / (np.sqrt(moment2_out) + epsilon * np.sqrt(1 - beta2_pow))
+    )
+    return param_out, moment1_out, moment2_out
+
+
+class TestAdamOp(OpTest):
+    def setUp(self):
+        self.op_type = "adam"
+        self.init_shape()
+        param = np.random.uniform(-1, 1, self.shape).astype("float32")
+        grad = np.random.uniform(-1, 1, self.shape).astype("float32")
+        moment1 = np.random.uniform(-1, 1, self.shape).astype("float32")
+        moment2 = np.random.random(self.shape).astype("float32")
+
+        beta1 = 0.78
+        beta2 = 0.836
+        epsilon = 1e-4
+        beta1_pow = beta1**10
+        beta2_pow = beta2**10
+
+        self.inputs = {
+            "Param": param,
+            "Grad": grad,
+            "Moment1": moment1,
+            "Moment2": moment2,
+            "LearningRate": np.array([0.004]).astype("float32"),
+            "Beta1Pow": np.array([beta1_pow]).astype("float32"),
+            "Beta2Pow": np.array([beta2_pow]).astype("float32"),
+        }
+        self.attrs = {"epsilon": epsilon, "beta1": beta1, "beta2": beta2}
+        self.set_decay()
+
+        param_out, moment1_out, moment2_out = self.reference()
+        self.outputs = {
+            "Moment1Out": moment1_out,
+            "Moment2Out": moment2_out,
+            "ParamOut": param_out,
+            "Beta1PowOut": np.array([beta1_pow]).astype("float32") * beta1,
+            "Beta2PowOut": np.array([beta2_pow]).astype("float32") * beta2,
+        }
+
+    def init_shape(self):
+        self.shape = [102, 105]
+
+    def set_decay(self):
+        pass
+
+    def reference(self):
+        return adam_step(self.inputs, self.attrs)
+
+    def test_check_output(self):
+        self.check_output(atol=1e-5)
+
+
+class TestAdamOpLarge(TestAdamOp):
+    # Several chunks of the multi-tensor loop.
+    def init_shape(self):
+        self.shape = [300, 257]
+
+
+class TestAdamWOp(TestAdamOp):
+    def setUp(self):
+        super().setUp()
+        self.op_type = "adamw"
+
+    def set_decay(self):
+        self.attrs["coeff"] = 0.5
+        self.attrs["lr_ratio"] = 0.1
+        self.attrs["with_decay"] = True
+
+    def reference(self):
+        return adam_step(
+            self.inputs,
+            self.attrs,
+            coeff=self.attrs["coeff"],
+            lr_ratio=self.attrs["lr_ratio"],
+        )
+
+
+class TestMultiTensorAdam(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        self.shapes = [[2, 3], [128], [300, 257], [1], [64, 64]]
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def run_optimizer(self, use_multi_tensor):
+        paddle.seed(10)
+        params = [paddle.create_parameter(shape, "float32") for shape in self.shapes]
+        optimizer = paddle.optimizer.Adam(
+            learning_rate=0.01, parameters=params, use_multi_tensor=use_multi_tensor
+        )
+        for _ in range(3):
+            loss = paddle.add_n([paddle.mean(p * p) for p in params])
+            loss.backward()
+            optimizer.step()
+            optimizer.clear_grad()
+        return [p.numpy() for p in params]
+
+    def test_matches_single_tensor_adam(self):
+        expected = self.run_optimizer(False)
+        actual = self.run_optimizer(True)
+        for e, a in zip(expected, actual):
+            np.testing.assert_allclose(a, e, rtol=1e-6, atol=1e-7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -423,5 +423,31 @@ class TestArgsortWithInputNaN(unittest.TestCase):
         paddle.enable_static()
 
 
+class TestArgsortLongRows(unittest.TestCase):
+    # Rows of 1000 elements go through the radix sort; axis 1 is strided.
+    def setUp(self):
+        self.place = core.CustomPlace("custom_cpu", 0)
+
+    def check(self, data, descending):
+        paddle.disable_static(self.place)
+        out = paddle.argsort(paddle.to_tensor(data), axis=1, descending=descending)
+        key = -data if descending else data
+        expect = np.argsort(key, axis=1, kind="stable")
+        np.testing.assert_array_equal(out.numpy(), expect)
+        paddle.enable_static()
+
+    def test_int64_with_ties(self):
+        data = np.random.randint(-50, 50, [3, 1000, 5]).astype("int64")
+        self.check(data, False)
+        self.check(data, True)
+
+    def test_float32_with_nan(self):
+        data = np.random.uniform(-1, 1, [3, 1000, 5]).astype("float32")
+        self.check(data, True)
+        data[0, 10, :] = np.nan
+        data[2, 999, 1] = np.nan
+        self.check(data, False)
+
+
 if __name__ == "__main__":
     unittest.main()
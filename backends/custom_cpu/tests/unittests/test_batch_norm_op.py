@@ -0,0 +1,181 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+
+paddle.set_device("custom_cpu")
+
+
+def _reduce_axes(x, data_format):
+    channel_last = data_format == "NHWC" or x.ndim == 2
+    axes = tuple(range(x.ndim - 1)) if channel_last else (0,) + tuple(range(2, x.ndim))
+    shape = [1] * x.ndim
+    shape[x.ndim - 1 if channel_last else 1] = -1
+    return axes, shape
+
+
+def batch_norm_forward_naive(x, scale, bias, epsilon, data_format):
+    axes, shape = _reduce_axes(x, data_format)
+    mean = np.mean(x, axis=axes)
+    var = np.var(x, axis=axes)
+    x_hat = (x - mean.reshape(shape)) / np.sqrt(var.reshape(shape) + epsilon)
+    y = x_hat * scale.reshape(shape) + bias.reshape(shape)
+    return y, mean, var
+
+
+def batch_norm_backward_naive(x, dy, scale, epsilon, data_format):
+    axes, shape = _reduce_axes(x, data_format)
+    m = x.size // scale.size
+    mean = np.mean(x, axis=axes).reshape(shape)
+    inv_std = 1.0 / np.sqrt(np.var(x, axis=axes).reshape(shape) + epsilon)
+    x_hat = (x - mean) * inv_std
+    dbias = np.sum(dy, axis=axes)
+    dscale = np.sum(dy * x_hat, axis=axes)
+    dx = (
+        scale.reshape(shape)
+        * inv_std
+        * (dy - dbias.reshape(shape) / m - x_hat * dscale.reshape(shape) / m)
+    )
+    return dx, dscale, dbias
+
+
+class TestBatchNorm(unittest.TestCase):
+    def setUp(self):
+        self.epsilon = 1e-5
+        self.momentum = 0.9
+        self.init_dtype()
+        self.init_test_case()
+
+    def init_dtype(self):
+        self.dtype = "float64"
+        self.rtol = 1e-6
+        self.atol = 1e-6
+
+    def init_test_case(self):
+        self.shape = [4, 8, 7, 9]
+        self.data_format = "NCHW"
+
+    def channels(self):
+        return self.shape[-1 if self.data_format == "NHWC" else 1]
+
+    def test_train(self):
+        c = self.channels()
+        x_np = np.random.uniform(-2, 3, self.shape).astype(self.dtype)
+        dy_np = np.random.uniform(-1, 1, self.shape).astype(self.dtype)
+        scale_np = np.random.uniform(0.5, 1.5, [c]).astype(self.dtype)
+        bias_np = np.random.uniform(-1, 1, [c]).astype(self.dtype)
+        running_mean_np = np.random.uniform(-1, 1, [c]).astype(self.dtype)
+        running_var_np = np.random.uniform(0.5, 1.5, [c]).astype(self.dtype)
+
+        x = paddle.to_tensor(x_np, stop_gradient=False)
+        scale = paddle.to_tensor(scale_np, stop_gradient=False)
+        bias = paddle.to_tensor(bias_np, stop_gradient=False)
+        running_mean = paddle.to_tensor(running_mean_np)
+        running_var = paddle.to_tensor(running_var_np)
+        y = paddle.nn.functional.batch_norm(
+            x,
+            running_mean,
+            running_var,
+            weight=scale,
+            bias=bias,
+            training=True,
+            momentum=self.momentum,
+            epsilon=self.epsilon,
+            data_format=self.data_format,
+        )
+        dx, dscale, dbias = paddle.grad(
+            [y], [x, scale, bias], [paddle.to_tensor(dy_np)]
+        )
+
+        y_ref, mean_ref, var_ref = batch_norm_forward_naive(
+            x_np, scale_np, bias_np, self.epsilon, self.data_format
+        )
+        dx_ref, dscale_ref, dbias_ref = batch_norm_backward_naive(
+            x_np, dy_np, scale_np, self.epsilon, self.data_format
+        )
+        tol = dict(rtol=self.rtol, atol=self.atol)
+        np.testing.assert_allclose(y.numpy(), y_ref, **tol)
+        np.testing.assert_allclose(
+            running_mean.numpy(),
+            running_mean_np * self.momentum + mean_ref * (1 - self.momentum),
+            **tol
+        )
+        np.testing.assert_allclose(
+            running_var.numpy(),
+            running_var_np * self.momentum + var_ref * (1 - self.momentum),
+            **tol
+        )
+        np.testing.assert_allclose(dx.numpy(), dx_ref, **tol)
+        np.testing.assert_allclose(dscale.numpy(), dscale_ref, **tol)
+        np.testing.assert_allclose(dbias.numpy(), dbias_ref, **tol)
+
+    def test_eval(self):
+        c = self.channels()
+        x_np = np.random.uniform(-2, 3, self.shape).astype(self.dtype)
+        scale_np = np.random.uniform(0.5, 1.5, [c]).astype(self.dtype)
+        bias_np = np.random.uniform(-1, 1, [c]).astype(self.dtype)
+        mean_np = np.random.uniform(-1, 1, [c]).astype(self.dtype)
+        var_np = np.random.uniform(0.5, 1.5, [c]).astype(self.dtype)
+
+        y = paddle.nn.functional.batch_norm(
+            paddle.to_tensor(x_np),
+            paddle.to_tensor(mean_np),
+            paddle.to_tensor(var_np),
+            weight=paddle.to_tensor(scale_np),
+            bias=paddle.to_tensor(bias_np),
+            training=False,
+            epsilon=self.epsilon,
+            data_format=self.data_format,
+        )
+
+        _, shape = _reduce_axes(x_np, self.data_format)
+        y_ref = (x_np - mean_np.reshape(shape)) / np.sqrt(
+            var_np.reshape(shape) + self.epsilon
+        ) * scale_np.reshape(shape) + bias_np.reshape(shape)
+        np.testing.assert_allclose(y.numpy(), y_ref, rtol=self.rtol, atol=self.atol)
+
+
+class TestBatchNormNHWC(TestBatchNorm):
+    def init_test_case(self):
+        self.shape = [4, 7, 9, 80]
+        self.data_format = "NHWC"
+
+
+class TestBatchNorm2D(TestBatchNorm):
+    def init_test_case(self):
+        self.shape = [64, 33]
+        self.data_format = "NCHW"
+
+
+class TestBatchNormFP32(TestBatchNorm):
+    def init_dtype(self):
+        self.dtype = "float32"
+        self.rtol = 1e-4
+        self.atol = 1e-4
+
+
+class TestBatchNormNHWCFP32(TestBatchNormNHWC):
+    def init_dtype(self):
+        self.dtype = "float32"
+        self.rtol = 1e-4
+        self.atol = 1e-4
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -115,6 +115,87 @@ class TestCastOpFp32ToBf16(OpTest):
         self.check_output()
 
 
+class TestCastOpInt64ToFp64(OpTest):
+    def setUp(self):
+        # Not representable in float32.
+        ipt = np.random.randint(-(2**53), 2**53, size=[10, 10]).astype("int64")
+        self.inputs = {"X": ipt}
+        self.outputs = {"Out": ipt.astype("float64")}
+        self.attrs = {
+            "in_dtype": int(core.VarDesc.VarType.INT64),
+            "out_dtype": int(core.VarDesc.VarType.FP64),
+        }
+        self.op_type = "cast"
+        self.__class__.no_need_check_grad = True
+
+    def test_check_output(self):
+        self.check_output(atol=0)
+
+
+class TestCastOpInt64ToInt32(OpTest):
+    def setUp(self):
+        ipt = np.random.randint(-(2**31), 2**31, size=[10, 10]).astype("int64")
+        self.inputs = {"X": ipt}
+        self.outputs = {"Out": ipt.astype("int32")}
+        self.attrs = {
+            "in_dtype": int(core.VarDesc.VarType.INT64),
+            "out_dtype": int(core.VarDesc.VarType.INT32),
+        }
+        self.op_type = "cast"
+        self.__class__.no_need_check_grad = True
+
+    def test_check_output(self):
+        self.check_output(atol=0)
+
+
+class TestCastOpFp64ToFp16(OpTest):
+    def setUp(self):
+        ipt = np.random.uniform(-70000, 70000, size=[100, 100])
+        self.inputs = {"X": ipt.astype("float64")}
+        self.outputs = {"Out": ipt.astype("float16")}
+        self.attrs = {
+            "in_dtype": int(core.VarDesc.VarType.FP64),
+            "out_dtype": int(core.VarDesc.VarType.FP16),
+        }
+        self.op_type = "cast"
+        self.__class__.no_need_check_grad = True
+
+    def test_check_output(self):
+        self.check_output(atol=0)
+
+
+class TestCastOpFp32ToFp16Large(OpTest):
+    def setUp(self):
+        # Large enough to be split across threads and vectorised.
+        ipt = np.random.uniform(-1000, 1000, size=[1027, 513]).astype("float32")
+        self.inputs = {"X": ipt}
+        self.outputs = {"Out": ipt.astype("float16")}
+        self.attrs = {
+            "in_dtype": int(core.VarDesc.VarType.FP32),
+            "out_dtype": int(core.VarDesc.VarType.FP16),
+        }
+        self.op_type = "cast"
+        self.__class__.no_need_check_grad = True
+
+    def test_check_output(self):
+        self.check_output(atol=0)
+
+
+class TestCastOpFp32ToFp32(OpTest):
+    def setUp(self):
+        ipt = np.random.random(size=[10, 10]).astype("float32")
+        self.inputs = {"X": ipt}
+        self.outputs = {"Out": ipt}
+        self.attrs = {
+            "in_dtype": int(core.VarDesc.VarType.FP32),
+            "out_dtype": int(core.VarDesc.VarType.FP32),
+        }
+        self.op_type = "cast"
+
+    def test_check_output(self):
+        self.check_output()
+
+
 class TestCastOpError(unittest.TestCase):
     def test_errors(self):
         with program_guard(Program(), Program()):
@@ -248,6 +248,22 @@ def create_paddle_case(op_type, callback):
                 (res,) = exe.run(feed={"x": input_x, "y": input_y}, fetch_list=[out])
             self.assertEqual((res == real_result).all(), True)
 
+        def test_dynamic_broadcast_float(self):
+            paddle.disable_static(paddle.CustomPlace("custom_cpu", 0))
+            for x_shape, y_shape in [
+                ([64, 33, 130], [1]),
+                ([64, 33, 130], [33, 1]),
+                ([1, 130], [64, 33, 130]),
+            ]:
+                input_x = np.random.randint(-2, 3, x_shape).astype(np.float32)
+                input_y = np.random.randint(-2, 3, y_shape).astype(np.float32)
+                input_x.flat[:3] = [np.nan, np.inf, -np.inf]
+                op = eval("paddle.%s" % (self.op_type))
+                out = op(paddle.to_tensor(input_x), paddle.to_tensor(input_y))
+                real_result = callback(input_x, input_y)
+                np.testing.assert_array_equal(out.numpy(), real_result)
+            paddle.enable_static()
+
         def test_attr_name(self):
             paddle.enable_static()
             with program_guard(Program(), Program()):
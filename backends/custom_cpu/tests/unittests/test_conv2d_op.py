@@ -0,0 +1,352 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def conv2d_forward_naive(
+    input, filter, group, conv_param, padding_algorithm="EXPLICIT", data_format="NCHW"
+):
+    channel_last = data_format == "NHWC"
+    if channel_last:
+        input = np.transpose(input, [0, 3, 1, 2])
+
+    in_n, in_c, in_h, in_w = input.shape
+    f_n, f_c, f_h, f_w = filter.shape
+    assert f_c * group == in_c
+    sub_f_n = f_n // group
+
+    stride, pad, dilation = (
+        conv_param["stride"],
+        conv_param["pad"],
+        conv_param["dilation"],
+    )
+
+    if padding_algorithm == "VALID":
+        pad = [0, 0, 0, 0]
+    elif padding_algorithm == "SAME":
+        dilation = [1, 1]
+        pad = []
+        for input_size, filter_size, stride_size in zip(
+            input.shape[2:4], filter.shape[2:4], stride
+        ):
+            out_size = (input_size + stride_size - 1) // stride_size
+            pad_sum = max((out_size - 1) * stride_size + filter_size - input_size, 0)
+            pad.append(pad_sum // 2)
+            pad.append(pad_sum - pad_sum // 2)
+
+    if len(pad) == 4:
+        pad_h_0, pad_h_1, pad_w_0, pad_w_1 = pad
+    else:
+        pad_h_0, pad_h_1, pad_w_0, pad_w_1 = pad[0], pad[0], pad[1], pad[1]
+
+    d_block_h = dilation[0] * (f_h - 1) + 1
+    d_block_w = dilation[1] * (f_w - 1) + 1
+    out_h = 1 + (in_h + pad_h_0 + pad_h_1 - d_block_h) // stride[0]
+    out_w = 1 + (in_w + pad_w_0 + pad_w_1 - d_block_w) // stride[1]
+    out = np.zeros((in_n, f_n, out_h, out_w))
+
+    input_pad = np.pad(
+        input,
+        ((0, 0), (0, 0), (pad_h_0, pad_h_1), (pad_w_0, pad_w_1)),
+        mode="constant",
+        constant_values=0,
+    )
+    filter_dilation = np.zeros((f_n, f_c, d_block_h, d_block_w))
+    filter_dilation[
+        :, :, 0 : d_block_h : dilation[0], 0 : d_block_w : dilation[1]
+    ] = filter
+
+    for i in range(out_h):
+        for j in range(out_w):
+            for g in range(group):
+                input_pad_masked = input_pad[
+                    :,
+                    g * f_c : (g + 1) * f_c,
+                    i * stride[0] : i * stride[0] + d_block_h,
+                    j * stride[1] : j * stride[1] + d_block_w,
+                ]
+                f_sub = filter_dilation[g * sub_f_n : (g + 1) * sub_f_n]
+                for k in range(sub_f_n):
+                    out[:, g * sub_f_n + k, i, j] = np.sum(
+                        input_pad_masked * f_sub[k], axis=(1, 2, 3)
+                    )
+
+    if channel_last:
+        out = np.transpose(out, [0, 2, 3, 1])
+    return out
+
+
+def create_test_channel_last_class(parent):
+    class TestChannelLastCase(parent):
+        def init_data_format(self):
+            self.data_format = "NHWC"
+
+    cls_name = "{0}_{1}".format(parent.__name__, "ChannelLast")
+    TestChannelLastCase.__name__ = cls_name
+    globals()[cls_name] = TestChannelLastCase
+
+
+def create_test_padding_SAME_class(parent):
+    class TestPaddingSAMECase(parent):
+        def init_paddings(self):
+            self.pad = [0, 0]
+            self.padding_algorithm = "SAME"
+
+    cls_name = "{0}_{1}".format(parent.__name__, "PaddingSAMEOp")
+    TestPaddingSAMECase.__name__ = cls_name
+    globals()[cls_name] = TestPaddingSAMECase
+
+
+def create_test_padding_VALID_class(parent):
+    class TestPaddingVALIDCase(parent):
+        def init_paddings(self):
+            self.pad = [1, 1]
+            self.padding_algorithm = "VALID"
+
+    cls_name = "{0}_{1}".format(parent.__name__, "PaddingVALIDOp")
+    TestPaddingVALIDCase.__name__ = cls_name
+    globals()[cls_name] = TestPaddingVALIDCase
+
+
+class TestConv2DOp(OpTest):
+    def setUp(self):
+        self.op_type = "conv2d"
+        self.python_api = paddle.nn.functional.conv2d
+        self.dtype = np.float64
+        self.init_op_type()
+        self.init_group()
+        self.init_dilation()
+        self.init_data_format()
+        self.init_paddings()
+        self.init_test_case()
+
+        input_size = self.input_size
+        if self.data_format == "NHWC":
+            N, C, H, W = input_size
+            input_size = [N, H, W, C]
+
+        input = np.random.random(input_size).astype(self.dtype)
+        filter = np.random.uniform(-1, 1, self.filter_size).astype(self.dtype)
+        output = conv2d_forward_naive(
+            input,
+            filter,
+            self.groups,
+            {"stride": self.stride, "pad": self.pad, "dilation": self.dilations},
+            self.padding_algorithm,
+            self.data_format,
+        ).astype(self.dtype)
+
+        self.inputs = {"Input": input, "Filter": filter}
+        self.attrs = {
+            "strides": self.stride,
+            "paddings": self.pad,
+            "padding_algorithm": self.padding_algorithm,
+            "groups": self.groups,
+            "dilations": self.dilations,
+            "data_format": self.data_format,
+        }
+        self.outputs = {"Output": output}
+
+    def test_check_output(self):
+        self.check_output(atol=1e-5)
+
+    def test_check_grad(self):
+        self.check_grad({"Input", "Filter"}, "Output", max_relative_error=0.02)
+
+    def test_check_grad_no_filter(self):
+        self.check_grad(
+            ["Input"], "Output", max_relative_error=0.02, no_grad_set=set(["Filter"])
+        )
+
+    def test_check_grad_no_input(self):
+        self.check_grad(
+            ["Filter"], "Output", max_relative_error=0.02, no_grad_set=set(["Input"])
+        )
+
+    def init_op_type(self):
+        pass
+
+    def init_group(self):
+        self.groups = 1
+
+    def init_dilation(self):
+        self.dilations = [1, 1]
+
+    def init_data_format(self):
+        self.data_format = "NCHW"
+
+    def init_paddings(self):
+        self.padding_algorithm = "EXPLICIT"
+
+    def init_test_case(self):
+        self.pad = [0, 0]
+        self.stride = [1, 1]
+        self.input_size = [2, 3, 5, 5]  # NCHW
+        self.filter_size = [6, 3 // self.groups, 3, 3]
+
+
+class TestWithPad(TestConv2DOp):
+    def init_test_case(self):
+        self.pad = [1, 1]
+        self.stride = [1, 1]
+        self.input_size = [2, 3, 5, 5]
+        self.filter_size = [6, 3, 3, 3]
+
+
+class TestWithAsymmetricPad(TestConv2DOp):
+    def init_test_case(self):
+        self.pad = [0, 1, 2, 1]
+        self.stride = [1, 2]
+        self.input_size = [2, 3, 6, 7]
+        self.filter_size = [6, 3, 3, 2]
+
+
+class TestWithStride(TestConv2DOp):
+    def init_test_case(self):
+        self.pad = [1, 1]
+        self.stride = [2, 2]
+        self.input_size = [2, 3, 6, 6]
+        self.filter_size = [6, 3, 3, 3]
+
+
+class TestWithGroup(TestConv2DOp):
+    def init_group(self):
+        self.groups = 3
+
+    def init_test_case(self):
+        self.pad = [1, 1]
+        self.stride = [1, 1]
+        self.input_size = [2, 6, 5, 5]
+        self.filter_size = [9, 2, 3, 3]
+
+
+class TestWithDilation(TestConv2DOp):
+    def init_dilation(self):
+        self.dilations = [2, 2]
+
+    def init_test_case(self):
+        self.pad = [1, 1]
+        self.stride = [1, 1]
+        self.input_size = [2, 3, 10, 10]
+        self.filter_size = [12, 3, 3, 3]
+
+
+class TestWith1x1(TestConv2DOp):
+    def init_test_case(self):
+        self.pad = [0, 0]
+        self.stride = [1, 1]
+        self.input_size = [2, 3, 5, 5]
+        self.filter_size = [12, 3, 1, 1]
+
+
+# Enough channels per group for the heuristic to pick Winograd.
+class TestWithWinograd(TestConv2DOp):
+    def init_test_case(self):
+        self.pad = [1, 1]
+        self.stride = [1, 1]
+        self.input_size = [1, 32, 7, 7]
+        self.filter_size = [32, 32, 3, 3]
+
+    def test_check_grad(self):
+        pass
+
+    def test_check_grad_no_filter(self):
+        pass
+
+    def test_check_grad_no_input(self):
+        pass
+
+
+class TestDepthwiseConv2DOp(TestConv2DOp):
+    def init_op_type(self):
+        self.op_type = "depthwise_conv2d"
+
+    def init_group(self):
+        self.groups = 4
+
+    def init_test_case(self):
+        self.pad = [1, 1]
+        self.stride = [1, 1]
+        self.input_size = [2, 4, 6, 6]
+        self.filter_size = [8, 1, 3, 3]
+
+
+class TestDepthwiseConv2DOpWithStride(TestDepthwiseConv2DOp):
+    def init_test_case(self):
+        self.pad = [2, 2]
+        self.stride = [2, 2]
+        self.input_size = [2, 4, 9, 9]
+        self.filter_size = [4, 1, 5, 5]
+
+
+create_test_padding_SAME_class(TestWithStride)
+create_test_padding_SAME_class(TestDepthwiseConv2DOp)
+create_test_padding_VALID_class(TestWithPad)
+create_test_padding_VALID_class(TestDepthwiseConv2DOp)
+
+create_test_channel_last_class(TestWithStride)
+create_test_channel_last_class(TestWithGroup)
+create_test_channel_last_class(TestDepthwiseConv2DOp)
+
+
+class TestConv2DAPI(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_dygraph(self):
+        x_np = np.random.random([2, 8, 12, 12]).astype("float32")
+        w_np = np.random.uniform(-1, 1, [16, 8, 3, 3]).astype("float32")
+        x = paddle.to_tensor(x_np, stop_gradient=False)
+        w = paddle.to_tensor(w_np, stop_gradient=False)
+        out = paddle.nn.functional.conv2d(x, w, stride=1, padding=1)
+        expected = conv2d_forward_naive(
+            x_np, w_np, 1, {"stride": [1, 1], "pad": [1, 1], "dilation": [1, 1]}
+        )
+        np.testing.assert_allclose(out.numpy(), expected, rtol=1e-4, atol=1e-4)
+
+        # The gradient of sum(out) w.r.t. the filter is the sum of the
+        # input patches that each filter tap sees.
+        out.sum().backward()
+        x_pad = np.pad(x_np, ((0, 0), (0, 0), (1, 1), (1, 1)))
+        w_grad = np.zeros_like(w_np)
+        for kh in range(3):
+            for kw in range(3):
+                w_grad[:, :, kh, kw] = x_pad[:, :, kh : kh + 12, kw : kw + 12].sum(
+                    axis=(0, 2, 3)
+                )
+        np.testing.assert_allclose(w.grad.numpy(), w_grad, rtol=1e-4, atol=1e-3)
+        self.assertEqual(x.grad.shape, x.shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
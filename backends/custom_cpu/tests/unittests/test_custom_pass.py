@@ -0,0 +1,130 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function, division
+
+import numpy as np
+import unittest
+import paddle
+import paddle.fluid.core as core
+
+# registers generate_fused_linear_act and the fused_linear_act op
+import paddle_custom_device.custom_cpu.passes  # noqa: F401
+
+paddle.enable_static()
+
+
+class LinearActNet(paddle.nn.Layer):
+    def __init__(self):
+        super().__init__()
+        self.fc1 = paddle.nn.Linear(32, 64)
+        self.fc2 = paddle.nn.Linear(64, 48)
+        self.fc3 = paddle.nn.Linear(48, 16)
+
+    def forward(self, x):
+        x = paddle.nn.functional.relu(self.fc1(x))
+        x = paddle.nn.functional.gelu(self.fc2(x))
+        return paddle.nn.functional.gelu(self.fc3(x), approximate=True)
+
+
+MODEL_FILE = "./saved_linear_act_model"
+
+
+class TestFusedLinearActPass(unittest.TestCase):
+    def setUp(self):
+        self.x = np.random.uniform(-1, 1, [4, 32]).astype("float32")
+
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        net = LinearActNet()
+        net.eval()
+        self.expected = net(paddle.to_tensor(self.x)).numpy()
+        net = paddle.jit.to_static(
+            net, input_spec=[paddle.static.InputSpec([None, 32], "float32", "x")]
+        )
+        paddle.jit.save(net, MODEL_FILE)
+        paddle.enable_static()
+
+    def run_predictor(self, use_pass):
+        config = paddle.inference.Config()
+        config.set_prog_file(MODEL_FILE + ".pdmodel")
+        config.set_params_file(MODEL_FILE + ".pdiparams")
+        config.enable_memory_optim()
+        config.enable_custom_device("custom_cpu")
+        if use_pass:
+            config.pass_builder().append_pass("generate_fused_linear_act")
+        predictor = paddle.inference.create_predictor(config)
+
+        input_tensor = predictor.get_input_handle(predictor.get_input_names()[0])
+        input_tensor.copy_from_cpu(self.x)
+        predictor.run()
+        output_tensor = predictor.get_output_handle(predictor.get_output_names()[0])
+        return output_tensor.copy_to_cpu()
+
+    @staticmethod
+    def apply_pass(program):
+        graph = core.Graph(program.desc)
+        core.get_pass("generate_fused_linear_act").apply(graph)
+        return [node.op() for node in graph.nodes() if node.is_op()]
+
+    def test_pass_rewrites_program(self):
+        exe = paddle.static.Executor(paddle.CustomPlace("custom_cpu", 0))
+        program, _, _ = paddle.static.load_inference_model(MODEL_FILE, exe)
+        ops = self.apply_pass(program)
+        op_types = [op.type() for op in ops]
+        for op_type in ["matmul_v2", "elementwise_add", "relu", "gelu"]:
+            self.assertNotIn(op_type, op_types)
+        act_types = [
+            op.attr("act_type") for op in ops if op.type() == "fused_linear_act"
+        ]
+        self.assertEqual(sorted(act_types), ["gelu", "gelu_tanh", "relu"])
+
+    def check_other_axis_unchanged(self, x_shape, axis):
+        # The bias has as many elements as the columns of the product, but is
+        # broadcast along another axis, which fused_linear_act cannot do.
+        main = paddle.static.Program()
+        with paddle.static.program_guard(main, paddle.static.Program()):
+            x = paddle.static.data("x", x_shape, "float32")
+            weight = paddle.static.create_parameter([16, 16], "float32")
+            bias = paddle.static.create_parameter([16], "float32")
+            product = paddle.matmul(x, weight)
+            block = main.global_block()
+            added = block.create_var(name="added", dtype="float32", shape=x_shape)
+            block.append_op(
+                type="elementwise_add",
+                inputs={"X": [product], "Y": [bias]},
+                outputs={"Out": [added]},
+                attrs={"axis": axis},
+            )
+            paddle.nn.functional.relu(added)
+        op_types = [op.type() for op in self.apply_pass(main)]
+        self.assertNotIn("fused_linear_act", op_types)
+        for op_type in ["matmul_v2", "elementwise_add", "relu"]:
+            self.assertIn(op_type, op_types)
+
+    def test_pass_skips_bias_on_other_axis(self):
+        self.check_other_axis_unchanged([16, 16], 0)
+        self.check_other_axis_unchanged([2, 16, 16], 1)
+
+    def test_fused_linear_act(self):
+        np.testing.assert_allclose(
+            self.run_predictor(False), self.expected, rtol=1e-5, atol=1e-6
+        )
+        np.testing.assert_allclose(
+            self.run_predictor(True), self.expected, rtol=1e-5, atol=1e-6
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
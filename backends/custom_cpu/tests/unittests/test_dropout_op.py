@@ -0,0 +1,104 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestDropoutOp(OpTest):
+    def setUp(self):
+        self.op_type = "dropout"
+        self.inputs = {"X": np.random.random((32, 64)).astype("float32")}
+        self.attrs = {"dropout_prob": 0.0, "fix_seed": True, "is_test": False}
+        self.outputs = {
+            "Out": self.inputs["X"],
+            "Mask": np.ones((32, 64)).astype("uint8"),
+        }
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad_normal(self):
+        self.check_grad(["X"], "Out")
+
+
+class TestDropoutOpAllDropped(TestDropoutOp):
+    def setUp(self):
+        self.op_type = "dropout"
+        self.inputs = {"X": np.random.random((32, 64, 2)).astype("float32")}
+        self.attrs = {"dropout_prob": 1.0, "fix_seed": True, "is_test": False}
+        self.outputs = {
+            "Out": np.zeros((32, 64, 2)).astype("float32"),
+            "Mask": np.zeros((32, 64, 2)).astype("uint8"),
+        }
+
+
+class TestDropoutOpInference(OpTest):
+    def setUp(self):
+        self.op_type = "dropout"
+        self.inputs = {"X": np.random.random((32, 64)).astype("float32")}
+        self.attrs = {"dropout_prob": 0.35, "fix_seed": True, "is_test": True}
+        self.outputs = {"Out": self.inputs["X"] * (1.0 - 0.35)}
+
+    def test_check_output(self):
+        self.check_output()
+
+
+class TestDropoutAPI(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_upscale_in_train(self):
+        p = 0.3
+        x = paddle.to_tensor(
+            np.random.uniform(1, 2, [256, 512]).astype("float32"), stop_gradient=False
+        )
+        out = paddle.nn.functional.dropout(x, p=p)
+        kept = out.numpy() != 0
+        self.assertAlmostEqual(kept.mean(), 1.0 - p, delta=0.01)
+        np.testing.assert_allclose(
+            out.numpy()[kept], x.numpy()[kept] / (1.0 - p), rtol=1e-6
+        )
+        (grad,) = paddle.grad([out], [x], [paddle.ones_like(out)])
+        np.testing.assert_allclose(grad.numpy(), kept / (1.0 - p), rtol=1e-6)
+
+    def test_global_seed(self):
+        x = paddle.ones([1000, 10])
+        paddle.seed(7)
+        first = paddle.nn.functional.dropout(x, p=0.5).numpy()
+        paddle.seed(7)
+        np.testing.assert_array_equal(
+            paddle.nn.functional.dropout(x, p=0.5).numpy(), first
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
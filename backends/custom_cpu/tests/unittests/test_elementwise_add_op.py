@@ -0,0 +1,91 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import paddle
+from op_test import OpTest
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestElementwiseAddOp(OpTest):
+    def setUp(self):
+        self.op_type = "elementwise_add"
+        self.python_api = paddle.add
+        self.dtype = np.float64
+        self.axis = -1
+        self.init_input_output()
+        self.init_axis()
+
+        self.inputs = {"X": self.x, "Y": self.y}
+        self.outputs = {"Out": self.out}
+        self.attrs = {"axis": self.axis}
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad_normal(self):
+        self.check_grad(["X", "Y"], "Out")
+
+    def test_check_grad_ingore_x(self):
+        self.check_grad(["Y"], "Out", no_grad_set=set("X"))
+
+    def test_check_grad_ingore_y(self):
+        self.check_grad(["X"], "Out", no_grad_set=set("Y"))
+
+    def init_input_output(self):
+        self.x = np.random.uniform(0.1, 1, [13, 17]).astype(self.dtype)
+        self.y = np.random.uniform(0.1, 1, [13, 17]).astype(self.dtype)
+        self.out = self.x + self.y
+
+    def init_axis(self):
+        pass
+
+
+class TestElementwiseAddOp_bias(TestElementwiseAddOp):
+    def init_input_output(self):
+        self.x = np.random.rand(8, 10).astype(self.dtype)
+        self.y = np.random.rand(10).astype(self.dtype)
+        self.out = self.x + self.y
+
+
+class TestElementwiseAddOp_broadcast_0(TestElementwiseAddOp):
+    def init_input_output(self):
+        self.x = np.random.rand(10, 3, 4).astype(self.dtype)
+        self.y = np.random.rand(10).astype(self.dtype)
+        self.out = self.x + self.y.reshape(10, 1, 1)
+
+    def init_axis(self):
+        self.axis = 0
+
+
+class TestElementwiseAddOp_broadcast_both(TestElementwiseAddOp):
+    def init_input_output(self):
+        self.x = np.random.rand(2, 1, 4).astype(self.dtype)
+        self.y = np.random.rand(3, 1).astype(self.dtype)
+        self.out = self.x + self.y
+
+
+if __name__ == "__main__":
+    unittest.main()
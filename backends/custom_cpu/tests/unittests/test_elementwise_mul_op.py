@@ -223,6 +223,27 @@ class TestElementwiseMulOp_xsize_lessthan_ysize(ElementwiseMulOp):
         self.init_kernel_type()
 
 
+class TestElementwiseMulOp_broadcast_large(ElementwiseMulOp):
+    # Large enough to be split across threads in the middle of a row.
+    def setUp(self):
+        self.op_type = "elementwise_mul"
+        self.inputs = {
+            "X": np.random.rand(3, 129, 257).astype(np.float64),
+            "Y": np.random.rand(3, 1, 257).astype(np.float64),
+        }
+        self.outputs = {"Out": self.inputs["X"] * self.inputs["Y"]}
+        self.init_kernel_type()
+
+    def test_check_grad_normal(self):
+        pass
+
+    def test_check_grad_ingore_x(self):
+        pass
+
+    def test_check_grad_ingore_y(self):
+        pass
+
+
 class TestElementwiseMulOpError(unittest.TestCase):
     def test_errors(self):
         with program_guard(Program(), Program()):
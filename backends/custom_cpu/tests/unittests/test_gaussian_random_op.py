@@ -0,0 +1,88 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestGaussianRandomOp(OpTest):
+    def setUp(self):
+        self.op_type = "gaussian_random"
+        self.python_api = paddle.normal
+        self.set_attrs()
+        self.inputs = {}
+        self.attrs = {
+            "shape": [123, 92],
+            "mean": self.mean,
+            "std": self.std,
+            "seed": 10,
+            "dtype": self.dtype,
+        }
+        self.outputs = {"Out": np.zeros((123, 92), dtype="float32")}
+
+    def set_attrs(self):
+        self.mean = 1.0
+        self.std = 2.0
+        self.dtype = paddle.fluid.core.VarDesc.VarType.FP32
+
+    def test_check_output(self):
+        self.check_output_customized(self.verify_output)
+
+    def verify_output(self, outs):
+        data = np.array(outs[0])
+        self.assertEqual(data.shape, (123, 92))
+        np.testing.assert_allclose(np.mean(data), self.mean, atol=0.05)
+        np.testing.assert_allclose(np.std(data), self.std, rtol=0.05)
+
+
+class TestGaussianRandomOpFP64(TestGaussianRandomOp):
+    def set_attrs(self):
+        self.mean = -3.0
+        self.std = 0.5
+        self.dtype = paddle.fluid.core.VarDesc.VarType.FP64
+
+
+class TestGaussianRandomSeed(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_global_seed(self):
+        paddle.seed(2023)
+        first = paddle.randn([1000, 3]).numpy()
+        second = paddle.randn([1000, 3]).numpy()
+        paddle.seed(2023)
+        np.testing.assert_array_equal(paddle.randn([1000, 3]).numpy(), first)
+        np.testing.assert_array_equal(paddle.randn([1000, 3]).numpy(), second)
+        self.assertFalse(np.array_equal(first, second))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def layer_norm_forward_naive(x, scale, bias, epsilon, begin_norm_axis):
+    rows = int(np.prod(x.shape[:begin_norm_axis]))
+    cols = int(np.prod(x.shape[begin_norm_axis:]))
+    x2d = x.reshape(rows, cols)
+    mean = np.mean(x2d, axis=1)
+    var = np.var(x2d, axis=1)
+    y = (x2d - mean[:, None]) / np.sqrt(var[:, None] + epsilon)
+    if scale is not None:
+        y = y * scale.reshape(1, cols)
+    if bias is not None:
+        y = y + bias.reshape(1, cols)
+    return y.reshape(x.shape), mean, var
+
+
+class TestLayerNormOp(OpTest):
+    def setUp(self):
+        self.op_type = "layer_norm"
+        self.dtype = np.float64
+        self.epsilon = 1e-5
+        self.init_test_case()
+
+        cols = int(np.prod(self.shape[self.begin_norm_axis :]))
+        x = np.random.uniform(-1, 2, self.shape).astype(self.dtype)
+        scale = np.random.uniform(0.5, 1.5, [cols]).astype(self.dtype)
+        bias = np.random.uniform(-1, 1, [cols]).astype(self.dtype)
+        y, mean, var = layer_norm_forward_naive(
+            x, scale, bias, self.epsilon, self.begin_norm_axis
+        )
+
+        self.inputs = {"X": x, "Scale": scale, "Bias": bias}
+        self.attrs = {
+            "epsilon": self.epsilon,
+            "begin_norm_axis": self.begin_norm_axis,
+        }
+        self.outputs = {
+            "Y": y.astype(self.dtype),
+            "Mean": mean.astype(self.dtype),
+            "Variance": var.astype(self.dtype),
+        }
+
+    def init_test_case(self):
+        self.shape = [2, 6, 5, 7]
+        self.begin_norm_axis = 1
+
+    def test_check_output(self):
+        self.check_output(atol=1e-6)
+
+    def test_check_grad(self):
+        self.check_grad(["X", "Scale", "Bias"], "Y", max_relative_error=0.01)
+
+    def test_check_grad_no_scale_bias(self):
+        self.check_grad(
+            ["X"], "Y", max_relative_error=0.01, no_grad_set=set(["Scale", "Bias"])
+        )
+
+
+class TestLayerNormOpLastAxis(TestLayerNormOp):
+    def init_test_case(self):
+        self.shape = [3, 4, 130]
+        self.begin_norm_axis = 2
+
+
+class TestLayerNormOpWithoutScaleBias(OpTest):
+    def setUp(self):
+        self.op_type = "layer_norm"
+        self.dtype = np.float64
+        self.epsilon = 1e-5
+        self.begin_norm_axis = 1
+
+        x = np.random.uniform(-1, 2, [5, 67]).astype(self.dtype)
+        y, mean, var = layer_norm_forward_naive(
+            x, None, None, self.epsilon, self.begin_norm_axis
+        )
+
+        self.inputs = {"X": x}
+        self.attrs = {
+            "epsilon": self.epsilon,
+            "begin_norm_axis": self.begin_norm_axis,
+        }
+        self.outputs = {
+            "Y": y.astype(self.dtype),
+            "Mean": mean.astype(self.dtype),
+            "Variance": var.astype(self.dtype),
+        }
+
+    def test_check_output(self):
+        self.check_output(atol=1e-6)
+
+    def test_check_grad(self):
+        self.check_grad(["X"], "Y", max_relative_error=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+class TestLookupTableV2Op(OpTest):
+    def setUp(self):
+        self.op_type = "lookup_table_v2"
+        self.python_api = paddle.nn.functional.embedding
+        self.init_dtype()
+        self.init_padding_idx()
+        table = np.random.random((17, 31)).astype(self.dtype)
+        # Every id appears several times, so the gradient merges duplicates.
+        ids = np.random.randint(0, 17, (4, 25)).astype(self.id_dtype)
+        ids[0, :3] = [3, 3, 3]
+
+        out = table[ids]
+        if self.padding_idx != -1:
+            out[ids == self.padding_idx] = 0
+
+        self.inputs = {"W": table, "Ids": ids}
+        self.attrs = {"padding_idx": self.padding_idx}
+        self.outputs = {"Out": out}
+
+    def init_dtype(self):
+        self.dtype = "float64"
+        self.id_dtype = "int64"
+
+    def init_padding_idx(self):
+        self.padding_idx = -1
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad(["W"], "Out", no_grad_set=set(["Ids"]))
+
+
+class TestLookupTableV2OpInt32Ids(TestLookupTableV2Op):
+    def init_dtype(self):
+        self.dtype = "float64"
+        self.id_dtype = "int32"
+
+
+class TestLookupTableV2OpPaddingIdx(TestLookupTableV2Op):
+    def init_padding_idx(self):
+        self.padding_idx = 3
+
+
+class TestLookupTableV2OpFP32(TestLookupTableV2OpPaddingIdx):
+    def init_dtype(self):
+        self.dtype = "float32"
+        self.id_dtype = "int64"
+
+    def test_check_grad(self):
+        self.check_grad(["W"], "Out", no_grad_set=set(["Ids"]), max_relative_error=0.01)
+
+
+class TestEmbeddingGradDuplicates(unittest.TestCase):
+    def test_duplicate_ids_accumulate(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        ids = paddle.to_tensor(np.array([[1, 2, 1], [0, 1, 4]], dtype="int64"))
+        weight = paddle.to_tensor(
+            np.random.random((6, 8)).astype("float32"), stop_gradient=False
+        )
+        out = paddle.nn.functional.embedding(ids, weight, padding_idx=4)
+        out.backward(paddle.ones_like(out))
+
+        expected = np.zeros((6, 8), dtype="float32")
+        expected[0] = 1
+        expected[1] = 3
+        expected[2] = 1
+        np.testing.assert_allclose(weight.grad.numpy(), expected)
+        np.testing.assert_allclose(out.numpy()[1, 2], np.zeros(8))
+        paddle.enable_static()
+
+
+class TestEmbeddingInvalidIds(unittest.TestCase):
+    def run_embedding(self, ids, padding_idx=None):
+        ids = paddle.to_tensor(np.array(ids, dtype="int64"))
+        weight = paddle.to_tensor(np.random.random((6, 8)).astype("float32"))
+        return paddle.nn.functional.embedding(ids, weight, padding_idx=padding_idx)
+
+    def test_negative_id_without_padding_raises(self):
+        # Without padding the kernel gets padding_idx -1, which must not make
+        # an id of -1 valid.
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        with self.assertRaises(Exception):
+            self.run_embedding([[0, -1]]).numpy()
+        with self.assertRaises(Exception):
+            self.run_embedding([[0, -1]], padding_idx=4).numpy()
+        with self.assertRaises(Exception):
+            self.run_embedding([[0, 6]]).numpy()
+        paddle.enable_static()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -268,6 +268,38 @@ class TestMatMul2Dx3D_TransXY(TestMatMulOp):
         self.trans_y = True
 
 
+class TestMatMul2Dx2DLarge(TestMatMulOp):
+    def config(self):
+        self.x_shape = (40, 50)
+        self.y_shape = (50, 60)
+        self.trans_x = False
+        self.trans_y = False
+
+
+class TestMatMul2Dx2DLarge_TransXY(TestMatMulOp):
+    def config(self):
+        self.x_shape = (50, 40)
+        self.y_shape = (60, 50)
+        self.trans_x = True
+        self.trans_y = True
+
+
+class TestMatMul3Dx2DLarge_TransY(TestMatMulOp):
+    def config(self):
+        self.x_shape = (3, 40, 50)
+        self.y_shape = (60, 50)
+        self.trans_x = False
+        self.trans_y = True
+
+
+class TestMatMul2Dx3DLarge_TransX(TestMatMulOp):
+    def config(self):
+        self.x_shape = (50, 40)
+        self.y_shape = (3, 50, 60)
+        self.trans_x = True
+        self.trans_y = False
+
+
 if __name__ == "__main__":
     paddle.enable_static()
     unittest.main()
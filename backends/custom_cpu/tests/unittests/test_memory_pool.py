@@ -0,0 +1,100 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ctypes
+import os
+import unittest
+
+import numpy as np
+import paddle
+
+paddle.set_device("custom_cpu")
+
+
+class CustomCPUMemoryStats(ctypes.Structure):
+    _fields_ = [
+        ("num_allocs", ctypes.c_uint64),
+        ("num_cache_hits", ctypes.c_uint64),
+        ("num_frees", ctypes.c_uint64),
+        ("bytes_requested", ctypes.c_uint64),
+        ("bytes_in_use", ctypes.c_uint64),
+        ("bytes_cached", ctypes.c_uint64),
+        ("bytes_reserved", ctypes.c_uint64),
+        ("peak_bytes_reserved", ctypes.c_uint64),
+        ("hit_rate", ctypes.c_double),
+        ("fragmentation", ctypes.c_double),
+    ]
+
+
+def load_plugin():
+    # Opening the already loaded plugin again returns the same handle, so the
+    # counters below are the ones Paddle's allocations go through.
+    path = os.path.join(
+        os.environ.get("CUSTOM_DEVICE_ROOT", ""), "libpaddle-custom-cpu.so"
+    )
+    if not os.path.exists(path):
+        return None
+    lib = ctypes.CDLL(path)
+    lib.CustomCPUMemoryPoolGetStats.argtypes = [ctypes.POINTER(CustomCPUMemoryStats)]
+    lib.CustomCPUMemoryPoolGetStats.restype = None
+    lib.CustomCPUMemoryPoolTrim.argtypes = []
+    lib.CustomCPUMemoryPoolTrim.restype = ctypes.c_uint64
+    return lib
+
+
+def get_stats(lib):
+    stats = CustomCPUMemoryStats()
+    lib.CustomCPUMemoryPoolGetStats(ctypes.byref(stats))
+    return stats
+
+
+@unittest.skipIf(load_plugin() is None, "custom_cpu plugin library not found")
+class TestMemoryPool(unittest.TestCase):
+    def setUp(self):
+        self.lib = load_plugin()
+
+    def allocate_tensors(self):
+        for _ in range(10):
+            xs = [paddle.rand([256, 1024 + 64 * i]) for i in range(8)]
+            out = paddle.add_n(xs)
+            np.testing.assert_allclose(
+                out.numpy(), np.sum([x.numpy() for x in xs], axis=0), rtol=1e-5
+            )
+
+    def test_stats_are_consistent(self):
+        self.allocate_tensors()
+        stats = get_stats(self.lib)
+        self.assertGreater(stats.num_allocs, 0)
+        self.assertLessEqual(stats.num_cache_hits, stats.num_allocs)
+        self.assertGreaterEqual(stats.hit_rate, 0.0)
+        self.assertLessEqual(stats.hit_rate, 1.0)
+        self.assertLessEqual(stats.bytes_requested, stats.bytes_in_use)
+        self.assertEqual(stats.bytes_reserved, stats.bytes_in_use + stats.bytes_cached)
+        self.assertGreaterEqual(stats.peak_bytes_reserved, stats.bytes_reserved)
+
+    def test_trim_releases_cached_blocks(self):
+        self.allocate_tensors()
+        before = get_stats(self.lib)
+        released = self.lib.CustomCPUMemoryPoolTrim()
+        after = get_stats(self.lib)
+        self.assertEqual(released, before.bytes_cached)
+        self.assertEqual(after.bytes_cached, 0)
+        self.assertEqual(after.bytes_reserved, after.bytes_in_use)
+
+        # The pool keeps serving allocations after a trim.
+        self.allocate_tensors()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def momentum_step(
+    param,
+    grad,
+    velocity,
+    lr,
+    mu,
+    use_nesterov=False,
+    regularization_coeff=0.0,
+    rescale_grad=1.0,
+):
+    grad = grad * rescale_grad + regularization_coeff * param
+    velocity_out = mu * velocity + grad
+    if use_nesterov:
+        param_out = param - (grad + mu * velocity_out) * lr
+    else:
+        param_out = param - lr * velocity_out
+    return param_out, velocity_out
+
+
+class TestMomentumOp(OpTest):
+    def setUp(self):
+        self.op_type = "momentum"
+        self.init_config()
+        param = np.random.random((123, 321)).astype("float32")
+        grad = np.random.random((123, 321)).astype("float32")
+        velocity = np.random.random((123, 321)).astype("float32")
+        lr = np.array([0.001]).astype("float32")
+        mu = 0.0001
+
+        self.inputs = {
+            "Param": param,
+            "Grad": grad,
+            "Velocity": velocity,
+            "LearningRate": lr,
+        }
+        self.attrs = {
+            "mu": mu,
+            "use_nesterov": self.use_nesterov,
+            "regularization_method": self.regularization_method,
+            "regularization_coeff": self.regularization_coeff,
+            "rescale_grad": self.rescale_grad,
+        }
+
+        param_out, velocity_out = momentum_step(
+            param,
+            grad,
+            velocity,
+            lr,
+            mu,
+            self.use_nesterov,
+            self.regularization_coeff if self.regularization_method else 0.0,
+            self.rescale_grad,
+        )
+        self.outputs = {"ParamOut": param_out, "VelocityOut": velocity_out}
+
+    def init_config(self):
+        self.use_nesterov = False
+        self.regularization_method = ""
+        self.regularization_coeff = 0.0
+        self.rescale_grad = 1.0
+
+    def test_check_output(self):
+        self.check_output()
+
+
+class TestMomentumOpNesterov(TestMomentumOp):
+    def init_config(self):
+        self.use_nesterov = True
+        self.regularization_method = ""
+        self.regularization_coeff = 0.0
+        self.rescale_grad = 1.0
+
+
+class TestMomentumOpL2Decay(TestMomentumOp):
+    def init_config(self):
+        self.use_nesterov = False
+        self.regularization_method = "l2_decay"
+        self.regularization_coeff = 0.1
+        self.rescale_grad = 0.5
+
+
+class TestMultiTensorMomentum(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+        self.shapes = [[2, 3], [128], [300, 257], [1], [64, 64]]
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def run_optimizer(self, use_multi_tensor):
+        paddle.seed(10)
+        params = [paddle.create_parameter(shape, "float32") for shape in self.shapes]
+        optimizer = paddle.optimizer.Momentum(
+            learning_rate=0.01,
+            momentum=0.9,
+            parameters=params,
+            use_nesterov=True,
+            weight_decay=paddle.regularizer.L2Decay(0.01),
+            use_multi_tensor=use_multi_tensor,
+        )
+        for _ in range(3):
+            loss = paddle.add_n([paddle.mean(p * p) for p in params])
+            loss.backward()
+            optimizer.step()
+            optimizer.clear_grad()
+        return [p.numpy() for p in params]
+
+    def test_matches_single_tensor_momentum(self):
+        expected = self.run_optimizer(False)
+        actual = self.run_optimizer(True)
+        for e, a in zip(expected, actual):
+            np.testing.assert_allclose(a, e, rtol=1e-6, atol=1e-7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def adaptive_start_index(index, input_size, output_size):
+    return int(np.floor(index * input_size / output_size))
+
+
+def adaptive_end_index(index, input_size, output_size):
+    return int(np.ceil((index + 1) * input_size / output_size))
+
+
+def pool2D_forward_naive(
+    x,
+    ksize,
+    strides,
+    paddings,
+    global_pool=False,
+    ceil_mode=False,
+    exclusive=True,
+    adaptive=False,
+    data_format="NCHW",
+    pool_type="max",
+):
+    if data_format == "NHWC":
+        x = np.transpose(x, [0, 3, 1, 2])
+    N, C, H, W = x.shape
+    if global_pool:
+        ksize = [H, W]
+        paddings = [0, 0]
+    if adaptive:
+        H_out, W_out = ksize
+    elif ceil_mode:
+        H_out = (H - ksize[0] + 2 * paddings[0] + strides[0] - 1) // strides[0] + 1
+        W_out = (W - ksize[1] + 2 * paddings[1] + strides[1] - 1) // strides[1] + 1
+    else:
+        H_out = (H - ksize[0] + 2 * paddings[0]) // strides[0] + 1
+        W_out = (W - ksize[1] + 2 * paddings[1]) // strides[1] + 1
+
+    out = np.zeros((N, C, H_out, W_out))
+    for i in range(H_out):
+        for j in range(W_out):
+            if adaptive:
+                h0 = adaptive_start_index(i, H, H_out)
+                h1 = adaptive_end_index(i, H, H_out)
+                w0 = adaptive_start_index(j, W, W_out)
+                w1 = adaptive_end_index(j, W, W_out)
+            else:
+                h0 = np.max((i * strides[0] - paddings[0], 0))
+                h1 = np.min((i * strides[0] + ksize[0] - paddings[0], H))
+                w0 = np.max((j * strides[1] - paddings[1], 0))
+                w1 = np.min((j * strides[1] + ksize[1] - paddings[1], W))
+            window = x[:, :, h0:h1, w0:w1]
+            if pool_type == "max":
+                out[:, :, i, j] = np.max(window, axis=(2, 3))
+            elif exclusive or adaptive:
+                out[:, :, i, j] = np.sum(window, axis=(2, 3)) / ((h1 - h0) * (w1 - w0))
+            else:
+                out[:, :, i, j] = np.sum(window, axis=(2, 3)) / (ksize[0] * ksize[1])
+
+    if data_format == "NHWC":
+        out = np.transpose(out, [0, 2, 3, 1])
+    return out
+
+
+def create_test_channel_last_class(parent):
+    class TestChannelLastCase(parent):
+        def init_data_format(self):
+            self.data_format = "NHWC"
+
+    cls_name = "{0}_{1}".format(parent.__name__, "ChannelLast")
+    TestChannelLastCase.__name__ = cls_name
+    globals()[cls_name] = TestChannelLastCase
+
+
+def create_test_avg_class(parent):
+    class TestAvgCase(parent):
+        def init_pool_type(self):
+            self.pool_type = "avg"
+
+    cls_name = "{0}_{1}".format(parent.__name__, "Avg")
+    TestAvgCase.__name__ = cls_name
+    globals()[cls_name] = TestAvgCase
+
+
+class TestPool2D_Op(OpTest):
+    def setUp(self):
+        self.op_type = "pool2d"
+        self.dtype = np.float64
+        self.init_test_case()
+        self.init_global_pool()
+        self.init_pool_type()
+        self.init_ceil_mode()
+        self.init_exclusive()
+        self.init_adaptive()
+        self.init_data_format()
+
+        shape = self.shape
+        if self.data_format == "NHWC":
+            N, C, H, W = shape
+            shape = [N, H, W, C]
+        # Distinct values keep the max unique, so the numeric gradient of max
+        # pooling is well defined.
+        x = np.random.permutation(np.prod(shape)).reshape(shape)
+        x = (x / np.prod(shape)).astype(self.dtype)
+        output = pool2D_forward_naive(
+            x,
+            self.ksize,
+            self.strides,
+            self.paddings,
+            self.global_pool,
+            self.ceil_mode,
+            self.exclusive,
+            self.adaptive,
+            self.data_format,
+            self.pool_type,
+        ).astype(self.dtype)
+
+        self.inputs = {"X": x}
+        self.attrs = {
+            "strides": self.strides,
+            "paddings": self.paddings,
+            "ksize": self.ksize,
+            "pooling_type": self.pool_type,
+            "global_pooling": self.global_pool,
+            "ceil_mode": self.ceil_mode,
+            "exclusive": self.exclusive,
+            "adaptive": self.adaptive,
+            "data_format": self.data_format,
+        }
+        self.outputs = {"Out": output}
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad({"X"}, "Out", max_relative_error=0.07)
+
+    def init_test_case(self):
+        self.shape = [2, 3, 5, 5]
+        self.ksize = [3, 3]
+        self.strides = [1, 1]
+        self.paddings = [0, 0]
+
+    def init_global_pool(self):
+        self.global_pool = False
+
+    def init_pool_type(self):
+        self.pool_type = "max"
+
+    def init_ceil_mode(self):
+        self.ceil_mode = False
+
+    def init_exclusive(self):
+        self.exclusive = True
+
+    def init_adaptive(self):
+        self.adaptive = False
+
+    def init_data_format(self):
+        self.data_format = "NCHW"
+
+
+class TestPool2D_Op_Padding(TestPool2D_Op):
+    def init_test_case(self):
+        self.shape = [2, 3, 7, 9]
+        self.ksize = [3, 3]
+        self.strides = [2, 2]
+        self.paddings = [1, 1]
+
+
+class TestPool2D_Op_NotExclusive(TestPool2D_Op_Padding):
+    def init_pool_type(self):
+        self.pool_type = "avg"
+
+    def init_exclusive(self):
+        self.exclusive = False
+
+
+class TestPool2D_Op_CeilMode(TestPool2D_Op):
+    def init_test_case(self):
+        self.shape = [2, 3, 8, 8]
+        self.ksize = [3, 3]
+        self.strides = [2, 2]
+        self.paddings = [0, 0]
+
+    def init_ceil_mode(self):
+        self.ceil_mode = True
+
+
+class TestPool2D_Op_Global(TestPool2D_Op):
+    def init_global_pool(self):
+        self.global_pool = True
+
+
+class TestPool2D_Op_Adaptive(TestPool2D_Op):
+    def init_test_case(self):
+        self.shape = [2, 3, 7, 7]
+        self.ksize = [3, 3]
+        self.strides = [1, 1]
+        self.paddings = [0, 0]
+
+    def init_adaptive(self):
+        self.adaptive = True
+
+
+create_test_avg_class(TestPool2D_Op)
+create_test_avg_class(TestPool2D_Op_Padding)
+create_test_avg_class(TestPool2D_Op_CeilMode)
+create_test_avg_class(TestPool2D_Op_Global)
+create_test_avg_class(TestPool2D_Op_Adaptive)
+
+create_test_channel_last_class(TestPool2D_Op)
+create_test_channel_last_class(TestPool2D_Op_Padding)
+create_test_channel_last_class(TestPool2D_Op_NotExclusive)
+create_test_channel_last_class(TestPool2D_Op_CeilMode)
+create_test_channel_last_class(TestPool2D_Op_Global)
+create_test_channel_last_class(TestPool2D_Op_Adaptive)
+create_test_channel_last_class(TestPool2D_Op_PaddingAvg)
+create_test_channel_last_class(TestPool2D_Op_AdaptiveAvg)
+
+
+if __name__ == "__main__":
+    unittest.main()
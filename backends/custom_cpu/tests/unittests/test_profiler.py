@@ -0,0 +1,58 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+import paddle.profiler as profiler
+
+paddle.set_device("custom_cpu")
+
+
+class TestProfiler(unittest.TestCase):
+    def run_model(self):
+        x = paddle.to_tensor(np.random.random([512, 1024]).astype("float32"))
+        w = paddle.to_tensor(np.random.random([1024, 256]).astype("float32"))
+        y = paddle.nn.functional.softmax(paddle.matmul(x, w))
+        return y.numpy()
+
+    def test_chrome_trace_has_device_events(self):
+        prof = profiler.Profiler(
+            targets=[
+                profiler.ProfilerTarget.CPU,
+                profiler.ProfilerTarget.CUSTOM_DEVICE,
+            ],
+            custom_device_types=["custom_cpu"],
+        )
+        prof.start()
+        self.run_model()
+        prof.stop()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.json")
+            prof.export(path, format="json")
+            with open(path) as f:
+                trace = json.load(f)
+        events = trace["traceEvents"] if isinstance(trace, dict) else trace
+        names = {event.get("name", "") for event in events}
+        self.assertTrue(any("MemCpyH2D" in name for name in names))
+        self.assertTrue(any("MEMCPY_HtoD" in name for name in names))
+
+
+if __name__ == "__main__":
+    unittest.main()
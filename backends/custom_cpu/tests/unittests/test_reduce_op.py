@@ -180,6 +180,32 @@ class TestSumOp8D(OpTest):
         self.check_grad(["X"], "Out", check_eager=False)
 
 
+class TestSumOpLongRows(OpTest):
+    # Rows longer than one reduction block are reduced block by block.
+    def setUp(self):
+        self.python_api = paddle.sum
+        self.op_type = "reduce_sum"
+        self.inputs = {"X": np.random.random((3, 40000)).astype("float32")}
+        self.attrs = {"dim": [1]}
+        self.outputs = {"Out": self.inputs["X"].sum(axis=1)}
+
+    def test_check_output(self):
+        self.check_output(check_eager=False, atol=1e-3)
+
+
+class TestSumOpManyRows(OpTest):
+    # Non-adjacent reduced axes over many rows take two blocked passes.
+    def setUp(self):
+        self.python_api = paddle.sum
+        self.op_type = "reduce_sum"
+        self.inputs = {"X": np.random.random((2, 20000, 3, 7)).astype("float64")}
+        self.attrs = {"dim": [1, 3]}
+        self.outputs = {"Out": self.inputs["X"].sum(axis=(1, 3))}
+
+    def test_check_output(self):
+        self.check_output(check_eager=False)
+
+
 @skip_check_grad_ci(
     reason="reduce_max is discontinuous non-derivable function,"
     " its gradient check is not supported by unittest framework."
@@ -132,6 +132,68 @@ class TestSoftmaxOp6(TestSoftmaxOp):
         return 3
 
 
+class TestSoftmaxOpLongRowFP32(TestSoftmaxOp):
+    # Spans several online blocks of the contiguous path.
+    def get_x_shape(self):
+        return [4, 1000]
+
+    def init_kernel_type(self):
+        self.dtype = np.float32
+
+    def test_check_grad(self):
+        pass
+
+
+class TestSoftmaxOpStridedFP32(TestSoftmaxOp):
+    # The softmax axis is not innermost and inner spans two column chunks.
+    def get_x_shape(self):
+        return [2, 40, 200]
+
+    def get_axis(self):
+        return 1
+
+    def init_kernel_type(self):
+        self.dtype = np.float32
+
+    def test_check_grad(self):
+        pass
+
+
+class TestSoftmaxNanInf(unittest.TestCase):
+    # A NaN, or an inf that gives inf - inf, turns its whole softmax group into
+    # NaN as in the reference kernel, while -inf is clipped like any logit.
+    def setUp(self):
+        self.place = paddle.CustomPlace("custom_cpu", 0)
+        x = np.random.uniform(-1.0, 1.0, [4, 300]).astype("float32")
+        x[0, 7] = np.nan
+        x[1, 200] = np.inf
+        x[2, 100] = -np.inf
+        self.x_np = x
+
+    def check(self, dtype, axis):
+        paddle.disable_static(self.place)
+        x = self.x_np.astype(dtype)
+        out = F.softmax(paddle.to_tensor(x), axis=axis).numpy()
+        paddle.enable_static()
+        with np.errstate(invalid="ignore"):
+            out_ref = ref_softmax(x, axis=axis)
+        np.testing.assert_allclose(out, out_ref, rtol=1e-5, atol=1e-6, equal_nan=True)
+        return out
+
+    def test_last_axis(self):
+        for dtype in ["float32", "float64"]:
+            out = self.check(dtype, -1)
+            self.assertTrue(np.isnan(out[0]).all())
+            self.assertTrue(np.isnan(out[1]).all())
+            self.assertTrue(np.isfinite(out[2:]).all())
+
+    def test_strided_axis(self):
+        for dtype in ["float32", "float64"]:
+            out = self.check(dtype, 0)
+            self.assertTrue(np.isnan(out[:, [7, 200]]).all())
+            self.assertEqual(np.isnan(out).sum(), 2 * out.shape[0])
+
+
 class TestSoftmaxAPI(unittest.TestCase):
     def setUp(self):
         self.place = paddle.CustomPlace("custom_cpu", 0)
@@ -695,6 +695,32 @@ class TestSoftmaxWithCrossEntropyOpBoundary1(TestSoftmaxWithCrossEntropyOp):
         self.use_softmax = True
 
 
+class TestSoftmaxWithCrossEntropyOpManyClassesFP32(TestSoftmaxWithCrossEntropyOp):
+    """
+    Test the loss taken from the fused softmax pass with a class axis that is
+    long and not innermost.
+    """
+
+    def initParams(self):
+        self.op_type = "softmax_with_cross_entropy"
+        self.python_api = python_api
+        self.python_out_sig = ["Loss", "Softmax"]
+        self.numeric_stable_mode = True
+        self.soft_label = False
+        self.shape = [3, 1000, 150]
+        self.axis = 1
+        self.ignore_index = -1
+        self.dtype = np.float32
+        self.logits = np.random.uniform(-20.0, 20.0, self.shape).astype(self.dtype)
+        self.use_softmax = True
+
+    def test_check_output(self):
+        self.check_output(atol=1e-4)
+
+    def test_check_grad(self):
+        pass
+
+
 if __name__ == "__main__":
     paddle.enable_static()
     unittest.main()
@@ -0,0 +1,55 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import unittest
+
+# Set before the plugin is loaded, so streams get worker threads.
+os.environ["FLAGS_custom_cpu_async_stream"] = "1"
+
+import numpy as np
+import paddle
+
+paddle.set_device("custom_cpu")
+
+
+class TestStream(unittest.TestCase):
+    def test_event_orders_streams(self):
+        s1 = paddle.device.Stream()
+        s2 = paddle.device.Stream()
+        x = np.random.random([1024, 1024]).astype("float32")
+        with paddle.device.stream_guard(s1):
+            y = paddle.to_tensor(x) * 2
+            event = s1.record_event()
+        s2.wait_event(event)
+        s2.synchronize()
+        self.assertTrue(event.query())
+        self.assertTrue(s2.query())
+        np.testing.assert_allclose(y.numpy(), x * 2)
+
+    def test_synchronize(self):
+        stream = paddle.device.Stream()
+        event = paddle.device.Event()
+        self.assertTrue(event.query())
+        with paddle.device.stream_guard(stream):
+            x = paddle.rand([256, 256])
+            event.record()
+        event.synchronize()
+        paddle.device.synchronize()
+        self.assertTrue(stream.query())
+        self.assertEqual(x.shape, [256, 256])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+
+import unittest
+import numpy as np
+from op_test import OpTest
+import paddle
+
+paddle.enable_static()
+
+
+def get_places(self):
+    return [paddle.CustomPlace("custom_cpu", 0)]
+
+
+OpTest._get_places = get_places
+
+
+def numpy_topk(x, k=1, axis=-1, largest=True):
+    if axis < 0:
+        axis = len(x.shape) + axis
+    if largest:
+        indices = np.argsort(-x, axis=axis, kind="stable")
+    else:
+        indices = np.argsort(x, axis=axis, kind="stable")
+    indices = np.take(indices, np.arange(k), axis=axis)
+    value = np.take_along_axis(x, indices, axis=axis)
+    return value, indices
+
+
+class TestTopkOp(OpTest):
+    def init_args(self):
+        self.k = 3
+        self.axis = 1
+        self.largest = True
+
+    def setUp(self):
+        self.op_type = "top_k_v2"
+        self.python_api = paddle.topk
+        self.dtype = np.float64
+        self.input_data = np.random.rand(10, 20)
+        self.init_args()
+        self.inputs = {"X": self.input_data}
+        self.attrs = {"k": self.k, "axis": self.axis, "largest": self.largest}
+        output, indices = numpy_topk(
+            self.input_data, axis=self.axis, k=self.k, largest=self.largest
+        )
+        self.outputs = {"Out": output, "Indices": indices}
+
+    def test_check_output(self):
+        self.check_output()
+
+    def test_check_grad(self):
+        self.check_grad(["X"], "Out")
+
+
+class TestTopkOpSmallest(TestTopkOp):
+    def init_args(self):
+        self.k = 3
+        self.axis = 1
+        self.largest = False
+
+
+class TestTopkOpMiddleAxis(TestTopkOp):
+    def init_args(self):
+        self.k = 2
+        self.axis = 1
+        self.largest = True
+        self.input_data = np.random.rand(4, 7, 5)
+
+
+class TestTopkOpLongRow(TestTopkOp):
+    # k much smaller than the row: selected with a heap.
+    def init_args(self):
+        self.k = 5
+        self.axis = -1
+        self.largest = True
+        self.input_data = np.random.rand(3, 1000)
+
+
+class TestTopkOpFullRow(TestTopkOp):
+    def init_args(self):
+        self.k = 20
+        self.axis = 1
+        self.largest = False
+
+
+class TestTopkAPI(unittest.TestCase):
+    def setUp(self):
+        paddle.disable_static()
+        paddle.set_device("custom_cpu")
+
+    def tearDown(self):
+        paddle.enable_static()
+
+    def test_int64_with_ties(self):
+        data = np.random.randint(0, 20, [6, 500]).astype("int64")
+        values, indices = paddle.topk(paddle.to_tensor(data), k=7)
+        expect_values, expect_indices = numpy_topk(data, k=7)
+        np.testing.assert_array_equal(values.numpy(), expect_values)
+        np.testing.assert_array_equal(indices.numpy(), expect_indices)
+
+    def test_nan_is_largest(self):
+        data = np.array([[1.0, np.nan, 3.0, 2.0]], dtype="float32")
+        values, indices = paddle.topk(paddle.to_tensor(data), k=2)
+        np.testing.assert_array_equal(indices.numpy(), [[1, 2]])
+        values, indices = paddle.topk(paddle.to_tensor(data), k=2, largest=False)
+        np.testing.assert_array_equal(indices.numpy(), [[0, 3]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#   Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ctypes
+import os
+import unittest
+
+# Read when the plugin is loaded.
+os.environ["FLAGS_custom_cpu_zero_copy"] = "1"
+
+import numpy as np
+import paddle
+
+paddle.set_device("custom_cpu")
+
+
+class CustomCPUZeroCopyStats(ctypes.Structure):
+    _fields_ = [
+        ("bytes_copied", ctypes.c_uint64),
+        ("bytes_shared", ctypes.c_uint64),
+    ]
+
+
+def load_plugin():
+    path = os.path.join(
+        os.environ.get("CUSTOM_DEVICE_ROOT", ""), "libpaddle-custom-cpu.so"
+    )
+    if not os.path.exists(path):
+        return None
+    lib = ctypes.CDLL(path)
+    lib.CustomCPUZeroCopyGetStats.argtypes = [ctypes.POINTER(CustomCPUZeroCopyStats)]
+    lib.CustomCPUZeroCopyGetStats.restype = None
+    return lib
+
+
+def bytes_shared(lib):
+    stats = CustomCPUZeroCopyStats()
+    lib.CustomCPUZeroCopyGetStats(ctypes.byref(stats))
+    return stats.bytes_shared
+
+
+class TestZeroCopy(unittest.TestCase):
+    def setUp(self):
+        # 16 MB, well above the size from which copies share pages.
+        self.x_np = np.random.rand(16, 512, 512).astype("float32")
+        self.y_np = np.random.rand(16, 512, 512).astype("float32")
+
+    def test_clone_keeps_its_value_when_source_changes(self):
+        x = paddle.to_tensor(self.x_np)
+        clone = x.clone()
+        paddle.assign(paddle.to_tensor(self.y_np), x)
+        np.testing.assert_array_equal(clone.numpy(), self.x_np)
+        np.testing.assert_array_equal(x.numpy(), self.y_np)
+
+    def test_source_keeps_its_value_when_clone_changes(self):
+        x = paddle.to_tensor(self.x_np)
+        clone = x.clone()
+        paddle.assign(paddle.to_tensor(self.y_np), clone)
+        np.testing.assert_array_equal(x.numpy(), self.x_np)
+        np.testing.assert_array_equal(clone.numpy(), self.y_np)
+
+    def test_copy_of_copy(self):
+        x = paddle.to_tensor(self.x_np)
+        clones = [x.clone()]
+        for _ in range(3):
+            clones.append(clones[-1].clone())
+        del x
+        out = paddle.add(clones[-1], clones[0])
+        np.testing.assert_array_equal(clones[-1].numpy(), self.x_np)
+        np.testing.assert_allclose(out.numpy(), 2 * self.x_np)
+
+    def test_small_tensors(self):
+        x_np = np.random.rand(3, 5).astype("float32")
+        x = paddle.to_tensor(x_np)
+        clone = x.clone()
+        paddle.assign(paddle.zeros([3, 5]), x)
+        np.testing.assert_array_equal(clone.numpy(), x_np)
+
+    @unittest.skipIf(load_plugin() is None, "custom_cpu plugin library not found")
+    def test_pages_are_shared(self):
+        lib = load_plugin()
+        x = paddle.to_tensor(self.x_np)
+        before = bytes_shared(lib)
+        clone = x.clone()
+        self.assertGreater(bytes_shared(lib), before)
+        np.testing.assert_array_equal(clone.numpy(), self.x_np)
+
+
+if __name__ == "__main__":
+    unittest.main()
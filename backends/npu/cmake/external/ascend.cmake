@@ -82,4 +82,7 @@ else()
 endif()
 
 find_ascend_toolkit_version(${ASCEND_TOOLKIT_DIR}/ascend_toolkit_install.info)
-find_ascend_driver_version(${ASCEND_DIR}/driver/version.info)
+# hosts that build WITH_ACL_STUB have the toolkit but no driver
+if(EXISTS ${ASCEND_DIR}/driver/version.info)
+  find_ascend_driver_version(${ASCEND_DIR}/driver/version.info)
+endif()
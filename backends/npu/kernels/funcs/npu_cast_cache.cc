@@ -0,0 +1,306 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/npu_cast_cache.h"
+
+#include <iterator>
+#include <thread>
+
+#include "glog/logging.h"
+#include "runtime/flags.h"
+
+FLAGS_DEFINE_int32(npu_cast_cache_mb,
+                   0,
+                   "Megabytes of casted inputs TypeAdapter keeps for reuse "
+                   "while their source is unchanged, 0 to disable. Only for "
+                   "dygraph, see kernels/funcs/npu_cast_cache.h.");
+FLAGS_DEFINE_int32(npu_cast_scratch_mb,
+                   256,
+                   "Megabytes of scratch buffers TypeAdapter keeps for the "
+                   "temporaries of its casts, see "
+                   "kernels/funcs/npu_cast_cache.h.");
+
+namespace {
+
+// Scratch buffers kept over all streams, threads and slots.
+constexpr size_t kMaxScratchBuffers = 64;
+// A buffer more than this many times the size of a request is replaced by
+// one of the requested size, unless it is small anyway.
+constexpr size_t kScratchShrinkFactor = 4;
+constexpr size_t kSmallScratchBytes = 64 << 10;
+
+}  // namespace
+
+bool NpuCastCache::Key::operator==(const Key &other) const {
+  return holder == other.holder && offset == other.offset &&
+         dims == other.dims && src_dtype == other.src_dtype &&
+         dst_dtype == other.dst_dtype && stream == other.stream;
+}
+
+NpuCastCache &NpuCastCache::Instance() {
+  static NpuCastCache cache(
+      FLAGS_npu_cast_cache_mb > 0
+          ? static_cast<size_t>(FLAGS_npu_cast_cache_mb) << 20
+          : 0,
+      FLAGS_npu_cast_scratch_mb > 0
+          ? static_cast<size_t>(FLAGS_npu_cast_scratch_mb) << 20
+          : 0);
+  return cache;
+}
+
+NpuCastCache::NpuCastCache(size_t capacity_bytes, size_t scratch_capacity_bytes)
+    : capacity_bytes_(capacity_bytes),
+      scratch_capacity_bytes_(scratch_capacity_bytes) {}
+
+NpuCastCache::Key NpuCastCache::MakeKey(const phi::DenseTensor &src,
+                                        phi::DataType dtype,
+                                        void *stream) {
+  return {src.Holder().get(),
+          src.meta().offset,
+          phi::vectorize(src.dims()),
+          src.dtype(),
+          dtype,
+          stream};
+}
+
+bool NpuCastCache::Cacheable(
+    const phi::DenseTensor &src,
+    const std::vector<phi::DenseTensor> &outputs) const {
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (capacity_bytes_ == 0) {
+      return false;
+    }
+  }
+  if (!src.initialized()) {
+    return false;
+  }
+  for (auto &out : outputs) {
+    if (out.initialized() && out.Holder() == src.Holder()) {
+      return false;
+    }
+  }
+  return true;
+}
+
+bool NpuCastCache::Lookup(const phi::DenseTensor &src,
+                          phi::DataType dtype,
+                          void *stream,
+                          phi::DenseTensor *out) {
+  // InplaceVersionCounter is not const, the copy shares the counter.
+  phi::DenseTensor source = src;
+  const uint32_t version = source.InplaceVersionCounter().CurrentVersion();
+  const auto key = MakeKey(src, dtype, stream);
+
+  std::lock_guard<std::mutex> lock(mutex_);
+  auto range = index_.equal_range(key.holder);
+  for (auto it = range.first; it != range.second; ++it) {
+    auto entry = it->second;
+    if (!(entry->key == key)) {
+      continue;
+    }
+    if (entry->version != version) {
+      EraseLocked(entry);
+      return false;
+    }
+    entries_.splice(entries_.begin(), entries_, entry);
+    *out = entry->casted;
+    casts_reused_.fetch_add(1, std::memory_order_relaxed);
+    VLOG(4) << "NpuCastCache reuses the cast of " << key.holder << " from "
+            << src.dtype() << " to " << dtype;
+    return true;
+  }
+  return false;
+}
+
+void NpuCastCache::Insert(const phi::DenseTensor &src,
+                          phi::DataType dtype,
+                          void *stream,
+                          const phi::DenseTensor &casted) {
+  phi::DenseTensor source = src;
+  Entry entry{MakeKey(src, dtype, stream),
+              src.Holder(),
+              source.InplaceVersionCounter().CurrentVersion(),
+              casted,
+              src.capacity() + casted.capacity()};
+
+  std::lock_guard<std::mutex> lock(mutex_);
+  if (entry.bytes > capacity_bytes_) {
+    return;
+  }
+  auto range = index_.equal_range(entry.key.holder);
+  for (auto it = range.first; it != range.second; ++it) {
+    if (it->second->key == entry.key) {
+      EraseLocked(it->second);
+      break;
+    }
+  }
+  cached_bytes_ += entry.bytes;
+  entries_.emplace_front(std::move(entry));
+  index_.emplace(entries_.front().key.holder, entries_.begin());
+  EvictLocked();
+}
+
+void NpuCastCache::Invalidate(const phi::DenseTensor &tensor) {
+  if (!tensor.initialized()) {
+    return;
+  }
+  std::lock_guard<std::mutex> lock(mutex_);
+  auto range = index_.equal_range(tensor.Holder().get());
+  std::vector<std::list<Entry>::iterator> stale;
+  for (auto it = range.first; it != range.second; ++it) {
+    stale.push_back(it->second);
+  }
+  for (auto entry : stale) {
+    EraseLocked(entry);
+  }
+}
+
+void NpuCastCache::Scratch(const phi::CustomContext &dev_ctx,
+                           int slot,
+                           const phi::DDim &dims,
+                           phi::DataType dtype,
+                           phi::DenseTensor *out) {
+  const size_t bytes = phi::product(dims) * phi::SizeOf(dtype);
+  if (bytes == 0) {
+    out->Resize(dims);
+    dev_ctx.Alloc(out, dtype);
+    return;
+  }
+  auto holder = ScratchBuffer(dev_ctx.stream(), slot, bytes, [&](size_t size) {
+    phi::DenseTensor tensor;
+    tensor.Resize({static_cast<int64_t>(size)});
+    dev_ctx.Alloc(&tensor, phi::DataType::UINT8);
+    return tensor.Holder();
+  });
+  *out = phi::DenseTensor(holder, phi::DenseTensorMeta(dtype, dims));
+}
+
+std::shared_ptr<phi::Allocation> NpuCastCache::ScratchBuffer(
+    void *stream,
+    int slot,
+    size_t bytes,
+    const std::function<std::shared_ptr<phi::Allocation>(size_t)> &alloc) {
+  const auto key = std::make_tuple(stream, std::this_thread::get_id(), slot);
+  bool keep = false;
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    auto it = scratch_.find(key);
+    if (it == scratch_.end()) {
+      keep = bytes <= scratch_capacity_bytes_;
+    } else if (it->second.holder.use_count() == 1) {
+      // Only the map refers to the buffer, the request may take it over.
+      const size_t size = it->second.holder->size();
+      if (size >= bytes && (size <= kScratchShrinkFactor * bytes ||
+                            size <= kSmallScratchBytes)) {
+        it->second.last_use = ++scratch_clock_;
+        scratch_reused_.fetch_add(1, std::memory_order_relaxed);
+        return it->second.holder;
+      }
+      keep = bytes <= scratch_capacity_bytes_;
+    }
+  }
+  // The allocator may free cached blocks or wait for the device, so the
+  // buffer is allocated without mutex_, which every TypeAdapter takes, and
+  // published afterwards. No other thread uses key.
+  auto holder = alloc(bytes);
+  if (keep) {
+    std::lock_guard<std::mutex> lock(mutex_);
+    auto &buffer = scratch_[key];
+    if (buffer.holder) {
+      scratch_bytes_ -= buffer.holder->size();
+    }
+    buffer = {holder, ++scratch_clock_};
+    scratch_bytes_ += holder->size();
+    EvictScratchLocked();
+  }
+  return holder;
+}
+
+void NpuCastCache::ReleaseStream(void *stream) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  for (auto it = entries_.begin(); it != entries_.end();) {
+    auto next = std::next(it);
+    if (it->key.stream == stream) {
+      EraseLocked(it);
+    }
+    it = next;
+  }
+  for (auto it = scratch_.begin(); it != scratch_.end();) {
+    if (std::get<0>(it->first) == stream) {
+      scratch_bytes_ -= it->second.holder->size();
+      it = scratch_.erase(it);
+    } else {
+      ++it;
+    }
+  }
+}
+
+void NpuCastCache::SetCapacity(size_t capacity_bytes) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  capacity_bytes_ = capacity_bytes;
+  EvictLocked();
+}
+
+void NpuCastCache::Clear() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  index_.clear();
+  entries_.clear();
+  scratch_.clear();
+  cached_bytes_ = 0;
+  scratch_bytes_ = 0;
+}
+
+NpuCastCacheStats NpuCastCache::Stats() const {
+  NpuCastCacheStats stats;
+  stats.casts_launched = casts_launched_.load(std::memory_order_relaxed);
+  stats.casts_reused = casts_reused_.load(std::memory_order_relaxed);
+  stats.scratch_reused = scratch_reused_.load(std::memory_order_relaxed);
+  std::lock_guard<std::mutex> lock(mutex_);
+  stats.cached_bytes = cached_bytes_;
+  stats.scratch_bytes = scratch_bytes_;
+  return stats;
+}
+
+void NpuCastCache::EraseLocked(std::list<Entry>::iterator it) {
+  auto range = index_.equal_range(it->key.holder);
+  for (auto index = range.first; index != range.second; ++index) {
+    if (index->second == it) {
+      index_.erase(index);
+      break;
+    }
+  }
+  cached_bytes_ -= it->bytes;
+  entries_.erase(it);
+}
+
+void NpuCastCache::EvictLocked() {
+  while (cached_bytes_ > capacity_bytes_ && !entries_.empty()) {
+    EraseLocked(std::prev(entries_.end()));
+  }
+}
+
+void NpuCastCache::EvictScratchLocked() {
+  while (scratch_.size() > kMaxScratchBuffers ||
+         scratch_bytes_ > scratch_capacity_bytes_) {
+    auto oldest = scratch_.begin();
+    for (auto it = scratch_.begin(); it != scratch_.end(); ++it) {
+      if (it->second.last_use < oldest->second.last_use) {
+        oldest = it;
+      }
+    }
+    scratch_bytes_ -= oldest->second.holder->size();
+    scratch_.erase(oldest);
+  }
+}
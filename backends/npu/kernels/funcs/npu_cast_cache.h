@@ -0,0 +1,171 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <atomic>
+#include <functional>
+#include <list>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <thread>
+#include <tuple>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+#include "paddle/phi/backends/custom/custom_context.h"
+#include "paddle/phi/core/dense_tensor.h"
+
+struct NpuCastCacheStats {
+  // Cast launches issued by TypeAdapter.
+  uint64_t casts_launched{0};
+  // Input casts served from the cache instead.
+  uint64_t casts_reused{0};
+  // Temporaries placed in scratch buffers instead of newly allocated.
+  uint64_t scratch_reused{0};
+  size_t cached_bytes{0};
+  size_t scratch_bytes{0};
+};
+
+// The buffers NpuOpRunner::TypeAdapter casts through.
+//
+// Casted copies of inputs are kept, keyed by the allocation, offset, shape
+// and dtypes of the source and the stream, and reused for as long as the
+// inplace version of the source is unchanged. The source allocation is held
+// by the entry, so its address cannot be reused by another tensor meanwhile.
+// That is only sound when every write to a cached source bumps its inplace
+// version, as the in-place APIs of dygraph do, while static graph executors
+// and the inference predictor refill the same tensors without it; the cache
+// is therefore off unless FLAGS_npu_cast_cache_mb sets its size. Outputs of
+// TypeAdapter invalidate the entries of their allocation.
+//
+// Temporaries that are not cached live in scratch buffers, one per stream,
+// host thread and position. A later launch from the same thread on the same
+// stream is ordered after every earlier use of the buffer, so it can be
+// reused without synchronization once no tensor on the host refers to it
+// any more; while one does, e.g. in a TypeAdapter nested in the op_runner of
+// another, the request gets an allocation of its own. A buffer is replaced
+// when it is much larger than the request, and the least recently used ones
+// are dropped beyond FLAGS_npu_cast_scratch_mb or a fixed number of buffers,
+// which also bounds what exited threads leave behind. ReleaseStream drops
+// the buffers of a destroyed stream.
+class NpuCastCache {
+ public:
+  static NpuCastCache &Instance();
+
+  NpuCastCache(size_t capacity_bytes, size_t scratch_capacity_bytes);
+
+  NpuCastCache(const NpuCastCache &) = delete;
+  NpuCastCache &operator=(const NpuCastCache &) = delete;
+
+  // Whether a copy of src cast to dtype may be cached: the cache is enabled
+  // and src is not written by the op, i.e. shares no allocation with outputs.
+  bool Cacheable(const phi::DenseTensor &src,
+                 const std::vector<phi::DenseTensor> &outputs) const;
+
+  // Sets *out to the cached copy of src cast to dtype on stream and returns
+  // true, or returns false when there is no current one.
+  bool Lookup(const phi::DenseTensor &src,
+              phi::DataType dtype,
+              void *stream,
+              phi::DenseTensor *out);
+
+  void Insert(const phi::DenseTensor &src,
+              phi::DataType dtype,
+              void *stream,
+              const phi::DenseTensor &casted);
+
+  // Drops the copies of every tensor in the allocation of tensor, which an op
+  // is about to write.
+  void Invalidate(const phi::DenseTensor &tensor);
+
+  // Points *out, of the given dims and dtype, at the scratch buffer of the
+  // stream of dev_ctx and the calling thread for slot.
+  void Scratch(const phi::CustomContext &dev_ctx,
+               int slot,
+               const phi::DDim &dims,
+               phi::DataType dtype,
+               phi::DenseTensor *out);
+
+  // Returns the scratch buffer of stream and the calling thread for slot,
+  // of at least bytes, or a new one from alloc(bytes) when it is missing,
+  // too small or too large, or still referred to.
+  std::shared_ptr<phi::Allocation> ScratchBuffer(
+      void *stream,
+      int slot,
+      size_t bytes,
+      const std::function<std::shared_ptr<phi::Allocation>(size_t)> &alloc);
+
+  // Drops the cached copies and scratch buffers of stream, which is about to
+  // be destroyed.
+  void ReleaseStream(void *stream);
+
+  void CountCast() { casts_launched_.fetch_add(1, std::memory_order_relaxed); }
+
+  void SetCapacity(size_t capacity_bytes);
+
+  void Clear();
+
+  NpuCastCacheStats Stats() const;
+
+ private:
+  struct Key {
+    const void *holder;
+    size_t offset;
+    std::vector<int64_t> dims;
+    phi::DataType src_dtype;
+    phi::DataType dst_dtype;
+    void *stream;
+
+    bool operator==(const Key &other) const;
+  };
+
+  struct Entry {
+    Key key;
+    std::shared_ptr<phi::Allocation> src_holder;
+    uint32_t version;
+    phi::DenseTensor casted;
+    size_t bytes;
+  };
+
+  static Key MakeKey(const phi::DenseTensor &src,
+                     phi::DataType dtype,
+                     void *stream);
+
+  struct ScratchEntry {
+    std::shared_ptr<phi::Allocation> holder;
+    uint64_t last_use;
+  };
+
+  void EraseLocked(std::list<Entry>::iterator it);
+  void EvictLocked();
+  void EvictScratchLocked();
+
+  mutable std::mutex mutex_;
+  size_t capacity_bytes_;
+  size_t cached_bytes_{0};
+  size_t scratch_capacity_bytes_;
+  size_t scratch_bytes_{0};
+  // Most recently used first, indexed by the source allocation.
+  std::list<Entry> entries_;
+  std::unordered_multimap<const void *, std::list<Entry>::iterator> index_;
+  std::map<std::tuple<void *, std::thread::id, int>, ScratchEntry> scratch_;
+  uint64_t scratch_clock_{0};
+
+  std::atomic<uint64_t> casts_launched_{0};
+  std::atomic<uint64_t> casts_reused_{0};
+  std::atomic<uint64_t> scratch_reused_{0};
+};
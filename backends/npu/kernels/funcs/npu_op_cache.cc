@@ -0,0 +1,155 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/npu_op_cache.h"
+
+#include "glog/logging.h"
+#include "runtime/flags.h"
+
+FLAGS_DEFINE_int32(npu_op_cache_capacity,
+                   4096,
+                   "Number of op launches whose tensor descriptors and "
+                   "attributes NpuOpRunner keeps for reuse, 0 to disable.");
+
+namespace {
+
+template <typename T>
+void AppendPod(std::string *key, const T &value) {
+  key->append(reinterpret_cast<const char *>(&value), sizeof(T));
+}
+
+void AppendBytes(std::string *key, const std::string &bytes) {
+  AppendPod(key, bytes.size());
+  key->append(bytes);
+}
+
+void AppendDims(std::string *key, const std::vector<int64_t> &dims) {
+  AppendPod(key, dims.size());
+  key->append(reinterpret_cast<const char *>(dims.data()),
+              dims.size() * sizeof(int64_t));
+}
+
+}  // namespace
+
+void NpuTensorDescSpec::AppendKey(std::string *key) const {
+  AppendPod(key, data_type);
+  AppendPod(key, origin_format);
+  AppendDims(key, origin_dims);
+  AppendPod(key, is_scalar);
+  AppendPod(key, has_storage);
+  if (has_storage) {
+    AppendPod(key, storage_format);
+    AppendDims(key, storage_dims);
+  }
+  AppendPod(key, mem_type);
+  AppendPod(key, is_const);
+  if (is_const) {
+    AppendBytes(key, const_data);
+  }
+  AppendBytes(key, name);
+}
+
+NpuOpDescs::~NpuOpDescs() {
+  if (attr) {
+    aclopDestroyAttr(attr);
+  }
+  for (auto desc : input_descs) {
+    aclDestroyTensorDesc(desc);
+  }
+  for (auto desc : output_descs) {
+    aclDestroyTensorDesc(desc);
+  }
+}
+
+NpuOpCache &NpuOpCache::Instance() {
+  static NpuOpCache cache(
+      FLAGS_npu_op_cache_capacity > 0 ? FLAGS_npu_op_cache_capacity : 0);
+  return cache;
+}
+
+NpuOpCache::NpuOpCache(size_t capacity) : capacity_(capacity) {}
+
+bool NpuOpCache::Enabled() const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  return capacity_ > 0;
+}
+
+std::shared_ptr<NpuOpDescs> NpuOpCache::Get(const std::string &key) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  auto it = index_.find(key);
+  if (it == index_.end()) {
+    ++misses_;
+    return nullptr;
+  }
+  ++hits_;
+  entries_.splice(entries_.begin(), entries_, it->second);
+  return it->second->second;
+}
+
+void NpuOpCache::Put(const std::string &key,
+                     std::shared_ptr<NpuOpDescs> descs) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  if (capacity_ == 0) {
+    return;
+  }
+  auto it = index_.find(key);
+  if (it != index_.end()) {
+    it->second->second = std::move(descs);
+    entries_.splice(entries_.begin(), entries_, it->second);
+    return;
+  }
+  entries_.emplace_front(key, std::move(descs));
+  index_.emplace(key, entries_.begin());
+  EvictLocked();
+}
+
+void NpuOpCache::SetCapacity(size_t capacity) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  capacity_ = capacity;
+  EvictLocked();
+}
+
+void NpuOpCache::Clear() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  index_.clear();
+  entries_.clear();
+}
+
+NpuOpCacheStats NpuOpCache::Stats() const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  NpuOpCacheStats stats;
+  stats.hits = hits_;
+  stats.misses = misses_;
+  stats.evictions = evictions_;
+  stats.size = entries_.size();
+  stats.capacity = capacity_;
+  return stats;
+}
+
+void NpuOpCache::ResetStats() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  hits_ = 0;
+  misses_ = 0;
+  evictions_ = 0;
+}
+
+void NpuOpCache::EvictLocked() {
+  while (entries_.size() > capacity_) {
+    VLOG(4) << "NpuOpCache evicts an entry of " << entries_.back().first.size()
+            << " key bytes";
+    index_.erase(entries_.back().first);
+    entries_.pop_back();
+    ++evictions_;
+  }
+}
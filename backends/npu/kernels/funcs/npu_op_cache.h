@@ -0,0 +1,121 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstdint>
+#include <list>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+#include "acl/acl.h"
+
+// Everything aclCreateTensorDesc and the aclSetTensor* calls need to build
+// the descriptor of one input or output of an NpuOpRunner. Two specs with the
+// same key build identical descriptors.
+struct NpuTensorDescSpec {
+  aclDataType data_type;
+  aclFormat origin_format;
+  std::vector<int64_t> origin_dims;
+  bool is_scalar{false};
+  // Set when the tensor carries NPU storage properties.
+  bool has_storage{false};
+  int64_t storage_format{0};
+  std::vector<int64_t> storage_dims;
+  aclMemType mem_type{ACL_MEMTYPE_DEVICE};
+  // Constant host inputs are compiled into the op, so their values are part
+  // of the descriptor.
+  bool is_const{false};
+  std::string const_data;
+  std::string name;
+
+  void AppendKey(std::string *key) const;
+};
+
+// The descriptors and attributes of one op launch. An NpuOpRunner keeps the
+// NpuOpDescs it runs with alive, so an entry evicted from the cache while in
+// use is only destroyed once the last runner holding it is.
+struct NpuOpDescs {
+  NpuOpDescs() = default;
+  NpuOpDescs(const NpuOpDescs &) = delete;
+  NpuOpDescs &operator=(const NpuOpDescs &) = delete;
+  ~NpuOpDescs();
+
+  std::vector<aclTensorDesc *> input_descs;
+  std::vector<aclTensorDesc *> output_descs;
+  aclopAttr *attr{nullptr};
+  // Copies of the constant host data set on the descriptors, in a list so
+  // that they never move.
+  std::list<std::string> const_data;
+};
+
+struct NpuOpCacheStats {
+  uint64_t hits{0};
+  uint64_t misses{0};
+  uint64_t evictions{0};
+  size_t size{0};
+  size_t capacity{0};
+};
+
+// LRU cache from the key of a launch (op type, the specs of its inputs and
+// outputs and its attributes) to prebuilt NpuOpDescs, so that repeated
+// launches of the same op only create the data buffers. All methods are
+// thread safe.
+class NpuOpCache {
+ public:
+  // The cache of the process, holding FLAGS_npu_op_cache_capacity entries;
+  // a capacity of 0 disables it.
+  static NpuOpCache &Instance();
+
+  explicit NpuOpCache(size_t capacity);
+
+  NpuOpCache(const NpuOpCache &) = delete;
+  NpuOpCache &operator=(const NpuOpCache &) = delete;
+
+  bool Enabled() const;
+
+  // Returns the entry of key and marks it most recently used, or nullptr
+  // when there is none.
+  std::shared_ptr<NpuOpDescs> Get(const std::string &key);
+
+  // Inserts or replaces the entry of key, evicting the least recently used
+  // entries beyond the capacity.
+  void Put(const std::string &key, std::shared_ptr<NpuOpDescs> descs);
+
+  void SetCapacity(size_t capacity);
+
+  void Clear();
+
+  NpuOpCacheStats Stats() const;
+
+  void ResetStats();
+
+ private:
+  using Entry = std::pair<std::string, std::shared_ptr<NpuOpDescs>>;
+
+  void EvictLocked();
+
+  mutable std::mutex mutex_;
+  size_t capacity_;
+  // Most recently used first.
+  std::list<Entry> entries_;
+  std::unordered_map<std::string, std::list<Entry>::iterator> index_;
+  uint64_t hits_{0};
+  uint64_t misses_{0};
+  uint64_t evictions_{0};
+};
@@ -47,62 +47,96 @@ FLAGS_DEFINE_bool(
     false,
     "Enable NPU Storage Format for Ascend910 performance improvement.");
 
-NpuOpRunner::NpuOpRunner() {}
-
-NpuOpRunner::NpuOpRunner(const std::string &op_type) : op_type_(op_type) {}
+namespace {
 
-NpuOpRunner::NpuOpRunner(const std::string &op_type,
-                         const std::vector<phi::DenseTensor> &inputs,
-                         const std::vector<phi::DenseTensor> &outputs,
-                         const NPUAttributeMap &attrs)
-    : op_type_(op_type) {
-  AddInputs(inputs);
-  AddOutputs(outputs);
-  AddAttrs(attrs);
+template <typename T>
+void AppendValue(std::string *key, const T &value) {
+  key->append(reinterpret_cast<const char *>(&value), sizeof(T));
 }
 
-NpuOpRunner::~NpuOpRunner() {
-  VLOG(4) << "Free NpuOpRunner(" << this << ") of " << op_type_;
-  // Is it safe to free the descs/buffers after run called in host ?
-  aclopDestroyAttr(attr_);  // return void
-  for (auto desc : input_descs_) {
-    aclDestroyTensorDesc(desc);
-  }
-  for (auto desc : output_descs_) {
-    aclDestroyTensorDesc(desc);
-  }
-  for (auto buffer : input_buffers_) {
-    PADDLE_ENFORCE_NPU_SUCCESS(aclDestroyDataBuffer(buffer));
-  }
-  for (auto buffer : output_buffers_) {
-    PADDLE_ENFORCE_NPU_SUCCESS(aclDestroyDataBuffer(buffer));
-  }
+template <typename T>
+void AppendVector(std::string *key, const std::vector<T> &values) {
+  AppendValue(key, values.size());
+  key->append(reinterpret_cast<const char *>(values.data()),
+              values.size() * sizeof(T));
 }
 
-const std::string &NpuOpRunner::Type() { return op_type_; }
-
-NpuOpRunner &NpuOpRunner::SetType(const std::string &name) {
-  op_type_ = name;
-  return *this;
+void AppendString(std::string *key, const std::string &value) {
+  AppendValue(key, value.size());
+  key->append(value);
 }
 
-NpuOpRunner &NpuOpRunner::AddAttr(const std::string &name,
-                                  const NPUAttribute &attr) {
-  if (!attr_) {
-    attr_ = aclopCreateAttr();
+// Serializes an attribute for the key of NpuOpCache, starting with a tag of
+// its type so that values of different types never collide.
+void AppendAttrKey(std::string *key,
+                   const std::string &name,
+                   const NPUAttribute &attr) {
+  if (attr.type() == typeid(bool)) {
+    key->push_back('b');
+    AppendValue(key, BOOST_GET_CONST(bool, attr));
+  } else if (attr.type() == typeid(int)) {
+    key->push_back('i');
+    AppendValue(key, BOOST_GET_CONST(int, attr));
+  } else if (attr.type() == typeid(int64_t)) {
+    key->push_back('l');
+    AppendValue(key, BOOST_GET_CONST(int64_t, attr));
+  } else if (attr.type() == typeid(float)) {
+    key->push_back('f');
+    AppendValue(key, BOOST_GET_CONST(float, attr));
+  } else if (attr.type() == typeid(std::vector<bool>)) {
+    key->push_back('B');
+    auto a = BOOST_GET_CONST(std::vector<bool>, attr);
+    AppendValue(key, a.size());
+    for (auto it : a) {
+      key->push_back(it ? 1 : 0);
+    }
+  } else if (attr.type() == typeid(std::vector<int>)) {
+    key->push_back('I');
+    AppendVector(key, BOOST_GET_CONST(std::vector<int>, attr));
+  } else if (attr.type() == typeid(std::vector<int64_t>)) {
+    key->push_back('L');
+    AppendVector(key, BOOST_GET_CONST(std::vector<int64_t>, attr));
+  } else if (attr.type() == typeid(std::vector<float>)) {
+    key->push_back('F');
+    AppendVector(key, BOOST_GET_CONST(std::vector<float>, attr));
+  } else if (attr.type() == typeid(std::string)) {
+    key->push_back('s');
+    AppendString(key, BOOST_GET_CONST(std::string, attr));
+  } else if (attr.type() == typeid(std::vector<std::string>)) {
+    key->push_back('S');
+    auto a = BOOST_GET_CONST(std::vector<std::string>, attr);
+    AppendValue(key, a.size());
+    for (auto &it : a) {
+      AppendString(key, it);
+    }
+  } else if (attr.type() == typeid(std::vector<std::vector<int64_t>>)) {
+    key->push_back('V');
+    auto a = BOOST_GET_CONST(std::vector<std::vector<int64_t>>, attr);
+    AppendValue(key, a.size());
+    for (auto &v : a) {
+      AppendVector(key, v);
+    }
+  } else {
+    PADDLE_THROW(phi::errors::Unimplemented(
+        "Can not convert attribubte '%s' to convert to aclopAttr", name));
   }
+}
+
+void SetAclopAttr(aclopAttr *acl_attr,
+                  const std::string &name,
+                  const NPUAttribute &attr) {
   if (attr.type() == typeid(bool)) {
     PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrBool(attr_, name.c_str(), BOOST_GET_CONST(bool, attr)));
+        aclopSetAttrBool(acl_attr, name.c_str(), BOOST_GET_CONST(bool, attr)));
   } else if (attr.type() == typeid(int)) {
     PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrInt(attr_, name.c_str(), BOOST_GET_CONST(int, attr)));
+        aclopSetAttrInt(acl_attr, name.c_str(), BOOST_GET_CONST(int, attr)));
   } else if (attr.type() == typeid(int64_t)) {
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrInt(attr_, name.c_str(), BOOST_GET_CONST(int64_t, attr)));
+    PADDLE_ENFORCE_NPU_SUCCESS(aclopSetAttrInt(
+        acl_attr, name.c_str(), BOOST_GET_CONST(int64_t, attr)));
   } else if (attr.type() == typeid(float)) {
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrFloat(attr_, name.c_str(), BOOST_GET_CONST(float, attr)));
+    PADDLE_ENFORCE_NPU_SUCCESS(aclopSetAttrFloat(
+        acl_attr, name.c_str(), BOOST_GET_CONST(float, attr)));
   } else if (attr.type() == typeid(std::vector<bool>)) {
     auto a = BOOST_GET_CONST(std::vector<bool>, attr);
     std::vector<uint8_t> cast_a;
@@ -110,27 +144,27 @@ NpuOpRunner &NpuOpRunner::AddAttr(const std::string &name,
       cast_a.push_back(static_cast<uint8_t>(it));
     }
     PADDLE_ENFORCE_NPU_SUCCESS(aclopSetAttrListBool(
-        attr_, name.c_str(), cast_a.size(), cast_a.data()));
+        acl_attr, name.c_str(), cast_a.size(), cast_a.data()));
   } else if (attr.type() == typeid(std::vector<int>)) {
     auto a = BOOST_GET_CONST(std::vector<int>, attr);
     std::vector<int64_t> cast_a;
     for (auto it : a) {
       cast_a.push_back(static_cast<int64_t>(it));
     }
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrListInt(attr_, name.c_str(), cast_a.size(), cast_a.data()));
+    PADDLE_ENFORCE_NPU_SUCCESS(aclopSetAttrListInt(
+        acl_attr, name.c_str(), cast_a.size(), cast_a.data()));
   } else if (attr.type() == typeid(std::vector<int64_t>)) {
     auto a = BOOST_GET_CONST(std::vector<int64_t>, attr);
     PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrListInt(attr_, name.c_str(), a.size(), a.data()));
+        aclopSetAttrListInt(acl_attr, name.c_str(), a.size(), a.data()));
   } else if (attr.type() == typeid(std::vector<float>)) {
     auto a = BOOST_GET_CONST(std::vector<float>, attr);
     PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrListFloat(attr_, name.c_str(), a.size(), a.data()));
+        aclopSetAttrListFloat(acl_attr, name.c_str(), a.size(), a.data()));
   } else if (attr.type() == typeid(std::string)) {
     auto a = BOOST_GET_CONST(std::string, attr);
     PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrString(attr_, name.c_str(), a.c_str()));
+        aclopSetAttrString(acl_attr, name.c_str(), a.c_str()));
   } else if (attr.type() == typeid(std::vector<std::string>)) {
     auto a = BOOST_GET_CONST(std::vector<std::string>, attr);
     std::vector<const char *> s;
@@ -138,7 +172,7 @@ NpuOpRunner &NpuOpRunner::AddAttr(const std::string &name,
       s.push_back(it.data());
     }
     PADDLE_ENFORCE_NPU_SUCCESS(
-        aclopSetAttrListString(attr_, name.c_str(), s.size(), s.data()));
+        aclopSetAttrListString(acl_attr, name.c_str(), s.size(), s.data()));
   } else if (attr.type() == typeid(std::vector<std::vector<int64_t>>)) {
     auto a = BOOST_GET_CONST(std::vector<std::vector<int64_t>>, attr);
     std::vector<int64_t *> data;
@@ -148,11 +182,93 @@ NpuOpRunner &NpuOpRunner::AddAttr(const std::string &name,
       num.push_back(v.size());
     }
     PADDLE_ENFORCE_NPU_SUCCESS(aclopSetAttrListListInt(
-        attr_, name.c_str(), data.size(), num.data(), data.data()));
+        acl_attr, name.c_str(), data.size(), num.data(), data.data()));
   } else {
     PADDLE_THROW(phi::errors::Unimplemented(
         "Can not convert attribubte '%s' to convert to aclopAttr", name));
   }
+}
+
+aclTensorDesc *CreateTensorDesc(const NpuTensorDescSpec &spec,
+                                NpuOpDescs *descs) {
+  auto *desc = spec.is_scalar ? aclCreateTensorDesc(
+                                    spec.data_type, 0, nullptr, ACL_FORMAT_ND)
+                              : aclCreateTensorDesc(spec.data_type,
+                                                    spec.origin_dims.size(),
+                                                    spec.origin_dims.data(),
+                                                    spec.origin_format);
+  PADDLE_ENFORCE_NOT_NULL(
+      desc, phi::errors::External("Call aclCreateTensorDesc failed."));
+
+  if (spec.has_storage) {
+    PADDLE_ENFORCE_NPU_SUCCESS(
+        aclSetTensorFormat(desc, (aclFormat)spec.storage_format));
+    if (!spec.is_scalar) {
+      PADDLE_ENFORCE_NPU_SUCCESS(aclSetTensorShape(
+          desc, spec.storage_dims.size(), spec.storage_dims.data()));
+    }
+  } else {
+    PADDLE_ENFORCE_NPU_SUCCESS(aclSetTensorFormat(desc, spec.origin_format));
+    PADDLE_ENFORCE_NPU_SUCCESS(aclSetTensorShape(
+        desc, spec.origin_dims.size(), spec.origin_dims.data()));
+  }
+
+  if (spec.mem_type == ACL_MEMTYPE_HOST) {
+    PADDLE_ENFORCE_NPU_SUCCESS(aclSetTensorPlaceMent(desc, spec.mem_type));
+  }
+  if (spec.is_const) {
+    descs->const_data.push_back(spec.const_data);
+    auto &data = descs->const_data.back();
+    PADDLE_ENFORCE_NPU_SUCCESS(
+        aclSetTensorConst(desc, const_cast<char *>(data.data()), data.size()));
+  }
+  if (!spec.name.empty()) {
+    aclSetTensorDescName(desc, spec.name.c_str());
+  }
+  return desc;
+}
+
+}  // namespace
+
+NpuOpRunner::NpuOpRunner() {}
+
+NpuOpRunner::NpuOpRunner(const std::string &op_type) : op_type_(op_type) {}
+
+NpuOpRunner::NpuOpRunner(const std::string &op_type,
+                         const std::vector<phi::DenseTensor> &inputs,
+                         const std::vector<phi::DenseTensor> &outputs,
+                         const NPUAttributeMap &attrs)
+    : op_type_(op_type) {
+  AddInputs(inputs);
+  AddOutputs(outputs);
+  AddAttrs(attrs);
+}
+
+NpuOpRunner::~NpuOpRunner() {
+  VLOG(4) << "Free NpuOpRunner(" << this << ") of " << op_type_;
+  // Is it safe to free the descs/buffers after run called in host ?
+  for (auto buffer : input_buffers_) {
+    PADDLE_ENFORCE_NPU_SUCCESS(aclDestroyDataBuffer(buffer));
+  }
+  for (auto buffer : output_buffers_) {
+    PADDLE_ENFORCE_NPU_SUCCESS(aclDestroyDataBuffer(buffer));
+  }
+}
+
+const std::string &NpuOpRunner::Type() { return op_type_; }
+
+NpuOpRunner &NpuOpRunner::SetType(const std::string &name) {
+  op_type_ = name;
+  descs_.reset();
+  return *this;
+}
+
+NpuOpRunner &NpuOpRunner::AddAttr(const std::string &name,
+                                  const NPUAttribute &attr) {
+  AttrSpec spec{attr, false, ""};
+  AppendAttrKey(&spec.key, name, attr);
+  attrs_[name] = std::move(spec);
+  descs_.reset();
   return *this;
 }
 
@@ -163,13 +279,11 @@ NpuOpRunner &NpuOpRunner::AddAttrDataType(const std::string &name,
       true,
       phi::errors::InvalidArgument(
           "Attr type is NOT equal to framework::proto::VarType::Type."));
-  if (!attr_) {
-    attr_ = aclopCreateAttr();
-  }
   VLOG(4) << "AddAttrDataType call";
-  auto dtype =
-      ConvertToNpuDtype(static_cast<phi::DataType>(paddle::get<int>(attr)));
-  PADDLE_ENFORCE_NPU_SUCCESS(aclopSetAttrDataType(attr_, name.c_str(), dtype));
+  AttrSpec spec{attr, true, "d"};
+  AppendValue(&spec.key, paddle::get<int>(attr));
+  attrs_[name] = std::move(spec);
+  descs_.reset();
   return *this;
 }
 
@@ -181,25 +295,27 @@ NpuOpRunner &NpuOpRunner::AddAttrs(const NPUAttributeMap &attrs) {
 }
 
 NpuOpRunner &NpuOpRunner::AddInput(const phi::DenseTensor &tensor) {
-  // create aclTensorDesc
-  input_descs_.emplace_back(CreateTensorDesc(tensor));
+  // record the spec of aclTensorDesc
+  input_specs_.emplace_back(CreateTensorDescSpec(tensor));
   // create aclDataBuffer
   input_buffers_.emplace_back(CreateDataBuffer(tensor));
+  descs_.reset();
   return *this;
 }
 
 NpuOpRunner &NpuOpRunner::AddInput(const phi::DenseTensor &tensor,
                                    aclMemType mem_type) {
-  // create aclTensorDesc
-  auto desc = CreateTensorDesc(tensor, mem_type);
-  input_descs_.emplace_back(desc);
-  // create aclDataBuffer
-  input_buffers_.emplace_back(CreateDataBuffer(tensor));
+  // record the spec of aclTensorDesc
+  auto spec = CreateTensorDescSpec(tensor, mem_type);
   if (mem_type == ACL_MEMTYPE_HOST) {
-    PADDLE_ENFORCE_NPU_SUCCESS(aclSetTensorConst(
-        desc, const_cast<void *>(tensor.data()), tensor.capacity()));
+    spec.is_const = true;
+    spec.const_data.assign(static_cast<const char *>(tensor.data()),
+                           tensor.capacity());
   }
-
+  input_specs_.emplace_back(std::move(spec));
+  // create aclDataBuffer
+  input_buffers_.emplace_back(CreateDataBuffer(tensor));
+  descs_.reset();
   return *this;
 }
 
@@ -211,16 +327,18 @@ NpuOpRunner &NpuOpRunner::AddInput(const phi::CustomContext &dev_ctx,
   custom_kernel::TensorFromVector(
       dev_ctx, values, phi::CPUContext(), &host_tensor);
   host_tensors_.emplace_back(host_tensor);
-  // create aclTensorDesc
-  auto desc = CreateTensorDesc(host_tensor, ACL_MEMTYPE_HOST);
-  input_descs_.emplace_back(desc);
-  // create aclDataBuffer
-  input_buffers_.emplace_back(CreateDataBuffer(host_tensor));
+  // record the spec of aclTensorDesc
+  auto spec = CreateTensorDescSpec(host_tensor, ACL_MEMTYPE_HOST);
   // set tensor const
   if (is_const) {
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclSetTensorConst(desc, host_tensor.data(), host_tensor.capacity()));
+    spec.is_const = true;
+    spec.const_data.assign(static_cast<const char *>(host_tensor.data()),
+                           host_tensor.capacity());
   }
+  input_specs_.emplace_back(std::move(spec));
+  // create aclDataBuffer
+  input_buffers_.emplace_back(CreateDataBuffer(host_tensor));
+  descs_.reset();
   return *this;
 }
 
@@ -238,23 +356,25 @@ ADD_INPUT_IMPL_GET_DTYPE(phi::dtype::float16);
 #undef ADD_INPUT_IMPL_GET_DTYPE
 
 NpuOpRunner &NpuOpRunner::AddOutput(const phi::DenseTensor &tensor) {
-  // create aclTensorDesc
-  output_descs_.emplace_back(CreateTensorDesc(tensor));
+  // record the spec of aclTensorDesc
+  output_specs_.emplace_back(CreateTensorDescSpec(tensor));
   // create aclDataBuffer
   output_buffers_.emplace_back(CreateDataBuffer(tensor));
+  descs_.reset();
   return *this;
 }
 
 NpuOpRunner &NpuOpRunner::AddInputs(
     const std::vector<phi::DenseTensor> &tensors) {
-  input_descs_.reserve(tensors.size());
+  input_specs_.reserve(tensors.size());
   input_buffers_.reserve(tensors.size());
   for (auto tensor : tensors) {
-    // create aclTensorDesc
-    input_descs_.emplace_back(CreateTensorDesc(tensor));
+    // record the spec of aclTensorDesc
+    input_specs_.emplace_back(CreateTensorDescSpec(tensor));
     // create aclDataBuffer
     input_buffers_.emplace_back(CreateDataBuffer(tensor));
   }
+  descs_.reset();
   return *this;
 }
 
@@ -262,62 +382,68 @@ NpuOpRunner &NpuOpRunner::AddInputs(
 // It is needed to set the name of each input tensor.
 NpuOpRunner &NpuOpRunner::AddInputNames(const std::vector<std::string> &names) {
   PADDLE_ENFORCE_EQ(names.size(),
-                    input_descs_.size(),
+                    input_specs_.size(),
                     phi::errors::InvalidArgument(
                         "The size of input names should be "
                         "equal to the size of input descs, but got the size "
                         "of input names is %d, the size of input descs is %d.",
                         names.size(),
-                        input_descs_.size()));
+                        input_specs_.size()));
   for (size_t i = 0; i < names.size(); ++i) {
-    aclSetTensorDescName(input_descs_[i], names[i].c_str());
+    input_specs_[i].name = names[i];
   }
+  descs_.reset();
   return *this;
 }
 
 NpuOpRunner &NpuOpRunner::AddOutputs(
     const std::vector<phi::DenseTensor> &tensors) {
-  output_descs_.reserve(tensors.size());
+  output_specs_.reserve(tensors.size());
   output_buffers_.reserve(tensors.size());
   for (auto tensor : tensors) {
-    // create aclTensorDesc
-    output_descs_.emplace_back(CreateTensorDesc(tensor));
+    // record the spec of aclTensorDesc
+    output_specs_.emplace_back(CreateTensorDescSpec(tensor));
     // create aclDataBuffer
     output_buffers_.emplace_back(CreateDataBuffer(tensor));
   }
+  descs_.reset();
   return *this;
 }
 
 aclTensorDesc *NpuOpRunner::GetInputDesc(size_t index) {
   PADDLE_ENFORCE_LT(index,
-                    input_descs_.size(),
+                    input_specs_.size(),
                     phi::errors::OutOfRange(
                         "The index should be less than the size of inputs of "
                         "operator %s, but got index is %d and size is %d",
                         Type(),
                         index,
-                        input_descs_.size()));
-  return input_descs_[index];
+                        input_specs_.size()));
+  PrepareDescs(false);
+  return descs_->input_descs[index];
 }
 
 aclTensorDesc *NpuOpRunner::GetOutputDesc(size_t index) {
   PADDLE_ENFORCE_LT(index,
-                    output_descs_.size(),
+                    output_specs_.size(),
                     phi::errors::OutOfRange(
                         "The index should be less than the size of output of "
                         "operator %s, but got index is %d and size is %d",
                         Type(),
                         index,
-                        output_descs_.size()));
-  return output_descs_[index];
+                        output_specs_.size()));
+  PrepareDescs(false);
+  return descs_->output_descs[index];
 }
 
 std::vector<aclTensorDesc *> &NpuOpRunner::GetInputDescs() {
-  return input_descs_;
+  PrepareDescs(false);
+  return descs_->input_descs;
 }
 
 std::vector<aclTensorDesc *> &NpuOpRunner::GetOutputDescs() {
-  return output_descs_;
+  PrepareDescs(false);
+  return descs_->output_descs;
 }
 
 std::vector<aclDataBuffer *> &NpuOpRunner::GetInputBuffers() {
@@ -328,66 +454,44 @@ std::vector<aclDataBuffer *> &NpuOpRunner::GetOutputBuffers() {
   return output_buffers_;
 }
 
-aclTensorDesc *NpuOpRunner::CreateTensorDesc(phi::DenseTensor tensor,
-                                             aclMemType mem_type) {
-  auto data_type = ConvertToNpuDtype(tensor.dtype());
-  auto origin_format = ConvertToNpuFormat(tensor.layout());
-  auto origin_dims = phi::vectorize(tensor.dims());
+NpuTensorDescSpec NpuOpRunner::CreateTensorDescSpec(
+    const phi::DenseTensor &tensor, aclMemType mem_type) {
+  NpuTensorDescSpec spec;
+  spec.data_type = ConvertToNpuDtype(tensor.dtype());
+  spec.origin_format = ConvertToNpuFormat(tensor.layout());
+  spec.origin_dims = phi::vectorize(tensor.dims());
+  spec.mem_type = mem_type;
 
-  auto origin_size = origin_dims.size();
-  bool is_scalar = tensor.dims().size() == 0;
+  spec.is_scalar = tensor.dims().size() == 0;
   if ((op_type_ == "DropOutGenMask" || op_type_ == "StatelessDropOutGenMask") &&
-      origin_size == 1 && *(origin_dims.data()) == 1) {
-    origin_size = 0;
-    is_scalar = true;
+      spec.origin_dims.size() == 1 && spec.origin_dims[0] == 1) {
+    spec.is_scalar = true;
   }
-  if (is_scalar) {
-    origin_dims.clear();
-    origin_dims.push_back(0);
+  if (spec.is_scalar) {
+    spec.origin_dims.clear();
   }
 
-  auto *desc =
-      is_scalar
-          ? aclCreateTensorDesc(data_type, 0, nullptr, ACL_FORMAT_ND)
-          : aclCreateTensorDesc(
-                data_type, origin_size, origin_dims.data(), origin_format);
-  PADDLE_ENFORCE_NOT_NULL(
-      desc, phi::errors::External("Call aclCreateTensorDesc failed."));
-
   if (tensor.storage_properties_initialized()) {
     auto npu_properties =
         tensor.storage_properties<phi::NPUStorageProperties>();
-    int64_t storage_format = npu_properties.storage_format;
-    auto storage_dims = phi::vectorize(npu_properties.storage_dims);
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclSetTensorFormat(desc, (aclFormat)storage_format));
-    if (!is_scalar) {
-      PADDLE_ENFORCE_NPU_SUCCESS(
-          aclSetTensorShape(desc, storage_dims.size(), storage_dims.data()));
-    }
+    spec.has_storage = true;
+    spec.storage_format = npu_properties.storage_format;
+    spec.storage_dims = phi::vectorize(npu_properties.storage_dims);
     VLOG(1) << "CreateTensorDesc for OP: " << op_type_
-            << ", data_type: " << data_type
-            << ", origin_format: " << origin_format
-            << ", storage_format: " << storage_format
+            << ", data_type: " << spec.data_type
+            << ", origin_format: " << spec.origin_format
+            << ", storage_format: " << spec.storage_format
             << ", origin_dims: " << tensor.dims()
             << ", storage_dims: " << npu_properties.storage_dims;
   } else {
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclSetTensorFormat(desc, (aclFormat)origin_format));
-    PADDLE_ENFORCE_NPU_SUCCESS(
-        aclSetTensorShape(desc, origin_size, origin_dims.data()));
     VLOG(1) << "CreateTensorDesc for OP: " << op_type_
-            << ", data_type: " << data_type
-            << ", origin_format: " << origin_format
-            << ", storage_format: " << origin_format
+            << ", data_type: " << spec.data_type
+            << ", origin_format: " << spec.origin_format
+            << ", storage_format: " << spec.origin_format
             << ", origin_dims: " << tensor.dims()
             << ", storage_dims: " << tensor.dims();
   }
-
-  if (mem_type == ACL_MEMTYPE_HOST) {
-    PADDLE_ENFORCE_NPU_SUCCESS(aclSetTensorPlaceMent(desc, mem_type));
-  }
-  return desc;
+  return spec;
 }
 
 aclDataBuffer *NpuOpRunner::CreateDataBuffer(phi::DenseTensor tensor) {
@@ -399,6 +503,69 @@ aclDataBuffer *NpuOpRunner::CreateDataBuffer(phi::DenseTensor tensor) {
   return buffer;
 }
 
+std::string NpuOpRunner::CacheKey() const {
+  std::string key = op_type_;
+  key.push_back('\0');
+  AppendValue(&key, input_specs_.size());
+  for (auto &spec : input_specs_) {
+    spec.AppendKey(&key);
+  }
+  AppendValue(&key, output_specs_.size());
+  for (auto &spec : output_specs_) {
+    spec.AppendKey(&key);
+  }
+  for (auto &pair : attrs_) {
+    AppendString(&key, pair.first);
+    key.append(pair.second.key);
+  }
+  return key;
+}
+
+std::shared_ptr<NpuOpDescs> NpuOpRunner::CreateOpDescs() const {
+  auto descs = std::make_shared<NpuOpDescs>();
+  descs->input_descs.reserve(input_specs_.size());
+  for (auto &spec : input_specs_) {
+    descs->input_descs.emplace_back(CreateTensorDesc(spec, descs.get()));
+  }
+  descs->output_descs.reserve(output_specs_.size());
+  for (auto &spec : output_specs_) {
+    descs->output_descs.emplace_back(CreateTensorDesc(spec, descs.get()));
+  }
+  if (!attrs_.empty()) {
+    descs->attr = aclopCreateAttr();
+    for (auto &pair : attrs_) {
+      if (pair.second.is_data_type) {
+        auto dtype = ConvertToNpuDtype(
+            static_cast<phi::DataType>(paddle::get<int>(pair.second.value)));
+        PADDLE_ENFORCE_NPU_SUCCESS(
+            aclopSetAttrDataType(descs->attr, pair.first.c_str(), dtype));
+      } else {
+        SetAclopAttr(descs->attr, pair.first, pair.second.value);
+      }
+    }
+  }
+  return descs;
+}
+
+void NpuOpRunner::PrepareDescs(bool use_cache) const {
+  if (descs_ && (use_cache || !descs_shared_)) {
+    return;
+  }
+  auto &cache = NpuOpCache::Instance();
+  if (use_cache && cache.Enabled()) {
+    const auto key = CacheKey();
+    descs_ = cache.Get(key);
+    if (!descs_) {
+      descs_ = CreateOpDescs();
+      cache.Put(key, descs_);
+    }
+    descs_shared_ = true;
+  } else {
+    descs_ = CreateOpDescs();
+    descs_shared_ = false;
+  }
+}
+
 void NpuOpRunner::AllocFloatStatus(aclrtStream stream) const {
   std::string op_type = "NPUAllocFloatStatus";
   // Attr
@@ -493,11 +660,11 @@ void NpuOpRunner::InitFloatStatus(aclrtStream stream) const {
 void NpuOpRunner::PrintOpInfo() const {
   // PrintInput
   std::cout << "Input: " << std::endl;
-  for (int i = 0; i < input_descs_.size(); i++) {
-    auto type = aclGetTensorDescType(input_descs_[i]);
+  for (int i = 0; i < descs_->input_descs.size(); i++) {
+    auto type = aclGetTensorDescType(descs_->input_descs[i]);
     std::cout << "- type: " << type << std::endl;
-    auto input_size = aclGetTensorDescSize(input_descs_[i]);
-    auto numel = aclGetTensorDescElementCount(input_descs_[i]);
+    auto input_size = aclGetTensorDescSize(descs_->input_descs[i]);
+    auto numel = aclGetTensorDescElementCount(descs_->input_descs[i]);
     std::vector<float> cpu_data(numel, 0);
     auto input_ptr = aclGetDataBufferAddr(input_buffers_[i]);
     PADDLE_ENFORCE_NPU_SUCCESS(aclrtMemcpy(cpu_data.data(),
@@ -515,11 +682,11 @@ void NpuOpRunner::PrintOpInfo() const {
   }
   // PrintOutput
   std::cout << "Output: " << std::endl;
-  for (int i = 0; i < output_descs_.size(); i++) {
-    auto type = aclGetTensorDescType(output_descs_[i]);
+  for (int i = 0; i < descs_->output_descs.size(); i++) {
+    auto type = aclGetTensorDescType(descs_->output_descs[i]);
     std::cout << "- type: " << type << std::endl;
-    auto input_size = aclGetTensorDescSize(output_descs_[i]);
-    auto numel = aclGetTensorDescElementCount(output_descs_[i]);
+    auto input_size = aclGetTensorDescSize(descs_->output_descs[i]);
+    auto numel = aclGetTensorDescElementCount(descs_->output_descs[i]);
     std::vector<float> cpu_data(numel, 0);
     auto input_ptr = aclGetDataBufferAddr(output_buffers_[i]);
     PADDLE_ENFORCE_NPU_SUCCESS(aclrtMemcpy(cpu_data.data(),
@@ -591,21 +758,24 @@ void NpuOpRunner::Run(aclrtStream stream, bool sync) const {
       stream,
       phi::errors::External("Stream should not be null, please check."));
   InitFloatStatus(stream);
+  PrepareDescs(true);
+  const auto &input_descs = descs_->input_descs;
+  const auto &output_descs = descs_->output_descs;
   VLOG(1) << "NpuOpRunner: " << op_type_ << "\n"
-          << GetOpDescString(input_descs_, "Input")
-          << GetOpDescString(output_descs_, "Output");
+          << GetOpDescString(input_descs, "Input")
+          << GetOpDescString(output_descs, "Output");
   aclError ret;
   // Ensure that the Gil has been released before running
   // aclopCompileAndExecute.
   PY_GIL_RELEASE({
     ret = aclopCompileAndExecute(op_type_.c_str(),
-                                 input_descs_.size(),
-                                 input_descs_.data(),
+                                 input_descs.size(),
+                                 input_descs.data(),
                                  input_buffers_.data(),
-                                 output_descs_.size(),
-                                 output_descs_.data(),
+                                 output_descs.size(),
+                                 output_descs.data(),
                                  output_buffers_.data(),
-                                 attr_,
+                                 descs_->attr,
                                  ACL_ENGINE_SYS,
                                  ACL_COMPILE_SYS,
                                  NULL,
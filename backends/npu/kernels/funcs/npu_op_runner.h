@@ -14,8 +14,13 @@
 
 #pragma once
 
+#include <map>
+#include <memory>
+
 #include "acl/acl.h"
 #include "glog/logging.h"
+#include "kernels/funcs/npu_cast_cache.h"
+#include "kernels/funcs/npu_op_cache.h"
 #include "kernels/funcs/npu_op_prepare.h"
 #include "paddle/phi/common/amp_type_traits.h"
 #include "paddle/phi/extension.h"
@@ -38,6 +43,10 @@ using NPUAttribute = paddle::variant<paddle::blank,
 
 using NPUAttributeMap = std::unordered_map<std::string, NPUAttribute>;
 
+// Builds and launches one ACL op. Inputs, outputs and attributes are recorded
+// as they are added, and their descriptors are only created when the op runs,
+// taken from NpuOpCache when an op of the same type, specs and attributes has
+// run before, so a repeated launch only creates its data buffers.
 class NpuOpRunner {
  public:
   NpuOpRunner();
@@ -80,6 +89,8 @@ class NpuOpRunner {
 
   NpuOpRunner &AddOutputs(const std::vector<phi::DenseTensor> &tensors);
 
+  // The descriptor getters give the runner descriptors of its own, which
+  // the caller may modify, instead of shared ones from NpuOpCache.
   aclTensorDesc *GetInputDesc(size_t index);
 
   aclTensorDesc *GetOutputDesc(size_t index);
@@ -141,6 +152,9 @@ class NpuOpRunner {
       const std::vector<phi::DataType> &input_type,
       const std::vector<phi::DataType> &output_type,
       const std::vector<std::vector<T>> &&host_vecs = {}) {
+    auto &cast_cache = NpuCastCache::Instance();
+    // tmp_inputs and tmp_outputs hold their scratch buffers until op_runner
+    // returns, so a TypeAdapter nested in it gets buffers of its own.
     std::vector<phi::DenseTensor> tmp_inputs(inputs.size());
     std::vector<phi::DenseTensor> tmp_outputs(outputs.size());
 
@@ -149,26 +163,48 @@ class NpuOpRunner {
                          input_type[i] != inputs[i].dtype());
       if (!cast_input) {
         tmp_inputs[i] = inputs[i];
-      } else {
+        continue;
+      }
+      if (cast_cache.Lookup(
+              inputs[i], input_type[i], dev_ctx.stream(), &tmp_inputs[i])) {
+        continue;
+      }
+      const bool cacheable = cast_cache.Cacheable(inputs[i], outputs);
+      if (cacheable) {
         tmp_inputs[i].Resize(inputs[i].dims());
         dev_ctx.Alloc(&(tmp_inputs[i]), input_type[i]);
+      } else {
+        cast_cache.Scratch(dev_ctx,
+                           static_cast<int>(i),
+                           inputs[i].dims(),
+                           input_type[i],
+                           &tmp_inputs[i]);
+      }
 
-        const auto &cast_runner = NpuOpRunner(
-            "Cast",
-            {inputs[i]},
-            {tmp_inputs[i]},
-            {{"dst_type", static_cast<int>(ConvertToNpuDtype(input_type[i]))}});
-        cast_runner.Run(dev_ctx.stream());
+      const auto &cast_runner = NpuOpRunner(
+          "Cast",
+          {inputs[i]},
+          {tmp_inputs[i]},
+          {{"dst_type", static_cast<int>(ConvertToNpuDtype(input_type[i]))}});
+      cast_runner.Run(dev_ctx.stream());
+      cast_cache.CountCast();
+      if (cacheable) {
+        cast_cache.Insert(
+            inputs[i], input_type[i], dev_ctx.stream(), tmp_inputs[i]);
       }
     }
     for (size_t i = 0; i < output_type.size(); ++i) {
+      cast_cache.Invalidate(outputs[i]);
       bool cast_output = (output_type[i] == phi::DataType::UNDEFINED ||
                           output_type[i] != outputs[i].dtype());
       if (!cast_output) {
         tmp_outputs[i] = outputs[i];
       } else {
-        tmp_outputs[i].Resize(outputs[i].dims());
-        dev_ctx.Alloc(&(tmp_outputs[i]), output_type[i]);
+        cast_cache.Scratch(dev_ctx,
+                           -1 - static_cast<int>(i),
+                           outputs[i].dims(),
+                           output_type[i],
+                           &tmp_outputs[i]);
       }
     }
 
@@ -185,6 +221,7 @@ class NpuOpRunner {
             {{"dst_type",
               static_cast<int>(ConvertToNpuDtype(outputs[i].dtype()))}});
         cast_runner.Run(dev_ctx.stream());
+        cast_cache.CountCast();
       }
     }
   }
@@ -193,9 +230,19 @@ class NpuOpRunner {
   static void ClearFloatStatus(aclrtStream stream);
 
  private:
-  aclTensorDesc *CreateTensorDesc(phi::DenseTensor tensor,
-                                  aclMemType mem_type = ACL_MEMTYPE_DEVICE);
+  struct AttrSpec {
+    NPUAttribute value;
+    bool is_data_type;
+    // Serialized value for the key of NpuOpCache.
+    std::string key;
+  };
+
+  NpuTensorDescSpec CreateTensorDescSpec(
+      const phi::DenseTensor &tensor, aclMemType mem_type = ACL_MEMTYPE_DEVICE);
   aclDataBuffer *CreateDataBuffer(phi::DenseTensor tensor);
+  std::string CacheKey() const;
+  std::shared_ptr<NpuOpDescs> CreateOpDescs() const;
+  void PrepareDescs(bool use_cache) const;
   void InitFloatStatus(aclrtStream stream) const;
   void AllocFloatStatus(aclrtStream stream) const;
   void PrintOpInfo() const;
@@ -204,10 +251,14 @@ class NpuOpRunner {
   std::string op_type_;
   std::vector<aclDataBuffer *> input_buffers_;
   std::vector<aclDataBuffer *> output_buffers_;
-  std::vector<aclTensorDesc *> input_descs_;
-  std::vector<aclTensorDesc *> output_descs_;
+  std::vector<NpuTensorDescSpec> input_specs_;
+  std::vector<NpuTensorDescSpec> output_specs_;
+  // Ordered by name, so that the same attributes always give the same key.
+  std::map<std::string, AttrSpec> attrs_;
   std::vector<phi::DenseTensor> host_tensors_;
-  aclopAttr *attr_{nullptr};
+  // Created on first use and dropped whenever the op changes.
+  mutable std::shared_ptr<NpuOpDescs> descs_;
+  mutable bool descs_shared_{false};
 };
 
 template <typename T>
@@ -0,0 +1,152 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/host_memory_pool.h"
+
+namespace {
+
+// Smallest block, large enough for the scalars and shapes copied one by one.
+constexpr size_t kMinBlockSize = 512;
+// Larger requests get blocks of their own size, rounding them up to a power
+// of two would waste too much pinned memory.
+constexpr size_t kMaxClassSize = size_t(64) << 20;
+
+}  // namespace
+
+size_t PinnedHostPool::SizeClass(size_t size) {
+  if (size > kMaxClassSize) {
+    return size;
+  }
+  size_t block = kMinBlockSize;
+  while (block < size) {
+    block <<= 1;
+  }
+  return block;
+}
+
+PinnedHostPool::PinnedHostPool(HostPoolBackend *backend,
+                               size_t max_cached_bytes)
+    : backend_(backend), max_cached_bytes_(max_cached_bytes) {}
+
+PinnedHostPool::~PinnedHostPool() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  for (auto &queue : pending_) {
+    for (auto &pending : queue.second) {
+      backend_->SynchronizeEvent(pending.event);
+      backend_->DestroyEvent(pending.event);
+    }
+  }
+  pending_.clear();
+  for (auto event : free_events_) {
+    backend_->DestroyEvent(event);
+  }
+  free_events_.clear();
+  for (auto &block : block_sizes_) {
+    backend_->FreeHost(block.first);
+  }
+  block_sizes_.clear();
+  free_blocks_.clear();
+}
+
+void *PinnedHostPool::Alloc(size_t size) {
+  const size_t block_size = SizeClass(size);
+  std::lock_guard<std::mutex> lock(mutex_);
+  ReclaimLocked();
+  ++stats_.allocs;
+  auto it = free_blocks_.find(block_size);
+  if (it != free_blocks_.end() && !it->second.empty()) {
+    void *ptr = it->second.back();
+    it->second.pop_back();
+    stats_.cached_bytes -= block_size;
+    ++stats_.reused_blocks;
+    return ptr;
+  }
+  void *ptr = backend_->MallocHost(block_size);
+  if (ptr == nullptr) {
+    return nullptr;
+  }
+  ++stats_.host_mallocs;
+  block_sizes_[ptr] = block_size;
+  return ptr;
+}
+
+void PinnedHostPool::FreeAfter(void *ptr, void *stream) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  void *event = nullptr;
+  if (free_events_.empty()) {
+    event = backend_->CreateEvent();
+    ++stats_.events_created;
+  } else {
+    event = free_events_.back();
+    free_events_.pop_back();
+    ++stats_.reused_events;
+  }
+  backend_->RecordEvent(event, stream);
+  pending_[stream].push_back({ptr, event});
+  ++stats_.pending_blocks;
+}
+
+void PinnedHostPool::Free(void *ptr) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  ReleaseLocked(ptr);
+}
+
+void PinnedHostPool::Synchronize() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  for (auto &queue : pending_) {
+    if (!queue.second.empty()) {
+      // The last event of a stream completes after all earlier ones.
+      backend_->SynchronizeEvent(queue.second.back().event);
+    }
+    for (auto &pending : queue.second) {
+      ReleaseLocked(pending.ptr);
+      free_events_.push_back(pending.event);
+    }
+    stats_.pending_blocks -= queue.second.size();
+    queue.second.clear();
+  }
+}
+
+PinnedHostPoolStats PinnedHostPool::Stats() const {
+  std::lock_guard<std::mutex> lock(mutex_);
+  return stats_;
+}
+
+void PinnedHostPool::ReclaimLocked() {
+  // Emptied queues are kept, streams are few and long lived.
+  for (auto &stream_queue : pending_) {
+    auto &queue = stream_queue.second;
+    while (!queue.empty() && backend_->QueryEvent(queue.front().event)) {
+      ReleaseLocked(queue.front().ptr);
+      free_events_.push_back(queue.front().event);
+      queue.pop_front();
+      --stats_.pending_blocks;
+    }
+  }
+}
+
+void PinnedHostPool::ReleaseLocked(void *ptr) {
+  auto it = block_sizes_.find(ptr);
+  if (it == block_sizes_.end()) {
+    return;
+  }
+  const size_t block_size = it->second;
+  if (stats_.cached_bytes + block_size > max_cached_bytes_) {
+    backend_->FreeHost(ptr);
+    block_sizes_.erase(it);
+    return;
+  }
+  free_blocks_[block_size].push_back(ptr);
+  stats_.cached_bytes += block_size;
+}
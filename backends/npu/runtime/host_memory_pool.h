@@ -0,0 +1,111 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <deque>
+#include <map>
+#include <mutex>
+#include <unordered_map>
+#include <vector>
+
+// The device calls PinnedHostPool makes. Events and streams are opaque
+// handles, so that tests can drive the pool with stub events instead of ACL.
+class HostPoolBackend {
+ public:
+  virtual ~HostPoolBackend() = default;
+
+  virtual void *MallocHost(size_t size) = 0;
+  virtual void FreeHost(void *ptr) = 0;
+
+  virtual void *CreateEvent() = 0;
+  virtual void DestroyEvent(void *event) = 0;
+  virtual void RecordEvent(void *event, void *stream) = 0;
+  // Whether everything before the last record of event has completed.
+  virtual bool QueryEvent(void *event) = 0;
+  virtual void SynchronizeEvent(void *event) = 0;
+};
+
+struct PinnedHostPoolStats {
+  uint64_t allocs{0};
+  // Allocations served by a cached block instead of MallocHost.
+  uint64_t reused_blocks{0};
+  uint64_t host_mallocs{0};
+  uint64_t events_created{0};
+  uint64_t reused_events{0};
+  // Blocks waiting for the event of their last use.
+  size_t pending_blocks{0};
+  size_t cached_bytes{0};
+};
+
+// Pinned host memory for the staging buffers of asynchronous copies.
+//
+// Blocks are rounded up to power of two size classes and kept in per-class
+// free lists after use. A block handed back with FreeAfter is queued behind
+// an event recorded on the stream that reads it; events of one stream
+// complete in the order they were recorded, so each stream queue is
+// reclaimed from the front until the first event still pending. Events are
+// recycled with the blocks, which makes a steady stream of copies of
+// similar sizes free of host allocations and event creation.
+//
+// Free blocks beyond max_cached_bytes are returned to the host. All methods
+// are thread safe.
+class PinnedHostPool {
+ public:
+  PinnedHostPool(HostPoolBackend *backend, size_t max_cached_bytes);
+
+  PinnedHostPool(const PinnedHostPool &) = delete;
+  PinnedHostPool &operator=(const PinnedHostPool &) = delete;
+
+  // Waits for every pending block and releases all memory and events.
+  ~PinnedHostPool();
+
+  void *Alloc(size_t size);
+
+  // Returns ptr, from Alloc, to the pool once the work enqueued on stream so
+  // far has completed.
+  void FreeAfter(void *ptr, void *stream);
+
+  // Returns ptr, from Alloc and not used by any pending work, to the pool.
+  void Free(void *ptr);
+
+  // Waits for every pending block and returns it to the pool.
+  void Synchronize();
+
+  PinnedHostPoolStats Stats() const;
+
+  static size_t SizeClass(size_t size);
+
+ private:
+  struct Pending {
+    void *ptr;
+    void *event;
+  };
+
+  void ReclaimLocked();
+  void ReleaseLocked(void *ptr);
+
+  HostPoolBackend *backend_;
+  size_t max_cached_bytes_;
+
+  mutable std::mutex mutex_;
+  // Size class of every block owned by the pool.
+  std::unordered_map<void *, size_t> block_sizes_;
+  std::map<size_t, std::vector<void *>> free_blocks_;
+  std::unordered_map<void *, std::deque<Pending>> pending_;
+  std::vector<void *> free_events_;
+  PinnedHostPoolStats stats_;
+};
@@ -14,16 +14,20 @@
 
 #include "runtime/runtime.h"
 
+#include <algorithm>
 #include <cstring>
 #include <iostream>
-#include <list>
+#include <memory>
 #include <mutex>
 #include <string>
 #include <unordered_map>
 #include <vector>
 
 #include "glog/logging.h"
+#include "kernels/funcs/npu_cast_cache.h"
+#include "kernels/funcs/npu_op_cache.h"
 #include "runtime/flags.h"
+#include "runtime/host_memory_pool.h"
 
 FLAGS_DEFINE_string(npu_profiling_dir,
                     "ascend_profiling",
@@ -36,153 +40,203 @@ FLAGS_DEFINE_uint64(npu_profiling_dtypes,
 FLAGS_DEFINE_uint64(npu_profiling_metrics,
                     static_cast<uint64_t>(ACL_AICORE_ARITHMETIC_UTILIZATION),
                     "AI Core metric to profile");
+FLAGS_DEFINE_int32(npu_host_pool_cache_mb,
+                   128,
+                   "Megabytes of free pinned host blocks each device keeps "
+                   "for the staging buffers of asynchronous H2D copies.");
 
 thread_local int g_current_device_id(-1);
 
+SecondaryEventPool::SecondaryEventPool(aclrtStream aicore_stream,
+                                       aclrtStream aicpu_stream) {
+  lanes_[kAicpu].stream = aicpu_stream;
+  lanes_[kAicore].stream = aicore_stream;
+}
+
+SecondaryEventPool::~SecondaryEventPool() {
+  for (auto &lane : lanes_) {
+    for (auto &pending : lane.pending) {
+      ACL_CHECK(aclrtSynchronizeEvent(pending.marker));
+      ACL_CHECK(aclrtDestroyEvent(pending.event));
+      ACL_CHECK(aclrtDestroyEvent(pending.marker));
+    }
+  }
+  for (auto event : free_events_) {
+    ACL_CHECK(aclrtDestroyEvent(event));
+  }
+}
+
+void SecondaryEventPool::RecordBefore() { RecordAndWait(kAicpu, kAicore); }
+
+void SecondaryEventPool::RecordAfter() { RecordAndWait(kAicore, kAicpu); }
+
+SecondaryEventStats SecondaryEventPool::Stats() const {
+  SecondaryEventStats stats;
+  stats.created = created_.load(std::memory_order_relaxed);
+  stats.reused = reused_.load(std::memory_order_relaxed);
+  return stats;
+}
+
+void SecondaryEventPool::RecordAndWait(Lane from, Lane to) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  PollLocked();
+  auto &waiting = lanes_[to];
+  aclrtEvent event = AcquireEventLocked();
+  aclrtEvent marker = AcquireEventLocked();
+  ACL_CHECK(aclrtRecordEvent(event, lanes_[from].stream));
+  ACL_CHECK(aclrtStreamWaitEvent(waiting.stream, event));
+  ACL_CHECK(aclrtRecordEvent(marker, waiting.stream));
+  waiting.pending.push_back({event, marker});
+}
+
+aclrtEvent SecondaryEventPool::AcquireEventLocked() {
+  if (!free_events_.empty()) {
+    aclrtEvent event = free_events_.back();
+    free_events_.pop_back();
+    reused_.fetch_add(1, std::memory_order_relaxed);
+    return event;
+  }
+  aclrtEvent event;
+  ACL_CHECK(aclrtCreateEvent(&event));
+  created_.fetch_add(1, std::memory_order_relaxed);
+  return event;
+}
+
+void SecondaryEventPool::PollLocked() {
+  for (auto &lane : lanes_) {
+    while (!lane.pending.empty()) {
+      aclrtEventRecordedStatus status = ACL_EVENT_RECORDED_STATUS_COMPLETE;
+      ACL_CHECK(aclrtQueryEventStatus(lane.pending.front().marker, &status));
+      if (status != ACL_EVENT_RECORDED_STATUS_COMPLETE) {
+        break;
+      }
+      free_events_.push_back(lane.pending.front().event);
+      free_events_.push_back(lane.pending.front().marker);
+      lane.pending.pop_front();
+    }
+  }
+}
+
 aclrtStream SecondaryStream::Get(aclrtStream aicore_stream) {
+  std::lock_guard<std::mutex> lock(mutex_);
   RUN_CHECK(aicpu_streams.find(aicore_stream) != aicpu_streams.cend());
   return aicpu_streams[aicore_stream];
 }
 
 void SecondaryStream::Create(aclrtStream aicore_stream) {
+  std::lock_guard<std::mutex> lock(mutex_);
   RUN_CHECK(aicpu_streams.find(aicore_stream) == aicpu_streams.cend());
   aclrtStream aicpu_stream;
   ACL_CHECK(aclrtCreateStream(&aicpu_stream));
   aicpu_streams[aicore_stream] = aicpu_stream;
+  event_pools[aicore_stream].reset(
+      new SecondaryEventPool(aicore_stream, aicpu_stream));
 }
 
 void SecondaryStream::Destroy(aclrtStream aicore_stream) {
+  std::lock_guard<std::mutex> lock(mutex_);
   RUN_CHECK(aicpu_streams.find(aicore_stream) != aicpu_streams.cend());
+  auto pool = event_pools.find(aicore_stream);
+  auto stats = pool->second->Stats();
+  destroyed_pool_stats.created += stats.created;
+  destroyed_pool_stats.reused += stats.reused;
+  event_pools.erase(pool);
   ACL_CHECK(aclrtDestroyStream(aicpu_streams[aicore_stream]));
   aicpu_streams.erase(aicore_stream);
 }
 
+SecondaryEventPool *SecondaryStream::GetEventPool(aclrtStream aicore_stream) {
+  std::lock_guard<std::mutex> lock(mutex_);
+  auto pool = event_pools.find(aicore_stream);
+  RUN_CHECK(pool != event_pools.cend());
+  return pool->second.get();
+}
+
 void SecondaryStream::RecordBefore(aclrtStream aicore_stream) {
-  static std::list<aclrtEvent> events;
+  GetEventPool(aicore_stream)->RecordBefore();
+}
 
-  RUN_CHECK(aicpu_streams.find(aicore_stream) != aicpu_streams.cend());
-  auto aicpu_stream = aicpu_streams[aicore_stream];
+void SecondaryStream::RecordAfter(aclrtStream aicore_stream) {
+  GetEventPool(aicore_stream)->RecordAfter();
+}
 
-  for (auto iter = events.begin(); iter != events.end();) {
-    auto event = *iter;
-    aclrtEventRecordedStatus status = ACL_EVENT_RECORDED_STATUS_COMPLETE;
-    ACL_CHECK(aclrtQueryEventStatus(event, &status));
-    if (status == ACL_EVENT_RECORDED_STATUS_COMPLETE) {
-      ACL_CHECK(aclrtDestroyEvent(event));
-      iter = events.erase(iter);
-    } else {
-      ++iter;
-    }
-  }
-  {
-    aclrtEvent event;
-    ACL_CHECK(aclrtCreateEvent(&event));
-    ACL_CHECK(aclrtRecordEvent(event, aicpu_stream));
-    ACL_CHECK(aclrtStreamWaitEvent(aicore_stream, event));
-    events.push_back(event);
+SecondaryEventStats SecondaryStream::EventStats() {
+  std::lock_guard<std::mutex> lock(mutex_);
+  SecondaryEventStats stats = destroyed_pool_stats;
+  for (auto &pool : event_pools) {
+    auto pool_stats = pool.second->Stats();
+    stats.created += pool_stats.created;
+    stats.reused += pool_stats.reused;
   }
+  return stats;
 }
 
-void SecondaryStream::RecordAfter(aclrtStream aicore_stream) {
-  static std::list<aclrtEvent> events;
+class AclHostPoolBackend : public HostPoolBackend {
+ public:
+  void *MallocHost(size_t size) override {
+    void *ptr = nullptr;
+    ACL_CHECK(aclrtMallocHost(&ptr, size));
+    return ptr;
+  }
 
-  RUN_CHECK(aicpu_streams.find(aicore_stream) != aicpu_streams.cend());
-  auto aicpu_stream = aicpu_streams[aicore_stream];
+  void FreeHost(void *ptr) override { ACL_CHECK(aclrtFreeHost(ptr)); }
 
-  for (auto iter = events.begin(); iter != events.end();) {
-    auto event = *iter;
-    aclrtEventRecordedStatus status = ACL_EVENT_RECORDED_STATUS_COMPLETE;
-    ACL_CHECK(aclrtQueryEventStatus(event, &status));
-    if (status == ACL_EVENT_RECORDED_STATUS_COMPLETE) {
-      ACL_CHECK(aclrtDestroyEvent(event));
-      iter = events.erase(iter);
-    } else {
-      ++iter;
-    }
-  }
-  {
+  void *CreateEvent() override {
     aclrtEvent event;
     ACL_CHECK(aclrtCreateEvent(&event));
-    ACL_CHECK(aclrtRecordEvent(event, aicore_stream));
-    ACL_CHECK(aclrtStreamWaitEvent(aicpu_stream, event));
-    events.push_back(event);
+    return event;
   }
-}
 
-class AlignnedAllocator {
- public:
-  void *Alloc(size_t size, size_t align) {
-    std::lock_guard<std::mutex> lock(mtx_);
-    ProcessEvents();
-    void *p = malloc(size + align);
-    void *ret =
-        reinterpret_cast<void *>(reinterpret_cast<size_t>(p) + align -
-                                 (reinterpret_cast<size_t>(p) & (align - 1)));
-    recorded_events_[ret] = {p, nullptr};
-    return ret;
+  void DestroyEvent(void *event) override {
+    ACL_CHECK(aclrtDestroyEvent(event));
   }
 
-  void Record(void *p, aclrtEvent event) {
-    std::lock_guard<std::mutex> lock(mtx_);
-    recorded_events_[p].second = event;
+  void RecordEvent(void *event, void *stream) override {
+    ACL_CHECK(aclrtRecordEvent(event, stream));
   }
 
-  void ClearEvent() {
-    std::lock_guard<std::mutex> lock(mtx_);
-    for (auto it = recorded_events_.begin(); it != recorded_events_.end();) {
-      aclrtEvent event = it->second.second;
-      if (!event) continue;
-      ACL_CHECK(aclrtSynchronizeEvent(event));
-      void *ptr = it->second.first;
-      free(ptr);
-      ACL_CHECK(aclrtDestroyEvent(event));
-      it = recorded_events_.erase(it);
-    }
+  bool QueryEvent(void *event) override {
+    aclrtEventRecordedStatus status = ACL_EVENT_RECORDED_STATUS_COMPLETE;
+    ACL_CHECK(aclrtQueryEventStatus(event, &status));
+    return status == ACL_EVENT_RECORDED_STATUS_COMPLETE;
   }
 
-  void ProcessEvents() {
-    for (auto it = recorded_events_.begin(); it != recorded_events_.end();) {
-      aclrtEvent event = it->second.second;
-      if (!event) continue;
-      aclrtEventRecordedStatus status = ACL_EVENT_RECORDED_STATUS_COMPLETE;
-      ACL_CHECK(aclrtQueryEventStatus(event, &status));
-      if (status == ACL_EVENT_RECORDED_STATUS_COMPLETE) {
-        void *ptr = it->second.first;
-        free(ptr);
-        it = recorded_events_.erase(it);
-        ACL_CHECK(aclrtDestroyEvent(event));
-      } else {
-        ++it;
-      }
-    }
+  void SynchronizeEvent(void *event) override {
+    ACL_CHECK(aclrtSynchronizeEvent(event));
   }
-
- private:
-  std::unordered_map<void *, std::pair<void *, aclrtEvent>> recorded_events_;
-  std::mutex mtx_;
 };
 
-class AlignnedAllocatorList {
+class HostPoolList {
  public:
-  explicit AlignnedAllocatorList(size_t device_count)
-      : allocator_list(device_count, nullptr) {}
+  explicit HostPoolList(size_t device_count) : pool_list(device_count) {}
 
-  void Init(size_t dev_id) { allocator_list[dev_id] = new AlignnedAllocator; }
+  void Init(size_t dev_id) {
+    pool_list[dev_id].reset(new PinnedHostPool(
+        &backend,
+        static_cast<size_t>(std::max(FLAGS_npu_host_pool_cache_mb, 0)) << 20));
+  }
 
   void Deinit(size_t dev_id) {
-    delete allocator_list[dev_id];
-    allocator_list[dev_id] = nullptr;
+    if (pool_list[dev_id]) {
+      auto stats = pool_list[dev_id]->Stats();
+      VLOG(1) << "NPU " << dev_id << " pinned host pool: " << stats.allocs
+              << " allocs, " << stats.reused_blocks << " reused blocks, "
+              << stats.host_mallocs << " host mallocs, " << stats.events_created
+              << " events created, " << stats.reused_events
+              << " reused events, " << stats.pending_blocks
+              << " pending blocks, " << stats.cached_bytes << " cached bytes";
+    }
+    pool_list[dev_id].reset();
   }
 
-  AlignnedAllocator *GetAllocator(size_t dev_id) {
-    return allocator_list[dev_id];
-  }
+  PinnedHostPool *GetPool(size_t dev_id) { return pool_list[dev_id].get(); }
 
  private:
-  std::vector<AlignnedAllocator *> allocator_list;
+  AclHostPoolBackend backend;
+  std::vector<std::unique_ptr<PinnedHostPool>> pool_list;
 };
 
-static AlignnedAllocatorList *global_allocator_list = nullptr;
+static HostPoolList *global_host_pool_list = nullptr;
 
 inline void check_uninitialized_thread(int dev_id) {
   if (g_current_device_id == -1) {
@@ -207,15 +261,15 @@ C_Status Init() {
   ACL_CHECK(aclInit(nullptr));
   size_t count = get_devices_count();
   if (count) {
-    global_allocator_list = new AlignnedAllocatorList(count);
+    global_host_pool_list = new HostPoolList(count);
   }
   return C_SUCCESS;
 }
 
 C_Status InitDevice(const C_Device device) {
   ACL_CHECK(aclrtSetDevice(device->id));
-  if (global_allocator_list) {
-    global_allocator_list->Init(device->id);
+  if (global_host_pool_list) {
+    global_host_pool_list->Init(device->id);
   }
   return C_SUCCESS;
 }
@@ -235,18 +289,32 @@ C_Status GetDevice(const C_Device device) {
 
 C_Status ReleaseDevice(const C_Device device) {
   ACL_CHECK(aclrtSetDevice(device->id));
-  if (global_allocator_list) {
-    // global_allocator_list->GetAllocator(device->id)->ClearEvent();
-    global_allocator_list->Deinit(device->id);
+  if (global_host_pool_list) {
+    global_host_pool_list->Deinit(device->id);
   }
   ACL_CHECK(aclrtResetDevice(device->id));
   return C_SUCCESS;
 }
 
 C_Status Finalize() {
-  if (global_allocator_list) {
-    delete global_allocator_list;
-    global_allocator_list = nullptr;
+  auto op_cache_stats = NpuOpCache::Instance().Stats();
+  VLOG(1) << "NpuOpCache: " << op_cache_stats.hits << " hits, "
+          << op_cache_stats.misses << " misses, " << op_cache_stats.evictions
+          << " evictions, " << op_cache_stats.size << " of "
+          << op_cache_stats.capacity << " entries";
+  auto event_stats = SecondaryStream::Instance().EventStats();
+  VLOG(1) << "SecondaryStream: " << event_stats.created << " events created, "
+          << event_stats.reused << " events reused";
+  auto cast_cache_stats = NpuCastCache::Instance().Stats();
+  VLOG(1) << "NpuCastCache: " << cast_cache_stats.casts_launched
+          << " casts launched, " << cast_cache_stats.casts_reused
+          << " casts reused, " << cast_cache_stats.scratch_reused
+          << " scratch buffers reused, " << cast_cache_stats.cached_bytes
+          << " cached bytes, " << cast_cache_stats.scratch_bytes
+          << " scratch bytes";
+  if (global_host_pool_list) {
+    delete global_host_pool_list;
+    global_host_pool_list = nullptr;
   }
   ACL_CHECK(aclFinalize());
   return C_SUCCESS;
@@ -296,15 +364,14 @@ C_Status AsyncMemCpyH2D(const C_Device device,
                         void *dst,
                         const void *src,
                         size_t size) {
-  auto allocator = global_allocator_list->GetAllocator(get_current_device_id());
-  void *tmp = allocator->Alloc(size, 64);
-  aclrtEvent event;
-  ACL_CHECK(aclrtCreateEvent(&event));
+  auto pool = global_host_pool_list->GetPool(get_current_device_id());
+  void *tmp = pool->Alloc(size);
+  RUN_CHECK(tmp != nullptr);
   memcpy(tmp, src, size);
   ACL_CHECK(aclrtMemcpyAsync(
       dst, size, tmp, size, ACL_MEMCPY_HOST_TO_DEVICE, (aclrtStream)(stream)));
-  ACL_CHECK(aclrtRecordEvent(event, (aclrtStream)(stream)));
-  allocator->Record(tmp, event);
+  // src may be reused as soon as this returns, tmp once the copy is done.
+  pool->FreeAfter(tmp, stream);
   return C_SUCCESS;
 }
 
@@ -378,6 +445,7 @@ C_Status CreateStream(const C_Device device, C_Stream *stream) {
 }
 
 C_Status DestroyStream(const C_Device device, C_Stream stream) {
+  NpuCastCache::Instance().ReleaseStream(stream);
   ACL_CHECK(aclrtDestroyStream(reinterpret_cast<aclrtStream>(stream)));
   SecondaryStream::Instance().Destroy(reinterpret_cast<aclrtStream>(stream));
   return C_SUCCESS;
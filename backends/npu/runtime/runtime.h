@@ -19,6 +19,13 @@
 #include <hccl/hccl.h>
 #include <hccl/hccl_types.h>
 
+#include <atomic>
+#include <deque>
+#include <memory>
+#include <mutex>
+#include <unordered_map>
+#include <vector>
+
 #include "paddle/phi/extension.h"
 
 #define RUNTIME_CHECK(func, success)                                          \
@@ -182,6 +189,64 @@ class AscendProfiler {
   bool start_ = false;
 };
 
+struct SecondaryEventStats {
+  uint64_t created{0};
+  uint64_t reused{0};
+};
+
+// The events SecondaryStream synchronizes an aicore stream and its aicpu
+// stream with. An event is recorded on one of the two streams and waited for
+// on the other, followed by a marker event recorded on the waiting stream.
+// The marker completes only after the wait has, so once it is complete
+// neither event can be observed by pending work and both are reused. Records
+// of one stream complete in order, so the markers are polled from the front
+// of per-stream queues.
+class SecondaryEventPool {
+ public:
+  SecondaryEventPool(aclrtStream aicore_stream, aclrtStream aicpu_stream);
+
+  SecondaryEventPool(const SecondaryEventPool &) = delete;
+  SecondaryEventPool &operator=(const SecondaryEventPool &) = delete;
+
+  // Waits for the pending events and destroys all events.
+  ~SecondaryEventPool();
+
+  // Makes the aicore stream wait for the work enqueued on the aicpu stream.
+  void RecordBefore();
+
+  // Makes the aicpu stream wait for the work enqueued on the aicore stream.
+  void RecordAfter();
+
+  SecondaryEventStats Stats() const;
+
+ private:
+  enum Lane { kAicpu = 0, kAicore = 1 };
+
+  struct Pending {
+    // Recorded on the other stream and waited for on this one.
+    aclrtEvent event;
+    // Recorded on this stream after the wait.
+    aclrtEvent marker;
+  };
+
+  struct LaneState {
+    aclrtStream stream;
+    // Waits enqueued on the stream whose marker is not known to be complete,
+    // oldest first.
+    std::deque<Pending> pending;
+  };
+
+  void RecordAndWait(Lane from, Lane to);
+  aclrtEvent AcquireEventLocked();
+  void PollLocked();
+
+  mutable std::mutex mutex_;
+  LaneState lanes_[2];
+  std::vector<aclrtEvent> free_events_;
+  std::atomic<uint64_t> created_{0};
+  std::atomic<uint64_t> reused_{0};
+};
+
 struct SecondaryStream {
   static SecondaryStream &Instance() {
     static SecondaryStream ins;
@@ -204,7 +269,19 @@ struct SecondaryStream {
   // aicore ---- aicore
   void RecordAfter(aclrtStream aicore_stream);
 
+  // Events created and reused by RecordBefore and RecordAfter of all
+  // streams, including destroyed ones.
+  SecondaryEventStats EventStats();
+
  private:
   SecondaryStream() = default;
+
+  SecondaryEventPool *GetEventPool(aclrtStream aicore_stream);
+
+  std::mutex mutex_;
   std::unordered_map<aclrtStream, aclrtStream> aicpu_streams;
+  // One pool per aicore stream, which belongs to a single device.
+  std::unordered_map<aclrtStream, std::unique_ptr<SecondaryEventPool>>
+      event_pools;
+  SecondaryEventStats destroyed_pool_stats;
 };
@@ -0,0 +1,249 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "runtime/host_memory_pool.h"
+
+#include <cstdlib>
+#include <memory>
+#include <set>
+#include <vector>
+
+#include "gtest/gtest.h"
+
+namespace {
+
+// Events complete only when the test says so, or when they are synchronized.
+class FakeBackend : public HostPoolBackend {
+ public:
+  struct Event {
+    void *stream{nullptr};
+    bool done{true};
+  };
+
+  ~FakeBackend() override {
+    EXPECT_TRUE(host_blocks.empty());
+    EXPECT_EQ(events.size(), 0u);
+  }
+
+  void *MallocHost(size_t size) override {
+    void *ptr = std::malloc(size);
+    host_blocks.insert(ptr);
+    ++host_mallocs;
+    return ptr;
+  }
+
+  void FreeHost(void *ptr) override {
+    EXPECT_EQ(host_blocks.erase(ptr), 1u);
+    std::free(ptr);
+    ++host_frees;
+  }
+
+  void *CreateEvent() override {
+    events.emplace_back(new Event);
+    return events.back().get();
+  }
+
+  void DestroyEvent(void *event) override {
+    for (auto it = events.begin(); it != events.end(); ++it) {
+      if (it->get() == event) {
+        events.erase(it);
+        return;
+      }
+    }
+    ADD_FAILURE() << "unknown event " << event;
+  }
+
+  void RecordEvent(void *event, void *stream) override {
+    auto ev = static_cast<Event *>(event);
+    ev->stream = stream;
+    ev->done = false;
+    records.push_back(ev);
+  }
+
+  bool QueryEvent(void *event) override {
+    return static_cast<Event *>(event)->done;
+  }
+
+  void SynchronizeEvent(void *event) override {
+    ++synchronized;
+    // Like a device stream, everything recorded before on the same stream
+    // completes too.
+    auto ev = static_cast<Event *>(event);
+    for (auto record : records) {
+      if (record->stream == ev->stream) {
+        record->done = true;
+      }
+      if (record == ev) {
+        break;
+      }
+    }
+  }
+
+  // Completes the i-th RecordEvent call.
+  void Complete(size_t i) { records.at(i)->done = true; }
+
+  void CompleteAll() {
+    for (auto record : records) {
+      record->done = true;
+    }
+  }
+
+  std::set<void *> host_blocks;
+  std::vector<std::unique_ptr<Event>> events;
+  std::vector<Event *> records;
+  int host_mallocs{0};
+  int host_frees{0};
+  int synchronized{0};
+};
+
+void *const kStream0 = reinterpret_cast<void *>(0x10);
+void *const kStream1 = reinterpret_cast<void *>(0x20);
+
+TEST(PinnedHostPool, SizeClass) {
+  EXPECT_EQ(PinnedHostPool::SizeClass(1), 512u);
+  EXPECT_EQ(PinnedHostPool::SizeClass(512), 512u);
+  EXPECT_EQ(PinnedHostPool::SizeClass(513), 1024u);
+  EXPECT_EQ(PinnedHostPool::SizeClass(size_t(64) << 20), size_t(64) << 20);
+  EXPECT_EQ(PinnedHostPool::SizeClass((size_t(64) << 20) + 1),
+            (size_t(64) << 20) + 1);
+}
+
+TEST(PinnedHostPool, ReclaimStopsAtFirstPendingEvent) {
+  FakeBackend backend;
+  PinnedHostPool pool(&backend, size_t(1) << 20);
+
+  void *a = pool.Alloc(100);
+  void *b = pool.Alloc(100);
+  pool.FreeAfter(a, kStream0);
+  pool.FreeAfter(b, kStream0);
+  // The second record of the stream completes first, the queue must still
+  // wait for the first one.
+  backend.Complete(1);
+  void *c = pool.Alloc(100);
+  EXPECT_NE(c, a);
+  EXPECT_NE(c, b);
+  EXPECT_EQ(pool.Stats().pending_blocks, 2u);
+  EXPECT_EQ(backend.host_mallocs, 3);
+
+  // Another stream is reclaimed independently of the blocked one.
+  pool.FreeAfter(c, kStream1);
+  backend.Complete(2);
+  EXPECT_EQ(pool.Alloc(100), c);
+  EXPECT_EQ(pool.Stats().pending_blocks, 2u);
+
+  backend.Complete(0);
+  void *d = pool.Alloc(100);
+  void *e = pool.Alloc(100);
+  EXPECT_EQ(std::set<void *>({d, e}), std::set<void *>({a, b}));
+  EXPECT_EQ(pool.Stats().pending_blocks, 0u);
+  EXPECT_EQ(backend.host_mallocs, 3);
+  pool.Free(c);
+  pool.Free(d);
+  pool.Free(e);
+}
+
+TEST(PinnedHostPool, EventsAreRecycled) {
+  FakeBackend backend;
+  PinnedHostPool pool(&backend, size_t(1) << 20);
+
+  for (int i = 0; i < 100; ++i) {
+    void *ptr = pool.Alloc(4096);
+    pool.FreeAfter(ptr, i % 2 ? kStream1 : kStream0);
+    backend.CompleteAll();
+  }
+  auto stats = pool.Stats();
+  EXPECT_EQ(stats.allocs, 100u);
+  EXPECT_EQ(stats.host_mallocs, 1u);
+  EXPECT_EQ(stats.reused_blocks, 99u);
+  EXPECT_EQ(stats.events_created, 1u);
+  EXPECT_EQ(stats.reused_events, 99u);
+  EXPECT_EQ(backend.events.size(), 1u);
+  EXPECT_EQ(backend.host_mallocs, 1);
+}
+
+TEST(PinnedHostPool, MaxCachedBytes) {
+  FakeBackend backend;
+  PinnedHostPool pool(&backend, 1024);
+
+  void *a = pool.Alloc(512);
+  void *b = pool.Alloc(512);
+  void *c = pool.Alloc(512);
+  void *big = pool.Alloc(2048);
+  pool.Free(a);
+  pool.Free(b);
+  EXPECT_EQ(pool.Stats().cached_bytes, 1024u);
+  EXPECT_EQ(backend.host_frees, 0);
+
+  // Neither fits under the cap any more.
+  pool.Free(c);
+  pool.Free(big);
+  EXPECT_EQ(pool.Stats().cached_bytes, 1024u);
+  EXPECT_EQ(backend.host_frees, 2);
+  EXPECT_EQ(backend.host_blocks.size(), 2u);
+
+  // Blocks that completed on a stream are capped the same way.
+  void *d = pool.Alloc(512);
+  void *e = pool.Alloc(512);
+  void *f = pool.Alloc(512);
+  EXPECT_EQ(backend.host_mallocs, 5);
+  pool.FreeAfter(d, kStream0);
+  pool.FreeAfter(e, kStream0);
+  pool.FreeAfter(f, kStream0);
+  backend.CompleteAll();
+  pool.Synchronize();
+  EXPECT_EQ(pool.Stats().cached_bytes, 1024u);
+  EXPECT_EQ(backend.host_frees, 3);
+}
+
+TEST(PinnedHostPool, Synchronize) {
+  FakeBackend backend;
+  PinnedHostPool pool(&backend, size_t(1) << 20);
+
+  std::vector<void *> blocks;
+  for (int i = 0; i < 6; ++i) {
+    blocks.push_back(pool.Alloc(1000));
+  }
+  for (int i = 0; i < 6; ++i) {
+    pool.FreeAfter(blocks[i], i < 3 ? kStream0 : kStream1);
+  }
+  EXPECT_EQ(pool.Stats().pending_blocks, 6u);
+
+  pool.Synchronize();
+  // One wait per stream, on its last event.
+  EXPECT_EQ(backend.synchronized, 2);
+  auto stats = pool.Stats();
+  EXPECT_EQ(stats.pending_blocks, 0u);
+  EXPECT_EQ(stats.cached_bytes, 6u * 1024);
+
+  for (int i = 0; i < 6; ++i) {
+    pool.Alloc(1000);
+  }
+  EXPECT_EQ(backend.host_mallocs, 6);
+  EXPECT_EQ(pool.Stats().events_created, 6u);
+}
+
+TEST(PinnedHostPool, DestructorWaitsForPendingBlocks) {
+  FakeBackend backend;
+  {
+    PinnedHostPool pool(&backend, size_t(1) << 20);
+    pool.FreeAfter(pool.Alloc(100), kStream0);
+    pool.FreeAfter(pool.Alloc(100), kStream1);
+    pool.Free(pool.Alloc(100));
+  }
+  EXPECT_EQ(backend.synchronized, 2);
+  EXPECT_TRUE(backend.host_blocks.empty());
+  EXPECT_TRUE(backend.events.empty());
+}
+
+}  // namespace
@@ -0,0 +1,278 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/npu_cast_cache.h"
+
+#include <memory>
+#include <thread>
+#include <vector>
+
+#include "gtest/gtest.h"
+#include "tools/acl_stub/acl_stub.h"
+
+namespace {
+
+void *const kStream0 = reinterpret_cast<void *>(0x10);
+void *const kStream1 = reinterpret_cast<void *>(0x20);
+
+// The cache never reads the data, host memory stands in for the device.
+phi::DenseTensor Tensor(const std::vector<int64_t> &dims, phi::DataType dtype) {
+  phi::DenseTensorMeta meta(dtype, phi::make_ddim(dims));
+  size_t size = phi::product(meta.dims) * phi::SizeOf(dtype);
+  std::shared_ptr<phi::Allocation> allocation(
+      new phi::Allocation(new char[size], size, phi::CustomPlace("npu", 0)),
+      [](phi::Allocation *allocation) {
+        delete[] static_cast<char *>(allocation->ptr());
+        delete allocation;
+      });
+  return phi::DenseTensor(allocation, meta);
+}
+
+// What Scratch allocates, device memory of the ACL stub.
+std::shared_ptr<phi::Allocation> NpuAllocation(size_t size) {
+  void *ptr = nullptr;
+  EXPECT_EQ(aclrtMalloc(&ptr, size, ACL_MEM_MALLOC_NORMAL_ONLY),
+            ACL_ERROR_NONE);
+  return std::shared_ptr<phi::Allocation>(
+      new phi::Allocation(ptr, size, phi::CustomPlace("npu", 0)),
+      [](phi::Allocation *allocation) {
+        aclrtFree(allocation->ptr());
+        delete allocation;
+      });
+}
+
+uint64_t Mallocs() { return AclStubGetCounter(kAclStubMalloc); }
+
+// What TypeAdapter does for one input: reuses the cached cast of src, or
+// casts it and caches the result. Returns whether a Cast was launched.
+bool CastInput(NpuCastCache *cache,
+               const phi::DenseTensor &src,
+               phi::DataType dtype,
+               void *stream,
+               const std::vector<phi::DenseTensor> &outputs,
+               phi::DenseTensor *casted) {
+  if (cache->Lookup(src, dtype, stream, casted)) {
+    return false;
+  }
+  *casted = Tensor(phi::vectorize(src.dims()), dtype);
+  cache->CountCast();
+  if (cache->Cacheable(src, outputs)) {
+    cache->Insert(src, dtype, stream, *casted);
+  }
+  return true;
+}
+
+TEST(NpuCastCache, RepeatedCastOfUnchangedInputIsSkipped) {
+  NpuCastCache cache(size_t(1) << 20, 0);
+  auto x = Tensor({4, 8}, phi::DataType::INT64);
+  phi::DenseTensor first, casted;
+  EXPECT_TRUE(CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &first));
+  for (int i = 0; i < 5; ++i) {
+    EXPECT_FALSE(
+        CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+    EXPECT_EQ(casted.Holder(), first.Holder());
+    EXPECT_EQ(casted.dtype(), phi::DataType::INT32);
+  }
+  auto stats = cache.Stats();
+  EXPECT_EQ(stats.casts_launched, 1u);
+  EXPECT_EQ(stats.casts_reused, 5u);
+  EXPECT_EQ(stats.cached_bytes, x.capacity() + first.capacity());
+
+  // Another destination dtype or stream is another copy.
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::FLOAT32, kStream0, {}, &casted));
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream1, {}, &casted));
+  EXPECT_EQ(cache.Stats().casts_launched, 3u);
+}
+
+TEST(NpuCastCache, BumpedInplaceVersionRecasts) {
+  NpuCastCache cache(size_t(1) << 20, 0);
+  auto x = Tensor({4, 8}, phi::DataType::INT64);
+  phi::DenseTensor casted;
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+  EXPECT_FALSE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+
+  x.InplaceVersionCounter().Bump();
+  phi::DenseTensor recasted;
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &recasted));
+  EXPECT_NE(recasted.Holder(), casted.Holder());
+  EXPECT_FALSE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+  EXPECT_EQ(casted.Holder(), recasted.Holder());
+
+  auto stats = cache.Stats();
+  EXPECT_EQ(stats.casts_launched, 2u);
+  EXPECT_EQ(stats.casts_reused, 2u);
+  // The stale copy was dropped.
+  EXPECT_EQ(stats.cached_bytes, x.capacity() + recasted.capacity());
+}
+
+TEST(NpuCastCache, WrittenInputsAreNotReused) {
+  NpuCastCache cache(size_t(1) << 20, 0);
+  auto x = Tensor({4, 8}, phi::DataType::INT64);
+  phi::DenseTensor casted;
+
+  // An op writing its own input casts it every time.
+  EXPECT_FALSE(cache.Cacheable(x, {x}));
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {x}, &casted));
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {x}, &casted));
+
+  // Outputs of TypeAdapter invalidate the copies of their allocation.
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+  cache.Invalidate(x);
+  EXPECT_EQ(cache.Stats().cached_bytes, 0u);
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+}
+
+TEST(NpuCastCache, ReleaseStream) {
+  NpuCastCache cache(size_t(1) << 20, 0);
+  auto x = Tensor({4, 8}, phi::DataType::INT64);
+  phi::DenseTensor casted0, casted1;
+  CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted0);
+  CastInput(&cache, x, phi::DataType::INT32, kStream1, {}, &casted1);
+
+  cache.ReleaseStream(kStream0);
+  EXPECT_EQ(cache.Stats().cached_bytes, x.capacity() + casted1.capacity());
+  phi::DenseTensor casted;
+  EXPECT_FALSE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream1, {}, &casted));
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+}
+
+TEST(NpuCastCache, Capacity) {
+  auto x = Tensor({4, 8}, phi::DataType::INT64);
+  auto y = Tensor({4, 8}, phi::DataType::INT64);
+  const size_t entry_bytes = x.capacity() + 4 * 8 * sizeof(int32_t);
+
+  NpuCastCache cache(entry_bytes, 0);
+  phi::DenseTensor casted;
+  CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted);
+  CastInput(&cache, y, phi::DataType::INT32, kStream0, {}, &casted);
+  // x was the least recently used.
+  EXPECT_TRUE(
+      CastInput(&cache, x, phi::DataType::INT32, kStream0, {}, &casted));
+  EXPECT_EQ(cache.Stats().cached_bytes, entry_bytes);
+
+  // Copies larger than the cache are not kept.
+  auto z = Tensor({64, 8}, phi::DataType::INT64);
+  EXPECT_TRUE(
+      CastInput(&cache, z, phi::DataType::INT32, kStream0, {}, &casted));
+  EXPECT_TRUE(
+      CastInput(&cache, z, phi::DataType::INT32, kStream0, {}, &casted));
+
+  cache.SetCapacity(0);
+  EXPECT_EQ(cache.Stats().cached_bytes, 0u);
+  EXPECT_FALSE(cache.Cacheable(x, {}));
+}
+
+TEST(NpuCastCache, ScratchIsReusedPerStreamThreadAndSlot) {
+  NpuCastCache cache(0, size_t(1) << 20);
+  const uint64_t mallocs = Mallocs();
+  auto buffer = cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation).get();
+  EXPECT_EQ(cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation).get(), buffer);
+  // A smaller request fits as well.
+  EXPECT_EQ(cache.ScratchBuffer(kStream0, 0, 128, NpuAllocation).get(), buffer);
+  EXPECT_EQ(Mallocs(), mallocs + 1);
+
+  // Other slots and streams have buffers of their own.
+  EXPECT_NE(cache.ScratchBuffer(kStream0, 1, 256, NpuAllocation).get(), buffer);
+  EXPECT_NE(cache.ScratchBuffer(kStream1, 0, 256, NpuAllocation).get(), buffer);
+  // So do other threads, whose launches are not ordered after ours.
+  phi::Allocation *other_thread = nullptr;
+  std::thread([&] {
+    other_thread = cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation).get();
+  }).join();
+  EXPECT_NE(other_thread, buffer);
+  EXPECT_EQ(Mallocs(), mallocs + 4);
+
+  auto stats = cache.Stats();
+  EXPECT_EQ(stats.scratch_reused, 2u);
+  EXPECT_EQ(stats.scratch_bytes, 4 * 256u);
+  EXPECT_EQ(stats.cached_bytes, 0u);
+}
+
+TEST(NpuCastCache, ScratchInUseIsNotHandedOut) {
+  NpuCastCache cache(0, size_t(1) << 20);
+  // The temporaries of a TypeAdapter live until its op_runner returns, a
+  // TypeAdapter nested in it must not write to them.
+  auto outer = cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation);
+  auto inner = cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation);
+  EXPECT_NE(inner, outer);
+  inner.reset();
+  // The outer buffer is kept for the next launch.
+  auto outer_ptr = outer.get();
+  outer.reset();
+  EXPECT_EQ(cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation).get(),
+            outer_ptr);
+  EXPECT_EQ(cache.Stats().scratch_bytes, 256u);
+}
+
+TEST(NpuCastCache, ScratchReleaseStream) {
+  NpuCastCache cache(0, size_t(1) << 20);
+  std::weak_ptr<phi::Allocation> buffer0 =
+      cache.ScratchBuffer(kStream0, 0, 256, NpuAllocation);
+  std::weak_ptr<phi::Allocation> buffer1 =
+      cache.ScratchBuffer(kStream1, 0, 256, NpuAllocation);
+  cache.ReleaseStream(kStream0);
+  EXPECT_TRUE(buffer0.expired());
+  EXPECT_FALSE(buffer1.expired());
+  EXPECT_EQ(cache.Stats().scratch_bytes, 256u);
+}
+
+TEST(NpuCastCache, ScratchCapacity) {
+  NpuCastCache cache(0, 1024);
+  std::weak_ptr<phi::Allocation> first =
+      cache.ScratchBuffer(kStream0, 0, 512, NpuAllocation);
+  std::weak_ptr<phi::Allocation> second =
+      cache.ScratchBuffer(kStream0, 1, 512, NpuAllocation);
+  cache.ScratchBuffer(kStream0, 1, 512, NpuAllocation);
+  // first was the least recently used.
+  cache.ScratchBuffer(kStream0, 2, 512, NpuAllocation);
+  EXPECT_TRUE(first.expired());
+  EXPECT_FALSE(second.expired());
+  EXPECT_EQ(cache.Stats().scratch_bytes, 1024u);
+
+  // Requests larger than the capacity are not kept.
+  std::weak_ptr<phi::Allocation> large =
+      cache.ScratchBuffer(kStream0, 3, 4096, NpuAllocation);
+  EXPECT_TRUE(large.expired());
+  EXPECT_FALSE(second.expired());
+  EXPECT_EQ(cache.Stats().scratch_bytes, 1024u);
+}
+
+TEST(NpuCastCache, ScratchMuchLargerThanRequestIsReplaced) {
+  NpuCastCache cache(0, size_t(16) << 20);
+  const size_t large = size_t(8) << 20;
+  std::weak_ptr<phi::Allocation> buffer =
+      cache.ScratchBuffer(kStream0, 0, large, NpuAllocation);
+  auto buffer_ptr = buffer.lock().get();
+  // A quarter of the buffer is still close enough.
+  EXPECT_EQ(cache.ScratchBuffer(kStream0, 0, large / 4, NpuAllocation).get(),
+            buffer_ptr);
+  auto smaller = cache.ScratchBuffer(kStream0, 0, large / 8, NpuAllocation);
+  EXPECT_TRUE(buffer.expired());
+  EXPECT_EQ(smaller->size(), large / 8);
+  EXPECT_EQ(cache.Stats().scratch_bytes, large / 8);
+}
+
+}  // namespace
@@ -0,0 +1,152 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "kernels/funcs/npu_op_runner.h"
+
+#include <memory>
+#include <vector>
+
+#include "gtest/gtest.h"
+#include "tools/acl_stub/acl_stub.h"
+
+namespace {
+
+// A tensor on the stub device, large enough for dims of dtype.
+phi::DenseTensor NpuTensor(const std::vector<int64_t> &dims,
+                           phi::DataType dtype = phi::DataType::FLOAT32) {
+  phi::DenseTensorMeta meta(dtype, phi::make_ddim(dims));
+  size_t size = phi::product(meta.dims) * phi::SizeOf(dtype);
+  void *ptr = nullptr;
+  EXPECT_EQ(aclrtMalloc(&ptr, size, ACL_MEM_MALLOC_NORMAL_ONLY),
+            ACL_ERROR_NONE);
+  std::shared_ptr<phi::Allocation> allocation(
+      new phi::Allocation(ptr, size, phi::CustomPlace("npu", 0)),
+      [](phi::Allocation *allocation) {
+        aclrtFree(allocation->ptr());
+        delete allocation;
+      });
+  return phi::DenseTensor(allocation, meta);
+}
+
+class NpuOpRunnerTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    ASSERT_EQ(aclrtCreateStream(&stream_), ACL_ERROR_NONE);
+    auto &cache = NpuOpCache::Instance();
+    cache.SetCapacity(64);
+    cache.Clear();
+    cache.ResetStats();
+  }
+
+  void TearDown() override {
+    NpuOpCache::Instance().Clear();
+    aclrtDestroyStream(stream_);
+  }
+
+  void RunReduceSum(const phi::DenseTensor &x,
+                    const phi::DenseTensor &out,
+                    const std::vector<int64_t> &axes) {
+    NpuOpRunner runner(
+        "ReduceSumD", {x}, {out}, {{"axes", axes}, {"keep_dims", false}});
+    runner.Run(stream_);
+  }
+
+  static uint64_t DescsCreated() {
+    return AclStubGetCounter(kAclStubTensorDescCreated);
+  }
+
+  aclrtStream stream_{nullptr};
+};
+
+TEST_F(NpuOpRunnerTest, RepeatedLaunchReusesDescs) {
+  auto x = NpuTensor({4, 8});
+  auto out = NpuTensor({8});
+  RunReduceSum(x, out, {0});
+  const uint64_t descs = DescsCreated();
+  const uint64_t buffers = AclStubGetCounter(kAclStubDataBufferCreated);
+  const uint64_t attrs = AclStubGetCounter(kAclStubOpAttrCreated);
+
+  for (int i = 0; i < 10; ++i) {
+    RunReduceSum(x, out, {0});
+  }
+  EXPECT_EQ(DescsCreated(), descs);
+  EXPECT_EQ(AclStubGetCounter(kAclStubOpAttrCreated), attrs);
+  // Only the data buffers are made per launch.
+  EXPECT_EQ(AclStubGetCounter(kAclStubDataBufferCreated), buffers + 20);
+
+  auto stats = NpuOpCache::Instance().Stats();
+  EXPECT_EQ(stats.misses, 1u);
+  EXPECT_EQ(stats.hits, 10u);
+  EXPECT_EQ(stats.size, 1u);
+}
+
+TEST_F(NpuOpRunnerTest, ChangedAttrsOrShapesMiss) {
+  auto x = NpuTensor({4, 8});
+  auto out0 = NpuTensor({8});
+  auto out1 = NpuTensor({4});
+  RunReduceSum(x, out0, {0});
+
+  uint64_t descs = DescsCreated();
+  RunReduceSum(x, out1, {1});
+  EXPECT_EQ(NpuOpCache::Instance().Stats().misses, 2u);
+  EXPECT_GT(DescsCreated(), descs);
+
+  // Same attributes, other shapes.
+  auto y = NpuTensor({2, 8});
+  descs = DescsCreated();
+  RunReduceSum(y, out0, {0});
+  EXPECT_EQ(NpuOpCache::Instance().Stats().misses, 3u);
+  EXPECT_GT(DescsCreated(), descs);
+
+  // Same shapes, other dtype.
+  auto z = NpuTensor({4, 8}, phi::DataType::FLOAT16);
+  auto out2 = NpuTensor({8}, phi::DataType::FLOAT16);
+  RunReduceSum(z, out2, {0});
+  EXPECT_EQ(NpuOpCache::Instance().Stats().misses, 4u);
+
+  descs = DescsCreated();
+  RunReduceSum(x, out0, {0});
+  RunReduceSum(x, out1, {1});
+  RunReduceSum(y, out0, {0});
+  RunReduceSum(z, out2, {0});
+  EXPECT_EQ(DescsCreated(), descs);
+  auto stats = NpuOpCache::Instance().Stats();
+  EXPECT_EQ(stats.misses, 4u);
+  EXPECT_EQ(stats.hits, 4u);
+}
+
+TEST_F(NpuOpRunnerTest, CapacityEvictsLeastRecentlyUsed) {
+  auto &cache = NpuOpCache::Instance();
+  cache.SetCapacity(1);
+  auto x = NpuTensor({4, 8});
+  auto out0 = NpuTensor({8});
+  auto out1 = NpuTensor({4});
+  RunReduceSum(x, out0, {0});
+  RunReduceSum(x, out1, {1});
+  RunReduceSum(x, out0, {0});
+  auto stats = cache.Stats();
+  EXPECT_EQ(stats.misses, 3u);
+  EXPECT_EQ(stats.hits, 0u);
+  EXPECT_EQ(stats.evictions, 2u);
+  EXPECT_EQ(stats.size, 1u);
+
+  // A capacity of 0 disables the cache.
+  cache.SetCapacity(0);
+  const uint64_t descs = DescsCreated();
+  RunReduceSum(x, out0, {0});
+  EXPECT_GT(DescsCreated(), descs);
+  EXPECT_EQ(cache.Stats().size, 0u);
+}
+
+}  // namespace
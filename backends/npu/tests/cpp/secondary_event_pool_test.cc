@@ -0,0 +1,137 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "gtest/gtest.h"
+#include "runtime/runtime.h"
+#include "tools/acl_stub/acl_stub.h"
+
+namespace {
+
+class SecondaryEventPoolTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    ASSERT_EQ(aclrtCreateStream(&aicore_), ACL_ERROR_NONE);
+    ASSERT_EQ(aclrtCreateStream(&aicpu_), ACL_ERROR_NONE);
+    races_ = Races();
+  }
+
+  void TearDown() override {
+    // Every record the stub saw happened after the waits for the event.
+    EXPECT_EQ(Races(), races_);
+    aclrtDestroyStream(aicore_);
+    aclrtDestroyStream(aicpu_);
+  }
+
+  static uint64_t Races() {
+    return AclStubGetCounter(kAclStubEventRecordedWhileWaited);
+  }
+
+  aclrtStream aicore_{nullptr};
+  aclrtStream aicpu_{nullptr};
+  uint64_t races_{0};
+};
+
+TEST_F(SecondaryEventPoolTest, AlternatingPairsReuseEvents) {
+  SecondaryEventPool pool(aicore_, aicpu_);
+  pool.RecordBefore();
+  pool.RecordAfter();
+  const auto created = pool.Stats().created;
+  const auto reused = pool.Stats().reused;
+  const auto stub_created = AclStubGetCounter(kAclStubEventCreated);
+
+  for (int i = 0; i < 100; ++i) {
+    pool.RecordBefore();
+    pool.RecordAfter();
+  }
+  EXPECT_EQ(pool.Stats().created, created);
+  EXPECT_EQ(pool.Stats().reused, reused + 400);
+  EXPECT_EQ(AclStubGetCounter(kAclStubEventCreated), stub_created);
+}
+
+TEST_F(SecondaryEventPoolTest, RecordBeforeOnlyReusesEvents) {
+  // As in dropout, nothing is recorded on the aicore stream by the pool.
+  SecondaryEventPool pool(aicore_, aicpu_);
+  for (int i = 0; i < 100; ++i) {
+    pool.RecordBefore();
+  }
+  EXPECT_EQ(pool.Stats().created, 2u);
+  EXPECT_EQ(pool.Stats().reused, 198u);
+}
+
+TEST_F(SecondaryEventPoolTest, EventsWaitedOnByBusyStreamAreNotReused) {
+  SecondaryEventPool pool(aicore_, aicpu_);
+  AclStubHoldStream(aicpu_, 1);
+
+  // The records on the aicore stream complete, the waits of the aicpu stream
+  // for them are still pending.
+  for (int i = 0; i < 5; ++i) {
+    pool.RecordAfter();
+  }
+  EXPECT_EQ(pool.Stats().created, 10u);
+  EXPECT_EQ(pool.Stats().reused, 0u);
+
+  // Now the aicore stream waits for the aicpu stream as well.
+  for (int i = 0; i < 5; ++i) {
+    pool.RecordBefore();
+    pool.RecordAfter();
+  }
+  EXPECT_EQ(pool.Stats().created, 30u);
+  EXPECT_EQ(pool.Stats().reused, 0u);
+
+  // Once the stream has caught up, the events are reused and no more are
+  // created.
+  AclStubHoldStream(aicpu_, 0);
+  for (int i = 0; i < 100; ++i) {
+    pool.RecordBefore();
+    pool.RecordAfter();
+  }
+  EXPECT_EQ(pool.Stats().created, 30u);
+  EXPECT_EQ(pool.Stats().reused, 400u);
+}
+
+TEST_F(SecondaryEventPoolTest, EventsAreReusedOnceTheWaitsRan) {
+  SecondaryEventPool pool(aicore_, aicpu_);
+  AclStubHoldStream(aicore_, 1);
+  for (int i = 0; i < 3; ++i) {
+    pool.RecordBefore();
+  }
+  EXPECT_EQ(pool.Stats().created, 6u);
+
+  // The waits of the aicore stream run, which frees every event at once.
+  AclStubHoldStream(aicore_, 0);
+  for (int i = 0; i < 3; ++i) {
+    pool.RecordBefore();
+  }
+  EXPECT_EQ(pool.Stats().created, 6u);
+  EXPECT_EQ(pool.Stats().reused, 6u);
+}
+
+TEST_F(SecondaryEventPoolTest, DestroyWaitsForPendingEvents) {
+  {
+    SecondaryEventPool pool(aicore_, aicpu_);
+    AclStubHoldStream(aicpu_, 1);
+    pool.RecordAfter();
+    pool.RecordBefore();
+  }
+  // The pool synchronized with the device before destroying the events.
+  aclrtEvent event;
+  ASSERT_EQ(aclrtCreateEvent(&event), ACL_ERROR_NONE);
+  ASSERT_EQ(aclrtRecordEvent(event, aicpu_), ACL_ERROR_NONE);
+  aclrtEventRecordedStatus status = ACL_EVENT_RECORDED_STATUS_NOT_READY;
+  ASSERT_EQ(aclrtQueryEventStatus(event, &status), ACL_ERROR_NONE);
+  EXPECT_EQ(status, ACL_EVENT_RECORDED_STATUS_COMPLETE);
+  aclrtDestroyEvent(event);
+}
+
+}  // namespace
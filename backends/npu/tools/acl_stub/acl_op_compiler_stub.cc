@@ -0,0 +1,37 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// The stub libacl_op_compiler: launching an operator only counts the launch,
+// so what is measured is the host work of building it.
+
+#include <acl/acl.h>
+#include <acl/acl_op_compiler.h>
+
+#include "tools/acl_stub/acl_stub.h"
+
+aclError aclopCompileAndExecute(const char *opType,
+                                int numInputs,
+                                const aclTensorDesc *const inputDesc[],
+                                const aclDataBuffer *const inputs[],
+                                int numOutputs,
+                                const aclTensorDesc *const outputDesc[],
+                                aclDataBuffer *const outputs[],
+                                const aclopAttr *attr,
+                                aclopEngineType engineType,
+                                aclopCompileType compileFlag,
+                                const char *opPath,
+                                aclrtStream stream) {
+  AclStubIncrement(kAclStubOpLaunched);
+  return opType ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
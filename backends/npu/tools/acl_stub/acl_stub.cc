@@ -0,0 +1,609 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// A no-op libascendcl for running the NPU plugin on hosts without an NPU, so
+// that the host side of kernel launches can be measured on CPU-only CI.
+// Device memory is host memory, copies are plain memcpy and everything
+// "completes" immediately unless a test holds a stream back; operators are
+// not executed (see acl_op_compiler_stub.cc). Only the host-side cost is
+// meaningful.
+
+#include "tools/acl_stub/acl_stub.h"
+
+#include <acl/acl.h>
+#include <acl/acl_prof.h>
+
+#include <algorithm>
+#include <atomic>
+#include <cstdlib>
+#include <cstring>
+#include <deque>
+#include <mutex>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+struct aclTensorDesc {
+  aclDataType data_type;
+  aclFormat format;
+  std::vector<int64_t> dims;
+  std::string name;
+};
+
+struct aclDataBuffer {
+  void *data;
+  size_t size;
+};
+
+struct aclopAttr {};
+
+struct aclprofConfig {};
+
+struct aclprofStepInfo {};
+
+namespace {
+
+std::atomic<uint64_t> g_counters[kAclStubNumCounters];
+
+const char *const kCounterNames[kAclStubNumCounters] = {
+    "tensor_desc_created",
+    "tensor_desc_destroyed",
+    "data_buffer_created",
+    "op_attr_created",
+    "op_launched",
+    "memcpy",
+    "memcpy_async",
+    "memset",
+    "malloc",
+    "malloc_host",
+    "event_created",
+    "stream_synchronized",
+    "hccl_call",
+    "event_recorded_while_waited",
+};
+
+// Device memory reported by aclrtGetMemInfo, ACL_STUB_DEVICE_MEMORY_MB or
+// 4 GB. Paddle sizes its allocator chunks from it, and every chunk is really
+// allocated from the host.
+size_t DeviceMemory() {
+  const char *env = getenv("ACL_STUB_DEVICE_MEMORY_MB");
+  return (env ? strtoull(env, nullptr, 10) : 4096) << 20;
+}
+
+size_t DataTypeSize(aclDataType data_type) {
+  switch (data_type) {
+    case ACL_BOOL:
+    case ACL_INT8:
+    case ACL_UINT8:
+      return 1;
+    case ACL_FLOAT16:
+    case ACL_INT16:
+      return 2;
+    case ACL_INT64:
+    case ACL_DOUBLE:
+    case ACL_COMPLEX64:
+      return 8;
+    case ACL_COMPLEX128:
+      return 16;
+    default:
+      return 4;
+  }
+}
+
+void *AlignedAlloc(size_t size) {
+  void *ptr = nullptr;
+  return posix_memalign(&ptr, 64, size > 0 ? size : 1) == 0 ? ptr : nullptr;
+}
+
+// Events and the records and waits enqueued on streams. A stream executes
+// its work in order as soon as it is enqueued, except while it is held or
+// at a wait for a record that has not been executed yet.
+struct StubEvent {
+  // The event is complete when every record has been executed.
+  uint64_t recorded{0};
+  uint64_t completed{0};
+  // Enqueued waits for the event that have not been executed.
+  int pending_waits{0};
+};
+
+struct StubStreamOp {
+  StubEvent *event;
+  bool is_wait;
+  // The record made or, for a wait, waited for.
+  uint64_t record;
+};
+
+struct StubStream {
+  bool held{false};
+  std::deque<StubStreamOp> ops;
+};
+
+std::mutex g_stream_mutex;
+std::unordered_map<aclrtStream, StubStream> g_streams;
+
+void RunStreamsLocked() {
+  bool progress = true;
+  while (progress) {
+    progress = false;
+    for (auto &pair : g_streams) {
+      auto &stream = pair.second;
+      while (!stream.held && !stream.ops.empty()) {
+        const auto &op = stream.ops.front();
+        if (op.is_wait) {
+          if (op.event->completed < op.record) {
+            break;
+          }
+          --op.event->pending_waits;
+        } else {
+          op.event->completed = std::max(op.event->completed, op.record);
+        }
+        stream.ops.pop_front();
+        progress = true;
+      }
+    }
+  }
+}
+
+// The host waiting for the device lets every stream finish.
+void SynchronizeLocked() {
+  for (auto &pair : g_streams) {
+    pair.second.held = false;
+  }
+  RunStreamsLocked();
+}
+
+}  // namespace
+
+extern "C" {
+
+int AclStubNumCounters() { return kAclStubNumCounters; }
+
+const char *AclStubCounterName(int counter) {
+  return counter >= 0 && counter < kAclStubNumCounters ? kCounterNames[counter]
+                                                       : nullptr;
+}
+
+uint64_t AclStubGetCounter(int counter) {
+  return counter >= 0 && counter < kAclStubNumCounters
+             ? g_counters[counter].load(std::memory_order_relaxed)
+             : 0;
+}
+
+void AclStubIncrement(int counter) {
+  g_counters[counter].fetch_add(1, std::memory_order_relaxed);
+}
+
+void AclStubResetCounters() {
+  for (auto &counter : g_counters) {
+    counter.store(0, std::memory_order_relaxed);
+  }
+}
+
+void AclStubHoldStream(void *stream, int hold) {
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  g_streams[stream].held = hold != 0;
+  RunStreamsLocked();
+}
+
+}  // extern "C"
+
+aclError aclInit(const char *configPath) { return ACL_ERROR_NONE; }
+
+aclError aclFinalize() { return ACL_ERROR_NONE; }
+
+const char *aclGetRecentErrMsg() { return nullptr; }
+
+// Tensor descriptors and data buffers.
+
+aclTensorDesc *aclCreateTensorDesc(aclDataType dataType,
+                                   int numDims,
+                                   const int64_t *dims,
+                                   aclFormat format) {
+  AclStubIncrement(kAclStubTensorDescCreated);
+  auto desc = new aclTensorDesc;
+  desc->data_type = dataType;
+  desc->format = format;
+  if (numDims > 0 && dims) {
+    desc->dims.assign(dims, dims + numDims);
+  }
+  return desc;
+}
+
+void aclDestroyTensorDesc(const aclTensorDesc *desc) {
+  if (desc) {
+    AclStubIncrement(kAclStubTensorDescDestroyed);
+    delete desc;
+  }
+}
+
+aclDataType aclGetTensorDescType(const aclTensorDesc *desc) {
+  return desc ? desc->data_type : ACL_DT_UNDEFINED;
+}
+
+aclFormat aclGetTensorDescFormat(const aclTensorDesc *desc) {
+  return desc ? desc->format : ACL_FORMAT_UNDEFINED;
+}
+
+size_t aclGetTensorDescNumDims(const aclTensorDesc *desc) {
+  return desc ? desc->dims.size() : 0;
+}
+
+size_t aclGetTensorDescElementCount(const aclTensorDesc *desc) {
+  if (!desc) {
+    return 0;
+  }
+  size_t count = 1;
+  for (auto dim : desc->dims) {
+    count *= static_cast<size_t>(dim);
+  }
+  return count;
+}
+
+size_t aclGetTensorDescSize(const aclTensorDesc *desc) {
+  return desc ? aclGetTensorDescElementCount(desc) *
+                    DataTypeSize(desc->data_type)
+              : 0;
+}
+
+aclError aclSetTensorFormat(aclTensorDesc *desc, aclFormat format) {
+  if (!desc) {
+    return ACL_ERROR_INVALID_PARAM;
+  }
+  desc->format = format;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclSetTensorShape(aclTensorDesc *desc,
+                           int numDims,
+                           const int64_t *dims) {
+  if (!desc) {
+    return ACL_ERROR_INVALID_PARAM;
+  }
+  desc->dims.clear();
+  if (numDims > 0 && dims) {
+    desc->dims.assign(dims, dims + numDims);
+  }
+  return ACL_ERROR_NONE;
+}
+
+void aclSetTensorDescName(aclTensorDesc *desc, const char *name) {
+  if (desc && name) {
+    desc->name = name;
+  }
+}
+
+aclError aclSetTensorPlaceMent(aclTensorDesc *desc, aclMemType memType) {
+  return desc ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclSetTensorConst(aclTensorDesc *desc,
+                           void *dataBuffer,
+                           size_t length) {
+  return desc ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclDataBuffer *aclCreateDataBuffer(void *data, size_t size) {
+  AclStubIncrement(kAclStubDataBufferCreated);
+  return new aclDataBuffer{data, size};
+}
+
+aclError aclDestroyDataBuffer(const aclDataBuffer *dataBuffer) {
+  delete dataBuffer;
+  return ACL_ERROR_NONE;
+}
+
+void *aclGetDataBufferAddr(const aclDataBuffer *dataBuffer) {
+  return dataBuffer ? dataBuffer->data : nullptr;
+}
+
+// Operator attributes, which the stub does not keep.
+
+aclopAttr *aclopCreateAttr() {
+  AclStubIncrement(kAclStubOpAttrCreated);
+  return new aclopAttr;
+}
+
+void aclopDestroyAttr(const aclopAttr *attr) { delete attr; }
+
+aclError aclopSetAttrBool(aclopAttr *attr,
+                          const char *attrName,
+                          uint8_t attrValue) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrInt(aclopAttr *attr,
+                         const char *attrName,
+                         int64_t attrValue) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrFloat(aclopAttr *attr,
+                           const char *attrName,
+                           float attrValue) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrString(aclopAttr *attr,
+                            const char *attrName,
+                            const char *attrValue) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrDataType(aclopAttr *attr,
+                              const char *attrName,
+                              aclDataType attrValue) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrListBool(aclopAttr *attr,
+                              const char *attrName,
+                              int numValues,
+                              const uint8_t *values) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrListInt(aclopAttr *attr,
+                             const char *attrName,
+                             int numValues,
+                             const int64_t *values) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrListFloat(aclopAttr *attr,
+                               const char *attrName,
+                               int numValues,
+                               const float *values) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrListString(aclopAttr *attr,
+                                const char *attrName,
+                                int numValues,
+                                const char **values) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+aclError aclopSetAttrListListInt(aclopAttr *attr,
+                                 const char *attrName,
+                                 int numLists,
+                                 const int *numValues,
+                                 const int64_t *const values[]) {
+  return attr ? ACL_ERROR_NONE : ACL_ERROR_INVALID_PARAM;
+}
+
+// Devices, streams and events, see StubStream.
+
+aclError aclrtSetDevice(int32_t deviceId) { return ACL_ERROR_NONE; }
+
+aclError aclrtResetDevice(int32_t deviceId) { return ACL_ERROR_NONE; }
+
+aclError aclrtGetDevice(int32_t *deviceId) {
+  *deviceId = 0;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtGetDeviceCount(uint32_t *count) {
+  *count = 1;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtSynchronizeDevice() {
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  SynchronizeLocked();
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtCreateStream(aclrtStream *stream) {
+  *stream = new char;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtDestroyStream(aclrtStream stream) {
+  {
+    std::lock_guard<std::mutex> lock(g_stream_mutex);
+    auto it = g_streams.find(stream);
+    if (it != g_streams.end()) {
+      for (auto &op : it->second.ops) {
+        op.event->pending_waits -= op.is_wait;
+      }
+      g_streams.erase(it);
+    }
+  }
+  delete static_cast<char *>(stream);
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtSynchronizeStream(aclrtStream stream) {
+  AclStubIncrement(kAclStubStreamSynchronized);
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  SynchronizeLocked();
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtCreateEvent(aclrtEvent *event) {
+  AclStubIncrement(kAclStubEventCreated);
+  *event = new StubEvent;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtDestroyEvent(aclrtEvent event) {
+  auto stub_event = static_cast<StubEvent *>(event);
+  {
+    // Work still enqueued for the event is dropped with it.
+    std::lock_guard<std::mutex> lock(g_stream_mutex);
+    for (auto &pair : g_streams) {
+      auto &ops = pair.second.ops;
+      ops.erase(std::remove_if(ops.begin(),
+                               ops.end(),
+                               [stub_event](const StubStreamOp &op) {
+                                 return op.event == stub_event;
+                               }),
+                ops.end());
+    }
+    RunStreamsLocked();
+  }
+  delete stub_event;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtRecordEvent(aclrtEvent event, aclrtStream stream) {
+  auto stub_event = static_cast<StubEvent *>(event);
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  if (stub_event->pending_waits > 0) {
+    AclStubIncrement(kAclStubEventRecordedWhileWaited);
+  }
+  g_streams[stream].ops.push_back({stub_event, false, ++stub_event->recorded});
+  RunStreamsLocked();
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtQueryEventStatus(aclrtEvent event,
+                               aclrtEventRecordedStatus *status) {
+  auto stub_event = static_cast<StubEvent *>(event);
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  *status = stub_event->completed == stub_event->recorded
+                ? ACL_EVENT_RECORDED_STATUS_COMPLETE
+                : ACL_EVENT_RECORDED_STATUS_NOT_READY;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtSynchronizeEvent(aclrtEvent event) {
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  SynchronizeLocked();
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtStreamWaitEvent(aclrtStream stream, aclrtEvent event) {
+  auto stub_event = static_cast<StubEvent *>(event);
+  std::lock_guard<std::mutex> lock(g_stream_mutex);
+  ++stub_event->pending_waits;
+  g_streams[stream].ops.push_back({stub_event, true, stub_event->recorded});
+  RunStreamsLocked();
+  return ACL_ERROR_NONE;
+}
+
+// Memory.
+
+aclError aclrtMalloc(void **devPtr, size_t size, aclrtMemMallocPolicy policy) {
+  AclStubIncrement(kAclStubMalloc);
+  *devPtr = AlignedAlloc(size);
+  return *devPtr ? ACL_ERROR_NONE : ACL_ERROR_BAD_ALLOC;
+}
+
+aclError aclrtFree(void *devPtr) {
+  free(devPtr);
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtMallocHost(void **hostPtr, size_t size) {
+  AclStubIncrement(kAclStubMallocHost);
+  *hostPtr = AlignedAlloc(size);
+  return *hostPtr ? ACL_ERROR_NONE : ACL_ERROR_BAD_ALLOC;
+}
+
+aclError aclrtFreeHost(void *hostPtr) {
+  free(hostPtr);
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtMemcpy(void *dst,
+                     size_t destMax,
+                     const void *src,
+                     size_t count,
+                     aclrtMemcpyKind kind) {
+  AclStubIncrement(kAclStubMemcpy);
+  if (count > destMax) {
+    return ACL_ERROR_INVALID_PARAM;
+  }
+  if (count > 0) {
+    memmove(dst, src, count);
+  }
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtMemcpyAsync(void *dst,
+                          size_t destMax,
+                          const void *src,
+                          size_t count,
+                          aclrtMemcpyKind kind,
+                          aclrtStream stream) {
+  AclStubIncrement(kAclStubMemcpyAsync);
+  if (count > destMax) {
+    return ACL_ERROR_INVALID_PARAM;
+  }
+  if (count > 0) {
+    memmove(dst, src, count);
+  }
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtMemsetAsync(void *devPtr,
+                          size_t maxCount,
+                          int32_t value,
+                          size_t count,
+                          aclrtStream stream) {
+  AclStubIncrement(kAclStubMemset);
+  if (count > maxCount) {
+    return ACL_ERROR_INVALID_PARAM;
+  }
+  memset(devPtr, value, count);
+  return ACL_ERROR_NONE;
+}
+
+aclError aclrtGetMemInfo(aclrtMemAttr attr,
+                         size_t *free_size,
+                         size_t *total_size) {
+  *free_size = DeviceMemory();
+  *total_size = DeviceMemory();
+  return ACL_ERROR_NONE;
+}
+
+// Profiling, which the stub ignores.
+
+aclError aclprofInit(const char *profilerResultPath, size_t length) {
+  return ACL_ERROR_NONE;
+}
+
+aclError aclprofFinalize() { return ACL_ERROR_NONE; }
+
+aclprofConfig *aclprofCreateConfig(uint32_t *deviceIdList,
+                                   uint32_t deviceNums,
+                                   aclprofAicoreMetrics aicoreMetrics,
+                                   aclprofAicoreEvents *aicoreEvents,
+                                   uint64_t dataTypeConfig) {
+  return new aclprofConfig;
+}
+
+aclError aclprofDestroyConfig(const aclprofConfig *profilerConfig) {
+  delete profilerConfig;
+  return ACL_ERROR_NONE;
+}
+
+aclError aclprofStart(const aclprofConfig *profilerConfig) {
+  return ACL_ERROR_NONE;
+}
+
+aclError aclprofStop(const aclprofConfig *profilerConfig) {
+  return ACL_ERROR_NONE;
+}
+
+aclprofStepInfo *aclprofCreateStepInfo() { return new aclprofStepInfo; }
+
+void aclprofDestroyStepInfo(aclprofStepInfo *stepinfo) { delete stepinfo; }
+
+aclError aclprofGetStepTimestamp(aclprofStepInfo *stepInfo,
+                                 aclprofStepTag tag,
+                                 aclrtStream stream) {
+  return ACL_ERROR_NONE;
+}
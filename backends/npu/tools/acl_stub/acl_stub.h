@@ -0,0 +1,60 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#pragma once
+
+#include <cstdint>
+
+// Counters of the stub ACL runtime. They are exported with C linkage so that
+// tools/host_overhead_benchmark.py can read them through ctypes.
+
+enum AclStubCounter {
+  kAclStubTensorDescCreated = 0,
+  kAclStubTensorDescDestroyed,
+  kAclStubDataBufferCreated,
+  kAclStubOpAttrCreated,
+  kAclStubOpLaunched,
+  kAclStubMemcpy,
+  kAclStubMemcpyAsync,
+  kAclStubMemset,
+  kAclStubMalloc,
+  kAclStubMallocHost,
+  kAclStubEventCreated,
+  kAclStubStreamSynchronized,
+  kAclStubHcclCall,
+  // Records of an event while a wait for it was still enqueued on a stream,
+  // which may then wait for the new record instead.
+  kAclStubEventRecordedWhileWaited,
+  kAclStubNumCounters,
+};
+
+extern "C" {
+
+int AclStubNumCounters();
+
+const char *AclStubCounterName(int counter);
+
+uint64_t AclStubGetCounter(int counter);
+
+void AclStubIncrement(int counter);
+
+void AclStubResetCounters();
+
+// Holds back, when hold is nonzero, the work enqueued on stream: its records
+// stay ACL_EVENT_RECORDED_STATUS_NOT_READY and its waits pending, as if the
+// device were still busy, until the stream is released with hold 0 or the
+// host synchronizes with the device. Streams run freely by default.
+void AclStubHoldStream(void *stream, int hold);
+
+}  // extern "C"
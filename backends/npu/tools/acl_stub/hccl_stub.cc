@@ -0,0 +1,114 @@
+// Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// The stub libhccl: a single rank whose collectives only count the call.
+
+#include <hccl/hccl.h>
+#include <hccl/hccl_types.h>
+
+#include <cstring>
+
+#include "tools/acl_stub/acl_stub.h"
+
+HcclResult HcclGetRootInfo(HcclRootInfo *rootInfo) {
+  memset(rootInfo, 0, sizeof(HcclRootInfo));
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclCommInitRootInfo(uint32_t nRanks,
+                                const HcclRootInfo *rootInfo,
+                                uint32_t rank,
+                                HcclComm *comm) {
+  *comm = new char;
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclCommDestroy(HcclComm comm) {
+  delete static_cast<char *>(comm);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclAllReduce(void *sendBuf,
+                         void *recvBuf,
+                         uint64_t count,
+                         HcclDataType dataType,
+                         HcclReduceOp op,
+                         HcclComm comm,
+                         aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclBroadcast(void *buf,
+                         uint64_t count,
+                         HcclDataType dataType,
+                         uint32_t root,
+                         HcclComm comm,
+                         aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclReduce(void *sendBuf,
+                      void *recvBuf,
+                      uint64_t count,
+                      HcclDataType dataType,
+                      HcclReduceOp op,
+                      uint32_t root,
+                      HcclComm comm,
+                      aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclReduceScatter(void *sendBuf,
+                             void *recvBuf,
+                             uint64_t recvCount,
+                             HcclDataType dataType,
+                             HcclReduceOp op,
+                             HcclComm comm,
+                             aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclAllGather(void *sendBuf,
+                         void *recvBuf,
+                         uint64_t sendCount,
+                         HcclDataType dataType,
+                         HcclComm comm,
+                         aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclSend(void *sendBuf,
+                    uint64_t count,
+                    HcclDataType dataType,
+                    uint32_t destRank,
+                    HcclComm comm,
+                    aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
+
+HcclResult HcclRecv(void *recvBuf,
+                    uint64_t count,
+                    HcclDataType dataType,
+                    uint32_t srcRank,
+                    HcclComm comm,
+                    aclrtStream stream) {
+  AclStubIncrement(kAclStubHcclCall);
+  return HCCL_SUCCESS;
+}
@@ -0,0 +1,214 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the host-side cost of launching NPU kernels.
+
+Build the plugin against the no-op ACL/HCCL stubs, which run nothing on a
+device and make every copy a memcpy, so that the time of an op is only what
+Paddle and the kernel spend on the host: NpuOpRunner descriptors and
+attributes, the extra Cast launches of TypeAdapter, TensorCopy and
+FillNpuTensorWithConstant. This runs on CPU-only machines:
+
+    cd build && cmake .. -DWITH_TESTING=OFF -DWITH_ACL_STUB=ON && make -j8
+    pip install dist/paddle_custom_npu*.whl
+    python ../tools/host_overhead_benchmark.py --output report.json
+
+Every op is called --steps times per round, for --repeat rounds, and the
+report gives the per-call time of the median and fastest rounds together with
+the ACL calls per launch counted by the stub: descriptors created, ops
+launched, copies and so on. With --baseline, the run fails when an op got
+slower than the baseline by more than --tolerance, or makes more ACL calls
+than the baseline did. The counts do not depend on the machine, which makes
+them the reliable part of the check on shared CI hosts.
+"""
+
+import argparse
+import ctypes
+import json
+import statistics
+import sys
+import time
+
+import paddle
+
+# ACL calls whose count per launch must not grow.
+CHECKED_COUNTERS = (
+    "tensor_desc_created",
+    "op_attr_created",
+    "op_launched",
+    "memcpy",
+    "memcpy_async",
+)
+
+
+class AclStub(object):
+    """Counters of the stub libascendcl loaded by the plugin, if any."""
+
+    def __init__(self):
+        try:
+            lib = ctypes.CDLL("libascendcl.so")
+            lib.AclStubNumCounters.restype = ctypes.c_int
+        except (OSError, AttributeError):
+            self.lib = None
+            return
+        lib.AclStubCounterName.restype = ctypes.c_char_p
+        lib.AclStubCounterName.argtypes = [ctypes.c_int]
+        lib.AclStubGetCounter.restype = ctypes.c_uint64
+        lib.AclStubGetCounter.argtypes = [ctypes.c_int]
+        self.lib = lib
+        self.names = [
+            lib.AclStubCounterName(i).decode() for i in range(lib.AclStubNumCounters())
+        ]
+
+    def counters(self):
+        if self.lib is None:
+            return {}
+        return {
+            name: self.lib.AclStubGetCounter(i) for i, name in enumerate(self.names)
+        }
+
+
+def make_cases(size):
+    x = paddle.rand([size, size], dtype="float32")
+    y = paddle.rand([size, size], dtype="float32")
+    x_int64 = paddle.randint(0, 100, [size, size], dtype="int64")
+    linear = paddle.nn.Linear(size, size)
+    linear(x).sum().backward()
+    adam = paddle.optimizer.Adam(parameters=linear.parameters())
+    return {
+        "elementwise_add": lambda: paddle.add(x, y),
+        "matmul": lambda: paddle.matmul(x, y),
+        "softmax": lambda: paddle.nn.functional.softmax(x),
+        "concat": lambda: paddle.concat([x, y, x, y]),
+        # one adam kernel for the weight and one for the bias
+        "adam": adam.step,
+        # int64 goes through TypeAdapter, which casts in and out
+        "scale_int64": lambda: paddle.scale(x_int64, 2.0),
+        # TensorCopy
+        "assign": lambda: paddle.assign(x),
+        # FillNpuTensorWithConstant
+        "full": lambda: paddle.full([size, size], 1.0),
+    }
+
+
+def run_case(fn, steps, repeat, stub):
+    fn()  # warm up, so that one-time work such as the op cache is not timed
+    paddle.device.synchronize()
+    before = stub.counters()
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(steps):
+            fn()
+        paddle.device.synchronize()
+        rounds.append((time.perf_counter() - start) * 1e6 / steps)
+    after = stub.counters()
+    calls = steps * repeat
+    return {
+        "median_us": statistics.median(rounds),
+        "min_us": min(rounds),
+        "acl_calls_per_launch": {
+            name: (after[name] - before[name]) / calls for name in after
+        },
+    }
+
+
+def compare(report, baseline, tolerance):
+    failures = []
+    for name, result in report["ops"].items():
+        base = baseline.get("ops", {}).get(name)
+        if base is None:
+            continue
+        if result["median_us"] > base["median_us"] * (1.0 + tolerance):
+            failures.append(
+                "%s: %.2f us per launch, baseline %.2f us"
+                % (name, result["median_us"], base["median_us"])
+            )
+        base_calls = base.get("acl_calls_per_launch", {})
+        for counter in CHECKED_COUNTERS:
+            calls = result["acl_calls_per_launch"].get(counter)
+            if counter in base_calls and calls is not None:
+                if calls > base_calls[counter] + 1e-9:
+                    failures.append(
+                        "%s: %g %s per launch, baseline %g"
+                        % (name, calls, counter, base_calls[counter])
+                    )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--ops", nargs="*", help="ops to run, all by default")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    paddle.set_device("npu")
+    stub = AclStub()
+    if stub.lib is None:
+        print(
+            "warning: the plugin is not linked with the ACL stub, times include "
+            "the device and no ACL calls are counted",
+            file=sys.stderr,
+        )
+    cases = make_cases(args.size)
+    names = args.ops or list(cases)
+
+    report = {
+        "paddle_version": paddle.__version__,
+        "acl_stub": stub.lib is not None,
+        "size": args.size,
+        "steps": args.steps,
+        "repeat": args.repeat,
+        "ops": {},
+    }
+    print(
+        "%-16s %12s %12s %14s %12s"
+        % ("op", "median (us)", "min (us)", "descs/launch", "ops/launch")
+    )
+    for name in names:
+        result = run_case(cases[name], args.steps, args.repeat, stub)
+        report["ops"][name] = result
+        calls = result["acl_calls_per_launch"]
+        print(
+            "%-16s %12.2f %12.2f %14s %12s"
+            % (
+                name,
+                result["median_us"],
+                result["min_us"],
+                "%g" % calls["tensor_desc_created"] if calls else "-",
+                "%g" % calls["op_launched"] if calls else "-",
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.tolerance)
+        for failure in failures:
+            print("regression: " + failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()